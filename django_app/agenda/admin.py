@@ -3,14 +3,15 @@ Configuration de l'administration Django pour le module Agenda
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import (
     RendezVous, Tache, Etiquette, ParticipantExterne,
     DocumentRdv, DocumentTache, RappelRdv, RappelTache,
     CommentaireTache, SousTacheChecklist, Notification,
     JourneeAgenda, ReportTache, ConfigurationAgenda,
-    StatistiquesAgenda, HistoriqueAgenda,
-    VueSauvegardee, ParticipationRdv
+    StatistiquesAgenda, StatistiqueJournaliere, HistoriqueAgenda,
+    VueSauvegardee, ParticipationRdv, EnvoiNotification
 )
 
 
@@ -164,6 +165,7 @@ class TacheAdmin(admin.ModelAdmin):
     readonly_fields = ['date_creation', 'date_modification', 'date_terminaison', 'date_delegation']
     filter_horizontal = ['etiquettes', 'co_responsables']
     inlines = [SousTacheChecklistInline, CommentaireTacheInline, DocumentTacheInline, RappelTacheInline, ReportTacheInline]
+    list_select_related = ['responsable']
 
     fieldsets = (
         ('Informations de base', {
@@ -202,6 +204,9 @@ class TacheAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).avec_progression()
+
     def statut_badge(self, obj):
         couleurs = {
             'a_faire': '#3498db',
@@ -288,6 +293,23 @@ class NotificationAdmin(admin.ModelAdmin):
     readonly_fields = ['date_creation', 'date_lecture']
 
 
+@admin.register(EnvoiNotification)
+class EnvoiNotificationAdmin(admin.ModelAdmin):
+    list_display = ['destinataire', 'canal', 'statut', 'nb_tentatives', 'prochaine_tentative', 'date_envoi']
+    list_filter = ['canal', 'statut']
+    search_fields = ['destinataire', 'sujet']
+    raw_id_fields = ['notification']
+    readonly_fields = ['date_creation', 'date_envoi', 'derniere_erreur']
+    actions = ['relancer']
+
+    @admin.action(description="Remettre en file les envois sélectionnés")
+    def relancer(self, request, queryset):
+        nb = queryset.exclude(statut='envoye').update(
+            statut='en_attente', nb_tentatives=0, prochaine_tentative=timezone.now()
+        )
+        self.message_user(request, f"{nb} envoi(s) remis en file")
+
+
 # =============================================================================
 # ADMIN JOURNÉE AGENDA
 # =============================================================================
@@ -363,6 +385,17 @@ class StatistiquesAgendaAdmin(admin.ModelAdmin):
     readonly_fields = ['date_generation']
 
 
+@admin.register(StatistiqueJournaliere)
+class StatistiqueJournaliereAdmin(admin.ModelAdmin):
+    list_display = [
+        'date', 'utilisateur', 'nb_rdv_total', 'nb_rdv_termines',
+        'nb_taches_total', 'nb_taches_terminees', 'nb_taches_en_retard'
+    ]
+    list_filter = ['date']
+    date_hierarchy = 'date'
+    readonly_fields = ['date_generation']
+
+
 # =============================================================================
 # ADMIN REPORT TÂCHE
 # =============================================================================
@@ -461,11 +494,11 @@ class DocumentRdvAdmin(admin.ModelAdmin):
 
 @admin.register(RappelRdv)
 class RappelRdvAdmin(admin.ModelAdmin):
-    list_display = ['rendez_vous', 'type_rappel', 'type_notification', 'est_envoye', 'date_envoi']
+    list_display = ['rendez_vous', 'type_rappel', 'type_notification', 'est_envoye', 'date_envoi_prevue', 'date_envoi']
     list_filter = ['type_rappel', 'type_notification', 'est_envoye']
     search_fields = ['rendez_vous__titre']
     raw_id_fields = ['rendez_vous']
-    readonly_fields = ['date_envoi']
+    readonly_fields = ['date_envoi_prevue', 'date_envoi']
 
 
 # =============================================================================
@@ -488,11 +521,11 @@ class DocumentTacheAdmin(admin.ModelAdmin):
 
 @admin.register(RappelTache)
 class RappelTacheAdmin(admin.ModelAdmin):
-    list_display = ['tache', 'type_rappel', 'type_notification', 'est_envoye', 'date_envoi']
+    list_display = ['tache', 'type_rappel', 'type_notification', 'est_envoye', 'date_envoi_prevue', 'date_envoi']
     list_filter = ['type_rappel', 'type_notification', 'est_envoye']
     search_fields = ['tache__titre']
     raw_id_fields = ['tache']
-    readonly_fields = ['date_envoi']
+    readonly_fields = ['date_envoi_prevue', 'date_envoi']
 
 
 # =============================================================================
@@ -5,3 +5,7 @@ class AgendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agenda'
     verbose_name = "Gestion de l'Agenda"
+
+    def ready(self):
+        """Charge les signaux au démarrage de l'application."""
+        import agenda.signals  # noqa: F401
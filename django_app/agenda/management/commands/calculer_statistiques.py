@@ -1,13 +1,18 @@
 """
 Commande de gestion pour calculer les statistiques de l'agenda
 
-Utilisation: python manage.py calculer_statistiques [--periode jour|semaine|mois]
+Utilisation: python manage.py calculer_statistiques [--periode jour|semaine|mois|annee]
+             [--depuis AAAA-MM-JJ] [--recalculer]
 
-Cette commande calcule et enregistre les statistiques pour les rapports.
+Les statistiques journalières sont écrites à la clôture de la journée ;
+la passe 'jour' enregistre celles d'hier si la clôture n'a pas eu lieu.
+Les passes semaine, mois et année somment les statistiques journalières
+de la période précédente. --depuis enregistre les journées manquantes
+depuis une date (reprise de l'historique), mois par mois.
 """
 
-from datetime import timedelta
-from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from agenda.services import StatistiquesService
 
@@ -19,24 +24,44 @@ class Command(BaseCommand):
         parser.add_argument(
             '--periode',
             type=str,
-            choices=['jour', 'semaine', 'mois'],
+            choices=['jour', 'semaine', 'mois', 'annee'],
             default='jour',
             help='Période pour laquelle calculer les statistiques',
         )
+        parser.add_argument(
+            '--depuis',
+            type=str,
+            help='Enregistre les statistiques journalières depuis cette date (format: YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--recalculer',
+            action='store_true',
+            help='Avec --depuis, réécrit aussi les journées déjà enregistrées',
+        )
 
     def handle(self, *args, **options):
         periode = options['periode']
         today = timezone.now().date()
+        hier = today - timedelta(days=1)
+
+        if options['depuis']:
+            try:
+                debut = datetime.strptime(options['depuis'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Format de date invalide. Utilisez YYYY-MM-DD')
+            self._reprendre(debut, hier, options['recalculer'])
 
         if periode == 'jour':
-            date_debut = today - timedelta(days=1)
-            date_fin = date_debut
-        elif periode == 'semaine':
-            date_debut = today - timedelta(days=today.weekday() + 7)
-            date_fin = date_debut + timedelta(days=6)
-        else:  # mois
-            date_debut = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-            date_fin = today.replace(day=1) - timedelta(days=1)
+            date_debut = date_fin = hier
+            StatistiquesService.enregistrer_journees(date_debut, date_fin)
+        else:
+            # Période précédente complète
+            reference = {
+                'semaine': today - timedelta(days=7),
+                'mois': today.replace(day=1) - timedelta(days=1),
+                'annee': today.replace(month=1, day=1) - timedelta(days=1),
+            }[periode]
+            date_debut, date_fin = StatistiquesService.bornes_periode(periode, reference)
 
         self.stdout.write(f'Calcul des statistiques {periode} ({date_debut} - {date_fin})...')
 
@@ -55,3 +80,12 @@ class Command(BaseCommand):
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Erreur: {str(e)}'))
+
+    def _reprendre(self, debut, fin, recalculer):
+        """Enregistre les statistiques journalières de debut à fin, un mois à la fois"""
+        total = 0
+        while debut <= fin:
+            _, fin_mois = StatistiquesService.bornes_periode('mois', debut)
+            total += StatistiquesService.enregistrer_journees(debut, min(fin_mois, fin), recalculer)
+            debut = fin_mois + timedelta(days=1)
+        self.stdout.write(f'{total} journée(s) enregistrée(s)')
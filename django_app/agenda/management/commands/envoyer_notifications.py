@@ -0,0 +1,69 @@
+"""
+Commande de gestion pour remettre les emails et SMS de notification en file
+
+Utilisation: python manage.py envoyer_notifications [--taille-lot N] [--continu] [--intervalle S]
+
+Sans option, la commande vide la file d'envoi (EnvoiNotification) par lots et
+s'arrête ; elle peut être exécutée via cron chaque minute. Avec --continu, elle
+reste active et traite la file toutes les --intervalle secondes.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from agenda.services import EnvoiService
+
+
+class Command(BaseCommand):
+    help = 'Remet par lots les emails et SMS de notification en file d\'envoi'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=100,
+            help='Nombre d\'envois traités par lot (défaut: 100)',
+        )
+        parser.add_argument(
+            '--continu',
+            action='store_true',
+            help='Reste actif et traite la file en continu',
+        )
+        parser.add_argument(
+            '--intervalle',
+            type=int,
+            default=10,
+            help='Attente entre deux passages en mode continu, en secondes (défaut: 10)',
+        )
+
+    def handle(self, *args, **options):
+        taille_lot = max(options['taille_lot'], 1)
+
+        if not options['continu']:
+            self._vider_file(taille_lot)
+            return
+
+        self.stdout.write('Worker d\'envoi des notifications démarré')
+        try:
+            while True:
+                self._vider_file(taille_lot)
+                time.sleep(max(options['intervalle'], 1))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Worker d\'envoi des notifications arrêté'))
+
+    def _vider_file(self, taille_lot):
+        """Traite des lots jusqu'à ce que plus aucun envoi ne soit dû"""
+        totaux = {'envoyes': 0, 'reprogrammes': 0, 'abandonnes': 0}
+        while True:
+            resultat = EnvoiService.traiter_file(taille_lot)
+            for cle, valeur in resultat.items():
+                totaux[cle] += valeur
+            if sum(resultat.values()) < taille_lot:
+                break
+
+        if any(totaux.values()):
+            self.stdout.write(self.style.SUCCESS(
+                f"{totaux['envoyes']} envoi(s) effectué(s), "
+                f"{totaux['reprogrammes']} reprogrammé(s), "
+                f"{totaux['abandonnes']} abandonné(s)"
+            ))
@@ -1,75 +1,84 @@
 """
-Commande de gestion pour générer les occurrences de RDV et tâches récurrents
+Commande de gestion pour enregistrer les occurrences échues des RDV et tâches récurrents
 
 Utilisation: python manage.py generer_recurrences [--jours N]
 
-Cette commande devrait être exécutée quotidiennement pour créer les occurrences
-des éléments récurrents pour les N prochains jours.
+Les occurrences futures sont calculées à la lecture (RecurrenceService) et
+n'ont pas de ligne propre. Cette commande, exécutée chaque jour, enregistre
+celles du jour (et des N jours suivants avec --jours, des RATTRAPAGE_JOURS
+précédents si une exécution a manqué) : une occurrence arrivée à échéance
+doit pouvoir être terminée, pointée, clôturée ou escaladée. L'ensemble
+s'exécute dans une seule transaction, avec insertion groupée.
 """
 
 from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from agenda.models import RendezVous, Tache, TypeRecurrence
+from agenda.models import RendezVous, Tache
 from agenda.services import RecurrenceService
 
 
+# Jours passés repris si la commande n'a pas tourné
+RATTRAPAGE_JOURS = 7
+
+
 class Command(BaseCommand):
-    help = 'Génère les occurrences de RDV et tâches récurrents'
+    help = 'Enregistre les occurrences échues des RDV et tâches récurrents'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--jours',
             type=int,
-            default=30,
-            help='Nombre de jours à l\'avance pour générer les occurrences (défaut: 30)',
+            default=0,
+            help='Nombre de jours à l\'avance à enregistrer en plus du jour même (défaut: 0)',
         )
 
     def handle(self, *args, **options):
         jours = options['jours']
-        date_limite = timezone.now().date() + timedelta(days=jours)
+        aujourd_hui = timezone.now().date()
+        date_limite = aujourd_hui + timedelta(days=jours)
+        date_min = aujourd_hui - timedelta(days=RATTRAPAGE_JOURS)
 
         self.stdout.write(f'Génération des occurrences jusqu\'au {date_limite}...')
 
+        with transaction.atomic():
+            total_rdv, total_taches = self._generer(date_limite, date_min)
+
+        self.stdout.write(self.style.SUCCESS(f'{total_rdv} occurrence(s) de RDV créée(s)'))
+        self.stdout.write(self.style.SUCCESS(f'{total_taches} occurrence(s) de tâche(s) créée(s)'))
+        self.stdout.write(self.style.SUCCESS('Génération des récurrences terminée'))
+
+    def _generer(self, date_limite, date_min=None):
+        """Génère toutes les occurrences et retourne (total_rdv, total_taches)"""
         # RDV récurrents
         rdv_recurrents = RendezVous.objects.filter(
             est_actif=True,
-            type_recurrence__in=[
-                TypeRecurrence.QUOTIDIEN,
-                TypeRecurrence.HEBDOMADAIRE,
-                TypeRecurrence.MENSUEL,
-                TypeRecurrence.PERSONNALISE
-            ],
+            type_recurrence__in=RecurrenceService.TYPES_RECURRENTS,
             rdv_parent__isnull=True  # Seulement les parents
-        )
+        ).select_related('createur').prefetch_related(*RecurrenceService.RELATIONS_RDV)
 
         total_rdv = 0
         for rdv in rdv_recurrents:
-            occurrences = RecurrenceService.generer_occurrences_rdv(rdv, date_limite)
+            occurrences = RecurrenceService.generer_occurrences_rdv(rdv, date_limite, date_min)
             total_rdv += len(occurrences)
             if occurrences:
                 self.stdout.write(f'  - {rdv.titre}: {len(occurrences)} occurrence(s) créée(s)')
 
-        self.stdout.write(self.style.SUCCESS(f'{total_rdv} occurrence(s) de RDV créée(s)'))
-
         # Tâches récurrentes
         taches_recurrentes = Tache.objects.filter(
             est_active=True,
-            type_recurrence__in=[
-                TypeRecurrence.QUOTIDIEN,
-                TypeRecurrence.HEBDOMADAIRE,
-                TypeRecurrence.MENSUEL,
-                TypeRecurrence.PERSONNALISE
-            ],
+            type_recurrence__in=RecurrenceService.TYPES_RECURRENTS,
             tache_parent__isnull=True  # Seulement les parents
+        ).select_related('createur', 'responsable', 'dossier').prefetch_related(
+            *RecurrenceService.RELATIONS_TACHE
         )
 
         total_taches = 0
         for tache in taches_recurrentes:
-            occurrences = RecurrenceService.generer_occurrences_tache(tache, date_limite)
+            occurrences = RecurrenceService.generer_occurrences_tache(tache, date_limite, date_min)
             total_taches += len(occurrences)
             if occurrences:
                 self.stdout.write(f'  - {tache.titre}: {len(occurrences)} occurrence(s) créée(s)')
 
-        self.stdout.write(self.style.SUCCESS(f'{total_taches} occurrence(s) de tâche(s) créée(s)'))
-        self.stdout.write(self.style.SUCCESS('Génération des récurrences terminée'))
+        return total_rdv, total_taches
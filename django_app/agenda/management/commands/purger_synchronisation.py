@@ -0,0 +1,20 @@
+"""
+Commande de gestion pour purger les traces de suppression de l'agenda
+
+Utilisation: python manage.py purger_synchronisation
+
+Supprime les SuppressionAgenda plus anciennes que AGENDA_SYNC_RETENTION_JOURS.
+Les clients dont le jeton est plus ancien reçoivent une réponse 410 et
+refont une synchronisation complète.
+"""
+
+from django.core.management.base import BaseCommand
+from agenda.services import SynchronisationService
+
+
+class Command(BaseCommand):
+    help = "Purge les traces de suppression utilisées par la synchronisation de l'agenda"
+
+    def handle(self, *args, **options):
+        supprimees = SynchronisationService.purger()
+        self.stdout.write(self.style.SUCCESS(f'{supprimees} trace(s) de suppression purgée(s)'))
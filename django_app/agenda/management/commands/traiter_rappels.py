@@ -1,25 +1,68 @@
 """
 Commande de gestion pour traiter les rappels de RDV et tâches
 
-Utilisation: python manage.py traiter_rappels
+Utilisation: python manage.py traiter_rappels [--continu] [--attente-max S]
 
-Cette commande devrait être exécutée régulièrement via cron (toutes les 5-15 minutes).
+Sans option, la commande traite une fois les rappels arrivés à échéance et
+devrait être exécutée régulièrement via cron (toutes les 5-15 minutes).
+
+Avec --continu, elle tourne en ordonnanceur : après chaque passage, elle dort
+jusqu'à la prochaine date d'envoi prévue (au plus --attente-max secondes, pour
+prendre en compte les rappels créés entre-temps) au lieu d'interroger la base
+à intervalle fixe.
 """
 
+import time
+
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from agenda.services import RappelService
 
 
 class Command(BaseCommand):
     help = 'Traite les rappels de rendez-vous et tâches à envoyer'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continu',
+            action='store_true',
+            help='Mode ordonnanceur : reste actif et attend la prochaine échéance',
+        )
+        parser.add_argument(
+            '--attente-max',
+            type=int,
+            default=300,
+            help='Attente maximale entre deux passages en mode continu, en secondes (défaut: 300)',
+        )
+
     def handle(self, *args, **options):
+        if not options['continu']:
+            self._traiter()
+            self.stdout.write(self.style.SUCCESS('Tous les rappels ont été traités'))
+            return
+
+        attente_max = max(options['attente_max'], 1)
+        self.stdout.write(f'Ordonnanceur de rappels démarré (attente max: {attente_max}s)')
+        try:
+            while True:
+                self._traiter()
+                time.sleep(self._calculer_attente(attente_max))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Ordonnanceur de rappels arrêté'))
+
+    def _traiter(self):
         self.stdout.write('Traitement des rappels de RDV...')
-        RappelService.traiter_rappels_rdv()
-        self.stdout.write(self.style.SUCCESS('Rappels RDV traités'))
+        nb_rdv = RappelService.traiter_rappels_rdv()
+        self.stdout.write(self.style.SUCCESS(f'{nb_rdv} rappel(s) RDV traité(s)'))
 
         self.stdout.write('Traitement des rappels de tâches...')
-        RappelService.traiter_rappels_tache()
-        self.stdout.write(self.style.SUCCESS('Rappels tâches traités'))
+        nb_taches = RappelService.traiter_rappels_tache()
+        self.stdout.write(self.style.SUCCESS(f'{nb_taches} rappel(s) tâche(s) traité(s)'))
 
-        self.stdout.write(self.style.SUCCESS('Tous les rappels ont été traités'))
+    def _calculer_attente(self, attente_max):
+        """Secondes à attendre avant la prochaine échéance connue"""
+        prochaine = RappelService.prochaine_echeance()
+        if prochaine is None:
+            return attente_max
+        secondes = (prochaine - timezone.now()).total_seconds()
+        return min(max(secondes, 1), attente_max)
@@ -18,7 +18,13 @@ class Command(BaseCommand):
         self.stdout.write('Vérification des escalades...')
 
         try:
-            EscaladeService.verifier_escalades()
-            self.stdout.write(self.style.SUCCESS('Vérification des escalades terminée'))
+            escalades = EscaladeService.verifier_escalades()
+            for escalade in escalades:
+                self.stdout.write(
+                    f"  - {escalade['tache'].titre}: {escalade['jours_retard']} jour(s) de retard"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'Vérification des escalades terminée: {len(escalades)} tâche(s) escaladée(s)'
+            ))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Erreur: {str(e)}'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:58
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+DELAIS_RDV_MINUTES = {'15min': 15, '30min': 30, '1h': 60, '1jour': 24 * 60}
+DELAIS_TACHE_JOURS = {'jour_echeance': 0, 'veille': 1, '2jours': 2, 'semaine': 7}
+
+
+def calculer_dates_envoi_prevues(apps, schema_editor):
+    """Renseigne date_envoi_prevue pour les rappels existants non envoyés"""
+    RappelRdv = apps.get_model('agenda', 'RappelRdv')
+    RappelTache = apps.get_model('agenda', 'RappelTache')
+
+    rappels_rdv = list(RappelRdv.objects.filter(est_envoye=False).select_related('rendez_vous'))
+    for rappel in rappels_rdv:
+        if rappel.type_rappel == 'personnalise':
+            minutes = rappel.delai_personnalise or 60
+        else:
+            minutes = DELAIS_RDV_MINUTES.get(rappel.type_rappel, 60)
+        rappel.date_envoi_prevue = rappel.rendez_vous.date_debut - timedelta(minutes=minutes)
+    RappelRdv.objects.bulk_update(rappels_rdv, ['date_envoi_prevue'], batch_size=500)
+
+    rappels_tache = list(RappelTache.objects.filter(est_envoye=False).select_related('tache'))
+    for rappel in rappels_tache:
+        if rappel.type_rappel == 'personnalise':
+            jours = rappel.delai_personnalise or 0
+        else:
+            jours = DELAIS_TACHE_JOURS.get(rappel.type_rappel, 0)
+        jour_envoi = rappel.tache.date_echeance - timedelta(days=jours)
+        rappel.date_envoi_prevue = timezone.make_aware(datetime.combine(jour_envoi, time.min))
+    RappelTache.objects.bulk_update(rappels_tache, ['date_envoi_prevue'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0003_participationrdv_vuesauvegardee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rappelrdv',
+            name='date_envoi_prevue',
+            field=models.DateTimeField(blank=True, editable=False, help_text="Date d'envoi calculée à l'enregistrement (indexée pour le dispatcher)", null=True),
+        ),
+        migrations.AddField(
+            model_name='rappeltache',
+            name='date_envoi_prevue',
+            field=models.DateTimeField(blank=True, editable=False, help_text="Date d'envoi calculée à l'enregistrement (indexée pour le dispatcher)", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='rappelrdv',
+            index=models.Index(fields=['est_envoye', 'date_envoi_prevue'], name='agenda_rapp_est_env_034515_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rappeltache',
+            index=models.Index(fields=['est_envoye', 'date_envoi_prevue'], name='agenda_rapp_est_env_9123df_idx'),
+        ),
+        migrations.RunPython(calculer_dates_envoi_prevues, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:00
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def lier_notifications_taches(apps, schema_editor):
+    """Renseigne Notification.tache à partir du lien générique existant"""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Notification = apps.get_model('agenda', 'Notification')
+    Tache = apps.get_model('agenda', 'Tache')
+
+    ct_tache = ContentType.objects.filter(app_label='agenda', model='tache').first()
+    if ct_tache is None:
+        return
+
+    liens = {}
+    for notif_id, object_id in Notification.objects.filter(
+        content_type=ct_tache
+    ).values_list('id', 'object_id'):
+        try:
+            liens[notif_id] = uuid.UUID(str(object_id))
+        except (TypeError, ValueError):
+            continue
+
+    taches_existantes = set(
+        Tache.objects.filter(pk__in=set(liens.values())).values_list('pk', flat=True)
+    )
+    notifications = [
+        Notification(pk=notif_id, tache_id=tache_id)
+        for notif_id, tache_id in liens.items()
+        if tache_id in taches_existantes
+    ]
+    Notification.objects.bulk_update(notifications, ['tache'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0004_rappels_date_envoi_prevue'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='tache',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='agenda.tache'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['tache', 'type_notification', 'date_creation'], name='agenda_noti_tache_i_88fbf0_idx'),
+        ),
+        migrations.RunPython(lier_notifications_taches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:03
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0005_notification_tache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvoiNotification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('canal', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], max_length=10)),
+                ('destinataire', models.CharField(help_text='Adresse email ou numéro de téléphone', max_length=254)),
+                ('sujet', models.CharField(blank=True, max_length=255)),
+                ('message', models.TextField()),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('envoye', 'Envoyé'), ('abandonne', "Abandonné (trop d'échecs)")], default='en_attente', max_length=20)),
+                ('nb_tentatives', models.PositiveIntegerField(default=0)),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envois', to='agenda.notification')),
+            ],
+            options={
+                'verbose_name': 'Envoi de notification',
+                'verbose_name_plural': "File d'envoi des notifications",
+                'ordering': ['prochaine_tentative'],
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='agenda_envo_statut_b0219a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0006_envoinotification'),
+        ('gestion', '0023_audit_horodatage_action'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressionAgenda',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type_objet', models.CharField(choices=[('rendez_vous', 'Rendez-vous'), ('tache', 'Tâche')], max_length=20)),
+                ('objet_id', models.UUIDField()),
+                ('date_suppression', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Suppression agenda',
+                'verbose_name_plural': 'Suppressions agenda',
+                'ordering': ['date_suppression'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['date_modification'], name='agenda_rend_date_mo_25d21e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tache',
+            index=models.Index(fields=['date_modification'], name='agenda_tach_date_mo_313f18_idx'),
+        ),
+        migrations.AddField(
+            model_name='suppressionagenda',
+            name='utilisateur',
+            field=models.ForeignKey(blank=True, help_text='NULL = supprimé pour tous les utilisateurs', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='suppressions_agenda', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='suppressionagenda',
+            index=models.Index(fields=['date_suppression'], name='agenda_supp_date_su_b5dd4b_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def renseigner_date_occurrence(apps, schema_editor):
+    """Les occurrences déjà générées deviennent les exceptions de leur date"""
+    for modele, parent, champ_date, date_de in (
+        ('RendezVous', 'rdv_parent_id', 'date_debut', lambda d: timezone.localtime(d).date()),
+        ('Tache', 'tache_parent_id', 'date_echeance', lambda d: d),
+    ):
+        Modele = apps.get_model('agenda', modele)
+        deja_vues = set()
+        a_marquer = []
+        for id_, parent_id, valeur in Modele.objects.filter(**{f"{parent}__isnull": False}).order_by(
+            'date_creation', 'id'
+        ).values_list('id', parent, champ_date):
+            cle = (parent_id, date_de(valeur))
+            if cle not in deja_vues:
+                deja_vues.add(cle)
+                a_marquer.append(Modele(id=id_, date_occurrence=cle[1]))
+        Modele.objects.bulk_update(a_marquer, ['date_occurrence'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0007_synchronisation'),
+        ('gestion', '0023_audit_horodatage_action'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendezvous',
+            name='date_occurrence',
+            field=models.DateField(blank=True, help_text='Occurrence de la série remplacée par ce RDV (exception)', null=True),
+        ),
+        migrations.AddField(
+            model_name='tache',
+            name='date_occurrence',
+            field=models.DateField(blank=True, help_text='Occurrence de la série remplacée par cette tâche (exception)', null=True),
+        ),
+        migrations.RunPython(renseigner_date_occurrence, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['type_recurrence', 'est_actif'], name='agenda_rend_type_re_3e76c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tache',
+            index=models.Index(fields=['type_recurrence', 'est_active'], name='agenda_tach_type_re_8ccbee_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rendezvous',
+            constraint=models.UniqueConstraint(fields=('rdv_parent', 'date_occurrence'), name='rdv_occurrence_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='tache',
+            constraint=models.UniqueConstraint(fields=('tache_parent', 'date_occurrence'), name='tache_occurrence_unique'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0008_occurrences_virtuelles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('nb_rdv_total', models.IntegerField(default=0)),
+                ('nb_rdv_termines', models.IntegerField(default=0)),
+                ('nb_rdv_annules', models.IntegerField(default=0)),
+                ('nb_rdv_reportes', models.IntegerField(default=0)),
+                ('repartition_types_rdv', models.JSONField(default=dict)),
+                ('nb_taches_total', models.IntegerField(default=0)),
+                ('nb_taches_terminees', models.IntegerField(default=0)),
+                ('nb_taches_en_retard', models.IntegerField(default=0, help_text='Non terminées à la clôture')),
+                ('nb_taches_reportees', models.IntegerField(default=0)),
+                ('repartition_types_tache', models.JSONField(default=dict)),
+                ('nb_taches_deleguees', models.IntegerField(default=0)),
+                ('nb_delegations_validees', models.IntegerField(default=0)),
+                ('date_generation', models.DateTimeField(auto_now_add=True)),
+                ('utilisateur', models.ForeignKey(blank=True, help_text="NULL = toute l'étude (ligne écrite même pour une journée vide)", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statistiques_journalieres', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['utilisateur', 'date'], name='agenda_stat_utilisa_3bdb95_idx')],
+                'unique_together': {('date', 'utilisateur')},
+            },
+        ),
+    ]
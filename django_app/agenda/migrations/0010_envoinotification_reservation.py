@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0009_statistiques_journalieres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envoinotification',
+            name='lot',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='envoinotification',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', "En cours d'envoi"), ('envoye', 'Envoyé'), ('abandonne', "Abandonné (trop d'échecs)")], default='en_attente', max_length=20),
+        ),
+    ]
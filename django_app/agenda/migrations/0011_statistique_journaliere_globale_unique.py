@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def supprimer_doublons_globaux(apps, schema_editor):
+    """Ne garde que la ligne globale la plus récente de chaque journée"""
+    StatistiqueJournaliere = apps.get_model('agenda', 'StatistiqueJournaliere')
+    vues = set()
+    doublons = []
+    for pk, jour in StatistiqueJournaliere.objects.filter(
+        utilisateur__isnull=True
+    ).order_by('date', '-date_generation', '-pk').values_list('pk', 'date'):
+        if jour in vues:
+            doublons.append(pk)
+        vues.add(jour)
+    StatistiqueJournaliere.objects.filter(pk__in=doublons).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0010_envoinotification_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_doublons_globaux, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='statistiquejournaliere',
+            constraint=models.UniqueConstraint(condition=models.Q(('utilisateur__isnull', True)), fields=('date',), name='statistique_journaliere_globale_unique'),
+        ),
+    ]
@@ -9,6 +9,8 @@ Licence: Propriétaire
 import uuid
 from datetime import timedelta
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -133,6 +135,54 @@ COULEURS_DISPONIBLES = [
 ]
 
 
+# =============================================================================
+# QUERYSETS
+# =============================================================================
+
+def _compter(queryset, champ):
+    """Nombre de lignes liées à l'objet courant (sous-requête corrélée, 0 si aucune)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{champ: OuterRef('pk')}).order_by().values(champ).annotate(
+                nombre=Count('pk')
+            ).values('nombre')
+        ),
+        0,
+    )
+
+
+class RendezVousQuerySet(models.QuerySet):
+
+    def visibles_par(self, utilisateur):
+        """RDV créés par l'utilisateur ou auxquels il est assigné (sans jointure ni DISTINCT)"""
+        assignes = self.model.collaborateurs_assignes.through.objects.filter(
+            collaborateur__utilisateur=utilisateur
+        ).values('rendezvous_id')
+        return self.filter(Q(createur=utilisateur) | Q(id__in=assignes))
+
+
+class TacheQuerySet(models.QuerySet):
+
+    def visibles_par(self, utilisateur):
+        """Tâches créées, confiées ou co-confiées à l'utilisateur (sans jointure ni DISTINCT)"""
+        co_responsable = self.model.co_responsables.through.objects.filter(
+            utilisateur=utilisateur
+        ).values('tache_id')
+        return self.filter(
+            Q(createur=utilisateur) | Q(responsable=utilisateur) | Q(id__in=co_responsable)
+        )
+
+    def avec_progression(self):
+        """Annote les compteurs de sous-tâches actives et de checklist utilisés par progression_calculee"""
+        sous_taches = Tache.objects.filter(est_active=True)
+        return self.annotate(
+            nb_sous_taches=_compter(sous_taches, 'tache_parente'),
+            nb_sous_taches_terminees=_compter(sous_taches.filter(statut=StatutTache.TERMINEE), 'tache_parente'),
+            nb_checklist=_compter(SousTacheChecklist.objects.all(), 'tache'),
+            nb_checklist_completes=_compter(SousTacheChecklist.objects.filter(est_complete=True), 'tache'),
+        )
+
+
 # =============================================================================
 # MODÈLES PRINCIPAUX
 # =============================================================================
@@ -296,12 +346,19 @@ class RendezVous(models.Model):
         blank=True,
         related_name='occurrences'
     )
+    date_occurrence = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Occurrence de la série remplacée par ce RDV (exception)"
+    )
 
     # Métadonnées
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     est_actif = models.BooleanField(default=True)
 
+    objects = RendezVousQuerySet.as_manager()
+
     class Meta:
         ordering = ['date_debut']
         verbose_name = 'Rendez-vous'
@@ -310,11 +367,41 @@ class RendezVous(models.Model):
             models.Index(fields=['date_debut', 'statut']),
             models.Index(fields=['createur', 'date_debut']),
             models.Index(fields=['type_rdv', 'statut']),
+            models.Index(fields=['date_modification']),
+            models.Index(fields=['type_recurrence', 'est_actif']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rdv_parent', 'date_occurrence'],
+                name='rdv_occurrence_unique'
+            ),
         ]
 
     def __str__(self):
         return f"{self.titre} - {self.date_debut.strftime('%d/%m/%Y %H:%M')}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémorise la date chargée pour détecter un déplacement du RDV
+        instance._date_debut_initiale = instance.__dict__.get('date_debut')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        date_initiale = getattr(self, '_date_debut_initiale', None)
+        if date_initiale is not None and date_initiale != self.date_debut:
+            self.replanifier_rappels()
+        self._date_debut_initiale = self.date_debut
+
+    def replanifier_rappels(self):
+        """Recalcule la date d'envoi prévue des rappels non envoyés"""
+        rappels = list(self.rappels.filter(est_envoye=False))
+        for rappel in rappels:
+            rappel.rendez_vous = self
+            rappel.date_envoi_prevue = rappel.get_date_rappel()
+        RappelRdv.objects.bulk_update(rappels, ['date_envoi_prevue'])
+
     @property
     def duree(self):
         """Calcule la durée du rendez-vous en minutes"""
@@ -404,6 +491,12 @@ class RappelRdv(models.Model):
     )
     est_envoye = models.BooleanField(default=False)
     date_envoi = models.DateTimeField(blank=True, null=True)
+    date_envoi_prevue = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Date d'envoi calculée à l'enregistrement (indexée pour le dispatcher)"
+    )
     destinataires = models.ManyToManyField(
         'gestion.Utilisateur',
         blank=True,
@@ -414,10 +507,17 @@ class RappelRdv(models.Model):
         ordering = ['type_rappel']
         verbose_name = 'Rappel de rendez-vous'
         verbose_name_plural = 'Rappels de rendez-vous'
+        indexes = [
+            models.Index(fields=['est_envoye', 'date_envoi_prevue']),
+        ]
 
     def __str__(self):
         return f"Rappel {self.get_type_rappel_display()} - {self.rendez_vous.titre}"
 
+    def save(self, *args, **kwargs):
+        self.date_envoi_prevue = self.get_date_rappel()
+        super().save(*args, **kwargs)
+
     def get_date_rappel(self):
         """Calcule la date d'envoi du rappel"""
         delai_minutes = {
@@ -560,6 +660,11 @@ class Tache(models.Model):
         blank=True,
         related_name='occurrences_recurrentes'
     )
+    date_occurrence = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Occurrence de la série remplacée par cette tâche (exception)"
+    )
 
     # Hiérarchie (sous-tâches)
     tache_parente = models.ForeignKey(
@@ -581,6 +686,8 @@ class Tache(models.Model):
     date_terminaison = models.DateTimeField(blank=True, null=True)
     est_active = models.BooleanField(default=True)
 
+    objects = TacheQuerySet.as_manager()
+
     class Meta:
         ordering = ['date_echeance', '-priorite', 'ordre']
         verbose_name = 'Tâche'
@@ -590,11 +697,49 @@ class Tache(models.Model):
             models.Index(fields=['responsable', 'statut']),
             models.Index(fields=['createur', 'date_creation']),
             models.Index(fields=['tache_parente', 'ordre']),
+            models.Index(fields=['date_modification']),
+            models.Index(fields=['type_recurrence', 'est_active']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tache_parent', 'date_occurrence'],
+                name='tache_occurrence_unique'
+            ),
         ]
 
     def __str__(self):
         return f"{self.titre} - {self.get_statut_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémorise l'échéance chargée pour détecter un report de la tâche
+        instance._date_echeance_initiale = instance.__dict__.get('date_echeance')
+        # et le responsable, qui perd la tâche de son agenda s'il change
+        instance._responsable_initial_id = instance.__dict__.get('responsable_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        date_initiale = getattr(self, '_date_echeance_initiale', None)
+        if date_initiale is not None and date_initiale != self.date_echeance:
+            self.replanifier_rappels()
+        self._date_echeance_initiale = self.date_echeance
+        responsable_initial_id = getattr(self, '_responsable_initial_id', None)
+        if responsable_initial_id is not None and responsable_initial_id != self.responsable_id:
+            SuppressionAgenda.objects.create(
+                type_objet='tache', objet_id=self.pk, utilisateur_id=responsable_initial_id
+            )
+        self._responsable_initial_id = self.responsable_id
+
+    def replanifier_rappels(self):
+        """Recalcule la date d'envoi prévue des rappels non envoyés"""
+        rappels = list(self.rappels.filter(est_envoye=False))
+        for rappel in rappels:
+            rappel.tache = self
+            rappel.date_envoi_prevue = rappel.get_date_envoi_prevue()
+        RappelTache.objects.bulk_update(rappels, ['date_envoi_prevue'])
+
     @property
     def est_en_retard(self):
         """Vérifie si la tâche est en retard"""
@@ -615,14 +760,25 @@ class Tache(models.Model):
 
     @property
     def progression_calculee(self):
-        """Calcule la progression basée sur les sous-tâches"""
-        sous_taches = self.sous_taches.filter(est_active=True)
-        if not sous_taches.exists():
-            return self.progression
+        """
+        Progression d'après les sous-tâches actives, à défaut d'après la
+        checklist, à défaut la progression saisie. Sans requête si les
+        compteurs ont été annotés (Tache.objects.avec_progression()).
+        """
+        champs = ['nb_sous_taches', 'nb_sous_taches_terminees', 'nb_checklist', 'nb_checklist_completes']
+        if hasattr(self, 'nb_sous_taches'):
+            compteurs = [getattr(self, champ) for champ in champs]
+        else:
+            compteurs = Tache.objects.filter(pk=self.pk).avec_progression().values_list(*champs).first()
+            if compteurs is None:
+                return self.progression
 
-        total = sous_taches.count()
-        terminees = sous_taches.filter(statut=StatutTache.TERMINEE).count()
-        return int((terminees / total) * 100)
+        sous_taches, terminees, checklist, completes = compteurs
+        if sous_taches:
+            return int((terminees / sous_taches) * 100)
+        if checklist:
+            return int((completes / checklist) * 100)
+        return self.progression
 
     def marquer_terminee(self, utilisateur=None):
         """Marque la tâche comme terminée"""
@@ -769,15 +925,50 @@ class RappelTache(models.Model):
     )
     est_envoye = models.BooleanField(default=False)
     date_envoi = models.DateTimeField(blank=True, null=True)
+    date_envoi_prevue = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Date d'envoi calculée à l'enregistrement (indexée pour le dispatcher)"
+    )
+
+    DELAIS_JOURS = {
+        'jour_echeance': 0,
+        'veille': 1,
+        '2jours': 2,
+        'semaine': 7,
+    }
 
     class Meta:
         ordering = ['type_rappel']
         verbose_name = 'Rappel de tâche'
         verbose_name_plural = 'Rappels de tâche'
+        indexes = [
+            models.Index(fields=['est_envoye', 'date_envoi_prevue']),
+        ]
 
     def __str__(self):
         return f"Rappel {self.get_type_rappel_display()} - {self.tache.titre}"
 
+    def save(self, *args, **kwargs):
+        self.date_envoi_prevue = self.get_date_envoi_prevue()
+        super().save(*args, **kwargs)
+
+    def get_date_rappel(self):
+        """Calcule le jour d'envoi du rappel"""
+        if self.type_rappel == 'personnalise':
+            jours = self.delai_personnalise or 0
+        else:
+            jours = self.DELAIS_JOURS.get(self.type_rappel, 0)
+
+        return self.tache.date_echeance - timedelta(days=jours)
+
+    def get_date_envoi_prevue(self):
+        """Début (heure locale) du jour d'envoi du rappel"""
+        return timezone.make_aware(
+            timezone.datetime.combine(self.get_date_rappel(), timezone.datetime.min.time())
+        )
+
 
 # =============================================================================
 # NOTIFICATIONS
@@ -821,6 +1012,15 @@ class Notification(models.Model):
     object_id = models.CharField(max_length=36, null=True, blank=True)
     objet = GenericForeignKey('content_type', 'object_id')
 
+    # Lien direct et indexé vers la tâche concernée (escalades, rappels)
+    tache = models.ForeignKey(
+        Tache,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+
     est_lu = models.BooleanField(default=False)
     date_lecture = models.DateTimeField(blank=True, null=True)
     date_creation = models.DateTimeField(auto_now_add=True)
@@ -841,6 +1041,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['destinataire', 'est_lu']),
             models.Index(fields=['date_creation']),
+            models.Index(fields=['tache', 'type_notification', 'date_creation']),
         ]
 
     def __str__(self):
@@ -853,6 +1054,67 @@ class Notification(models.Model):
             self.date_lecture = timezone.now()
             self.save()
 
+            from gestion.services.navigation import invalidate_badges_cache
+            invalidate_badges_cache(self.destinataire_id)
+
+
+class EnvoiNotification(models.Model):
+    """
+    File d'envoi (outbox) des emails et SMS de notification.
+
+    Les producteurs n'envoient plus rien eux-mêmes : ils insèrent une ligne
+    ici, et le worker `envoyer_notifications` vide la file par lots en
+    réutilisant une seule connexion SMTP et une connexion HTTP persistante
+    vers la passerelle SMS.
+    """
+    CANAL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', "En cours d'envoi"),
+        ('envoye', 'Envoyé'),
+        ('abandonne', 'Abandonné (trop d\'échecs)'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    canal = models.CharField(max_length=10, choices=CANAL_CHOICES)
+    destinataire = models.CharField(
+        max_length=254,
+        help_text="Adresse email ou numéro de téléphone"
+    )
+    sujet = models.CharField(max_length=255, blank=True)
+    message = models.TextField()
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='envois'
+    )
+
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    nb_tentatives = models.PositiveIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    # Lot du worker qui a réservé l'envoi (statut en_cours)
+    lot = models.UUIDField(null=True, blank=True, editable=False)
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['prochaine_tentative']
+        verbose_name = "Envoi de notification"
+        verbose_name_plural = "File d'envoi des notifications"
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_canal_display()} -> {self.destinataire} ({self.get_statut_display()})"
+
 
 # =============================================================================
 # JOURNÉE ET CLÔTURE
@@ -1026,6 +1288,7 @@ class JourneeAgenda(models.Model):
                     type_notification='report',
                     content_type=ContentType.objects.get_for_model(Tache),
                     object_id=str(tache.id),
+                    tache=tache,
                 )
 
 
@@ -1266,6 +1529,65 @@ class StatistiquesAgenda(models.Model):
         return f"Stats {self.type_periode} - {self.date_debut} - {user}"
 
 
+class StatistiqueJournaliere(models.Model):
+    """
+    Compteurs d'une journée par utilisateur, figés à la clôture.
+    Les statistiques d'une semaine, d'un mois ou d'une année sont la somme
+    de ces lignes : elles ne relisent pas les RDV et tâches.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    utilisateur = models.ForeignKey(
+        'gestion.Utilisateur',
+        on_delete=models.CASCADE,
+        related_name='statistiques_journalieres',
+        null=True,
+        blank=True,
+        help_text="NULL = toute l'étude (ligne écrite même pour une journée vide)"
+    )
+
+    # Rendez-vous du jour
+    nb_rdv_total = models.IntegerField(default=0)
+    nb_rdv_termines = models.IntegerField(default=0)
+    nb_rdv_annules = models.IntegerField(default=0)
+    nb_rdv_reportes = models.IntegerField(default=0)
+    repartition_types_rdv = models.JSONField(default=dict)
+
+    # Tâches à échéance du jour
+    nb_taches_total = models.IntegerField(default=0)
+    nb_taches_terminees = models.IntegerField(default=0)
+    nb_taches_en_retard = models.IntegerField(default=0, help_text="Non terminées à la clôture")
+    nb_taches_reportees = models.IntegerField(default=0)
+    repartition_types_tache = models.JSONField(default=dict)
+
+    # Délégation
+    nb_taches_deleguees = models.IntegerField(default=0)
+    nb_delegations_validees = models.IntegerField(default=0)
+
+    date_generation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = 'Statistique journalière'
+        verbose_name_plural = 'Statistiques journalières'
+        unique_together = ['date', 'utilisateur']
+        constraints = [
+            # unique_together ne couvre pas la ligne globale (NULL distincts)
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(utilisateur__isnull=True),
+                name='statistique_journaliere_globale_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['utilisateur', 'date']),
+        ]
+
+    def __str__(self):
+        user = self.utilisateur.get_full_name() if self.utilisateur else "Global"
+        return f"Stats du {self.date} - {user}"
+
+
 # =============================================================================
 # HISTORIQUE ET AUDIT
 # =============================================================================
@@ -1336,6 +1658,45 @@ class HistoriqueAgenda(models.Model):
         return f"{self.action} - {self.type_objet} - {self.date_creation}"
 
 
+class SuppressionAgenda(models.Model):
+    """
+    Trace d'un RDV ou d'une tâche disparu pour la synchronisation incrémentale.
+
+    Enregistrée à la suppression définitive (pour tous) ou quand un
+    utilisateur perd l'accès à l'élément (désassignation, changement de
+    responsable). Purgée après AGENDA_SYNC_RETENTION_JOURS.
+    """
+    id = models.BigAutoField(primary_key=True)
+    type_objet = models.CharField(
+        max_length=20,
+        choices=[
+            ('rendez_vous', 'Rendez-vous'),
+            ('tache', 'Tâche'),
+        ]
+    )
+    objet_id = models.UUIDField()
+    utilisateur = models.ForeignKey(
+        'gestion.Utilisateur',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='suppressions_agenda',
+        help_text="NULL = supprimé pour tous les utilisateurs"
+    )
+    date_suppression = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['date_suppression']
+        verbose_name = 'Suppression agenda'
+        verbose_name_plural = 'Suppressions agenda'
+        indexes = [
+            models.Index(fields=['date_suppression']),
+        ]
+
+    def __str__(self):
+        return f"{self.type_objet} {self.objet_id} - {self.date_suppression}"
+
+
 # =============================================================================
 # VUES SAUVEGARDÉES (FILTRES PERSONNALISÉS)
 # =============================================================================
@@ -5,31 +5,70 @@ Logique de notification, récurrence, clôture automatique, etc.
 Auteur: Maître Martial Arnaud BIAOU
 """
 
+import hashlib
+import http.client
+import json
 import logging
-from datetime import datetime, timedelta, date, time
+import uuid
+from calendar import monthrange
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, date, time, timezone as dt_timezone
+from urllib.parse import urlsplit
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.dateparse import parse_date
+from django.db import transaction
+from django.db.models import Q, Min, Max, Sum
 from django.contrib.contenttypes.models import ContentType
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.core.cache import cache
+from django.core import signing
 
 logger = logging.getLogger(__name__)
 
 from .models import (
     RendezVous, Tache, Notification, RappelRdv, RappelTache,
     JourneeAgenda, ReportTache, ConfigurationAgenda,
-    StatistiquesAgenda, StatutRendezVous, StatutTache,
-    StatutDelegation, TypeRecurrence, TypeNotification
+    StatistiquesAgenda, StatistiqueJournaliere, StatutRendezVous, StatutTache,
+    StatutDelegation, TypeRecurrence, TypeNotification, EnvoiNotification,
+    SuppressionAgenda
 )
 
+# Longueur maximale d'un SMS mis en file
+SMS_LONGUEUR_MAX = 459
+
+# Origine des jetons de synchronisation
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
 
 class NotificationService:
-    """Service de gestion des notifications"""
+    """
+    Service de gestion des notifications.
+
+    Les emails et SMS ne sont jamais envoyés depuis la requête ou la boucle
+    cron : ils sont déposés dans la file EnvoiNotification et remis par
+    EnvoiService (commande `envoyer_notifications`).
+    """
 
     @staticmethod
     def creer_notification(destinataire, titre, message, type_notification, objet=None, canal='application'):
         """Crée une notification pour un utilisateur"""
-        notif = Notification.objects.create(
+        notif = NotificationService.construire_notification(
+            destinataire, titre, message, type_notification, objet, canal
+        )
+        notif.save()
+
+        # Mise en file des envois email/SMS si configurés
+        envois = NotificationService._preparer_envois([notif])
+        if envois:
+            EnvoiNotification.objects.bulk_create(envois)
+
+        return notif
+
+    @staticmethod
+    def construire_notification(destinataire, titre, message, type_notification, objet=None, canal='application'):
+        """Prépare une notification sans l'enregistrer (pour insertion groupée)"""
+        notif = Notification(
             destinataire=destinataire,
             titre=titre,
             message=message,
@@ -40,68 +79,89 @@ class NotificationService:
         if objet:
             notif.content_type = ContentType.objects.get_for_model(objet)
             notif.object_id = str(objet.id)
-            notif.save()
-
-        # Envoi email si configuré
-        if canal in ['email', 'tous']:
-            NotificationService.envoyer_email(destinataire, titre, message)
+            if isinstance(objet, Tache):
+                notif.tache = objet
 
         return notif
 
     @staticmethod
-    def envoyer_email(destinataire, titre, message):
-        """Envoie un email de notification"""
+    def creer_notifications_groupees(notifications):
+        """Enregistre une liste de notifications et leurs envois en insertions groupées"""
+        Notification.objects.bulk_create(notifications)
+
+        envois = NotificationService._preparer_envois(notifications)
+        if envois:
+            EnvoiNotification.objects.bulk_create(envois)
+
+        return notifications
+
+    @staticmethod
+    def _preparer_envois(notifications):
+        """Construit les envois email/SMS (non enregistrés) des notifications"""
+        externes = [n for n in notifications if n.canal in ['email', 'sms', 'tous']]
+        if not externes:
+            return []
+
+        config = ConfigurationAgenda.get_instance()
+        envois = []
+        for notif in externes:
+            dest = notif.destinataire
+            if notif.canal in ['email', 'tous'] and config.activer_notifications_email and dest.email:
+                envois.append(EnvoiNotification(
+                    canal='email',
+                    destinataire=dest.email,
+                    sujet=f"[Agenda Étude] {notif.titre}",
+                    message=notif.message,
+                    notification=notif,
+                ))
+            if notif.canal in ['sms', 'tous'] and config.activer_notifications_sms and dest.telephone:
+                envois.append(EnvoiNotification(
+                    canal='sms',
+                    destinataire=dest.telephone,
+                    message=f"{notif.titre}: {notif.message}"[:SMS_LONGUEUR_MAX],
+                    notification=notif,
+                ))
+        return envois
+
+    @staticmethod
+    def envoyer_email(destinataire, titre, message, config=None):
+        """
+        Met en file un email de notification.
+
+        Returns:
+            bool: True si l'email a été mis en file d'envoi
+        """
         try:
-            config = ConfigurationAgenda.get_instance()
+            config = config or ConfigurationAgenda.get_instance()
             if not config.activer_notifications_email:
                 return False
 
             if destinataire.email:
-                send_mail(
-                    subject=f"[Agenda Étude] {titre}",
+                EnvoiNotification.objects.create(
+                    canal='email',
+                    destinataire=destinataire.email,
+                    sujet=f"[Agenda Étude] {titre}",
                     message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else None,
-                    recipient_list=[destinataire.email],
-                    fail_silently=True,
                 )
                 return True
         except Exception as e:
-            print(f"Erreur envoi email: {e}")
+            logger.error(f"Erreur mise en file email: {e}")
         return False
 
     @staticmethod
     def envoyer_sms(numero, message):
         """
-        Placeholder pour envoi SMS.
-
-        À implémenter avec un fournisseur SMS tel que :
-        - Twilio (https://www.twilio.com/)
-        - Orange SMS API (https://developer.orange.com/)
-        - Vonage/Nexmo (https://www.vonage.com/)
-        - OVH SMS (https://www.ovhtelecom.fr/sms/)
+        Met en file un SMS de notification.
 
-        Exemple d'intégration Twilio :
-        ```python
-        from twilio.rest import Client
-
-        account_sid = settings.TWILIO_ACCOUNT_SID
-        auth_token = settings.TWILIO_AUTH_TOKEN
-        client = Client(account_sid, auth_token)
-
-        message = client.messages.create(
-            body=message,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=numero
-        )
-        return True
-        ```
+        La remise effective passe par la passerelle HTTP configurée dans
+        settings.SMS_GATEWAY_URL (voir PasserelleSMS).
 
         Args:
             numero (str): Numéro de téléphone du destinataire (format international +229...)
-            message (str): Contenu du SMS (max 160 caractères recommandé)
+            message (str): Contenu du SMS (tronqué à SMS_LONGUEUR_MAX caractères)
 
         Returns:
-            bool: True si l'envoi a réussi, False sinon
+            bool: True si le SMS a été mis en file d'envoi
         """
         try:
             config = ConfigurationAgenda.get_instance() if ConfigurationAgenda.objects.exists() else None
@@ -109,20 +169,15 @@ class NotificationService:
                 logger.debug(f"[SMS NON ENVOYÉ - Notifications SMS désactivées] À: {numero}")
                 return False
 
-            # Log le message au lieu de l'envoyer (placeholder)
-            logger.info(
-                f"[SMS NON ENVOYÉ - Placeholder] "
-                f"À: {numero}, "
-                f"Message: {message[:50]}{'...' if len(message) > 50 else ''}"
+            EnvoiNotification.objects.create(
+                canal='sms',
+                destinataire=numero,
+                message=message[:SMS_LONGUEUR_MAX],
             )
-
-            # TODO: Intégrer avec API SMS (Twilio, Orange, etc.)
-            # Décommenter et configurer selon le fournisseur choisi
-
-            return False  # Retourne False car le SMS n'est pas réellement envoyé
+            return True
 
         except Exception as e:
-            logger.error(f"Erreur envoi SMS: {e}")
+            logger.error(f"Erreur mise en file SMS: {e}")
             return False
 
     @staticmethod
@@ -203,24 +258,47 @@ class RappelService:
     """Service de gestion des rappels"""
 
     @staticmethod
-    def traiter_rappels_rdv():
-        """Traite les rappels de rendez-vous à envoyer"""
-        now = timezone.now()
+    def traiter_rappels_rdv(maintenant=None):
+        """
+        Traite les rappels de rendez-vous arrivés à échéance.
+
+        Seuls les rappels dus sont lus (requête par plage sur l'index
+        est_envoye/date_envoi_prevue) ; les notifications sont insérées
+        en une fois. Retourne le nombre de rappels envoyés.
+        """
+        now = maintenant or timezone.now()
 
-        rappels = RappelRdv.objects.filter(
+        rappels = list(RappelRdv.objects.filter(
             est_envoye=False,
+            date_envoi_prevue__lte=now,
             rendez_vous__est_actif=True,
             rendez_vous__date_debut__gt=now
-        ).select_related('rendez_vous')
+        ).select_related(
+            'rendez_vous__createur'
+        ).prefetch_related(
+            'destinataires',
+            'rendez_vous__collaborateurs_assignes__utilisateur'
+        ))
 
+        if not rappels:
+            return 0
+
+        notifications = []
         for rappel in rappels:
-            date_rappel = rappel.get_date_rappel()
-            if date_rappel <= now:
-                RappelService._envoyer_rappel_rdv(rappel)
+            notifications.extend(RappelService._preparer_rappel_rdv(rappel))
+
+        with transaction.atomic():
+            NotificationService.creer_notifications_groupees(notifications)
+            RappelRdv.objects.filter(pk__in=[r.pk for r in rappels]).update(
+                est_envoye=True,
+                date_envoi=timezone.now()
+            )
+
+        return len(rappels)
 
     @staticmethod
-    def _envoyer_rappel_rdv(rappel):
-        """Envoie un rappel de RDV"""
+    def _preparer_rappel_rdv(rappel):
+        """Prépare les notifications (non enregistrées) d'un rappel de RDV"""
         rdv = rappel.rendez_vous
 
         # Destinataires
@@ -231,17 +309,18 @@ class RappelService:
                 if collab.utilisateur:
                     destinataires.append(collab.utilisateur)
 
+        date_locale = timezone.localtime(rdv.date_debut)
         message = f"""
 Rappel de rendez-vous:
 
 {rdv.titre}
-Date: {rdv.date_debut.strftime('%d/%m/%Y à %H:%M')}
+Date: {date_locale.strftime('%d/%m/%Y à %H:%M')}
 {f'Lieu: {rdv.lieu}' if rdv.lieu else ''}
 {f'Description: {rdv.description}' if rdv.description else ''}
         """.strip()
 
-        for dest in set(destinataires):
-            NotificationService.creer_notification(
+        return [
+            NotificationService.construire_notification(
                 dest,
                 f"Rappel: {rdv.titre}",
                 message,
@@ -249,49 +328,45 @@ Date: {rdv.date_debut.strftime('%d/%m/%Y à %H:%M')}
                 rdv,
                 rappel.type_notification
             )
-
-        rappel.est_envoye = True
-        rappel.date_envoi = timezone.now()
-        rappel.save()
+            for dest in set(destinataires)
+        ]
 
     @staticmethod
-    def traiter_rappels_tache():
-        """Traite les rappels de tâches à envoyer"""
-        today = timezone.now().date()
+    def traiter_rappels_tache(maintenant=None):
+        """
+        Traite les rappels de tâches arrivés à échéance.
+
+        Retourne le nombre de rappels envoyés.
+        """
+        now = maintenant or timezone.now()
 
-        rappels = RappelTache.objects.filter(
+        rappels = list(RappelTache.objects.filter(
             est_envoye=False,
+            date_envoi_prevue__lte=now,
             tache__est_active=True
         ).exclude(
             tache__statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]
-        ).select_related('tache')
+        ).select_related('tache__responsable', 'tache__createur'))
 
-        for rappel in rappels:
-            date_rappel = RappelService._calculer_date_rappel_tache(rappel)
-            if date_rappel and date_rappel <= today:
-                RappelService._envoyer_rappel_tache(rappel)
+        if not rappels:
+            return 0
 
-    @staticmethod
-    def _calculer_date_rappel_tache(rappel):
-        """Calcule la date d'envoi d'un rappel de tâche"""
-        tache = rappel.tache
-        delais = {
-            'jour_echeance': 0,
-            'veille': 1,
-            '2jours': 2,
-            'semaine': 7,
-        }
+        notifications = []
+        for rappel in rappels:
+            notifications.extend(RappelService._preparer_rappel_tache(rappel))
 
-        if rappel.type_rappel == 'personnalise':
-            jours = rappel.delai_personnalise or 0
-        else:
-            jours = delais.get(rappel.type_rappel, 0)
+        with transaction.atomic():
+            NotificationService.creer_notifications_groupees(notifications)
+            RappelTache.objects.filter(pk__in=[r.pk for r in rappels]).update(
+                est_envoye=True,
+                date_envoi=timezone.now()
+            )
 
-        return tache.date_echeance - timedelta(days=jours)
+        return len(rappels)
 
     @staticmethod
-    def _envoyer_rappel_tache(rappel):
-        """Envoie un rappel de tâche"""
+    def _preparer_rappel_tache(rappel):
+        """Prépare les notifications (non enregistrées) d'un rappel de tâche"""
         tache = rappel.tache
 
         destinataires = []
@@ -310,8 +385,8 @@ Priorité: {tache.get_priorite_display()}
 {f'Description: {tache.description}' if tache.description else ''}
         """.strip()
 
-        for dest in destinataires:
-            NotificationService.creer_notification(
+        return [
+            NotificationService.construire_notification(
                 dest,
                 f"Rappel: {tache.titre}",
                 message,
@@ -319,136 +394,448 @@ Priorité: {tache.get_priorite_display()}
                 tache,
                 rappel.type_notification
             )
+            for dest in destinataires
+        ]
 
-        rappel.est_envoye = True
-        rappel.date_envoi = timezone.now()
-        rappel.save()
+    @staticmethod
+    def prochaine_echeance(maintenant=None):
+        """
+        Retourne la prochaine date d'envoi prévue parmi les rappels non
+        envoyés (RDV et tâches), ou None s'il n'y en a aucun.
+        """
+        now = maintenant or timezone.now()
+        echeances = [
+            modele.objects.filter(
+                est_envoye=False,
+                date_envoi_prevue__gt=now
+            ).aggregate(prochaine=Min('date_envoi_prevue'))['prochaine']
+            for modele in (RappelRdv, RappelTache)
+        ]
+        echeances = [e for e in echeances if e is not None]
+        return min(echeances) if echeances else None
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    """
+    Occurrence calculée d'une série récurrente (RDV ou tâche), non enregistrée.
+
+    Elle reprend les données de la série ; seule une exception (occurrence
+    déplacée, modifiée ou annulée) est une ligne réelle, liée à la série
+    par rdv_parent / tache_parent et date_occurrence.
+    """
+    serie: object
+    date_occurrence: date
+
+    @property
+    def id(self):
+        return f"{self.serie.pk}_{self.date_occurrence:%Y%m%d}"
+
+    @property
+    def date_debut(self):
+        """Début d'une occurrence de RDV : même heure locale que la série"""
+        heure = timezone.localtime(self.serie.date_debut).time()
+        debut = timezone.make_aware(datetime.combine(self.date_occurrence, heure))
+        return debut.astimezone(dt_timezone.utc)
+
+    @property
+    def titre(self):
+        return self.serie.titre
+
+    @property
+    def date_fin(self):
+        return self.date_debut + (self.serie.date_fin - self.serie.date_debut)
 
 
 class RecurrenceService:
-    """Service de gestion des récurrences"""
+    """
+    Service de gestion des récurrences.
+
+    Les occurrences sont calculées à la lecture pour la fenêtre demandée
+    (occurrences_rdv / occurrences_taches) à partir de la série ; seules
+    les exceptions sont enregistrées. Les dates d'une série pour une
+    fenêtre sont mises en cache sous une clé qui inclut date_modification
+    de la série : modifier une série ne touche qu'une ligne et rend ses
+    anciennes entrées de cache inutilisées.
+    """
+
+    # Relations M2M recopiées de la série vers chaque exception
+    RELATIONS_RDV = ('dossiers', 'collaborateurs_assignes', 'participants_externes')
+    RELATIONS_TACHE = ('etiquettes', 'co_responsables')
+
+    TYPES_RECURRENTS = [
+        TypeRecurrence.QUOTIDIEN,
+        TypeRecurrence.HEBDOMADAIRE,
+        TypeRecurrence.MENSUEL,
+        TypeRecurrence.PERSONNALISE,
+    ]
+    CACHE_TIMEOUT = 3600  # 1 heure (clé versionnée par date_modification)
+
+    @staticmethod
+    def horizon():
+        """Fenêtre d'expansion par défaut (jours à partir d'aujourd'hui)"""
+        return timedelta(days=getattr(settings, 'AGENDA_RECURRENCE_HORIZON_JOURS', 90))
+
+    @staticmethod
+    def fenetre(date_debut=None, date_fin=None):
+        """
+        Fenêtre (dates) d'expansion d'après des paramètres de requête
+        (date ou date-heure ISO) ; à défaut, l'horizon à partir d'aujourd'hui.
+        """
+        debut = parse_date(str(date_debut)[:10]) if date_debut else None
+        fin = parse_date(str(date_fin)[:10]) if date_fin else None
+        debut = debut or timezone.localdate()
+        return debut, fin or debut + RecurrenceService.horizon()
+
+    @staticmethod
+    def date_depart(serie):
+        """Date de la première occurrence (la série elle-même)"""
+        if isinstance(serie, RendezVous):
+            return timezone.localtime(serie.date_debut).date()
+        return serie.date_echeance
+
+    @staticmethod
+    def dates_dans_fenetre(serie, debut, fin):
+        """Dates d'occurrence de la série entre debut et fin incluses (hors la série elle-même)"""
+        if serie.type_recurrence not in RecurrenceService.TYPES_RECURRENTS:
+            return []
+        if serie.date_fin_recurrence:
+            fin = min(fin, serie.date_fin_recurrence)
+        return RecurrenceService.calculer_dates_occurrences(
+            RecurrenceService.date_depart(serie),
+            fin,
+            serie.type_recurrence,
+            serie.jours_semaine,
+            serie.jour_mois,
+            date_min=debut,
+        )
+
+    @staticmethod
+    def dates_series(series, debut, fin):
+        """
+        {id de série: dates d'occurrence dans la fenêtre}, lues en cache
+        (un get_many pour toutes les séries) et calculées à défaut.
+        """
+        cles = {
+            serie.pk: "agenda_recurrence:{}:{}:{}:{}:{}".format(
+                serie._meta.model_name, serie.pk,
+                serie.date_modification.strftime('%Y%m%d%H%M%S%f'), debut, fin,
+            )
+            for serie in series
+        }
+        en_cache = cache.get_many(list(cles.values())) if cles else {}
+        resultat, a_mettre_en_cache = {}, {}
+        for serie in series:
+            cle = cles[serie.pk]
+            if cle in en_cache:
+                resultat[serie.pk] = en_cache[cle]
+            else:
+                resultat[serie.pk] = a_mettre_en_cache[cle] = RecurrenceService.dates_dans_fenetre(
+                    serie, debut, fin
+                )
+        if a_mettre_en_cache:
+            cache.set_many(a_mettre_en_cache, RecurrenceService.CACHE_TIMEOUT)
+        return resultat
+
+    @staticmethod
+    def occurrences_rdv(series, debut, fin):
+        """
+        Occurrences calculées des RDV récurrents de `series` (queryset déjà
+        filtré selon les droits, éventuellement préchargé) entre debut et
+        fin, sauf celles remplacées par une exception. Deux requêtes.
+        """
+        series = list(series.filter(
+            rdv_parent__isnull=True,
+            est_actif=True,
+            type_recurrence__in=RecurrenceService.TYPES_RECURRENTS,
+            date_debut__date__lt=fin,
+        ).filter(Q(date_fin_recurrence__isnull=True) | Q(date_fin_recurrence__gte=debut)))
+        return RecurrenceService._occurrences(series, debut, fin, RendezVous, 'rdv_parent')
+
+    @staticmethod
+    def occurrences_taches(series, debut, fin):
+        """Occurrences calculées des tâches récurrentes (même principe que occurrences_rdv)"""
+        series = list(series.filter(
+            tache_parent__isnull=True,
+            est_active=True,
+            type_recurrence__in=RecurrenceService.TYPES_RECURRENTS,
+            date_echeance__lt=fin,
+        ).filter(Q(date_fin_recurrence__isnull=True) | Q(date_fin_recurrence__gte=debut)))
+        return RecurrenceService._occurrences(series, debut, fin, Tache, 'tache_parent')
 
     @staticmethod
-    def generer_occurrences_rdv(rdv_parent, date_limite=None):
-        """Génère les occurrences d'un RDV récurrent"""
+    def _occurrences(series, debut, fin, modele, champ_parent):
+        if not series:
+            return []
+        # Exceptions de la fenêtre, actives ou annulées
+        exceptions = set(modele.objects.filter(**{
+            f'{champ_parent}__in': [serie.pk for serie in series],
+            'date_occurrence__range': (debut, fin),
+        }).values_list(f'{champ_parent}_id', 'date_occurrence'))
+        dates = RecurrenceService.dates_series(series, debut, fin)
+        occurrences = [
+            Occurrence(serie, date_occurrence)
+            for serie in series
+            for date_occurrence in dates[serie.pk]
+            if (serie.pk, date_occurrence) not in exceptions
+        ]
+        occurrences.sort(key=lambda o: (o.date_occurrence, str(o.serie.pk)))
+        return occurrences
+
+    @staticmethod
+    def est_occurrence(serie, date_occurrence):
+        """La date est-elle une occurrence de la série (hors la série elle-même) ?"""
+        return date_occurrence in RecurrenceService.dates_dans_fenetre(serie, date_occurrence, date_occurrence)
+
+    @staticmethod
+    def materialiser_rdv(rdv_parent, date_occurrence):
+        """Exception (ligne réelle) d'une occurrence de RDV : (rdv, créé)"""
+        exception = RendezVous.objects.filter(rdv_parent=rdv_parent, date_occurrence=date_occurrence).first()
+        if exception is not None:
+            return exception, False
+        with transaction.atomic():
+            exception = RecurrenceService._occurrence_rdv(rdv_parent, date_occurrence)
+            exception.save()
+            RecurrenceService._copier_relations(rdv_parent, [exception], RecurrenceService.RELATIONS_RDV)
+        return exception, True
+
+    @staticmethod
+    def materialiser_tache(tache_parent, date_occurrence):
+        """Exception (ligne réelle) d'une occurrence de tâche : (tâche, créée)"""
+        exception = Tache.objects.filter(tache_parent=tache_parent, date_occurrence=date_occurrence).first()
+        if exception is not None:
+            return exception, False
+        with transaction.atomic():
+            exception = RecurrenceService._occurrence_tache(tache_parent, date_occurrence)
+            exception.save()
+            RecurrenceService._copier_relations(tache_parent, [exception], RecurrenceService.RELATIONS_TACHE)
+        return exception, True
+
+    @staticmethod
+    def generer_occurrences_rdv(rdv_parent, date_limite=None, date_min=None):
+        """
+        Enregistre les occurrences d'un RDV récurrent jusqu'à date_limite
+        (à partir de date_min), comme exceptions de leur date.
+
+        Utilisé pour les occurrences arrivées à échéance, dont le suivi
+        (statut, présences, clôture) demande une ligne réelle. Les dates
+        sont calculées d'abord, les exceptions existantes lues en une
+        requête, puis les lignes et leurs relations insérées par bulk_create.
+        """
         if rdv_parent.type_recurrence == TypeRecurrence.UNIQUE:
             return []
 
-        if not date_limite:
-            date_limite = rdv_parent.date_fin_recurrence or (timezone.now().date() + timedelta(days=90))
+        date_limite = RecurrenceService._borner_date_limite(rdv_parent, date_limite)
+        dates = RecurrenceService.calculer_dates_occurrences(
+            RecurrenceService.date_depart(rdv_parent),
+            date_limite,
+            rdv_parent.type_recurrence,
+            rdv_parent.jours_semaine,
+            rdv_parent.jour_mois,
+            date_min=date_min,
+        )
+        if not dates:
+            return []
 
-        occurrences = []
-        current_date = rdv_parent.date_debut.date()
-        duree = rdv_parent.date_fin - rdv_parent.date_debut
+        # Une seule requête pour les exceptions déjà enregistrées
+        existantes = set(
+            RendezVous.objects.filter(
+                rdv_parent=rdv_parent,
+                date_occurrence__range=(dates[0], dates[-1])
+            ).order_by().values_list('date_occurrence', flat=True)
+        )
 
-        while current_date <= date_limite:
-            # Calculer la prochaine date
-            next_date = RecurrenceService._calculer_prochaine_date(
-                current_date,
-                rdv_parent.type_recurrence,
-                rdv_parent.jours_semaine,
-                rdv_parent.jour_mois
-            )
+        occurrences = [
+            RecurrenceService._occurrence_rdv(rdv_parent, next_date)
+            for next_date in dates
+            if next_date not in existantes
+        ]
+        if not occurrences:
+            return []
 
-            if next_date and next_date <= date_limite:
-                # Vérifier si l'occurrence existe déjà
-                existe = RendezVous.objects.filter(
-                    rdv_parent=rdv_parent,
-                    date_debut__date=next_date
-                ).exists()
-
-                if not existe:
-                    # Créer l'occurrence
-                    heure_debut = rdv_parent.date_debut.time()
-                    nouvelle_date_debut = timezone.make_aware(
-                        datetime.combine(next_date, heure_debut)
-                    )
-
-                    occurrence = RendezVous.objects.create(
-                        titre=rdv_parent.titre,
-                        type_rdv=rdv_parent.type_rdv,
-                        description=rdv_parent.description,
-                        date_debut=nouvelle_date_debut,
-                        date_fin=nouvelle_date_debut + duree,
-                        journee_entiere=rdv_parent.journee_entiere,
-                        lieu=rdv_parent.lieu,
-                        adresse=rdv_parent.adresse,
-                        latitude=rdv_parent.latitude,
-                        longitude=rdv_parent.longitude,
-                        statut=StatutRendezVous.PLANIFIE,
-                        priorite=rdv_parent.priorite,
-                        couleur=rdv_parent.couleur,
-                        type_recurrence=TypeRecurrence.UNIQUE,
-                        createur=rdv_parent.createur,
-                        rdv_parent=rdv_parent,
-                    )
-
-                    # Copier les relations
-                    occurrence.dossiers.set(rdv_parent.dossiers.all())
-                    occurrence.collaborateurs_assignes.set(rdv_parent.collaborateurs_assignes.all())
-                    occurrence.participants_externes.set(rdv_parent.participants_externes.all())
-
-                    occurrences.append(occurrence)
-
-            current_date = next_date if next_date else date_limite + timedelta(days=1)
+        with transaction.atomic():
+            RendezVous.objects.bulk_create(occurrences)
+            RecurrenceService._copier_relations(
+                rdv_parent, occurrences, RecurrenceService.RELATIONS_RDV
+            )
 
         return occurrences
 
     @staticmethod
-    def generer_occurrences_tache(tache_parent, date_limite=None):
-        """Génère les occurrences d'une tâche récurrente"""
+    def generer_occurrences_tache(tache_parent, date_limite=None, date_min=None):
+        """
+        Enregistre les occurrences d'une tâche récurrente.
+
+        Même principe que generer_occurrences_rdv.
+        """
         if tache_parent.type_recurrence == TypeRecurrence.UNIQUE:
             return []
 
-        if not date_limite:
-            date_limite = tache_parent.date_fin_recurrence or (timezone.now().date() + timedelta(days=90))
+        date_limite = RecurrenceService._borner_date_limite(tache_parent, date_limite)
+        dates = RecurrenceService.calculer_dates_occurrences(
+            tache_parent.date_echeance,
+            date_limite,
+            tache_parent.type_recurrence,
+            tache_parent.jours_semaine,
+            tache_parent.jour_mois,
+            date_min=date_min,
+        )
+        if not dates:
+            return []
+
+        existantes = set(
+            Tache.objects.filter(
+                tache_parent=tache_parent,
+                date_occurrence__range=(dates[0], dates[-1])
+            ).order_by().values_list('date_occurrence', flat=True)
+        )
+
+        occurrences = [
+            RecurrenceService._occurrence_tache(tache_parent, next_date)
+            for next_date in dates
+            if next_date not in existantes
+        ]
+        if not occurrences:
+            return []
+
+        with transaction.atomic():
+            Tache.objects.bulk_create(occurrences)
+            RecurrenceService._copier_relations(
+                tache_parent, occurrences, RecurrenceService.RELATIONS_TACHE
+            )
+
+        return occurrences
 
-        occurrences = []
-        current_date = tache_parent.date_echeance
+    @staticmethod
+    def _occurrence_rdv(rdv_parent, date_occurrence):
+        """RDV (non enregistré) reprenant la série à la date de l'occurrence"""
+        occurrence = Occurrence(rdv_parent, date_occurrence)
+        return RendezVous(
+            titre=rdv_parent.titre,
+            type_rdv=rdv_parent.type_rdv,
+            description=rdv_parent.description,
+            date_debut=occurrence.date_debut,
+            date_fin=occurrence.date_fin,
+            journee_entiere=rdv_parent.journee_entiere,
+            lieu=rdv_parent.lieu,
+            adresse=rdv_parent.adresse,
+            latitude=rdv_parent.latitude,
+            longitude=rdv_parent.longitude,
+            statut=StatutRendezVous.PLANIFIE,
+            priorite=rdv_parent.priorite,
+            couleur=rdv_parent.couleur,
+            type_recurrence=TypeRecurrence.UNIQUE,
+            createur=rdv_parent.createur,
+            rdv_parent=rdv_parent,
+            date_occurrence=date_occurrence,
+        )
+
+    @staticmethod
+    def _occurrence_tache(tache_parent, date_occurrence):
+        """Tâche (non enregistrée) reprenant la série à la date de l'occurrence"""
+        return Tache(
+            titre=tache_parent.titre,
+            type_tache=tache_parent.type_tache,
+            description=tache_parent.description,
+            date_echeance=date_occurrence,
+            heure_echeance=tache_parent.heure_echeance,
+            priorite=tache_parent.priorite,
+            couleur=tache_parent.couleur,
+            temps_estime=tache_parent.temps_estime,
+            type_recurrence=TypeRecurrence.UNIQUE,
+            createur=tache_parent.createur,
+            responsable=tache_parent.responsable,
+            dossier=tache_parent.dossier,
+            tache_parent=tache_parent,
+            date_occurrence=date_occurrence,
+        )
 
-        while current_date <= date_limite:
-            next_date = RecurrenceService._calculer_prochaine_date(
+    @staticmethod
+    def calculer_dates_occurrences(date_depart, date_limite, type_recurrence, jours_semaine=None,
+                                   jour_mois=None, date_min=None):
+        """
+        Calcule les dates d'occurrence strictement postérieures à date_depart,
+        de date_min (incluse) à date_limite incluse, sans accès à la base.
+        Le calcul part directement de date_min : son coût dépend de la
+        fenêtre, pas de l'ancienneté de la série.
+        """
+        if date_min is None or date_min <= date_depart:
+            date_min = date_depart + timedelta(days=1)
+        if date_min > date_limite:
+            return []
+
+        dates = []
+        if type_recurrence == TypeRecurrence.MENSUEL:
+            # Même jour chaque mois (jour_mois plafonné à 28, sinon jour de
+            # départ ramené au dernier jour des mois plus courts)
+            jour = min(jour_mois, 28) if jour_mois else date_depart.day
+            rang = max(1, (date_min.year - date_depart.year) * 12 + date_min.month - date_depart.month)
+            while True:
+                annee, mois = divmod(date_depart.month - 1 + rang, 12)
+                annee += date_depart.year
+                next_date = date(annee, mois + 1, min(jour, monthrange(annee, mois + 1)[1]))
+                if next_date > date_limite:
+                    break
+                if next_date >= date_min:
+                    dates.append(next_date)
+                rang += 1
+            return dates
+
+        if type_recurrence == TypeRecurrence.HEBDOMADAIRE and not jours_semaine:
+            # Dernière occurrence avant date_min
+            semaines = max(0, -(-(date_min - date_depart).days // 7) - 1)
+            current_date = date_depart + timedelta(weeks=semaines)
+        else:
+            current_date = max(date_depart, date_min - timedelta(days=1))
+
+        while True:
+            current_date = RecurrenceService._calculer_prochaine_date(
                 current_date,
-                tache_parent.type_recurrence,
-                tache_parent.jours_semaine,
-                tache_parent.jour_mois
+                type_recurrence,
+                jours_semaine,
+                jour_mois
             )
+            if not current_date or current_date > date_limite:
+                break
+            if current_date >= date_min:
+                dates.append(current_date)
 
-            if next_date and next_date <= date_limite:
-                existe = Tache.objects.filter(
-                    tache_parent=tache_parent,
-                    date_echeance=next_date
-                ).exists()
-
-                if not existe:
-                    occurrence = Tache.objects.create(
-                        titre=tache_parent.titre,
-                        type_tache=tache_parent.type_tache,
-                        description=tache_parent.description,
-                        date_echeance=next_date,
-                        heure_echeance=tache_parent.heure_echeance,
-                        priorite=tache_parent.priorite,
-                        couleur=tache_parent.couleur,
-                        temps_estime=tache_parent.temps_estime,
-                        type_recurrence=TypeRecurrence.UNIQUE,
-                        createur=tache_parent.createur,
-                        responsable=tache_parent.responsable,
-                        dossier=tache_parent.dossier,
-                        tache_parent=tache_parent,
-                    )
-
-                    occurrence.etiquettes.set(tache_parent.etiquettes.all())
-                    occurrence.co_responsables.set(tache_parent.co_responsables.all())
-
-                    occurrences.append(occurrence)
-
-            current_date = next_date if next_date else date_limite + timedelta(days=1)
+        return dates
 
-        return occurrences
+    @staticmethod
+    def _borner_date_limite(parent, date_limite=None):
+        """Date limite de génération, bornée par la fin de récurrence du parent"""
+        if not date_limite:
+            return parent.date_fin_recurrence or (timezone.now().date() + timedelta(days=90))
+        if parent.date_fin_recurrence:
+            return min(date_limite, parent.date_fin_recurrence)
+        return date_limite
+
+    @staticmethod
+    def _copier_relations(parent, occurrences, noms_relations):
+        """
+        Recopie les relations M2M du parent sur les occurrences en insérant
+        directement les lignes des tables de liaison (un bulk_create par relation).
+        """
+        for nom in noms_relations:
+            champ = parent._meta.get_field(nom)
+            # Utilise le cache de prefetch_related si le parent a été préchargé
+            cibles = [obj.pk for obj in getattr(parent, nom).all()]
+            if not cibles:
+                continue
+
+            through = champ.remote_field.through
+            col_source = f'{champ.m2m_field_name()}_id'
+            col_cible = f'{champ.m2m_reverse_field_name()}_id'
+            through.objects.bulk_create([
+                through(**{col_source: occurrence.pk, col_cible: cible})
+                for occurrence in occurrences
+                for cible in cibles
+            ])
 
     @staticmethod
     def _calculer_prochaine_date(date_courante, type_recurrence, jours_semaine=None, jour_mois=None):
-        """Calcule la prochaine date selon le type de récurrence"""
+        """Calcule la prochaine date quotidienne ou hebdomadaire"""
         if type_recurrence == TypeRecurrence.QUOTIDIEN:
             return date_courante + timedelta(days=1)
 
@@ -467,27 +854,6 @@ class RecurrenceService:
             else:
                 return date_courante + timedelta(weeks=1)
 
-        elif type_recurrence == TypeRecurrence.MENSUEL:
-            # Prochain mois
-            annee = date_courante.year
-            mois = date_courante.month + 1
-            if mois > 12:
-                mois = 1
-                annee += 1
-
-            if jour_mois:
-                jour = min(jour_mois, 28)  # Sécurité pour les mois courts
-            else:
-                jour = date_courante.day
-
-            try:
-                return date(annee, mois, jour)
-            except ValueError:
-                # Jour invalide pour ce mois, prendre le dernier jour
-                from calendar import monthrange
-                dernier_jour = monthrange(annee, mois)[1]
-                return date(annee, mois, dernier_jour)
-
         return None
 
 
@@ -512,6 +878,9 @@ class ClotureJourneeService:
 
         config = ConfigurationAgenda.get_instance() if ConfigurationAgenda.objects.exists() else None
 
+        # Statistiques journalières, avant le report des tâches non terminées
+        StatistiquesService.enregistrer_journees(date_cloture, date_cloture)
+
         # Calculer les statistiques
         journee.calculer_statistiques()
 
@@ -605,73 +974,157 @@ Taux de réalisation: {taux}%
 
 
 class StatistiquesService:
-    """Service de calcul des statistiques"""
+    """
+    Service de calcul des statistiques.
+
+    Chaque journée clôturée laisse une StatistiqueJournaliere par utilisateur
+    concerné (créateur ou collaborateur assigné d'un RDV, créateur ou
+    responsable d'une tâche) et une ligne globale. Les statistiques d'une
+    période sont la somme de ces lignes : leur coût dépend du nombre de
+    jours, pas du volume de RDV et tâches. Les compteurs sont ceux de la
+    clôture (une tâche non terminée ce jour-là reste comptée en retard).
+    """
+
+    COMPTEURS = (
+        'nb_rdv_total', 'nb_rdv_termines', 'nb_rdv_annules', 'nb_rdv_reportes',
+        'nb_taches_total', 'nb_taches_terminees', 'nb_taches_en_retard', 'nb_taches_reportees',
+        'nb_taches_deleguees', 'nb_delegations_validees',
+    )
+    REPARTITIONS = ('repartition_types_rdv', 'repartition_types_tache')
 
     @staticmethod
-    def calculer_stats_periode(type_periode, date_debut, date_fin, utilisateur=None):
-        """Calcule les statistiques pour une période donnée"""
-        stats, created = StatistiquesAgenda.objects.get_or_create(
-            type_periode=type_periode,
-            date_debut=date_debut,
-            utilisateur=utilisateur,
-            defaults={'date_fin': date_fin}
-        )
-
-        # Filtres de base
-        rdv_filter = Q(est_actif=True, date_debut__date__gte=date_debut, date_debut__date__lte=date_fin)
-        tache_filter = Q(est_active=True, date_echeance__gte=date_debut, date_echeance__lte=date_fin)
+    def bornes_periode(type_periode, jour):
+        """(début, fin) du jour, de la semaine, du mois ou de l'année contenant `jour`"""
+        if type_periode == 'semaine':
+            debut = jour - timedelta(days=jour.weekday())
+            return debut, debut + timedelta(days=6)
+        if type_periode == 'mois':
+            return jour.replace(day=1), jour.replace(day=monthrange(jour.year, jour.month)[1])
+        if type_periode == 'annee':
+            return date(jour.year, 1, 1), date(jour.year, 12, 31)
+        return jour, jour
 
-        if utilisateur:
-            rdv_filter &= Q(createur=utilisateur) | Q(collaborateurs_assignes__utilisateur=utilisateur)
-            tache_filter &= Q(createur=utilisateur) | Q(responsable=utilisateur)
-
-        # Stats RDV
-        rdv = RendezVous.objects.filter(rdv_filter).distinct()
-        stats.nb_rdv_total = rdv.count()
-        stats.nb_rdv_termines = rdv.filter(statut=StatutRendezVous.TERMINE).count()
-        stats.nb_rdv_annules = rdv.filter(statut=StatutRendezVous.ANNULE).count()
-        stats.nb_rdv_reportes = rdv.filter(statut=StatutRendezVous.REPORTE).count()
+    @staticmethod
+    def enregistrer_journees(date_debut, date_fin, recalculer=False):
+        """
+        Écrit les statistiques journalières de date_debut à date_fin.
+        Les journées déjà enregistrées sont conservées (figées à leur
+        clôture) sauf avec recalculer. Quatre lectures pour toute la période,
+        puis une insertion groupée. Une journée écrite entre-temps par un
+        autre processus (clôture, commande) est conservée : le conflit sur
+        (date, utilisateur) est ignoré. Retourne le nombre de journées calculées.
+        """
+        deja = set(StatistiqueJournaliere.objects.filter(
+            date__range=(date_debut, date_fin), utilisateur__isnull=True
+        ).values_list('date', flat=True))
+        jours = [
+            date_debut + timedelta(days=n)
+            for n in range((date_fin - date_debut).days + 1)
+            if recalculer or date_debut + timedelta(days=n) not in deja
+        ]
+        if not jours:
+            return 0
+
+        lignes = {}
+
+        def ligne(jour, utilisateur_id):
+            if (jour, utilisateur_id) not in lignes:
+                lignes[(jour, utilisateur_id)] = StatistiqueJournaliere(date=jour, utilisateur_id=utilisateur_id)
+            return lignes[(jour, utilisateur_id)]
+
+        for jour in jours:
+            ligne(jour, None)
+        a_ecrire = set(jours)
+
+        # Rendez-vous : le jour est celui du début, en heure locale
+        rdvs = RendezVous.objects.filter(est_actif=True, date_debut__date__range=(jours[0], jours[-1]))
+        assignes = {}
+        for rdv_id, utilisateur_id in RendezVous.collaborateurs_assignes.through.objects.filter(
+            rendezvous__in=rdvs, collaborateur__utilisateur__isnull=False
+        ).values_list('rendezvous_id', 'collaborateur__utilisateur_id'):
+            assignes.setdefault(rdv_id, set()).add(utilisateur_id)
+
+        for rdv_id, date_debut_rdv, createur_id, statut, type_rdv in rdvs.values_list(
+            'id', 'date_debut', 'createur_id', 'statut', 'type_rdv'
+        ):
+            jour = timezone.localtime(date_debut_rdv).date()
+            if jour not in a_ecrire:
+                continue
+            # None : ligne globale
+            for utilisateur_id in {None, createur_id} | assignes.get(rdv_id, set()):
+                stats = ligne(jour, utilisateur_id)
+                stats.nb_rdv_total += 1
+                stats.nb_rdv_termines += statut == StatutRendezVous.TERMINE
+                stats.nb_rdv_annules += statut == StatutRendezVous.ANNULE
+                stats.nb_rdv_reportes += statut == StatutRendezVous.REPORTE
+                stats.repartition_types_rdv[type_rdv] = stats.repartition_types_rdv.get(type_rdv, 0) + 1
+
+        # Tâches à échéance du jour
+        for jour, createur_id, responsable_id, statut, type_tache, statut_delegation in Tache.objects.filter(
+            est_active=True, date_echeance__range=(jours[0], jours[-1])
+        ).values_list('date_echeance', 'createur_id', 'responsable_id', 'statut', 'type_tache', 'statut_delegation'):
+            if jour not in a_ecrire:
+                continue
+            # None : ligne globale
+            for utilisateur_id in {None, createur_id, responsable_id}:
+                stats = ligne(jour, utilisateur_id)
+                stats.nb_taches_total += 1
+                stats.nb_taches_terminees += statut == StatutTache.TERMINEE
+                stats.nb_taches_en_retard += statut not in (StatutTache.TERMINEE, StatutTache.ANNULEE)
+                stats.nb_taches_reportees += statut == StatutTache.REPORTEE
+                stats.repartition_types_tache[type_tache] = stats.repartition_types_tache.get(type_tache, 0) + 1
+                if statut_delegation:
+                    stats.nb_taches_deleguees += 1
+                    stats.nb_delegations_validees += statut_delegation == StatutDelegation.VALIDEE
+
+        with transaction.atomic():
+            if recalculer:
+                StatistiqueJournaliere.objects.filter(date__range=(date_debut, date_fin)).delete()
+            StatistiqueJournaliere.objects.bulk_create(
+                lignes.values(), batch_size=500, ignore_conflicts=True
+            )
+        return len(jours)
 
-        # Répartition par type
-        stats.repartition_types_rdv = dict(
-            rdv.values('type_rdv').annotate(count=models.Count('id')).values_list('type_rdv', 'count')
+    @staticmethod
+    def stats_periode(date_debut, date_fin, utilisateur=None):
+        """
+        Statistiques de la période, sommées sur les statistiques journalières
+        (globales, ou de l'utilisateur). Deux requêtes quelle que soit la
+        durée de la période ; les journées non enregistrées comptent pour zéro.
+        """
+        lignes = StatistiqueJournaliere.objects.filter(
+            date__range=(date_debut, date_fin), utilisateur=utilisateur
         )
-
-        # Stats Tâches
-        taches = Tache.objects.filter(tache_filter).distinct()
-        stats.nb_taches_total = taches.count()
-        stats.nb_taches_terminees = taches.filter(statut=StatutTache.TERMINEE).count()
-        stats.nb_taches_en_retard = taches.filter(
-            date_echeance__lt=date_fin
-        ).exclude(statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]).count()
-        stats.nb_taches_reportees = taches.filter(statut=StatutTache.REPORTEE).count()
-
-        # Répartition par type
-        stats.repartition_types_tache = dict(
-            taches.values('type_tache').annotate(count=models.Count('id')).values_list('type_tache', 'count')
+        totaux = lignes.aggregate(**{nom: Sum(nom) for nom in StatistiquesService.COMPTEURS})
+        stats = {nom: totaux[nom] or 0 for nom in StatistiquesService.COMPTEURS}
+        for nom in StatistiquesService.REPARTITIONS:
+            stats[nom] = {}
+        for repartitions in lignes.values_list(*StatistiquesService.REPARTITIONS):
+            for nom, repartition in zip(StatistiquesService.REPARTITIONS, repartitions):
+                for cle, nombre in repartition.items():
+                    stats[nom][cle] = stats[nom].get(cle, 0) + nombre
+
+        def taux(termines, total):
+            return round(termines / total * 100, 2) if total > 0 else 100
+
+        stats['taux_realisation_rdv'] = taux(stats['nb_rdv_termines'], stats['nb_rdv_total'])
+        stats['taux_realisation_taches'] = taux(stats['nb_taches_terminees'], stats['nb_taches_total'])
+        stats['taux_completion_delegations'] = taux(
+            stats['nb_delegations_validees'], stats['nb_taches_deleguees']
         )
+        return stats
 
-        # Taux de réalisation
-        if stats.nb_rdv_total > 0:
-            stats.taux_realisation_rdv = (stats.nb_rdv_termines / stats.nb_rdv_total) * 100
-        else:
-            stats.taux_realisation_rdv = 100
-
-        if stats.nb_taches_total > 0:
-            stats.taux_realisation_taches = (stats.nb_taches_terminees / stats.nb_taches_total) * 100
-        else:
-            stats.taux_realisation_taches = 100
-
-        # Délégations
-        delegations = taches.filter(statut_delegation__isnull=False)
-        stats.nb_taches_deleguees = delegations.count()
-        delegations_terminees = delegations.filter(statut_delegation=StatutDelegation.VALIDEE).count()
-        if stats.nb_taches_deleguees > 0:
-            stats.taux_completion_delegations = (delegations_terminees / stats.nb_taches_deleguees) * 100
-        else:
-            stats.taux_completion_delegations = 100
-
-        stats.save()
+    @staticmethod
+    def calculer_stats_periode(type_periode, date_debut, date_fin, utilisateur=None):
+        """Enregistre les statistiques d'une période, dérivées des statistiques journalières"""
+        donnees = StatistiquesService.stats_periode(date_debut, date_fin, utilisateur)
+        donnees.pop('nb_delegations_validees')
+        stats, created = StatistiquesAgenda.objects.update_or_create(
+            type_periode=type_periode,
+            date_debut=date_debut,
+            utilisateur=utilisateur,
+            defaults={'date_fin': date_fin, **donnees}
+        )
         return stats
 
 
@@ -680,34 +1133,53 @@ class EscaladeService:
 
     @staticmethod
     def verifier_escalades():
-        """Vérifie et déclenche les escalades nécessaires"""
+        """
+        Vérifie et déclenche les escalades nécessaires.
+
+        Les tâches à escalader sont lues en une requête qui joint chaque
+        tâche en retard à sa dernière notification 'tache_retard' (relation
+        indexée Notification.tache) ; les alertes de tous les admins sont
+        ensuite insérées en une fois. Le nombre de requêtes ne dépend pas
+        du nombre de tâches en retard.
+
+        Returns:
+            list: [{'tache': Tache, 'jours_retard': int}, ...] escaladées
+        """
         config = ConfigurationAgenda.get_instance() if ConfigurationAgenda.objects.exists() else None
         delai_escalade = config.delai_escalade_retard if config else 2
 
-        date_limite = timezone.now().date() - timedelta(days=delai_escalade)
+        maintenant = timezone.now()
+        today = maintenant.date()
+        date_limite = today - timedelta(days=delai_escalade)
 
-        taches_a_escalader = Tache.objects.filter(
+        taches_a_escalader = list(Tache.objects.filter(
             est_active=True,
             date_echeance__lte=date_limite
         ).exclude(
             statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]
-        )
+        ).annotate(
+            derniere_escalade=Max(
+                'notifications__date_creation',
+                filter=Q(notifications__type_notification='tache_retard')
+            )
+        ).filter(
+            # Pas déjà escaladée récemment (dans les 24h)
+            Q(derniere_escalade__isnull=True) |
+            Q(derniere_escalade__lt=maintenant - timedelta(hours=24))
+        ).select_related('responsable', 'dossier'))
+
+        if not taches_a_escalader:
+            return []
 
         from gestion.models import Utilisateur
-        admins = Utilisateur.objects.filter(role__in=['admin', 'huissier'], is_active=True)
+        admins = list(Utilisateur.objects.filter(role__in=['admin', 'huissier'], is_active=True))
 
+        escalades = []
+        notifications = []
         for tache in taches_a_escalader:
-            jours_retard = (timezone.now().date() - tache.date_echeance).days
-
-            # Vérifier si déjà escaladée récemment (dans les 24h)
-            notification_recente = Notification.objects.filter(
-                type_notification='tache_retard',
-                object_id=str(tache.id),
-                date_creation__gte=timezone.now() - timedelta(hours=24)
-            ).exists()
+            jours_retard = (today - tache.date_echeance).days
 
-            if not notification_recente:
-                message = f"""
+            message = f"""
 ALERTE: Tâche en retard critique
 
 Tâche: {tache.titre}
@@ -716,18 +1188,600 @@ Responsable: {tache.responsable.get_full_name() if tache.responsable else 'Non a
 {f'Dossier: {tache.dossier.reference}' if tache.dossier else ''}
 
 Cette tâche nécessite votre attention immédiate.
-                """.strip()
+            """.strip()
+
+            for admin in admins:
+                notifications.append(NotificationService.construire_notification(
+                    admin,
+                    f"URGENT: Tâche en retard de {jours_retard}j",
+                    message,
+                    'tache_retard',
+                    tache,
+                    'tous'
+                ))
+
+            escalades.append({'tache': tache, 'jours_retard': jours_retard})
+
+        with transaction.atomic():
+            NotificationService.creer_notifications_groupees(notifications)
+
+        return escalades
+
+
+class PasserelleSMS:
+    """
+    Client HTTP minimal pour la passerelle SMS.
+
+    Une seule connexion HTTP persistante (keep-alive) est ouverte pour
+    tout un lot d'envois ; elle est rouverte une fois si le serveur l'a
+    fermée entre deux messages, et abandonnée après toute autre erreur. La passerelle reçoit un POST JSON
+    {"to", "from", "text"} authentifié par la clé API de l'étude.
+    """
+
+    def __init__(self, url, api_key='', expediteur='', timeout=10):
+        self.url = urlsplit(url)
+        self.api_key = api_key
+        self.expediteur = expediteur
+        self.timeout = timeout
+        self._connexion = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.fermer()
 
-                for admin in admins:
-                    NotificationService.creer_notification(
-                        admin,
-                        f"URGENT: Tâche en retard de {jours_retard}j",
-                        message,
-                        'tache_retard',
-                        tache,
-                        'tous'
-                    )
+    def _ouvrir(self):
+        classe = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        self._connexion = classe(self.url.hostname, self.url.port, timeout=self.timeout)
+
+    def fermer(self):
+        if self._connexion is not None:
+            self._connexion.close()
+            self._connexion = None
+
+    def envoyer(self, numero, message):
+        """Envoie un SMS ; lève une exception si la passerelle le refuse"""
+        corps = json.dumps({'to': numero, 'from': self.expediteur, 'text': message})
+        entetes = {'Content-Type': 'application/json'}
+        if self.api_key:
+            entetes['Authorization'] = f'Bearer {self.api_key}'
+
+        for tentative in range(2):
+            if self._connexion is None:
+                self._ouvrir()
+            try:
+                self._connexion.request('POST', self.url.path or '/', body=corps, headers=entetes)
+                reponse = self._connexion.getresponse()
+                contenu = reponse.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Connexion keep-alive fermée par le serveur : on rouvre une fois
+                self.fermer()
+                if tentative:
+                    raise
+                continue
+            except Exception:
+                # Délai dépassé, réponse incomplète... : la connexion est dans
+                # un état indéterminé, le SMS suivant en rouvrira une neuve
+                self.fermer()
+                raise
+
+            if reponse.status >= 400:
+                raise RuntimeError(
+                    f"Passerelle SMS: HTTP {reponse.status} {contenu[:200].decode('utf-8', 'replace')}"
+                )
+            return True
+
+
+class EnvoiService:
+    """
+    Worker de remise des emails et SMS mis en file (EnvoiNotification).
+
+    Chaque passage traite un lot : une seule connexion SMTP pour tous les
+    emails, une seule connexion HTTP pour tous les SMS. Un envoi en échec
+    est reprogrammé avec un délai exponentiel, puis abandonné (dead-letter)
+    après MAX_TENTATIVES.
+
+    Le lot est réservé par un UPDATE conditionnel (statut en_attente ->
+    en_cours) : deux workers ne remettent jamais le même envoi. Un envoi
+    resté en_cours (worker arrêté) redevient dû après BAIL_SECONDES.
+    """
+
+    MAX_TENTATIVES = 5
+    DELAI_BASE_SECONDES = 60
+    BAIL_SECONDES = 600
+
+    @staticmethod
+    def traiter_file(taille_lot=100, maintenant=None):
+        """
+        Remet un lot d'envois dus.
+
+        Returns:
+            dict: {'envoyes': n, 'reprogrammes': n, 'abandonnes': n}
+        """
+        now = maintenant or timezone.now()
+        envois = EnvoiService._reserver_lot(taille_lot, now)
+
+        resultat = {'envoyes': 0, 'reprogrammes': 0, 'abandonnes': 0}
+        if not envois:
+            return resultat
+
+        emails = [e for e in envois if e.canal == 'email']
+        sms = [e for e in envois if e.canal == 'sms']
+
+        if emails:
+            EnvoiService._remettre_emails(emails)
+        if sms:
+            EnvoiService._remettre_sms(sms)
+
+        for envoi in envois:
+            if envoi.statut == 'envoye':
+                resultat['envoyes'] += 1
+            elif envoi.statut == 'abandonne':
+                resultat['abandonnes'] += 1
+            else:
+                resultat['reprogrammes'] += 1
 
+        with transaction.atomic():
+            EnvoiNotification.objects.bulk_update(
+                envois,
+                ['statut', 'nb_tentatives', 'prochaine_tentative', 'derniere_erreur', 'date_envoi', 'lot']
+            )
+            EnvoiService._marquer_notifications(envois)
+
+        return resultat
+
+    @staticmethod
+    def _reserver_lot(taille_lot, now):
+        """
+        Réserve les envois dus pour ce worker et retourne ceux obtenus.
+
+        Les lignes déjà réservées entre la lecture des candidats et l'UPDATE
+        ne satisfont plus la condition et sont laissées à l'autre worker.
+        """
+        dus = Q(statut='en_attente') | Q(statut='en_cours')
+        candidats = list(EnvoiNotification.objects.filter(
+            dus, prochaine_tentative__lte=now
+        ).order_by('prochaine_tentative').values_list('pk', flat=True)[:taille_lot])
+        if not candidats:
+            return []
+
+        lot = uuid.uuid4()
+        EnvoiNotification.objects.filter(
+            dus, pk__in=candidats, prochaine_tentative__lte=now
+        ).update(
+            statut='en_cours', lot=lot,
+            prochaine_tentative=now + timedelta(seconds=EnvoiService.BAIL_SECONDES)
+        )
+        return list(EnvoiNotification.objects.filter(
+            pk__in=candidats, lot=lot
+        ).order_by('prochaine_tentative'))
+
+    @staticmethod
+    def _remettre_emails(envois):
+        """Envoie les emails du lot sur une connexion SMTP unique"""
+        from parametres.models import ConfigurationEtude
+
+        config_etude = ConfigurationEtude.objects.filter(pk=1).first()
+        if config_etude and config_etude.smtp_serveur:
+            connexion = config_etude.get_connexion_email()
+            expediteur = config_etude.smtp_expediteur or None
+        else:
+            connexion = get_connection()
+            expediteur = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+
+        try:
+            connexion.open()
+        except Exception as e:
+            for envoi in envois:
+                EnvoiService._echec(envoi, e)
+            return
+
+        try:
+            for envoi in envois:
+                try:
+                    EmailMessage(
+                        subject=envoi.sujet,
+                        body=envoi.message,
+                        from_email=expediteur,
+                        to=[envoi.destinataire],
+                        connection=connexion,
+                    ).send(fail_silently=False)
+                    EnvoiService._succes(envoi)
+                except Exception as e:
+                    EnvoiService._echec(envoi, e)
+        finally:
+            connexion.close()
+
+    @staticmethod
+    def _remettre_sms(envois):
+        """Envoie les SMS du lot sur une connexion HTTP persistante"""
+        url = getattr(settings, 'SMS_GATEWAY_URL', '')
+        if not url:
+            for envoi in envois:
+                EnvoiService._echec(envoi, "Passerelle SMS non configurée (SMS_GATEWAY_URL)")
+            return
+
+        from parametres.models import ConfigurationEtude
+        config_etude = ConfigurationEtude.objects.filter(pk=1).first()
+
+        with PasserelleSMS(
+            url,
+            api_key=config_etude.sms_api_key if config_etude else '',
+            expediteur=config_etude.sms_expediteur if config_etude else '',
+        ) as passerelle:
+            for envoi in envois:
+                try:
+                    passerelle.envoyer(envoi.destinataire, envoi.message)
+                    EnvoiService._succes(envoi)
+                except Exception as e:
+                    EnvoiService._echec(envoi, e)
+
+    @staticmethod
+    def _succes(envoi):
+        envoi.statut = 'envoye'
+        envoi.lot = None
+        envoi.nb_tentatives += 1
+        envoi.date_envoi = timezone.now()
+        envoi.derniere_erreur = ''
+
+    @staticmethod
+    def _echec(envoi, erreur):
+        envoi.nb_tentatives += 1
+        envoi.derniere_erreur = str(erreur)[:1000]
+        envoi.lot = None
+        if envoi.nb_tentatives >= EnvoiService.MAX_TENTATIVES:
+            envoi.statut = 'abandonne'
+            logger.error(f"Envoi {envoi.canal} abandonné vers {envoi.destinataire}: {erreur}")
+        else:
+            envoi.statut = 'en_attente'
+            delai = EnvoiService.DELAI_BASE_SECONDES * (2 ** (envoi.nb_tentatives - 1))
+            envoi.prochaine_tentative = timezone.now() + timedelta(seconds=delai)
+
+    @staticmethod
+    def _marquer_notifications(envois):
+        """Reporte les envois réussis sur les indicateurs des notifications"""
+        for canal, champ in (('email', 'est_envoye_email'), ('sms', 'est_envoye_sms')):
+            ids = {
+                e.notification_id for e in envois
+                if e.canal == canal and e.statut == 'envoye' and e.notification_id
+            }
+            if ids:
+                Notification.objects.filter(pk__in=ids).update(**{champ: True})
+
+
+@dataclass
+class DeltaAgenda:
+    """
+    Changements d'un agenda depuis un jeton.
+
+    rendez_vous et taches sont les querysets des éléments actifs modifiés
+    (à sérialiser) ; les empreintes (id, date_modification) suffisent à
+    calculer l'ETag sans charger les objets.
+    """
+    jeton: str
+    rendez_vous: object
+    taches: object
+    empreintes_rdv: list
+    empreintes_taches: list
+    rdv_supprimes: list = field(default_factory=list)
+    taches_supprimees: list = field(default_factory=list)
+
+    def etag(self, *discriminants):
+        """Empreinte du contenu (hors jeton : une réponse 304 garde l'ancien jeton, toujours valable)"""
+        empreinte = hashlib.sha1(repr(discriminants).encode())
+        for elements in (self.empreintes_rdv, self.empreintes_taches,
+                         self.rdv_supprimes, self.taches_supprimees):
+            empreinte.update(repr(sorted(map(str, elements))).encode())
+        return empreinte.hexdigest()
+
+
+@dataclass
+class AbonnementIcs:
+    """Contenu d'un abonnement ICS : éléments réels et occurrences calculées de la fenêtre"""
+    nom: str
+    rdvs: object
+    taches: object
+    occurrences_rdv: list
+    occurrences_taches: list
+
+
+class SynchronisationService:
+    """
+    Synchronisation incrémentale des agendas (flux delta JSON et ICS).
+
+    Le jeton de changement encode l'instant de la réponse. Le delta relit
+    les éléments dont date_modification (indexée) est postérieure au jeton
+    moins une marge couvrant les transactions encore ouvertes à cet
+    instant, et les SuppressionAgenda de la même période. Les éléments
+    désactivés (suppression douce) sont rendus comme supprimés.
+    """
+
+    SALT_ICS = 'agenda.ics'
+    PRODID = '-//Etude BIAOU//Agenda//FR'
+    STATUTS_ICS_RDV = {
+        StatutRendezVous.CONFIRME: 'CONFIRMED',
+        StatutRendezVous.EN_COURS: 'CONFIRMED',
+        StatutRendezVous.TERMINE: 'CONFIRMED',
+        StatutRendezVous.ANNULE: 'CANCELLED',
+    }
+    STATUTS_ICS_TACHE = {
+        StatutTache.EN_COURS: 'IN-PROCESS',
+        StatutTache.TERMINEE: 'COMPLETED',
+        StatutTache.ANNULEE: 'CANCELLED',
+    }
+    PRIORITES_ICS = {'urgente': 1, 'haute': 3, 'normale': 5, 'basse': 9}
+
+    @staticmethod
+    def marge():
+        return timedelta(seconds=getattr(settings, 'AGENDA_SYNC_MARGE_SECONDES', 60))
+
+    @staticmethod
+    def retention():
+        return timedelta(days=getattr(settings, 'AGENDA_SYNC_RETENTION_JOURS', 30))
+
+    @staticmethod
+    def encoder_jeton(instant):
+        """Jeton opaque : microsecondes depuis l'epoch, en hexadécimal"""
+        return format((instant - EPOCH) // timedelta(microseconds=1), 'x')
+
+    @staticmethod
+    def decoder_jeton(jeton):
+        """Instant encodé dans le jeton (ValueError si illisible)"""
+        try:
+            return EPOCH + timedelta(microseconds=int(jeton, 16))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError("Jeton de synchronisation invalide")
+
+    @staticmethod
+    def jeton_expire(depuis, maintenant=None):
+        """Les traces de suppression antérieures à la rétention ont pu être purgées"""
+        maintenant = maintenant or timezone.now()
+        return depuis < maintenant - SynchronisationService.retention()
+
+    @staticmethod
+    def delta(rdvs, taches, utilisateur, depuis=None):
+        """
+        Changements des RDV et tâches visibles (`rdvs`, `taches`, déjà
+        filtrés selon les droits, actifs ou non) depuis l'instant `depuis`.
+        Sans `depuis`, état complet des éléments actifs.
+        """
+        maintenant = timezone.now()
+        if depuis is None:
+            rdvs = rdvs.filter(est_actif=True)
+            taches = taches.filter(est_active=True)
+        else:
+            seuil = depuis - SynchronisationService.marge()
+            rdvs = rdvs.filter(date_modification__gt=seuil)
+            taches = taches.filter(date_modification__gt=seuil)
+
+        empreintes_rdv, rdv_supprimes = [], set()
+        for id_, date_modification, actif in rdvs.order_by().values_list('id', 'date_modification', 'est_actif'):
+            if actif:
+                empreintes_rdv.append((id_, date_modification))
+            else:
+                rdv_supprimes.add(id_)
+        empreintes_taches, taches_supprimees = [], set()
+        for id_, date_modification, active in taches.order_by().values_list('id', 'date_modification', 'est_active'):
+            if active:
+                empreintes_taches.append((id_, date_modification))
+            else:
+                taches_supprimees.add(id_)
+
+        if depuis is not None:
+            traces = SuppressionAgenda.objects.filter(date_suppression__gt=seuil).filter(
+                Q(utilisateur__isnull=True) | Q(utilisateur=utilisateur)
+            ).values_list('type_objet', 'objet_id')
+            rdv_visibles = {id_ for id_, _ in empreintes_rdv}
+            taches_visibles = {id_ for id_, _ in empreintes_taches}
+            for type_objet, objet_id in traces:
+                # Un élément encore visible (ex. désassigné mais créateur) reste à jour
+                if type_objet == 'rendez_vous' and objet_id not in rdv_visibles:
+                    rdv_supprimes.add(objet_id)
+                elif type_objet == 'tache' and objet_id not in taches_visibles:
+                    taches_supprimees.add(objet_id)
+
+        return DeltaAgenda(
+            jeton=SynchronisationService.encoder_jeton(maintenant),
+            rendez_vous=rdvs.filter(est_actif=True),
+            taches=taches.filter(est_active=True),
+            empreintes_rdv=empreintes_rdv,
+            empreintes_taches=empreintes_taches,
+            rdv_supprimes=sorted(rdv_supprimes, key=str),
+            taches_supprimees=sorted(taches_supprimees, key=str),
+        )
+
+    @staticmethod
+    def purger(maintenant=None):
+        """Supprime les traces de suppression plus anciennes que la rétention"""
+        maintenant = maintenant or timezone.now()
+        supprimees, _ = SuppressionAgenda.objects.filter(
+            date_suppression__lt=maintenant - SynchronisationService.retention()
+        ).delete()
+        return supprimees
+
+    # -------------------------------------------------------------------------
+    # Export ICS
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def jeton_ics(utilisateur=None, collaborateur=None):
+        """Jeton signé de l'abonnement ICS d'un utilisateur ou d'un collaborateur"""
+        if collaborateur is not None:
+            return signing.dumps({'c': collaborateur.pk}, salt=SynchronisationService.SALT_ICS)
+        return signing.dumps({'u': utilisateur.pk}, salt=SynchronisationService.SALT_ICS)
+
+    @staticmethod
+    def abonnement_ics(jeton):
+        """
+        Agenda (AbonnementIcs) désigné par le jeton, ou None si le jeton est
+        invalide ou son titulaire inactif.
+        """
+        from gestion.models import Collaborateur, Utilisateur
+
+        try:
+            titulaire = signing.loads(jeton, salt=SynchronisationService.SALT_ICS)
+        except signing.BadSignature:
+            return None
+
+        if 'c' in titulaire:
+            collaborateur = Collaborateur.objects.filter(
+                pk=titulaire['c'], actif=True
+            ).select_related('utilisateur').first()
+            if collaborateur is None:
+                return None
+            utilisateur = collaborateur.utilisateur
+            nom = str(collaborateur)
+        else:
+            utilisateur = Utilisateur.objects.filter(pk=titulaire.get('u'), is_active=True).first()
+            if utilisateur is None:
+                return None
+            collaborateur = None
+            nom = utilisateur.get_full_name() or utilisateur.username
+
+        if utilisateur is not None:
+            rdvs = RendezVous.objects.visibles_par(utilisateur)
+            taches = Tache.objects.visibles_par(utilisateur)
+        else:
+            assignes = RendezVous.collaborateurs_assignes.through.objects.filter(
+                collaborateur=collaborateur
+            ).values('rendezvous_id')
+            rdvs = RendezVous.objects.filter(id__in=assignes)
+            taches = Tache.objects.none()
+
+        aujourd_hui = timezone.localdate()
+        debut = aujourd_hui - timedelta(days=getattr(settings, 'AGENDA_ICS_JOURS_PASSES', 31))
+        fin = aujourd_hui + timedelta(days=getattr(settings, 'AGENDA_ICS_JOURS_FUTURS', 365))
+        taches = taches.filter(tache_parente__isnull=True)
+        return AbonnementIcs(
+            nom=f"Agenda - {nom}",
+            rdvs=rdvs.filter(est_actif=True, date_fin__date__gte=debut, date_debut__date__lte=fin),
+            taches=taches.filter(est_active=True, date_echeance__range=(debut, fin)),
+            occurrences_rdv=RecurrenceService.occurrences_rdv(rdvs, debut, fin),
+            occurrences_taches=RecurrenceService.occurrences_taches(taches, debut, fin),
+        )
+
+    @staticmethod
+    def etag_ics(abonnement):
+        """
+        Empreinte du calendrier d'après les (id, date_modification) des
+        éléments de la fenêtre et des séries de ses occurrences calculées
+        """
+        empreinte = hashlib.sha1(abonnement.nom.encode())
+        for queryset in (abonnement.rdvs, abonnement.taches):
+            lignes = queryset.order_by('id').values_list('id', 'date_modification')
+            empreinte.update(repr([(str(id_), d.isoformat()) for id_, d in lignes]).encode())
+        for occurrences in (abonnement.occurrences_rdv, abonnement.occurrences_taches):
+            empreinte.update(repr([
+                (o.id, o.serie.date_modification.isoformat()) for o in occurrences
+            ]).encode())
+        return empreinte.hexdigest()
+
+    @staticmethod
+    def calendrier_ics(abonnement):
+        """
+        Calendrier iCalendar (RFC 5545) : RDV en VEVENT, tâches en VTODO,
+        occurrences calculées comprises (UID propre à chaque occurrence)
+        """
+        lignes = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            f'PRODID:{SynchronisationService.PRODID}',
+            'CALSCALE:GREGORIAN',
+            f'X-WR-CALNAME:{_texte_ics(abonnement.nom)}',
+        ]
+        evenements = [
+            (rdv.date_debut, rdv.id, rdv, rdv.date_debut, rdv.date_fin, rdv.statut)
+            for rdv in abonnement.rdvs
+        ] + [
+            (o.date_debut, o.id, o.serie, o.date_debut, o.date_fin, StatutRendezVous.PLANIFIE)
+            for o in abonnement.occurrences_rdv
+        ]
+        for _, uid, rdv, date_debut, date_fin, statut in sorted(evenements, key=lambda e: e[0]):
+            lignes += [
+                'BEGIN:VEVENT',
+                f'UID:{uid}@agenda',
+                f'DTSTAMP:{_date_heure_ics(rdv.date_modification)}',
+                f'LAST-MODIFIED:{_date_heure_ics(rdv.date_modification)}',
+            ]
+            if rdv.journee_entiere:
+                debut = timezone.localtime(date_debut).date()
+                fin = max(timezone.localtime(date_fin).date(), debut) + timedelta(days=1)
+                lignes += [
+                    f'DTSTART;VALUE=DATE:{debut:%Y%m%d}',
+                    f'DTEND;VALUE=DATE:{fin:%Y%m%d}',
+                ]
+            else:
+                lignes += [
+                    f'DTSTART:{_date_heure_ics(date_debut)}',
+                    f'DTEND:{_date_heure_ics(date_fin)}',
+                ]
+            lignes += [
+                f'SUMMARY:{_texte_ics(rdv.titre)}',
+                f'STATUS:{SynchronisationService.STATUTS_ICS_RDV.get(statut, "TENTATIVE")}',
+                f'CATEGORIES:{_texte_ics(rdv.get_type_rdv_display())}',
+            ]
+            if rdv.lieu or rdv.adresse:
+                lignes.append(f'LOCATION:{_texte_ics(rdv.lieu or rdv.adresse)}')
+            if rdv.description:
+                lignes.append(f'DESCRIPTION:{_texte_ics(rdv.description)}')
+            lignes.append('END:VEVENT')
+
+        a_faire = [
+            (tache.date_echeance, tache.id, tache, tache.date_echeance, tache.statut, tache.date_terminaison)
+            for tache in abonnement.taches
+        ] + [
+            (o.date_occurrence, o.id, o.serie, o.date_occurrence, StatutTache.A_FAIRE, None)
+            for o in abonnement.occurrences_taches
+        ]
+        for _, uid, tache, date_echeance, statut, date_terminaison in sorted(a_faire, key=lambda t: t[0]):
+            lignes += [
+                'BEGIN:VTODO',
+                f'UID:{uid}@agenda',
+                f'DTSTAMP:{_date_heure_ics(tache.date_modification)}',
+                f'LAST-MODIFIED:{_date_heure_ics(tache.date_modification)}',
+            ]
+            if tache.heure_echeance:
+                echeance = timezone.make_aware(datetime.combine(date_echeance, tache.heure_echeance))
+                lignes.append(f'DUE:{_date_heure_ics(echeance)}')
+            else:
+                lignes.append(f'DUE;VALUE=DATE:{date_echeance:%Y%m%d}')
+            lignes += [
+                f'SUMMARY:{_texte_ics(tache.titre)}',
+                f'STATUS:{SynchronisationService.STATUTS_ICS_TACHE.get(statut, "NEEDS-ACTION")}',
+                f'PRIORITY:{SynchronisationService.PRIORITES_ICS.get(tache.priorite, 0)}',
+            ]
+            if date_terminaison:
+                lignes.append(f'COMPLETED:{_date_heure_ics(date_terminaison)}')
+            if tache.description:
+                lignes.append(f'DESCRIPTION:{_texte_ics(tache.description)}')
+            lignes.append('END:VTODO')
+
+        lignes.append('END:VCALENDAR')
+        return ''.join(_plier_ics(ligne) for ligne in lignes)
+
+def _date_heure_ics(instant):
+    return instant.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _texte_ics(texte):
+    """Échappement des valeurs TEXT (RFC 5545, 3.3.11)"""
+    return (
+        str(texte).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '')
+    )
+
+
+def _plier_ics(ligne):
+    """Ligne terminée par CRLF, repliée à 75 octets sans couper un caractère UTF-8"""
+    morceaux, courant, taille, limite = [], '', 0, 75
+    for caractere in ligne:
+        octets = len(caractere.encode())
+        if taille + octets > limite:
+            morceaux.append(courant)
+            courant, taille, limite = ' ', 1, 75
+        courant += caractere
+        taille += octets
+    morceaux.append(courant)
+    return '\r\n'.join(morceaux) + '\r\n'
 
-# Import manquant pour les annotations
-from django.db import models
@@ -0,0 +1,73 @@
+"""
+Signaux Django pour le module Agenda.
+
+Alimentent la synchronisation incrémentale : une suppression définitive
+ou une perte d'accès laisse une SuppressionAgenda, et un changement
+d'assignation fait avancer date_modification (les tables d'association
+n'ont pas d'horodatage propre).
+"""
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import RendezVous, SuppressionAgenda, Tache
+
+
+@receiver(post_delete, sender=RendezVous)
+@receiver(post_delete, sender=Tache)
+def tracer_suppression(sender, instance, **kwargs):
+    """Un élément supprimé définitivement disparaît de tous les agendas"""
+    SuppressionAgenda.objects.create(
+        type_objet='rendez_vous' if sender is RendezVous else 'tache',
+        objet_id=instance.pk,
+    )
+
+
+def _suivre_assignations(through, modele, objet, autre, utilisateur, instance, action, reverse, pk_set):
+    """
+    Trace les utilisateurs retirés d'une relation d'assignation et horodate
+    les éléments concernés. `objet` et `autre` sont les deux clés de la
+    table d'association, `utilisateur` le chemin vers l'utilisateur retiré.
+    """
+    type_objet = 'rendez_vous' if modele is RendezVous else 'tache'
+
+    if action in ('pre_remove', 'pre_clear'):
+        liens = through.objects.filter(**{autre if reverse else objet: instance.pk})
+        if action == 'pre_remove':
+            liens = liens.filter(**{f"{objet if reverse else autre}__in": pk_set})
+        retraits = list(liens.values_list(f"{objet}_id", utilisateur))
+        SuppressionAgenda.objects.bulk_create([
+            SuppressionAgenda(type_objet=type_objet, objet_id=objet_id, utilisateur_id=utilisateur_id)
+            for objet_id, utilisateur_id in retraits
+            if utilisateur_id is not None
+        ])
+        # post_clear ne transmet plus les éléments concernés
+        instance._objets_desassignes = {objet_id for objet_id, _ in retraits}
+
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            objet_ids = {instance.pk}
+        elif action == 'post_clear':
+            objet_ids = getattr(instance, '_objets_desassignes', set())
+        else:
+            objet_ids = pk_set
+        if objet_ids:
+            modele.objects.filter(pk__in=objet_ids).update(date_modification=timezone.now())
+
+
+@receiver(m2m_changed, sender=RendezVous.collaborateurs_assignes.through)
+def assignations_rdv_modifiees(sender, instance, action, reverse, pk_set, **kwargs):
+    """Désassigner un collaborateur retire le RDV de son agenda"""
+    _suivre_assignations(
+        sender, RendezVous, 'rendezvous', 'collaborateur', 'collaborateur__utilisateur_id',
+        instance, action, reverse, pk_set,
+    )
+
+
+@receiver(m2m_changed, sender=Tache.co_responsables.through)
+def co_responsables_modifies(sender, instance, action, reverse, pk_set, **kwargs):
+    """Retirer un co-responsable retire la tâche de son agenda"""
+    _suivre_assignations(
+        sender, Tache, 'tache', 'utilisateur', 'utilisateur_id',
+        instance, action, reverse, pk_set,
+    )
@@ -4,8 +4,9 @@ Tests pour le module Agenda
 Auteur: Maître Martial Arnaud BIAOU
 """
 
+import json
 from datetime import datetime, timedelta, date, time
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
@@ -177,6 +178,476 @@ class TacheModelTest(TestCase):
         self.assertEqual(tache.progression_calculee, 50)
 
 
+class RecurrenceServiceTest(TestCase):
+    """Tests pour la génération groupée des occurrences"""
+
+    def setUp(self):
+        from gestion.models import Utilisateur
+        self.user = Utilisateur.objects.create_user(
+            username='testuser',
+            email='test@test.com',
+            password='testpass123',
+            role='huissier'
+        )
+        self.etiquette = Etiquette.objects.create(nom="Audience")
+
+    def test_generer_occurrences_rdv_groupees(self):
+        """Les occurrences et leurs relations sont créées sans doublon"""
+        from .services import RecurrenceService
+        debut = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        participant = ParticipantExterne.objects.create(nom="Me DOSSOU")
+        rdv = RendezVous.objects.create(
+            titre="Audience hebdomadaire",
+            date_debut=debut,
+            date_fin=debut + timedelta(hours=1),
+            type_recurrence=TypeRecurrence.QUOTIDIEN,
+            createur=self.user
+        )
+        rdv.participants_externes.add(participant)
+        date_limite = timezone.localdate(debut) + timedelta(days=10)
+
+        occurrences = RecurrenceService.generer_occurrences_rdv(rdv, date_limite)
+        self.assertEqual(len(occurrences), 10)
+        self.assertEqual(rdv.occurrences.count(), 10)
+        self.assertEqual(
+            RendezVous.participants_externes.through.objects.filter(
+                rendezvous__rdv_parent=rdv
+            ).count(),
+            10
+        )
+        self.assertEqual(
+            timezone.localtime(occurrences[0].date_debut).time(),
+            timezone.localtime(debut).time()
+        )
+
+        # Une seconde passe ne crée rien
+        with self.assertNumQueries(1):
+            self.assertEqual(RecurrenceService.generer_occurrences_rdv(rdv, date_limite), [])
+
+    def test_generer_occurrences_tache_bornee(self):
+        """La date de fin de récurrence borne la génération"""
+        from .services import RecurrenceService
+        today = timezone.now().date()
+        tache = Tache.objects.create(
+            titre="Relance hebdomadaire",
+            date_echeance=today,
+            type_recurrence=TypeRecurrence.HEBDOMADAIRE,
+            date_fin_recurrence=today + timedelta(weeks=3),
+            createur=self.user
+        )
+        tache.etiquettes.add(self.etiquette)
+
+        occurrences = RecurrenceService.generer_occurrences_tache(tache, today + timedelta(days=60))
+        self.assertEqual(
+            [o.date_echeance for o in occurrences],
+            [today + timedelta(weeks=n) for n in (1, 2, 3)]
+        )
+        self.assertEqual(self.etiquette.taches.count(), 4)
+
+
+class OccurrencesVirtuellesTest(TestCase):
+    """Tests pour l'expansion des récurrences à la lecture"""
+
+    def setUp(self):
+        from gestion.models import Utilisateur
+        self.client = Client()
+        self.user = Utilisateur.objects.create_user(
+            username='admin', email='admin@test.com', password='testpass123', role='huissier'
+        )
+        self.client.login(username='admin', password='testpass123')
+        self.today = timezone.localdate()
+        debut = timezone.make_aware(datetime.combine(self.today, time(9, 0)))
+        self.rdv = RendezVous.objects.create(
+            titre="Permanence", date_debut=debut, date_fin=debut + timedelta(hours=1),
+            type_recurrence=TypeRecurrence.QUOTIDIEN, createur=self.user
+        )
+        self.tache = Tache.objects.create(
+            titre="Relevé de courrier", date_echeance=self.today,
+            type_recurrence=TypeRecurrence.HEBDOMADAIRE, createur=self.user
+        )
+
+    def lister_rdv(self, jours=5):
+        fin = self.today + timedelta(days=jours)
+        reponse = self.client.get(
+            f'/agenda/api/rdv/?date_debut={self.today.isoformat()}&date_fin={fin.isoformat()}T23:59:59'
+        )
+        return reponse.json()['data']
+
+    def test_expansion_sans_ligne_en_base(self):
+        """La liste contient la série et ses occurrences calculées, aucune ligne n'est créée"""
+        donnees = self.lister_rdv()
+        self.assertEqual(len(donnees), 6)
+        self.assertEqual(donnees[0]['id'], str(self.rdv.id))
+        self.assertEqual(
+            [d['date_occurrence'] for d in donnees[1:]],
+            [(self.today + timedelta(days=n)).isoformat() for n in range(1, 6)]
+        )
+        self.assertTrue(all(d['virtuelle'] for d in donnees[1:]))
+        self.assertEqual(RendezVous.objects.count(), 1)
+
+        fin = self.today + timedelta(weeks=3)
+        taches = self.client.get(
+            f'/agenda/api/taches/?date_debut={self.today.isoformat()}&date_fin={fin.isoformat()}'
+        ).json()['data']
+        self.assertEqual(
+            [t['date_echeance'] for t in taches],
+            [(self.today + timedelta(weeks=n)).isoformat() for n in range(4)]
+        )
+
+    def test_exception_remplace_occurrence(self):
+        """Une occurrence enregistrée apparaît une seule fois ; annulée, elle disparaît"""
+        jour = self.today + timedelta(days=2)
+        url = f'/agenda/api/rdv/{self.rdv.id}/occurrences/{jour.isoformat()}/'
+        reponse = self.client.post(url).json()
+        self.assertEqual(reponse['data']['date_occurrence'], jour.isoformat())
+        self.assertEqual(self.client.post(url).json()['data']['id'], reponse['data']['id'])
+
+        donnees = self.lister_rdv()
+        self.assertEqual(len(donnees), 6)
+        self.assertIn(reponse['data']['id'], [d['id'] for d in donnees])
+
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        donnees = self.lister_rdv()
+        self.assertEqual(len(donnees), 5)
+        self.assertNotIn(jour.isoformat(), [d.get('date_occurrence') for d in donnees])
+
+        hors_serie = f'/agenda/api/rdv/{self.rdv.id}/occurrences/{self.today.isoformat()}/'
+        self.assertEqual(self.client.post(hors_serie).status_code, 400)
+
+    def test_cache_invalide_par_modification_de_serie(self):
+        """Les dates sont relues en cache, et recalculées après modification de la série"""
+        from .services import RecurrenceService
+        debut, fin = self.today, self.today + timedelta(days=14)
+        series = RendezVous.objects.filter(pk=self.rdv.pk)
+        self.assertEqual(len(RecurrenceService.occurrences_rdv(series, debut, fin)), 14)
+        with self.assertNumQueries(2):
+            RecurrenceService.occurrences_rdv(series, debut, fin)
+
+        self.rdv.type_recurrence = TypeRecurrence.HEBDOMADAIRE
+        self.rdv.save()
+        self.assertEqual(len(RecurrenceService.occurrences_rdv(series, debut, fin)), 2)
+
+    def test_vue_ensemble_compte_les_occurrences(self):
+        """Les compteurs de la semaine et du mois incluent les occurrences calculées"""
+        donnees = self.client.get('/agenda/api/vue-ensemble/').json()['data']
+        fin_semaine = date.fromisoformat(donnees['semaine']['fin'])
+        fin_mois = date.fromisoformat(donnees['mois']['fin'])
+        self.assertEqual(donnees['semaine']['nb_rdv'], (fin_semaine - self.today).days + 1)
+        self.assertEqual(donnees['mois']['nb_rdv'], (fin_mois - self.today).days + 1)
+        self.assertEqual(donnees['mois']['nb_taches'], (fin_mois - self.today).days // 7 + 1)
+        self.assertEqual(donnees['mois']['taches_en_retard'], 0)
+
+    def test_programme_du_jour_avec_occurrences(self):
+        """Actions du jour et programme du chatbot incluent l'occurrence du jour d'une série"""
+        from chatbot.commands import get_programme_jour
+        debut = timezone.make_aware(datetime.combine(self.today - timedelta(weeks=1), time(14, 0)))
+        RendezVous.objects.create(
+            titre="Point hebdomadaire", date_debut=debut, date_fin=debut + timedelta(hours=1),
+            type_recurrence=TypeRecurrence.HEBDOMADAIRE, createur=self.user
+        )
+        Tache.objects.create(
+            titre="Pointage de caisse", date_echeance=self.today - timedelta(days=1),
+            type_recurrence=TypeRecurrence.QUOTIDIEN, createur=self.user, responsable=self.user
+        )
+
+        donnees = self.client.get('/agenda/api/actions-jour/').json()['data']
+        self.assertEqual([r['titre'] for r in donnees['rendez_vous']], ["Permanence", "Point hebdomadaire"])
+        self.assertTrue(donnees['rendez_vous'][1]['virtuelle'])
+        self.assertEqual(
+            [t['titre'] for t in donnees['taches_jour'] if t['virtuelle']], ["Pointage de caisse"]
+        )
+        self.assertEqual(donnees['statistiques']['rdv_total'], 2)
+
+        programme = get_programme_jour(self.user)
+        self.assertEqual(programme['data'], {'rdvs': 2, 'taches': 1})
+        self.assertIn("14:00: Point hebdomadaire", programme['message'])
+        self.assertIn("- Pointage de caisse", programme['message'])
+
+    def test_fenetre_lointaine_identique_au_parcours_complet(self):
+        """Le calcul depuis date_min donne les mêmes dates que le parcours depuis l'origine"""
+        from .services import RecurrenceService
+        depart = date(2020, 1, 31)
+        fenetre = (date(2026, 2, 1), date(2026, 6, 30))
+        for type_recurrence, jours_semaine, jour_mois in [
+            (TypeRecurrence.QUOTIDIEN, None, None),
+            (TypeRecurrence.HEBDOMADAIRE, None, None),
+            (TypeRecurrence.HEBDOMADAIRE, [0, 3], None),
+            (TypeRecurrence.MENSUEL, None, None),
+            (TypeRecurrence.MENSUEL, None, 15),
+        ]:
+            complet = RecurrenceService.calculer_dates_occurrences(
+                depart, fenetre[1], type_recurrence, jours_semaine, jour_mois
+            )
+            self.assertEqual(
+                RecurrenceService.calculer_dates_occurrences(
+                    depart, fenetre[1], type_recurrence, jours_semaine, jour_mois, date_min=fenetre[0]
+                ),
+                [d for d in complet if d >= fenetre[0]]
+            )
+        # Le 31 n'est pas décalé par les mois courts
+        self.assertIn(date(2026, 3, 31), RecurrenceService.calculer_dates_occurrences(
+            depart, fenetre[1], TypeRecurrence.MENSUEL, date_min=fenetre[0]
+        ))
+
+
+class RappelServiceTest(TestCase):
+    """Tests pour l'ordonnancement indexé des rappels"""
+
+    def setUp(self):
+        from gestion.models import Utilisateur
+        self.user = Utilisateur.objects.create_user(
+            username='testuser',
+            email='test@test.com',
+            password='testpass123',
+            role='huissier'
+        )
+
+    def test_date_envoi_prevue_suit_le_rdv(self):
+        """La date prévue est calculée à l'enregistrement et suit le déplacement du RDV"""
+        debut = timezone.now() + timedelta(days=2)
+        rdv = RendezVous.objects.create(
+            titre="Constat",
+            date_debut=debut,
+            date_fin=debut + timedelta(hours=1),
+            createur=self.user
+        )
+        rappel = RappelRdv.objects.create(rendez_vous=rdv, type_rappel='1h')
+        self.assertEqual(rappel.date_envoi_prevue, debut - timedelta(hours=1))
+
+        rdv = RendezVous.objects.get(pk=rdv.pk)
+        rdv.date_debut = debut + timedelta(days=1)
+        rdv.date_fin = rdv.date_debut + timedelta(hours=1)
+        rdv.save()
+        rappel.refresh_from_db()
+        self.assertEqual(rappel.date_envoi_prevue, debut + timedelta(days=1, hours=-1))
+
+    def test_traiter_rappels_dus_uniquement(self):
+        """Seuls les rappels échus sont envoyés, en insertion groupée"""
+        from .services import RappelService
+        maintenant = timezone.now()
+        rdv = RendezVous.objects.create(
+            titre="Audience",
+            date_debut=maintenant + timedelta(minutes=20),
+            date_fin=maintenant + timedelta(hours=1),
+            createur=self.user
+        )
+        du = RappelRdv.objects.create(rendez_vous=rdv, type_rappel='30min')
+        futur = RappelRdv.objects.create(rendez_vous=rdv, type_rappel='15min')
+
+        tache = Tache.objects.create(
+            titre="Signification",
+            date_echeance=maintenant.date() + timedelta(days=1),
+            createur=self.user
+        )
+        RappelTache.objects.create(tache=tache, type_rappel='veille')
+
+        self.assertEqual(RappelService.traiter_rappels_rdv(), 1)
+        self.assertEqual(RappelService.traiter_rappels_tache(), 1)
+        du.refresh_from_db()
+        futur.refresh_from_db()
+        self.assertTrue(du.est_envoye)
+        self.assertFalse(futur.est_envoye)
+        self.assertEqual(Notification.objects.filter(destinataire=self.user).count(), 2)
+        self.assertEqual(RappelService.prochaine_echeance(), futur.date_envoi_prevue)
+
+
+class EscaladeServiceTest(TestCase):
+    """Tests pour la vérification groupée des escalades"""
+
+    def setUp(self):
+        from gestion.models import Utilisateur
+        self.admin = Utilisateur.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='huissier'
+        )
+        ConfigurationAgenda.objects.create(activer_notifications_email=False)
+
+    def _creer_taches_en_retard(self, nombre):
+        for i in range(nombre):
+            Tache.objects.create(
+                titre=f"Tâche en retard {i}",
+                date_echeance=timezone.now().date() - timedelta(days=5),
+                createur=self.admin
+            )
+
+    def test_escalade_unique_par_24h(self):
+        """Une tâche escaladée ne l'est pas de nouveau dans les 24h"""
+        from .services import EscaladeService
+        self._creer_taches_en_retard(2)
+
+        escalades = EscaladeService.verifier_escalades()
+        self.assertEqual(len(escalades), 2)
+        self.assertEqual(escalades[0]['jours_retard'], 5)
+        self.assertEqual(
+            Notification.objects.filter(type_notification='tache_retard', tache__isnull=False).count(),
+            2
+        )
+        self.assertEqual(EscaladeService.verifier_escalades(), [])
+
+    def test_nombre_requetes_constant(self):
+        """Le nombre de requêtes ne dépend pas du nombre de tâches"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .services import EscaladeService
+
+        self._creer_taches_en_retard(1)
+        with CaptureQueriesContext(connection) as une_tache:
+            EscaladeService.verifier_escalades()
+
+        Notification.objects.all().delete()
+        self._creer_taches_en_retard(5)
+        with CaptureQueriesContext(connection) as six_taches:
+            self.assertEqual(len(EscaladeService.verifier_escalades()), 6)
+
+        self.assertEqual(len(une_tache), len(six_taches))
+
+
+class EnvoiServiceTest(TestCase):
+    """Tests pour la file d'envoi des emails et SMS"""
+
+    def setUp(self):
+        from gestion.models import Utilisateur
+        self.user = Utilisateur.objects.create_user(
+            username='testuser',
+            email='test@test.com',
+            password='testpass123',
+            role='huissier',
+            telephone='+22997000000'
+        )
+        ConfigurationAgenda.objects.create(activer_notifications_sms=True)
+
+    def test_emails_remis_par_lot(self):
+        """Les emails sont mis en file puis remis par le worker"""
+        from django.core import mail
+        from .models import EnvoiNotification
+        from .services import NotificationService, EnvoiService
+
+        for i in range(3):
+            NotificationService.creer_notification(
+                self.user, f"Rappel {i}", "Message", 'autre', canal='email'
+            )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EnvoiNotification.objects.filter(statut='en_attente').count(), 3)
+
+        resultat = EnvoiService.traiter_file()
+        self.assertEqual(resultat['envoyes'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(Notification.objects.filter(est_envoye_email=True).count(), 3)
+
+    def test_sms_connexion_persistante_et_abandon(self):
+        """Les SMS d'un lot partagent une connexion ; les échecs finissent abandonnés"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from django.test import override_settings
+        from .models import EnvoiNotification
+        from .services import NotificationService, EnvoiService
+
+        recus = []
+
+        class FaussePasserelle(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                corps = self.rfile.read(int(self.headers['Content-Length']))
+                recus.append((self.client_address, json.loads(corps)))
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'OK')
+
+            def log_message(self, *args):
+                pass
+
+        serveur = ThreadingHTTPServer(('127.0.0.1', 0), FaussePasserelle)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        self.addCleanup(serveur.server_close)
+        self.addCleanup(serveur.shutdown)
+
+        for i in range(3):
+            NotificationService.envoyer_sms('+22997000000', f"SMS {i}")
+
+        with override_settings(SMS_GATEWAY_URL=f'http://127.0.0.1:{serveur.server_port}/sms'):
+            self.assertEqual(EnvoiService.traiter_file()['envoyes'], 3)
+        self.assertEqual(len(recus), 3)
+        self.assertEqual(len({adresse for adresse, _ in recus}), 1)
+        self.assertEqual(recus[0][1]['to'], '+22997000000')
+
+        # Passerelle absente : reprogrammation puis abandon
+        envoi = EnvoiNotification.objects.create(canal='sms', destinataire='+229', message='x')
+        with override_settings(SMS_GATEWAY_URL=''):
+            for _ in range(EnvoiService.MAX_TENTATIVES):
+                EnvoiNotification.objects.filter(pk=envoi.pk).update(prochaine_tentative=timezone.now())
+                EnvoiService.traiter_file()
+        envoi.refresh_from_db()
+        self.assertEqual(envoi.statut, 'abandonne')
+        self.assertEqual(envoi.nb_tentatives, EnvoiService.MAX_TENTATIVES)
+
+    def test_sms_apres_delai_depasse(self):
+        """Un délai dépassé n'empoisonne pas la connexion des SMS suivants"""
+        import threading
+        import time as horloge
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from .services import PasserelleSMS
+
+        recus = []
+
+        class PasserelleLente(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                corps = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                recus.append(corps['text'])
+                if len(recus) == 1:
+                    horloge.sleep(0.5)
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'OK')
+
+            def log_message(self, *args):
+                pass
+
+        class Serveur(ThreadingHTTPServer):
+            def handle_error(self, *args):
+                pass
+
+        serveur = Serveur(('127.0.0.1', 0), PasserelleLente)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        self.addCleanup(serveur.server_close)
+        self.addCleanup(serveur.shutdown)
+
+        with PasserelleSMS(f'http://127.0.0.1:{serveur.server_port}/sms', timeout=0.2) as passerelle:
+            with self.assertRaises(TimeoutError):
+                passerelle.envoyer('+22997000000', 'SMS 0')
+            self.assertTrue(passerelle.envoyer('+22997000000', 'SMS 1'))
+            self.assertTrue(passerelle.envoyer('+22997000000', 'SMS 2'))
+        self.assertEqual(recus, ['SMS 0', 'SMS 1', 'SMS 2'])
+
+    def test_lot_reserve_par_un_seul_worker(self):
+        """Un envoi réservé par un worker n'est pas remis par un autre, sauf bail expiré"""
+        from django.core import mail
+        from .models import EnvoiNotification
+        from .services import EnvoiService
+
+        envoi = EnvoiNotification.objects.create(
+            canal='email', destinataire='a@test.com', sujet='Rappel', message='x'
+        )
+        self.assertEqual([e.pk for e in EnvoiService._reserver_lot(10, timezone.now())], [envoi.pk])
+        envoi.refresh_from_db()
+        self.assertEqual(envoi.statut, 'en_cours')
+
+        self.assertEqual(EnvoiService.traiter_file()['envoyes'], 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Worker arrêté : l'envoi redevient dû à l'expiration du bail
+        plus_tard = timezone.now() + timedelta(seconds=EnvoiService.BAIL_SECONDES + 1)
+        self.assertEqual(EnvoiService.traiter_file(maintenant=plus_tard)['envoyes'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        envoi.refresh_from_db()
+        self.assertEqual((envoi.statut, envoi.lot), ('envoye', None))
+
 class NotificationModelTest(TestCase):
     """Tests pour les notifications"""
 
@@ -244,6 +715,123 @@ class JourneeAgendaTest(TestCase):
         self.assertIsNotNone(journee.bilan_json)
 
 
+class StatistiquesJournalieresTest(TestCase):
+    """Tests pour les statistiques journalières et leur cumul par période"""
+
+    def setUp(self):
+        from gestion.models import Collaborateur, Utilisateur
+        self.client = Client()
+        self.admin = Utilisateur.objects.create_user(
+            username='admin', email='admin@test.com', password='testpass123', role='huissier'
+        )
+        self.clerc = Utilisateur.objects.create_user(
+            username='clerc', email='clerc@test.com', password='testpass123', role='clerc'
+        )
+        collaborateur = Collaborateur.objects.create(nom='Clerc', role='clerc', utilisateur=self.clerc)
+        self.jour = date(2026, 3, 10)
+        for jour, statut in [(self.jour, StatutRendezVous.TERMINE), (self.jour + timedelta(days=1), StatutRendezVous.ANNULE)]:
+            debut = timezone.make_aware(datetime.combine(jour, time(10, 0)))
+            rdv = RendezVous.objects.create(
+                titre="Constat", date_debut=debut, date_fin=debut + timedelta(hours=1),
+                statut=statut, createur=self.admin
+            )
+            rdv.collaborateurs_assignes.add(collaborateur)
+        Tache.objects.create(
+            titre="Signification", date_echeance=self.jour, statut=StatutTache.TERMINEE,
+            createur=self.admin, responsable=self.clerc
+        )
+        self.tache_ouverte = Tache.objects.create(
+            titre="Relance", date_echeance=self.jour, createur=self.admin
+        )
+
+    def test_journees_par_utilisateur(self):
+        """Une ligne globale par jour, une par utilisateur concerné, sans réécriture"""
+        from .models import StatistiqueJournaliere
+        from .services import StatistiquesService
+        fin = self.jour + timedelta(days=2)
+        self.assertEqual(StatistiquesService.enregistrer_journees(self.jour, fin), 3)
+
+        globale = StatistiqueJournaliere.objects.get(date=self.jour, utilisateur=None)
+        self.assertEqual((globale.nb_rdv_total, globale.nb_rdv_termines), (1, 1))
+        self.assertEqual((globale.nb_taches_total, globale.nb_taches_terminees, globale.nb_taches_en_retard), (2, 1, 1))
+        clerc = StatistiqueJournaliere.objects.get(date=self.jour, utilisateur=self.clerc)
+        self.assertEqual((clerc.nb_rdv_total, clerc.nb_taches_total, clerc.nb_taches_en_retard), (1, 1, 0))
+        self.assertTrue(StatistiqueJournaliere.objects.filter(date=fin, utilisateur=None).exists())
+
+        # Journées figées, sauf recalcul
+        self.tache_ouverte.marquer_terminee()
+        self.assertEqual(StatistiquesService.enregistrer_journees(self.jour, fin), 0)
+        StatistiquesService.enregistrer_journees(self.jour, self.jour, recalculer=True)
+        self.assertEqual(
+            StatistiqueJournaliere.objects.get(date=self.jour, utilisateur=None).nb_taches_terminees, 2
+        )
+        self.assertEqual(StatistiqueJournaliere.objects.filter(date=self.jour).count(), 3)
+
+    def test_journee_ecrite_entre_temps(self):
+        """Une journée écrite par un autre processus après la lecture est conservée, sans doublon"""
+        from unittest import mock
+        from django.db import IntegrityError, transaction
+        from .models import StatistiqueJournaliere
+        from .services import StatistiquesService
+        StatistiquesService.enregistrer_journees(self.jour, self.jour)
+
+        # Lecture des journées existantes faite avant l'écriture concurrente
+        with mock.patch.object(
+            StatistiqueJournaliere.objects, 'filter', return_value=StatistiqueJournaliere.objects.none()
+        ):
+            self.assertEqual(StatistiquesService.enregistrer_journees(self.jour, self.jour), 1)
+        self.assertEqual(StatistiqueJournaliere.objects.filter(date=self.jour, utilisateur=None).count(), 1)
+        self.assertEqual(StatistiqueJournaliere.objects.filter(date=self.jour).count(), 3)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StatistiqueJournaliere.objects.create(date=self.jour)
+
+    def test_periode_sommee(self):
+        """Les statistiques d'une période somment les journées en deux requêtes"""
+        from .services import StatistiquesService
+        StatistiquesService.enregistrer_journees(self.jour, self.jour + timedelta(days=1))
+        debut, fin = StatistiquesService.bornes_periode('annee', self.jour)
+        with self.assertNumQueries(2):
+            stats = StatistiquesService.stats_periode(debut, fin, self.clerc)
+        self.assertEqual((stats['nb_rdv_total'], stats['nb_rdv_termines'], stats['nb_rdv_annules']), (2, 1, 1))
+        self.assertEqual(stats['taux_realisation_rdv'], 50)
+        self.assertEqual(stats['repartition_types_rdv'], {TypeRendezVous.RENDEZ_VOUS_CLIENT: 2})
+
+        stats = StatistiquesService.calculer_stats_periode('mois', *StatistiquesService.bornes_periode('mois', self.jour))
+        self.assertEqual((stats.nb_rdv_total, stats.nb_taches_total, stats.nb_taches_en_retard), (2, 2, 1))
+
+    def test_cloture_fige_avant_report(self):
+        """La clôture enregistre la journée avant de reporter les tâches non terminées"""
+        from .models import StatistiqueJournaliere
+        from .services import ClotureJourneeService
+        ClotureJourneeService.cloturer_automatique(self.jour)
+        self.tache_ouverte.refresh_from_db()
+        self.assertEqual(self.tache_ouverte.date_echeance, self.jour + timedelta(days=1))
+        globale = StatistiqueJournaliere.objects.get(date=self.jour, utilisateur=None)
+        self.assertEqual((globale.nb_taches_total, globale.nb_taches_en_retard), (2, 1))
+
+    def test_api_statistiques(self):
+        """Le collaborateur lit ses statistiques, l'administrateur celles de l'étude"""
+        from .services import StatistiquesService
+        StatistiquesService.enregistrer_journees(self.jour, self.jour + timedelta(days=1))
+        url = f'/agenda/api/statistiques/?periode=annee&date={self.jour.isoformat()}'
+
+        self.client.login(username='clerc', password='testpass123')
+        donnees = self.client.get(url).json()['data']
+        self.assertEqual((donnees['utilisateur'], donnees['nb_taches_total']), (self.clerc.id, 1))
+        self.assertEqual(donnees['evolution'], [{
+            'date': '2026-03-01', 'nb_rdv_total': 2, 'nb_rdv_termines': 1,
+            'nb_taches_total': 1, 'nb_taches_terminees': 1,
+        }])
+
+        self.client.login(username='admin', password='testpass123')
+        donnees = self.client.get(url.replace('annee', 'semaine')).json()['data']
+        self.assertEqual((donnees['debut'], donnees['fin']), ('2026-03-09', '2026-03-15'))
+        self.assertEqual((donnees['utilisateur'], donnees['nb_taches_total']), (None, 2))
+        self.assertEqual(len(donnees['evolution']), 2)
+        self.assertEqual(self.client.get('/agenda/api/statistiques/?periode=siecle').status_code, 400)
+
+
 class ConfigurationTest(TestCase):
     """Tests pour la configuration"""
 
@@ -371,3 +959,199 @@ class PermissionsTest(TestCase):
         self.client.login(username='clerc', password='testpass123')
         response = self.client.get('/agenda/api/rdv/')
         self.assertEqual(response.status_code, 200)
+
+
+class VuesJourneeRequetesTest(TestCase):
+    """Tests pour le coût en requêtes des vues du jour et de la liste des tâches"""
+
+    def setUp(self):
+        from gestion.models import Collaborateur, Utilisateur
+        self.client = Client()
+        self.admin = Utilisateur.objects.create_user(
+            username='admin', email='admin@test.com', password='testpass123', role='huissier'
+        )
+        self.clerc = Utilisateur.objects.create_user(
+            username='clerc', email='clerc@test.com', password='testpass123', role='clerc'
+        )
+        self.collaborateur = Collaborateur.objects.create(nom='Clerc', role='clerc', utilisateur=self.clerc)
+        self.client.login(username='clerc', password='testpass123')
+
+    def creer_taches(self, nombre):
+        aujourdhui = timezone.now().date()
+        for i in range(nombre):
+            tache = Tache.objects.create(
+                titre=f"Signification {i}", date_echeance=aujourdhui - timedelta(days=i % 2),
+                createur=self.admin, responsable=self.clerc
+            )
+            tache.co_responsables.add(self.clerc, self.admin)
+            Tache.objects.create(
+                titre=f"Sous-tâche {i}", date_echeance=aujourdhui, createur=self.admin,
+                tache_parente=tache, statut=StatutTache.TERMINEE
+            )
+            SousTacheChecklist.objects.create(tache=tache, libelle="Pièce", est_complete=True)
+            rdv = RendezVous.objects.create(
+                titre=f"Audience {i}", date_debut=timezone.now(),
+                date_fin=timezone.now() + timedelta(hours=1), createur=self.admin
+            )
+            rdv.collaborateurs_assignes.add(self.collaborateur)
+
+    def nombre_requetes(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes.captured_queries), response.json()
+
+    def test_requetes_independantes_du_nombre_de_taches(self):
+        """Le coût des vues ne dépend pas du nombre de tâches"""
+        urls = ['/agenda/api/actions-jour/', '/agenda/api/taches/', '/agenda/api/vue-ensemble/']
+        self.creer_taches(2)
+        avant = [self.nombre_requetes(url)[0] for url in urls]
+        self.creer_taches(10)
+        self.assertEqual([self.nombre_requetes(url)[0] for url in urls], avant)
+
+    def test_visibilite_sans_doublon(self):
+        """Une tâche co-confiée et un RDV assigné n'apparaissent qu'une fois"""
+        self.creer_taches(3)
+        _, actions = self.nombre_requetes('/agenda/api/actions-jour/')
+        self.assertEqual(len(actions['data']['rendez_vous']), 3)
+        _, taches = self.nombre_requetes('/agenda/api/taches/')
+        self.assertEqual(taches['count'], 3)
+        self.assertEqual(
+            {(t['progression'], t['sous_taches']['total'], t['checklist']['terminees']) for t in taches['data']},
+            {(100, 1, 1)}
+        )
+        self.assertEqual(
+            [t.progression_calculee for t in Tache.objects.filter(tache_parente__isnull=True)],
+            [t.progression_calculee for t in Tache.objects.filter(tache_parente__isnull=True).avec_progression()],
+        )
+
+
+@override_settings(AGENDA_SYNC_MARGE_SECONDES=0)
+class SynchronisationTest(TestCase):
+    """Tests pour le flux delta et l'abonnement ICS"""
+
+    def setUp(self):
+        from gestion.models import Collaborateur, Utilisateur
+        self.client = Client()
+        self.admin = Utilisateur.objects.create_user(
+            username='admin', email='admin@test.com', password='testpass123', role='huissier'
+        )
+        self.clerc = Utilisateur.objects.create_user(
+            username='clerc', email='clerc@test.com', password='testpass123', role='clerc'
+        )
+        self.collaborateur = Collaborateur.objects.create(nom='Clerc', role='clerc', utilisateur=self.clerc)
+        self.rdv = RendezVous.objects.create(
+            titre="Audience, référé; salle 2", date_debut=timezone.now(),
+            date_fin=timezone.now() + timedelta(hours=1), createur=self.admin
+        )
+        self.rdv.collaborateurs_assignes.add(self.collaborateur)
+        self.tache = Tache.objects.create(
+            titre="Signification", date_echeance=timezone.now().date(),
+            createur=self.admin, responsable=self.clerc
+        )
+        RendezVous.objects.create(
+            titre="Réunion interne", date_debut=timezone.now(),
+            date_fin=timezone.now() + timedelta(hours=1), createur=self.admin
+        )
+        self.client.login(username='clerc', password='testpass123')
+
+    def synchroniser(self, jeton=None, **headers):
+        url = '/agenda/api/synchronisation/' + (f'?depuis={jeton}' if jeton else '')
+        return self.client.get(url, **headers)
+
+    def test_etat_complet_puis_delta(self):
+        """Seuls les éléments visibles modifiés depuis le jeton sont renvoyés"""
+        complet = self.synchroniser().json()
+        self.assertTrue(complet['complet'])
+        self.assertEqual([r['id'] for r in complet['rendez_vous']], [str(self.rdv.id)])
+        self.assertEqual([t['id'] for t in complet['taches']], [str(self.tache.id)])
+
+        delta = self.synchroniser(complet['jeton']).json()
+        self.assertEqual((delta['rendez_vous'], delta['taches']), ([], []))
+
+        self.tache.statut = StatutTache.EN_COURS
+        self.tache.save()
+        delta = self.synchroniser(delta['jeton']).json()
+        self.assertEqual([t['statut'] for t in delta['taches']], [StatutTache.EN_COURS])
+        self.assertEqual(delta['rendez_vous'], [])
+
+    def test_etag_304(self):
+        """Le même jeton sans changement donne 304, un changement redonne 200"""
+        jeton = self.synchroniser().json()['jeton']
+        reponse = self.synchroniser(jeton)
+        self.assertEqual(
+            self.synchroniser(jeton, HTTP_IF_NONE_MATCH=reponse['ETag']).status_code, 304
+        )
+        self.rdv.lieu = "Tribunal de Cotonou"
+        self.rdv.save()
+        reponse = self.synchroniser(jeton, HTTP_IF_NONE_MATCH=reponse['ETag'])
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['rendez_vous'][0]['lieu'], "Tribunal de Cotonou")
+
+    def test_suppressions(self):
+        """Suppression douce, définitive et désassignation apparaissent comme supprimées"""
+        jeton = self.synchroniser().json()['jeton']
+        tache_id = self.tache.id
+        self.rdv.collaborateurs_assignes.remove(self.collaborateur)
+        self.tache.delete()
+        delta = self.synchroniser(jeton).json()
+        self.assertEqual(delta['supprimes'], {
+            'rendez_vous': [str(self.rdv.id)], 'taches': [str(tache_id)]
+        })
+
+        jeton = delta['jeton']
+        tache = Tache.objects.create(
+            titre="Relance", date_echeance=timezone.now().date(), createur=self.admin, responsable=self.clerc
+        )
+        tache.responsable = self.admin
+        tache.save()
+        delta = self.synchroniser(jeton).json()
+        self.assertEqual(delta['taches'], [])
+        self.assertEqual(delta['supprimes']['taches'], [str(tache.id)])
+
+        jeton = delta['jeton']
+        tache = Tache.objects.get(pk=tache.pk)
+        tache.responsable = self.clerc
+        tache.save()
+        tache.est_active = False
+        tache.save()
+        delta = self.synchroniser(jeton).json()
+        self.assertEqual(delta['supprimes']['taches'], [str(tache.id)])
+
+    def test_jeton_invalide_ou_expire(self):
+        from agenda.services import SynchronisationService
+        self.assertEqual(self.synchroniser('pas-un-jeton').status_code, 400)
+        ancien = SynchronisationService.encoder_jeton(timezone.now() - timedelta(days=400))
+        reponse = self.synchroniser(ancien)
+        self.assertEqual(reponse.status_code, 410)
+        self.assertTrue(reponse.json()['resynchroniser'])
+
+    def test_abonnement_ics(self):
+        """Calendrier personnel : VEVENT/VTODO, lignes repliées, 304 si inchangé"""
+        url = self.client.get('/agenda/api/synchronisation/lien-ics/').json()['url']
+        client = Client()
+        reponse = client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse['Content-Type'], 'text/calendar; charset=utf-8')
+        contenu = reponse.content.decode()
+        self.assertIn(f'UID:{self.rdv.id}@agenda', contenu)
+        self.assertIn(f'UID:{self.tache.id}@agenda', contenu)
+        self.assertIn('SUMMARY:Audience\\, référé\\; salle 2', contenu)
+        self.assertNotIn('Réunion interne', contenu)
+        self.assertTrue(all(len(ligne.encode()) <= 75 for ligne in contenu.split('\r\n')))
+
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=reponse['ETag']).status_code, 304)
+        self.tache.marquer_terminee()
+        reponse = client.get(url, HTTP_IF_NONE_MATCH=reponse['ETag'])
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('STATUS:COMPLETED', reponse.content.decode())
+
+        self.assertEqual(client.get('/agenda/ics/falsifie/agenda.ics').status_code, 404)
+
+    def test_lien_ics_collaborateur_reserve_admin(self):
+        url = f'/agenda/api/synchronisation/lien-ics/?collaborateur={self.collaborateur.id}'
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.login(username='admin', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 200)
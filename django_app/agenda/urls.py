@@ -68,6 +68,11 @@ urlpatterns = [
     path('api/cloturer-journee/', views.api_cloturer_journee, name='api_cloturer_journee'),
     path('api/bilan-journee/<str:date_str>/', views.api_bilan_journee, name='api_bilan_journee'),
 
+    # ==========================================================================
+    # API STATISTIQUES
+    # ==========================================================================
+    path('api/statistiques/', views.api_statistiques, name='api_statistiques'),
+
     # ==========================================================================
     # API NOTIFICATIONS
     # ==========================================================================
@@ -110,4 +115,17 @@ urlpatterns = [
     path('api/rdv/<uuid:rdv_id>/participations/ajouter/', views.api_ajouter_participation, name='api_ajouter_participation'),
     path('api/rdv/<uuid:rdv_id>/repondre/', views.api_repondre_invitation, name='api_repondre_invitation'),
     path('api/rdv/<uuid:rdv_id>/presences/', views.api_marquer_presence, name='api_marquer_presence'),
+
+    # ==========================================================================
+    # API OCCURRENCES DES SÉRIES RÉCURRENTES
+    # ==========================================================================
+    path('api/rdv/<uuid:rdv_id>/occurrences/<str:date_occurrence>/', views.api_occurrence_rdv, name='api_occurrence_rdv'),
+    path('api/taches/<uuid:tache_id>/occurrences/<str:date_occurrence>/', views.api_occurrence_tache, name='api_occurrence_tache'),
+
+    # ==========================================================================
+    # API SYNCHRONISATION (DELTA ET ABONNEMENT ICS)
+    # ==========================================================================
+    path('api/synchronisation/', views.api_synchronisation, name='api_synchronisation'),
+    path('api/synchronisation/lien-ics/', views.api_lien_ics, name='api_lien_ics'),
+    path('ics/<str:jeton>/agenda.ics', views.agenda_ics, name='agenda_ics'),
 ]
@@ -8,7 +8,8 @@ Auteur: Maître Martial Arnaud BIAOU
 import json
 from datetime import datetime, timedelta, date
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -16,6 +17,9 @@ from django.utils import timezone
 from django.db.models import Q, Count, Avg, Sum, F
 from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
 from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
 from django.contrib.contenttypes.models import ContentType
 
 from .models import (
@@ -23,11 +27,13 @@ from .models import (
     DocumentRdv, DocumentTache, RappelRdv, RappelTache,
     CommentaireTache, SousTacheChecklist, Notification,
     JourneeAgenda, ReportTache, ConfigurationAgenda,
-    StatistiquesAgenda, HistoriqueAgenda,
+    StatistiquesAgenda, StatistiqueJournaliere, HistoriqueAgenda,
     TypeRendezVous, TypeTache, StatutRendezVous, StatutTache,
     StatutDelegation, Priorite, TypeRecurrence,
     VueSauvegardee, ParticipationRdv
 )
+from .services import RecurrenceService, StatistiquesService, SynchronisationService
+from gestion.services.navigation import invalidate_badges_cache
 
 
 # =============================================================================
@@ -36,38 +42,8 @@ from .models import (
 
 def get_default_context(request):
     """Retourne le contexte par défaut pour tous les templates Agenda"""
-    user = request.user
-
-    modules = [
-        # Principal
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'layout-dashboard', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers'},
-        {'id': 'facturation', 'label': 'Facturation', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        # Finance
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'wallet', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        # Gestion
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        # Admin
-        {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    return {
-        'current_user': {
-            'id': user.id if user.is_authenticated else None,
-            'nom': user.get_full_name() if user.is_authenticated else 'Invité',
-            'role': user.role if user.is_authenticated and hasattr(user, 'role') else '',
-            'initials': user.get_initials() if user.is_authenticated and hasattr(user, 'get_initials') else 'XX',
-        },
-        'modules': modules,
-        'active_module': 'agenda',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'agenda'}
 
 
 # =============================================================================
@@ -93,21 +69,13 @@ def filter_by_user_permissions(queryset, user, model_type='rdv'):
     Filtre les résultats selon les permissions de l'utilisateur
     Admin/Huissier: voit tout
     Collaborateurs: voit seulement leurs éléments
+    (sous-requêtes IN sur les tables d'association : ni doublon ni DISTINCT)
     """
     if user_is_admin(user):
         return queryset
 
-    if model_type == 'rdv':
-        return queryset.filter(
-            Q(createur=user) |
-            Q(collaborateurs_assignes__utilisateur=user)
-        ).distinct()
-    elif model_type == 'tache':
-        return queryset.filter(
-            Q(createur=user) |
-            Q(responsable=user) |
-            Q(co_responsables=user)
-        ).distinct()
+    if model_type in ('rdv', 'tache'):
+        return queryset.visibles_par(user)
 
     return queryset
 
@@ -138,20 +106,11 @@ def log_action(request, objet, action, details=None, anciennes_valeurs=None, nou
 
 def creer_notification(destinataire, titre, message, type_notification, objet=None):
     """Crée une notification pour un utilisateur"""
-    notif = Notification.objects.create(
-        destinataire=destinataire,
-        titre=titre,
-        message=message,
-        type_notification=type_notification,
+    from .services import NotificationService
+    return NotificationService.creer_notification(
+        destinataire, titre, message, type_notification, objet
     )
 
-    if objet:
-        notif.content_type = ContentType.objects.get_for_model(objet)
-        notif.object_id = str(objet.id)
-        notif.save()
-
-    return notif
-
 
 # =============================================================================
 # VUES PRINCIPALES - PAGE AGENDA
@@ -172,6 +131,164 @@ def agenda_home(request):
     return render(request, 'agenda/home.html', context)
 
 
+def serialiser_rdv(rdv):
+    """
+    Représentation JSON d'un rendez-vous (liste et synchronisation)
+    Attend select_related('createur') et le prefetch des collaborateurs,
+    dossiers et participants externes.
+    """
+    return {
+        'id': str(rdv.id),
+        'titre': rdv.titre,
+        'type_rdv': rdv.type_rdv,
+        'type_rdv_display': rdv.get_type_rdv_display(),
+        'description': rdv.description,
+        'date_debut': rdv.date_debut.isoformat(),
+        'date_fin': rdv.date_fin.isoformat(),
+        'journee_entiere': rdv.journee_entiere,
+        'lieu': rdv.lieu,
+        'adresse': rdv.adresse,
+        'latitude': float(rdv.latitude) if rdv.latitude else None,
+        'longitude': float(rdv.longitude) if rdv.longitude else None,
+        'statut': rdv.statut,
+        'statut_display': rdv.get_statut_display(),
+        'priorite': rdv.priorite,
+        'priorite_display': rdv.get_priorite_display(),
+        'couleur': rdv.couleur,
+        'createur': {
+            'id': rdv.createur.id,
+            'nom': rdv.createur.get_full_name(),
+        } if rdv.createur else None,
+        'collaborateurs': [
+            {'id': c.id, 'nom': str(c)}
+            for c in rdv.collaborateurs_assignes.all()
+        ],
+        'dossiers': [
+            {'id': str(d.id), 'reference': d.reference, 'objet': d.objet}
+            for d in rdv.dossiers.all()
+        ],
+        'participants_externes': [
+            {'id': str(p.id), 'nom': p.nom, 'type': p.type_participant}
+            for p in rdv.participants_externes.all()
+        ],
+        'duree': rdv.duree,
+        'est_passe': rdv.est_passe,
+        'est_aujourdhui': rdv.est_aujourdhui,
+        'type_recurrence': rdv.type_recurrence,
+        'serie_id': str(rdv.rdv_parent_id) if rdv.rdv_parent_id else None,
+        'date_occurrence': rdv.date_occurrence.isoformat() if rdv.date_occurrence else None,
+        'virtuelle': False,
+    }
+
+
+def serialiser_occurrence_rdv(occurrence, donnees_serie):
+    """
+    Représentation JSON d'une occurrence calculée : celle de sa série
+    (donnees_serie) à la date de l'occurrence. L'id composite n'est pas
+    modifiable tel quel : api_occurrence_rdv en fait une exception.
+    """
+    date_debut = occurrence.date_debut
+    date_fin = occurrence.date_fin
+    return {
+        **donnees_serie,
+        'id': occurrence.id,
+        'date_debut': date_debut.isoformat(),
+        'date_fin': date_fin.isoformat(),
+        'statut': StatutRendezVous.PLANIFIE,
+        'statut_display': StatutRendezVous.PLANIFIE.label,
+        'est_passe': date_fin < timezone.now(),
+        'est_aujourdhui': date_debut.date() == timezone.now().date(),
+        'serie_id': str(occurrence.serie.pk),
+        'date_occurrence': occurrence.date_occurrence.isoformat(),
+        'virtuelle': True,
+    }
+
+
+def serialiser_tache(tache):
+    """
+    Représentation JSON d'une tâche (liste et synchronisation)
+    Attend avec_progression(), select_related('createur', 'responsable',
+    'dossier') et le prefetch des étiquettes.
+    """
+    return {
+        'id': str(tache.id),
+        'titre': tache.titre,
+        'type_tache': tache.type_tache,
+        'type_tache_display': tache.get_type_tache_display(),
+        'description': tache.description,
+        'date_echeance': tache.date_echeance.isoformat(),
+        'heure_echeance': tache.heure_echeance.isoformat() if tache.heure_echeance else None,
+        'statut': tache.statut,
+        'statut_display': tache.get_statut_display(),
+        'priorite': tache.priorite,
+        'priorite_display': tache.get_priorite_display(),
+        'couleur': tache.couleur,
+        'progression': tache.progression_calculee,
+        'temps_estime': tache.temps_estime,
+        'temps_passe': tache.temps_passe,
+        'createur': {
+            'id': tache.createur.id,
+            'nom': tache.createur.get_full_name(),
+        } if tache.createur else None,
+        'responsable': {
+            'id': tache.responsable.id,
+            'nom': tache.responsable.get_full_name(),
+        } if tache.responsable else None,
+        'dossier': {
+            'id': str(tache.dossier.id),
+            'reference': tache.dossier.reference,
+        } if tache.dossier else None,
+        'etiquettes': [
+            {'id': str(e.id), 'nom': e.nom, 'couleur': e.couleur}
+            for e in tache.etiquettes.all()
+        ],
+        'est_en_retard': tache.est_en_retard,
+        'est_aujourdhui': tache.est_aujourdhui,
+        'est_delegue': tache.est_delegue,
+        'statut_delegation': tache.statut_delegation,
+        'sous_taches': {
+            'total': tache.nb_sous_taches,
+            'terminees': tache.nb_sous_taches_terminees,
+        },
+        'checklist': {
+            'total': tache.nb_checklist,
+            'terminees': tache.nb_checklist_completes,
+        },
+        'type_recurrence': tache.type_recurrence,
+        'serie_id': str(tache.tache_parent_id) if tache.tache_parent_id else None,
+        'date_occurrence': tache.date_occurrence.isoformat() if tache.date_occurrence else None,
+        'virtuelle': False,
+    }
+
+
+def serialiser_occurrence_tache(occurrence, donnees_serie):
+    """Représentation JSON d'une occurrence calculée de tâche (voir serialiser_occurrence_rdv)"""
+    aujourdhui = timezone.now().date()
+    return {
+        **donnees_serie,
+        'id': occurrence.id,
+        'date_echeance': occurrence.date_occurrence.isoformat(),
+        'statut': StatutTache.A_FAIRE,
+        'statut_display': StatutTache.A_FAIRE.label,
+        'progression': 0,
+        'temps_passe': 0,
+        'est_en_retard': occurrence.date_occurrence < aujourdhui,
+        'est_aujourdhui': occurrence.date_occurrence == aujourdhui,
+        'statut_delegation': None,
+        'sous_taches': {'total': 0, 'terminees': 0},
+        'checklist': {'total': 0, 'terminees': 0},
+        'serie_id': str(occurrence.serie.pk),
+        'date_occurrence': occurrence.date_occurrence.isoformat(),
+        'virtuelle': True,
+    }
+
+
+def _instant(valeur):
+    """Date ou date-heure ISO d'un paramètre de requête, en datetime avec fuseau"""
+    instant = parse_datetime(valeur) or datetime.combine(parse_date(valeur), datetime.min.time())
+    return instant if timezone.is_aware(instant) else timezone.make_aware(instant)
+
+
 # =============================================================================
 # API RENDEZ-VOUS
 # =============================================================================
@@ -203,65 +320,46 @@ def api_liste_rdv(request):
         # Appliquer les permissions
         queryset = filter_by_user_permissions(queryset, user, 'rdv')
 
-        # Filtres de date
-        if date_debut:
-            queryset = queryset.filter(date_debut__gte=date_debut)
-        if date_fin:
-            queryset = queryset.filter(date_fin__lte=date_fin)
-
         # Autres filtres
         if type_rdv:
             queryset = queryset.filter(type_rdv=type_rdv)
-        if statut:
-            queryset = queryset.filter(statut=statut)
         if collaborateur_id:
             queryset = queryset.filter(collaborateurs_assignes__id=collaborateur_id)
         if dossier_id:
             queryset = queryset.filter(dossiers__id=dossier_id)
+        series = queryset
+        if statut:
+            queryset = queryset.filter(statut=statut)
 
-        # Sérialisation
-        rdv_list = []
-        for rdv in queryset.select_related('createur').prefetch_related(
-            'collaborateurs_assignes', 'dossiers', 'participants_externes'
-        ):
-            rdv_list.append({
-                'id': str(rdv.id),
-                'titre': rdv.titre,
-                'type_rdv': rdv.type_rdv,
-                'type_rdv_display': rdv.get_type_rdv_display(),
-                'description': rdv.description,
-                'date_debut': rdv.date_debut.isoformat(),
-                'date_fin': rdv.date_fin.isoformat(),
-                'journee_entiere': rdv.journee_entiere,
-                'lieu': rdv.lieu,
-                'adresse': rdv.adresse,
-                'latitude': float(rdv.latitude) if rdv.latitude else None,
-                'longitude': float(rdv.longitude) if rdv.longitude else None,
-                'statut': rdv.statut,
-                'statut_display': rdv.get_statut_display(),
-                'priorite': rdv.priorite,
-                'priorite_display': rdv.get_priorite_display(),
-                'couleur': rdv.couleur,
-                'createur': {
-                    'id': rdv.createur.id,
-                    'nom': rdv.createur.get_full_name(),
-                } if rdv.createur else None,
-                'collaborateurs': [
-                    {'id': c.id, 'nom': str(c)}
-                    for c in rdv.collaborateurs_assignes.all()
-                ],
-                'dossiers': [
-                    {'id': str(d.id), 'reference': d.reference, 'objet': d.objet}
-                    for d in rdv.dossiers.all()
-                ],
-                'participants_externes': [
-                    {'id': str(p.id), 'nom': p.nom, 'type': p.type_participant}
-                    for p in rdv.participants_externes.all()
-                ],
-                'duree': rdv.duree,
-                'est_passe': rdv.est_passe,
-                'est_aujourdhui': rdv.est_aujourdhui,
-            })
+        # Filtres de date
+        if date_debut:
+            queryset = queryset.filter(date_debut__gte=date_debut)
+        if date_fin:
+            queryset = queryset.filter(date_fin__lte=date_fin)
+
+        prefetch = ('collaborateurs_assignes', 'dossiers', 'participants_externes')
+        rdvs = [
+            (rdv.date_debut, serialiser_rdv(rdv))
+            for rdv in queryset.select_related('createur').prefetch_related(*prefetch)
+        ]
+
+        # Occurrences calculées des séries (planifiées tant qu'aucune exception ne les remplace)
+        if not statut or statut == StatutRendezVous.PLANIFIE:
+            debut, fin = RecurrenceService.fenetre(date_debut, date_fin)
+            donnees_series = {}
+            for occurrence in RecurrenceService.occurrences_rdv(
+                series.select_related('createur').prefetch_related(*prefetch), debut, fin
+            ):
+                if date_debut and occurrence.date_debut < _instant(date_debut):
+                    continue
+                if date_fin and occurrence.date_fin > _instant(date_fin):
+                    continue
+                serie = occurrence.serie
+                if serie.pk not in donnees_series:
+                    donnees_series[serie.pk] = serialiser_rdv(serie)
+                rdvs.append((occurrence.date_debut, serialiser_occurrence_rdv(occurrence, donnees_series[serie.pk])))
+            rdvs.sort(key=lambda element: element[0])
+        rdv_list = [donnees for _, donnees in rdvs]
 
         return JsonResponse({
             'success': True,
@@ -674,22 +772,14 @@ def api_liste_taches(request):
         createur_id = request.GET.get('createur')
 
         # Base queryset
-        queryset = Tache.objects.filter(est_active=True, tache_parente__isnull=True)
+        queryset = Tache.objects.filter(est_active=True, tache_parente__isnull=True).avec_progression()
 
         # Appliquer les permissions
         queryset = filter_by_user_permissions(queryset, user, 'tache')
 
-        # Filtres de date
-        if date_debut:
-            queryset = queryset.filter(date_echeance__gte=date_debut)
-        if date_fin:
-            queryset = queryset.filter(date_echeance__lte=date_fin)
-
         # Autres filtres
         if type_tache:
             queryset = queryset.filter(type_tache=type_tache)
-        if statut:
-            queryset = queryset.filter(statut=statut)
         if priorite:
             queryset = queryset.filter(priorite=priorite)
         if responsable_id:
@@ -699,6 +789,20 @@ def api_liste_taches(request):
         if createur_id:
             queryset = queryset.filter(createur_id=createur_id)
 
+        # Filtre tâches déléguées
+        if delegue == 'true':
+            queryset = queryset.exclude(responsable=F('createur')).filter(responsable__isnull=False)
+        series = queryset
+
+        if statut:
+            queryset = queryset.filter(statut=statut)
+
+        # Filtres de date
+        if date_debut:
+            queryset = queryset.filter(date_echeance__gte=date_debut)
+        if date_fin:
+            queryset = queryset.filter(date_echeance__lte=date_fin)
+
         # Filtre tâches en retard
         if en_retard == 'true':
             today = timezone.now().date()
@@ -708,10 +812,6 @@ def api_liste_taches(request):
                 statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]
             )
 
-        # Filtre tâches déléguées
-        if delegue == 'true':
-            queryset = queryset.exclude(responsable=F('createur')).filter(responsable__isnull=False)
-
         # Tri
         ordre = request.GET.get('ordre', 'date_echeance')
         if ordre.startswith('-'):
@@ -720,61 +820,29 @@ def api_liste_taches(request):
             queryset = queryset.order_by(ordre, '-priorite')
 
         # Sérialisation
-        taches_list = []
-        for tache in queryset.select_related('createur', 'responsable', 'dossier').prefetch_related(
-            'etiquettes', 'co_responsables', 'sous_taches', 'checklist_items'
-        ):
-            # Calculer sous-tâches
-            sous_taches_count = tache.sous_taches.count()
-            sous_taches_terminees = tache.sous_taches.filter(statut=StatutTache.TERMINEE).count()
-            checklist_count = tache.checklist_items.count()
-            checklist_terminees = tache.checklist_items.filter(est_complete=True).count()
+        relations = ('createur', 'responsable', 'dossier')
+        taches_list = [
+            serialiser_tache(tache)
+            for tache in queryset.select_related(*relations).prefetch_related('etiquettes')
+        ]
 
-            taches_list.append({
-                'id': str(tache.id),
-                'titre': tache.titre,
-                'type_tache': tache.type_tache,
-                'type_tache_display': tache.get_type_tache_display(),
-                'description': tache.description,
-                'date_echeance': tache.date_echeance.isoformat(),
-                'heure_echeance': tache.heure_echeance.isoformat() if tache.heure_echeance else None,
-                'statut': tache.statut,
-                'statut_display': tache.get_statut_display(),
-                'priorite': tache.priorite,
-                'priorite_display': tache.get_priorite_display(),
-                'couleur': tache.couleur,
-                'progression': tache.progression_calculee,
-                'temps_estime': tache.temps_estime,
-                'temps_passe': tache.temps_passe,
-                'createur': {
-                    'id': tache.createur.id,
-                    'nom': tache.createur.get_full_name(),
-                } if tache.createur else None,
-                'responsable': {
-                    'id': tache.responsable.id,
-                    'nom': tache.responsable.get_full_name(),
-                } if tache.responsable else None,
-                'dossier': {
-                    'id': str(tache.dossier.id),
-                    'reference': tache.dossier.reference,
-                } if tache.dossier else None,
-                'etiquettes': [
-                    {'id': str(e.id), 'nom': e.nom, 'couleur': e.couleur}
-                    for e in tache.etiquettes.all()
-                ],
-                'est_en_retard': tache.est_en_retard,
-                'est_aujourdhui': tache.est_aujourdhui,
-                'est_delegue': tache.est_delegue,
-                'statut_delegation': tache.statut_delegation,
-                'sous_taches': {
-                    'total': sous_taches_count,
-                    'terminees': sous_taches_terminees,
-                },
-                'checklist': {
-                    'total': checklist_count,
-                    'terminees': checklist_terminees,
-                },
-            })
+        # Occurrences calculées des séries (à faire tant qu'aucune exception ne les remplace)
+        if not statut or statut == StatutTache.A_FAIRE:
+            debut, fin = RecurrenceService.fenetre(date_debut, date_fin)
+            donnees_series = {}
+            occurrences = []
+            for occurrence in RecurrenceService.occurrences_taches(
+                series.select_related(*relations).prefetch_related('etiquettes'), debut, fin
+            ):
+                serie = occurrence.serie
+                if serie.pk not in donnees_series:
+                    donnees_series[serie.pk] = serialiser_tache(serie)
+                donnees = serialiser_occurrence_tache(occurrence, donnees_series[serie.pk])
+                if en_retard != 'true' or donnees['est_en_retard']:
+                    occurrences.append(donnees)
+            taches_list += occurrences
+            if occurrences and ordre.lstrip('-') == 'date_echeance':
+                taches_list.sort(key=lambda t: t['date_echeance'], reverse=ordre.startswith('-'))
 
         return JsonResponse({
             'success': True,
@@ -1465,7 +1533,7 @@ def api_taches_deleguees(request):
             )
 
         taches_list = []
-        for tache in queryset.select_related('createur', 'responsable', 'dossier'):
+        for tache in queryset.select_related('createur', 'responsable', 'dossier').avec_progression():
             taches_list.append({
                 'id': str(tache.id),
                 'titre': tache.titre,
@@ -1668,29 +1736,45 @@ def api_actions_du_jour(request):
         date_debut_jour = timezone.make_aware(datetime.combine(today, datetime.min.time()))
         date_fin_jour = timezone.make_aware(datetime.combine(today, datetime.max.time()))
 
-        # RDV du jour
+        # RDV du jour, occurrences calculées comprises (encore planifiées)
         rdv_queryset = RendezVous.objects.filter(
             est_actif=True,
             date_debut__range=[date_debut_jour, date_fin_jour]
         )
         rdv_queryset = filter_by_user_permissions(rdv_queryset, user, 'rdv')
+        series_rdv = filter_by_user_permissions(RendezVous.objects.all(), user, 'rdv')
 
-        rdv_list = [
-            {
+        def serialize_rdv(rdv, date_debut, date_fin, statut, **occurrence):
+            return {
                 'id': str(rdv.id),
                 'titre': rdv.titre,
                 'type_rdv': rdv.type_rdv,
                 'type_rdv_display': rdv.get_type_rdv_display(),
-                'date_debut': rdv.date_debut.isoformat(),
-                'date_fin': rdv.date_fin.isoformat(),
+                'date_debut': date_debut.isoformat(),
+                'date_fin': date_fin.isoformat(),
                 'lieu': rdv.lieu,
-                'statut': rdv.statut,
-                'statut_display': rdv.get_statut_display(),
+                'statut': statut,
+                'statut_display': StatutRendezVous(statut).label,
                 'priorite': rdv.priorite,
                 'couleur': rdv.couleur,
+                'virtuelle': False,
+                **occurrence,
             }
-            for rdv in rdv_queryset.order_by('date_debut')
+
+        rdvs = [
+            (rdv.date_debut, serialize_rdv(rdv, rdv.date_debut, rdv.date_fin, rdv.statut))
+            for rdv in rdv_queryset
+        ]
+        rdvs += [
+            (o.date_debut, serialize_rdv(
+                o.serie, o.date_debut, o.date_fin, StatutRendezVous.PLANIFIE,
+                id=o.id, serie_id=str(o.serie.pk), date_occurrence=o.date_occurrence.isoformat(),
+                virtuelle=True,
+            ))
+            for o in RecurrenceService.occurrences_rdv(series_rdv, today, today)
         ]
+        rdvs.sort(key=lambda element: element[0])
+        rdv_list = [donnees for _, donnees in rdvs]
 
         # Tâches du jour
         taches_jour_queryset = Tache.objects.filter(
@@ -1721,10 +1805,43 @@ def api_actions_du_jour(request):
                 'couleur': t.couleur,
                 'est_en_retard': t.est_en_retard,
                 'responsable': t.responsable.get_full_name() if t.responsable else None,
+                'virtuelle': False,
             }
 
-        taches_jour = [serialize_tache(t) for t in taches_jour_queryset.order_by('priorite', 'heure_echeance')]
-        taches_retard = [serialize_tache(t) for t in taches_retard_queryset.order_by('date_echeance')]
+        taches_jour = [
+            serialize_tache(t) for t in taches_jour_queryset.select_related('responsable').avec_progression().order_by(
+                'priorite', 'heure_echeance'
+            )
+        ]
+        series_taches = filter_by_user_permissions(Tache.objects.all(), user, 'tache')
+        for occurrence in RecurrenceService.occurrences_taches(
+            series_taches.select_related('responsable'), today, today
+        ):
+            serie = occurrence.serie
+            taches_jour.append({
+                'id': occurrence.id,
+                'titre': serie.titre,
+                'type_tache': serie.type_tache,
+                'type_tache_display': serie.get_type_tache_display(),
+                'date_echeance': occurrence.date_occurrence.isoformat(),
+                'statut': StatutTache.A_FAIRE,
+                'statut_display': StatutTache.A_FAIRE.label,
+                'priorite': serie.priorite,
+                'priorite_display': serie.get_priorite_display(),
+                'progression': 0,
+                'couleur': serie.couleur,
+                'est_en_retard': False,
+                'responsable': serie.responsable.get_full_name() if serie.responsable else None,
+                'serie_id': str(serie.pk),
+                'date_occurrence': occurrence.date_occurrence.isoformat(),
+                'virtuelle': True,
+            })
+        taches_jour.sort(key=lambda t: t['priorite'])
+        taches_retard = [
+            serialize_tache(t) for t in taches_retard_queryset.select_related('responsable').avec_progression().order_by(
+                'date_echeance'
+            )
+        ]
 
         # Statistiques
         total_rdv = len(rdv_list)
@@ -1887,78 +2004,106 @@ def api_vue_ensemble(request):
         fin_mois = (debut_mois + timedelta(days=32)).replace(day=1) - timedelta(days=1)
 
         is_admin = user_is_admin(user)
-
-        def get_stats(date_debut, date_fin, filter_user=True):
-            # Base querysets
-            rdv_filter = Q(est_actif=True, date_debut__date__gte=date_debut, date_debut__date__lte=date_fin)
-            tache_filter = Q(est_active=True, date_echeance__gte=date_debut, date_echeance__lte=date_fin)
-
-            if filter_user and not is_admin:
-                rdv_filter &= Q(createur=user) | Q(collaborateurs_assignes__utilisateur=user)
-                tache_filter &= Q(createur=user) | Q(responsable=user)
-
-            rdv = RendezVous.objects.filter(rdv_filter).distinct()
-            taches = Tache.objects.filter(tache_filter).distinct()
-
-            return {
-                'nb_rdv': rdv.count(),
-                'rdv_termines': rdv.filter(statut=StatutRendezVous.TERMINE).count(),
-                'nb_taches': taches.count(),
-                'taches_terminees': taches.filter(statut=StatutTache.TERMINEE).count(),
-                'taches_en_retard': taches.filter(date_echeance__lt=today).exclude(
-                    statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]
-                ).count(),
-            }
-
-        # Stats semaine
-        stats_semaine = get_stats(debut_semaine, fin_semaine)
-
-        # Stats mois
-        stats_mois = get_stats(debut_mois, fin_mois)
+        periodes = {'semaine': (debut_semaine, fin_semaine), 'mois': (debut_mois, fin_mois)}
+        tache_terminee = Q(statut=StatutTache.TERMINEE)
+        tache_en_retard = Q(date_echeance__lt=today) & ~Q(statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE])
+
+        # Une agrégation conditionnelle par modèle pour les deux périodes
+        date_min = min(debut_semaine, debut_mois)
+        date_max = max(fin_semaine, fin_mois)
+        rdv = RendezVous.objects.filter(est_actif=True, date_debut__date__range=(date_min, date_max))
+        taches = Tache.objects.filter(est_active=True, date_echeance__range=(date_min, date_max))
+        if not is_admin:
+            rdv = rdv.visibles_par(user)
+            taches = taches.visibles_par(user)
+
+        agregats_rdv, agregats_taches = {}, {}
+        for nom, bornes in periodes.items():
+            dans_rdv = Q(date_debut__date__range=bornes)
+            dans_taches = Q(date_echeance__range=bornes)
+            agregats_rdv[f'{nom}_nb_rdv'] = Count('pk', filter=dans_rdv)
+            agregats_rdv[f'{nom}_rdv_termines'] = Count(
+                'pk', filter=dans_rdv & Q(statut=StatutRendezVous.TERMINE)
+            )
+            agregats_taches[f'{nom}_nb_taches'] = Count('pk', filter=dans_taches)
+            agregats_taches[f'{nom}_taches_terminees'] = Count('pk', filter=dans_taches & tache_terminee)
+            agregats_taches[f'{nom}_taches_en_retard'] = Count('pk', filter=dans_taches & tache_en_retard)
+        compteurs = {**rdv.aggregate(**agregats_rdv), **taches.aggregate(**agregats_taches)}
+
+        # Occurrences calculées des séries (planifiées / à faire)
+        series_rdv = RendezVous.objects.all()
+        series_taches = Tache.objects.all()
+        if not is_admin:
+            series_rdv = series_rdv.visibles_par(user)
+            series_taches = series_taches.visibles_par(user)
+        occurrences_rdv = RecurrenceService.occurrences_rdv(series_rdv, date_min, date_max)
+        occurrences_taches = RecurrenceService.occurrences_taches(
+            series_taches.select_related('responsable'), date_min, date_max
+        )
+        for nom, (date_debut, date_fin) in periodes.items():
+            compteurs[f'{nom}_nb_rdv'] += sum(
+                date_debut <= o.date_occurrence <= date_fin for o in occurrences_rdv
+            )
+            dans_periode = [o for o in occurrences_taches if date_debut <= o.date_occurrence <= date_fin]
+            compteurs[f'{nom}_nb_taches'] += len(dans_periode)
+            compteurs[f'{nom}_taches_en_retard'] += sum(o.date_occurrence < today for o in dans_periode)
 
         # Taux de réalisation
         def taux(termines, total):
             return round((termines / total * 100), 1) if total > 0 else 100
 
-        stats_semaine['taux_rdv'] = taux(stats_semaine['rdv_termines'], stats_semaine['nb_rdv'])
-        stats_semaine['taux_taches'] = taux(stats_semaine['taches_terminees'], stats_semaine['nb_taches'])
-        stats_mois['taux_rdv'] = taux(stats_mois['rdv_termines'], stats_mois['nb_rdv'])
-        stats_mois['taux_taches'] = taux(stats_mois['taches_terminees'], stats_mois['nb_taches'])
-
-        result = {
-            'semaine': {
-                'debut': debut_semaine.isoformat(),
-                'fin': fin_semaine.isoformat(),
-                **stats_semaine
-            },
-            'mois': {
-                'debut': debut_mois.isoformat(),
-                'fin': fin_mois.isoformat(),
-                **stats_mois
-            },
-        }
+        result = {}
+        for nom, (date_debut, date_fin) in periodes.items():
+            stats = {
+                cle: compteurs[f'{nom}_{cle}']
+                for cle in ['nb_rdv', 'rdv_termines', 'nb_taches', 'taches_terminees', 'taches_en_retard']
+            }
+            stats['taux_rdv'] = taux(stats['rdv_termines'], stats['nb_rdv'])
+            stats['taux_taches'] = taux(stats['taches_terminees'], stats['nb_taches'])
+            result[nom] = {
+                'debut': date_debut.isoformat(),
+                'fin': date_fin.isoformat(),
+                **stats
+            }
 
-        # Stats par collaborateur (admin seulement)
+        # Stats par collaborateur (admin seulement), en une requête groupée
         if is_admin:
             from gestion.models import Utilisateur
-            collaborateurs_stats = []
 
-            for collab in Utilisateur.objects.filter(is_active=True).exclude(role='admin'):
-                taches_collab = Tache.objects.filter(
-                    responsable=collab,
+            par_responsable = {
+                ligne['responsable']: ligne
+                for ligne in Tache.objects.filter(
                     est_active=True,
+                    responsable__isnull=False,
                     date_echeance__gte=debut_mois,
                     date_echeance__lte=fin_mois
+                ).order_by().values('responsable').annotate(
+                    taches_assignees=Count('pk'),
+                    taches_terminees=Count('pk', filter=tache_terminee),
+                    taches_en_retard=Count('pk', filter=tache_en_retard),
                 )
+            }
+
+            occurrences_mois = {}
+            for occurrence in occurrences_taches:
+                responsable_id = occurrence.serie.responsable_id
+                if responsable_id and debut_mois <= occurrence.date_occurrence <= fin_mois:
+                    assignees, en_retard = occurrences_mois.get(responsable_id, (0, 0))
+                    occurrences_mois[responsable_id] = (
+                        assignees + 1, en_retard + (occurrence.date_occurrence < today)
+                    )
+
+            collaborateurs_stats = []
+            for collab in Utilisateur.objects.filter(is_active=True).exclude(role='admin'):
+                ligne = par_responsable.get(collab.id, {})
+                assignees, en_retard = occurrences_mois.get(collab.id, (0, 0))
                 collaborateurs_stats.append({
                     'id': collab.id,
                     'nom': collab.get_full_name(),
                     'role': collab.role,
-                    'taches_assignees': taches_collab.count(),
-                    'taches_terminees': taches_collab.filter(statut=StatutTache.TERMINEE).count(),
-                    'taches_en_retard': taches_collab.filter(date_echeance__lt=today).exclude(
-                        statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE]
-                    ).count(),
+                    'taches_assignees': ligne.get('taches_assignees', 0) + assignees,
+                    'taches_terminees': ligne.get('taches_terminees', 0),
+                    'taches_en_retard': ligne.get('taches_en_retard', 0) + en_retard,
                 })
 
             result['collaborateurs'] = collaborateurs_stats
@@ -1972,7 +2117,7 @@ def api_vue_ensemble(request):
             date_echeance__lt=today
         ).exclude(statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE])
         if not is_admin:
-            taches_retard = taches_retard.filter(Q(createur=user) | Q(responsable=user))
+            taches_retard = taches_retard.visibles_par(user)
 
         for tache in taches_retard[:5]:
             alertes.append({
@@ -1991,9 +2136,7 @@ def api_vue_ensemble(request):
             date_debut__date__lte=today + timedelta(days=3)
         )
         if not is_admin:
-            rdv_non_confirmes = rdv_non_confirmes.filter(
-                Q(createur=user) | Q(collaborateurs_assignes__utilisateur=user)
-            )
+            rdv_non_confirmes = rdv_non_confirmes.visibles_par(user)
 
         for rdv in rdv_non_confirmes[:5]:
             alertes.append({
@@ -2043,6 +2186,10 @@ def api_cloturer_journee(request):
         if journee.est_cloturee:
             return JsonResponse({'success': False, 'error': 'Cette journée est déjà clôturée'}, status=400)
 
+        # Statistiques journalières de l'étude, avant le report des tâches non
+        # terminées (la clôture d'un collaborateur ne fige pas celles des autres)
+        if journee.utilisateur is None:
+            StatistiquesService.enregistrer_journees(date_cloture, date_cloture)
         journee.cloturer(user, 'manuelle', commentaire)
 
         # Si date de report spécifique
@@ -2134,6 +2281,76 @@ def api_bilan_journee(request, date_str):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+# =============================================================================
+# API STATISTIQUES
+# =============================================================================
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_statistiques(request):
+    """
+    Statistiques d'une période, sommées sur les statistiques journalières
+    GET params: periode (jour, semaine, mois, annee), date (AAAA-MM-JJ),
+    utilisateur (admin seulement ; par défaut toute l'étude)
+    """
+    try:
+        user = get_user_from_request(request)
+        if not user:
+            return JsonResponse({'success': False, 'error': 'Non authentifié'}, status=401)
+
+        type_periode = request.GET.get('periode', 'mois')
+        if type_periode not in ('jour', 'semaine', 'mois', 'annee'):
+            return JsonResponse({'success': False, 'error': 'Période invalide'}, status=400)
+        jour = parse_date(request.GET.get('date', '')) or timezone.now().date()
+
+        if user_is_admin(user):
+            utilisateur = None
+            utilisateur_id = request.GET.get('utilisateur')
+            if utilisateur_id:
+                from gestion.models import Utilisateur
+                utilisateur = get_object_or_404(Utilisateur, id=utilisateur_id)
+        else:
+            utilisateur = user
+
+        date_debut, date_fin = StatistiquesService.bornes_periode(type_periode, jour)
+        stats = StatistiquesService.stats_periode(date_debut, date_fin, utilisateur)
+
+        # Évolution par mois sur une année, par jour sinon
+        tronquer = TruncMonth('date') if type_periode == 'annee' else F('date')
+        evolution = [
+            {
+                'date': ligne['periode'].isoformat(),
+                'nb_rdv_total': ligne['nb_rdv_total'],
+                'nb_rdv_termines': ligne['nb_rdv_termines'],
+                'nb_taches_total': ligne['nb_taches_total'],
+                'nb_taches_terminees': ligne['nb_taches_terminees'],
+            }
+            for ligne in StatistiqueJournaliere.objects.filter(
+                date__range=(date_debut, date_fin), utilisateur=utilisateur
+            ).annotate(periode=tronquer).order_by('periode').values('periode').annotate(
+                nb_rdv_total=Sum('nb_rdv_total'),
+                nb_rdv_termines=Sum('nb_rdv_termines'),
+                nb_taches_total=Sum('nb_taches_total'),
+                nb_taches_terminees=Sum('nb_taches_terminees'),
+            )
+        ]
+
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'periode': type_periode,
+                'debut': date_debut.isoformat(),
+                'fin': date_fin.isoformat(),
+                'utilisateur': utilisateur.id if utilisateur else None,
+                **stats,
+                'evolution': evolution,
+            }
+        })
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
 # =============================================================================
 # API NOTIFICATIONS
 # =============================================================================
@@ -2211,6 +2428,7 @@ def api_marquer_toutes_lues(request):
             est_lu=True,
             date_lecture=timezone.now()
         )
+        invalidate_badges_cache(user.id)
 
         return JsonResponse({'success': True, 'message': 'Toutes les notifications marquées comme lues'})
 
@@ -2906,3 +3124,232 @@ def api_recherche_globale(request):
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# =============================================================================
+# API OCCURRENCES DES SÉRIES RÉCURRENTES
+# =============================================================================
+
+def _exception_occurrence(request, user, serie, date_occurrence, materialiser):
+    """
+    POST : enregistre l'occurrence comme exception (ligne réelle, à modifier
+    ensuite par les API habituelles) ; DELETE : annule cette seule occurrence.
+    """
+    jour = parse_date(date_occurrence)
+    if jour is None or not RecurrenceService.est_occurrence(serie, jour):
+        return JsonResponse({'success': False, 'error': "Date hors de la série"}, status=400)
+
+    if request.method == 'DELETE' and not user_is_admin(user) and serie.createur != user:
+        return JsonResponse({'success': False, 'error': 'Non autorisé'}, status=403)
+
+    occurrence, creee = materialiser(serie, jour)
+    if creee:
+        log_action(request, occurrence, 'creation', {'serie': str(serie.id), 'date_occurrence': jour.isoformat()})
+
+    if request.method == 'DELETE':
+        champ_actif = 'est_actif' if isinstance(occurrence, RendezVous) else 'est_active'
+        setattr(occurrence, champ_actif, False)
+        occurrence.save()
+        log_action(request, occurrence, 'annulation')
+        return JsonResponse({'success': True, 'message': 'Occurrence annulée'})
+
+    return JsonResponse({
+        'success': True,
+        'data': {'id': str(occurrence.id), 'serie_id': str(serie.id), 'date_occurrence': jour.isoformat()},
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST", "DELETE"])
+def api_occurrence_rdv(request, rdv_id, date_occurrence):
+    """
+    Exception sur une occurrence d'un RDV récurrent (la série est inchangée)
+    POST: retourne l'id du RDV réel de l'occurrence ; DELETE: annule l'occurrence
+    """
+    try:
+        user = get_user_from_request(request)
+        if not user:
+            return JsonResponse({'success': False, 'error': 'Non authentifié'}, status=401)
+
+        series = filter_by_user_permissions(
+            RendezVous.objects.filter(est_actif=True, rdv_parent__isnull=True), user, 'rdv'
+        )
+        serie = series.filter(id=rdv_id).first()
+        if serie is None:
+            return JsonResponse({'success': False, 'error': 'Rendez-vous introuvable'}, status=404)
+
+        return _exception_occurrence(request, user, serie, date_occurrence, RecurrenceService.materialiser_rdv)
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST", "DELETE"])
+def api_occurrence_tache(request, tache_id, date_occurrence):
+    """
+    Exception sur une occurrence d'une tâche récurrente (la série est inchangée)
+    POST: retourne l'id de la tâche réelle de l'occurrence ; DELETE: annule l'occurrence
+    """
+    try:
+        user = get_user_from_request(request)
+        if not user:
+            return JsonResponse({'success': False, 'error': 'Non authentifié'}, status=401)
+
+        series = filter_by_user_permissions(
+            Tache.objects.filter(est_active=True, tache_parent__isnull=True), user, 'tache'
+        )
+        serie = series.filter(id=tache_id).first()
+        if serie is None:
+            return JsonResponse({'success': False, 'error': 'Tâche introuvable'}, status=404)
+
+        return _exception_occurrence(request, user, serie, date_occurrence, RecurrenceService.materialiser_tache)
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# =============================================================================
+# API SYNCHRONISATION (DELTA ET ABONNEMENT ICS)
+# =============================================================================
+
+def _reponse_conditionnelle(request, etag, construire):
+    """Réponse 304 si le client a déjà cette version (If-None-Match), sinon construire()"""
+    etag = quote_etag(etag)
+    reponse = get_conditional_response(request, etag=etag)
+    if reponse is None:
+        reponse = construire()
+    reponse['ETag'] = etag
+    patch_cache_control(reponse, private=True, no_cache=True)
+    return reponse
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_synchronisation(request):
+    """
+    RDV et tâches modifiés ou supprimés depuis un jeton de changement
+    GET params: depuis (jeton de la réponse précédente, absent = état complet),
+                date_debut, date_fin (état complet uniquement)
+    ETag / If-None-Match : 304 tant que rien n'a changé pour ce jeton
+    (le client garde alors son jeton, qui reste valable).
+    """
+    try:
+        user = get_user_from_request(request)
+        if not user:
+            return JsonResponse({'success': False, 'error': 'Non authentifié'}, status=401)
+
+        jeton = request.GET.get('depuis')
+        date_debut = request.GET.get('date_debut')
+        date_fin = request.GET.get('date_fin')
+        depuis = None
+        if jeton:
+            try:
+                depuis = SynchronisationService.decoder_jeton(jeton)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+            if SynchronisationService.jeton_expire(depuis):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Jeton expiré : resynchronisation complète nécessaire',
+                    'resynchroniser': True,
+                }, status=410)
+
+        rdvs = filter_by_user_permissions(RendezVous.objects.all(), user, 'rdv')
+        taches = filter_by_user_permissions(Tache.objects.filter(tache_parente__isnull=True), user, 'tache')
+        if depuis is None:
+            if date_debut:
+                rdvs = rdvs.filter(date_debut__gte=date_debut)
+                taches = taches.filter(date_echeance__gte=date_debut)
+            if date_fin:
+                rdvs = rdvs.filter(date_fin__lte=date_fin)
+                taches = taches.filter(date_echeance__lte=date_fin)
+
+        delta = SynchronisationService.delta(rdvs, taches, user, depuis)
+
+        def construire():
+            return JsonResponse({
+                'success': True,
+                'jeton': delta.jeton,
+                'complet': depuis is None,
+                'rendez_vous': [
+                    serialiser_rdv(rdv)
+                    for rdv in delta.rendez_vous.select_related('createur').prefetch_related(
+                        'collaborateurs_assignes', 'dossiers', 'participants_externes'
+                    )
+                ] if delta.empreintes_rdv else [],
+                'taches': [
+                    serialiser_tache(tache)
+                    for tache in delta.taches.avec_progression().select_related(
+                        'createur', 'responsable', 'dossier'
+                    ).prefetch_related('etiquettes')
+                ] if delta.empreintes_taches else [],
+                'supprimes': {
+                    'rendez_vous': [str(i) for i in delta.rdv_supprimes],
+                    'taches': [str(i) for i in delta.taches_supprimees],
+                },
+            })
+
+        return _reponse_conditionnelle(
+            request, delta.etag(user.pk, jeton, date_debut, date_fin), construire
+        )
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_lien_ics(request):
+    """
+    Lien d'abonnement ICS (agenda personnel)
+    GET params: collaborateur (admin/huissier : agenda d'un collaborateur)
+    """
+    try:
+        user = get_user_from_request(request)
+        if not user:
+            return JsonResponse({'success': False, 'error': 'Non authentifié'}, status=401)
+
+        collaborateur_id = request.GET.get('collaborateur')
+        if collaborateur_id:
+            if not user_is_admin(user):
+                return JsonResponse({'success': False, 'error': 'Non autorisé'}, status=403)
+            from gestion.models import Collaborateur
+            collaborateur = Collaborateur.objects.filter(id=collaborateur_id, actif=True).first()
+            if collaborateur is None:
+                return JsonResponse({'success': False, 'error': 'Collaborateur introuvable'}, status=404)
+            jeton = SynchronisationService.jeton_ics(collaborateur=collaborateur)
+        else:
+            jeton = SynchronisationService.jeton_ics(utilisateur=user)
+
+        return JsonResponse({
+            'success': True,
+            'url': request.build_absolute_uri(reverse('agenda:agenda_ics', args=[jeton])),
+        })
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def agenda_ics(request, jeton):
+    """
+    Abonnement ICS (lien secret, sans session) : RDV et tâches de la
+    fenêtre AGENDA_ICS_JOURS_PASSES / AGENDA_ICS_JOURS_FUTURS.
+    ETag / If-None-Match : 304 tant qu'aucun élément de la fenêtre n'a changé.
+    """
+    abonnement = SynchronisationService.abonnement_ics(jeton)
+    if abonnement is None:
+        raise Http404("Abonnement introuvable")
+
+    def construire():
+        reponse = HttpResponse(
+            SynchronisationService.calendrier_ics(abonnement),
+            content_type='text/calendar; charset=utf-8',
+        )
+        reponse['Content-Disposition'] = 'inline; filename="agenda.ics"'
+        return reponse
+
+    return _reponse_conditionnelle(
+        request, SynchronisationService.etag_ics(abonnement), construire
+    )
@@ -0,0 +1,273 @@
+"""
+Channel layer multi-processus sans service externe, sur SQLite (WAL).
+
+InMemoryChannelLayer ne fonctionne que dans un seul processus : avec
+plusieurs workers ASGI, un group_send vers chatbot_user_<id> émis par un
+processus n'atteint pas l'utilisateur connecté à un autre. Cette couche
+partage messages et groupes entre les processus d'une même machine via
+un fichier SQLite en mode WAL :
+
+- send() : un INSERT (refusé si la capacité du canal est atteinte) ;
+- group_send() : un seul INSERT ... SELECT sur les membres du groupe,
+  quel que soit leur nombre ;
+- réception : une tâche de relève par processus surveille
+  PRAGMA data_version (lecture en mémoire partagée, sans accès à la
+  table) et, à chaque changement, récupère d'un seul DELETE ... RETURNING
+  les messages des canaux qui ont une file dans le processus. L'intervalle
+  de relève double à chaque tour sans changement, jusqu'à
+  intervalle_releve_max, et revient au minimum dès qu'un message arrive. Les
+  messages d'un canal sans file (receive() annulé, pas encore relancé)
+  restent dans la table jusqu'à la prochaine réception ou leur expiration ;
+- toutes les requêtes passent par un thread dédié : la boucle
+  d'événements n'attend jamais le verrou SQLite.
+
+Les messages sont sérialisés en JSON (dictionnaires de types simples).
+
+Configuration (settings.CHANNEL_LAYERS) :
+
+    "BACKEND": "chatbot.channel_layers.SQLiteChannelLayer",
+    "CONFIG": {"chemin": BASE_DIR / "channels.sqlite3"},
+
+Pour plusieurs machines, utiliser channels_redis (voir settings.py).
+"""
+
+import asyncio
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    processus TEXT NOT NULL,
+    canal TEXT NOT NULL,
+    expiration REAL NOT NULL,
+    contenu TEXT NOT NULL
+);
+DROP INDEX IF EXISTS messages_processus;
+CREATE INDEX IF NOT EXISTS messages_canal ON messages (canal, expiration);
+CREATE TABLE IF NOT EXISTS groupes (
+    groupe TEXT NOT NULL,
+    canal TEXT NOT NULL,
+    expiration REAL NOT NULL,
+    PRIMARY KEY (groupe, canal)
+);
+CREATE INDEX IF NOT EXISTS groupes_canal ON groupes (canal);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """Channel layer partagé entre les processus d'une machine."""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, chemin=None, expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, intervalle_releve=0.01, intervalle_releve_max=0.25, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.chemin = str(chemin or settings.BASE_DIR / 'channels.sqlite3')
+        self.group_expiry = group_expiry
+        self.intervalle_releve = intervalle_releve
+        self.intervalle_releve_max = intervalle_releve_max
+
+        # Partie non locale des canaux spécifiques créés par ce processus
+        self.processus = f"{uuid.uuid4().hex[:16]}!"
+
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='channels-sqlite')
+        self._connexion = None
+        self._files = {}
+        self._releve = None
+        self._nouvelle_file = False
+        self._ecriture_locale = threading.Event()
+        self._prochain_nettoyage = 0
+
+    # Accès SQLite (thread dédié uniquement)
+
+    def _get_connexion(self):
+        if self._connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=10, isolation_level=None)
+            connexion.execute('PRAGMA journal_mode=WAL')
+            connexion.execute('PRAGMA synchronous=NORMAL')
+            connexion.executescript(SCHEMA)
+            self._connexion = connexion
+        return self._connexion
+
+    async def _executer(self, fonction, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, fonction, *args)
+
+    def _inserer(self, canal, contenu, capacite):
+        maintenant = time.time()
+        curseur = self._get_connexion().execute(
+            "INSERT INTO messages (processus, canal, expiration, contenu) "
+            "SELECT ?, ?, ?, ? WHERE "
+            "(SELECT COUNT(*) FROM messages WHERE canal = ? AND expiration > ?) < ?",
+            (self.non_local_name(canal), canal, maintenant + self.expiry, contenu,
+             canal, maintenant, capacite),
+        )
+        self._ecriture_locale.set()
+        return curseur.rowcount
+
+    def _inserer_groupe(self, groupe, contenu):
+        maintenant = time.time()
+        # Les canaux pleins sont ignorés, comme avec les autres couches
+        curseur = self._get_connexion().execute(
+            "INSERT INTO messages (processus, canal, expiration, contenu) "
+            "SELECT CASE WHEN instr(g.canal, '!') THEN substr(g.canal, 1, instr(g.canal, '!')) "
+            "ELSE g.canal END, g.canal, ?, ? FROM groupes g "
+            "WHERE g.groupe = ? AND g.expiration > ? AND "
+            "(SELECT COUNT(*) FROM messages m WHERE m.canal = g.canal AND m.expiration > ?) < ?",
+            (maintenant + self.expiry, contenu, groupe, maintenant, maintenant, self.capacity),
+        )
+        self._ecriture_locale.set()
+        return curseur.rowcount
+
+    def _version(self):
+        version = self._get_connexion().execute('PRAGMA data_version').fetchone()[0]
+        # data_version ignore les écritures de la même connexion
+        if self._ecriture_locale.is_set():
+            self._ecriture_locale.clear()
+            return None
+        return version
+
+    def _relever(self, canaux):
+        """Récupère (et supprime) les messages des canaux écoutés par le processus."""
+        maintenant = time.time()
+        connexion = self._get_connexion()
+        marques = ', '.join('?' * len(canaux))
+        lignes = connexion.execute(
+            f"DELETE FROM messages WHERE canal IN ({marques}) "
+            "RETURNING id, canal, expiration, contenu",
+            tuple(canaux),
+        ).fetchall()
+
+        if maintenant > self._prochain_nettoyage:
+            self._prochain_nettoyage = maintenant + self.expiry
+            connexion.execute("DELETE FROM messages WHERE expiration < ?", (maintenant,))
+            connexion.execute("DELETE FROM groupes WHERE expiration < ?", (maintenant,))
+
+        lignes.sort()
+        return [(canal, contenu) for _id, canal, expiration, contenu in lignes if expiration > maintenant]
+
+    def _retirer(self, canal):
+        """Retire le premier message d'un canal non spécifique."""
+        ligne = self._get_connexion().execute(
+            "DELETE FROM messages WHERE id = ("
+            "SELECT id FROM messages WHERE canal = ? AND expiration > ? ORDER BY id LIMIT 1"
+            ") RETURNING contenu",
+            (canal, time.time()),
+        ).fetchone()
+        return ligne[0] if ligne else None
+
+    # API channel layer
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+
+        if not await self._executer(self._inserer, channel, json.dumps(message), self.get_capacity(channel)):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+
+        if "!" not in channel:
+            while True:
+                contenu = await self._executer(self._retirer, channel)
+                if contenu is not None:
+                    return json.loads(contenu)
+                await asyncio.sleep(self.intervalle_releve * 10)
+
+        file = self._files.get(channel)
+        if file is None:
+            # Messages arrivés pendant que le canal n'était pas écouté
+            file = self._files[channel] = asyncio.Queue()
+            self._nouvelle_file = True
+        self._demarrer_releve()
+        try:
+            return await file.get()
+        except asyncio.CancelledError:
+            # Consumer terminé : le canal n'est plus relevé, ses messages
+            # suivants restent dans la table (ceux déjà relevés dans la file)
+            if file.empty() and self._files.get(channel) is file:
+                del self._files[channel]
+            raise
+
+    async def new_channel(self, prefix="specific."):
+        canal = f"{prefix}{self.processus}{secrets.token_hex(6)}"
+        self._files.setdefault(canal, asyncio.Queue())
+        return canal
+
+    def _demarrer_releve(self):
+        boucle = asyncio.get_running_loop()
+        if self._releve is None or self._releve.done() or self._releve.get_loop() is not boucle:
+            self._releve = boucle.create_task(self._relever_en_continu())
+
+    async def _relever_en_continu(self):
+        derniere_version = -1
+        intervalle = self.intervalle_releve
+        while self._files:
+            version = await self._executer(self._version)
+            if version is None or version != derniere_version or self._nouvelle_file:
+                derniere_version = version
+                self._nouvelle_file = False
+                canaux = tuple(self._files)
+                messages = await self._executer(self._relever, canaux)
+                for canal, contenu in messages:
+                    # Seuls les canaux relevés sont supprimés de la table :
+                    # une file retirée entre-temps est recréée
+                    self._files.setdefault(canal, asyncio.Queue()).put_nowait(json.loads(contenu))
+                if messages:
+                    intervalle = self.intervalle_releve
+            else:
+                # Processus inactif : relève de plus en plus espacée
+                intervalle = min(intervalle * 2, self.intervalle_releve_max)
+            await asyncio.sleep(intervalle)
+
+    async def flush(self):
+        def vider():
+            connexion = self._get_connexion()
+            connexion.execute("DELETE FROM messages")
+            connexion.execute("DELETE FROM groupes")
+        await self._executer(vider)
+        self._files = {}
+
+    async def close(self):
+        if self._releve is not None:
+            self._releve.cancel()
+
+    # Groupes
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+
+        def ajouter():
+            self._get_connexion().execute(
+                "INSERT OR REPLACE INTO groupes (groupe, canal, expiration) VALUES (?, ?, ?)",
+                (group, channel, time.time() + self.group_expiry),
+            )
+        await self._executer(ajouter)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+
+        def retirer():
+            self._get_connexion().execute(
+                "DELETE FROM groupes WHERE groupe = ? AND canal = ?", (group, channel)
+            )
+        await self._executer(retirer)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        await self._executer(self._inserer_groupe, group, json.dumps(message))
@@ -1,111 +1,225 @@
 """
 Executeurs de commandes pour le chatbot.
 Section 18 DSTD v3.2 - Commandes pour tresorerie, comptabilite, dossiers, courriers.
+
+Chaque commande existe en deux versions qui partagent requetes et mise en
+forme :
+- synchrone (get_solde_tresorerie...), pour l'API REST ;
+- asynchrone (aget_solde_tresorerie...), pour le consumer WebSocket :
+  ORM asynchrone, et les commandes longues sont des generateurs qui
+  produisent la reponse par morceaux, envoyes au fil de l'eau.
 """
 
-from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Sum
 from django.utils import timezone
 
 
+def _erreur(message):
+    return {'success': False, 'message': message, 'data': {}}
+
+
+# =============================================================================
+# TRESORERIE
+# =============================================================================
+
+def _requete_solde_tresorerie():
+    from tresorerie.models import CompteBancaire
+    return CompteBancaire.objects.filter(statut='actif')
+
+
+def _resultat_solde(total):
+    total = total or 0
+    return {
+        'success': True,
+        'message': f"Solde total de tresorerie: {total:,.0f} FCFA".replace(',', ' '),
+        'data': {'solde_total': str(total)}
+    }
+
+
 def get_solde_tresorerie(utilisateur):
     """Recupere le solde de tresorerie."""
     try:
-        from tresorerie.models import CompteBancaire
-        comptes = CompteBancaire.objects.filter(actif=True)
-        total = sum(c.solde_actuel for c in comptes)
-        return {
-            'success': True,
-            'message': f"Solde total de tresorerie: {total:,.0f} FCFA".replace(',', ' '),
-            'data': {'solde_total': str(total)}
-        }
+        total = _requete_solde_tresorerie().aggregate(total=Sum('solde_actuel'))['total']
+        return _resultat_solde(total)
     except Exception as e:
-        return {
-            'success': False,
-            'message': f"Erreur lors de la recuperation du solde: {str(e)}",
-            'data': {}
-        }
+        return _erreur(f"Erreur lors de la recuperation du solde: {str(e)}")
 
 
-def get_programme_jour(utilisateur):
-    """Recupere le programme du jour."""
+async def aget_solde_tresorerie(utilisateur):
+    """Version asynchrone de get_solde_tresorerie."""
     try:
-        from agenda.models import RendezVous, Tache
-        aujourdhui = timezone.now().date()
-
-        rdvs = RendezVous.objects.filter(
-            date=aujourdhui,
-            utilisateur=utilisateur
-        ).order_by('heure_debut')
-
-        taches = Tache.objects.filter(
-            date_echeance=aujourdhui,
-            utilisateur=utilisateur,
-            terminee=False
-        )
+        total = (await _requete_solde_tresorerie().aaggregate(total=Sum('solde_actuel')))['total']
+        return _resultat_solde(total)
+    except Exception as e:
+        return _erreur(f"Erreur lors de la recuperation du solde: {str(e)}")
+
+
+# =============================================================================
+# AGENDA
+# =============================================================================
+
+def _requetes_programme(utilisateur, jour):
+    """Rendez-vous et taches du jour de l'utilisateur."""
+    from agenda.models import RendezVous, Tache, StatutRendezVous, StatutTache
+
+    # Une occurrence annulée est une exception inactive
+    rdvs = RendezVous.objects.filter(
+        Q(createur=utilisateur) | Q(collaborateurs_assignes__utilisateur=utilisateur),
+        est_actif=True,
+        date_debut__date=jour,
+    ).exclude(statut=StatutRendezVous.ANNULE).distinct().order_by('date_debut')
+
+    taches = Tache.objects.filter(
+        responsable=utilisateur,
+        est_active=True,
+        date_echeance=jour,
+    ).exclude(statut__in=[StatutTache.TERMINEE, StatutTache.ANNULEE])
+
+    return rdvs, taches
+
 
-        message = f"Programme du {aujourdhui.strftime('%d/%m/%Y')}:\n"
+def _occurrences_programme(utilisateur, jour):
+    """Occurrences calculées du jour des series de l'utilisateur (non enregistrees)."""
+    from agenda.models import RendezVous, Tache
+    from agenda.services import RecurrenceService
 
-        if rdvs.exists():
-            message += f"\n{rdvs.count()} rendez-vous:"
-            for rdv in rdvs[:5]:
-                message += f"\n- {rdv.heure_debut.strftime('%H:%M')}: {rdv.titre}"
-        else:
-            message += "\nAucun rendez-vous."
+    return (
+        RecurrenceService.occurrences_rdv(RendezVous.objects.visibles_par(utilisateur), jour, jour),
+        RecurrenceService.occurrences_taches(Tache.objects.filter(responsable=utilisateur), jour, jour),
+    )
 
-        if taches.exists():
-            message += f"\n\n{taches.count()} taches:"
-            for tache in taches[:5]:
-                message += f"\n- {tache.titre}"
-        else:
-            message += "\nAucune tache en cours."
 
+def _premiers_rdvs(rdvs, occurrences_rdv):
+    """Cinq premiers rendez-vous du jour, occurrences calculees comprises."""
+    return sorted([*rdvs, *occurrences_rdv], key=lambda rdv: rdv.date_debut)[:5]
+
+
+def _section_rdvs(rdvs, nombre):
+    if not nombre:
+        return "Aucun rendez-vous."
+    lignes = [f"{nombre} rendez-vous:"]
+    for rdv in rdvs:
+        lignes.append(f"- {timezone.localtime(rdv.date_debut).strftime('%H:%M')}: {rdv.titre}")
+    return "\n".join(lignes)
+
+
+def _section_taches(taches, nombre):
+    if not nombre:
+        return "Aucune tache en cours."
+    lignes = [f"{nombre} taches:"]
+    for tache in taches:
+        lignes.append(f"- {tache.titre}")
+    return "\n".join(lignes)
+
+
+def get_programme_jour(utilisateur):
+    """Recupere le programme du jour."""
+    try:
+        aujourdhui = timezone.localdate()
+        rdvs, taches = _requetes_programme(utilisateur, aujourdhui)
+        occurrences_rdv, occurrences_taches = _occurrences_programme(utilisateur, aujourdhui)
+        nb_rdvs = rdvs.count() + len(occurrences_rdv)
+        nb_taches = taches.count() + len(occurrences_taches)
+
+        message = "\n\n".join([
+            f"Programme du {aujourdhui.strftime('%d/%m/%Y')}:",
+            _section_rdvs(_premiers_rdvs(rdvs[:5], occurrences_rdv), nb_rdvs),
+            _section_taches([*taches[:5], *occurrences_taches][:5], nb_taches),
+        ])
         return {
             'success': True,
             'message': message,
-            'data': {
-                'rdvs': rdvs.count(),
-                'taches': taches.count()
-            }
+            'data': {'rdvs': nb_rdvs, 'taches': nb_taches}
         }
     except Exception as e:
+        return _erreur(f"Erreur: {str(e)}")
+
+
+async def aget_programme_jour(utilisateur):
+    """
+    Version asynchrone de get_programme_jour : produit l'en-tete, puis les
+    rendez-vous, puis les taches, chacun des qu'il est disponible.
+    """
+    try:
+        aujourdhui = timezone.localdate()
+        yield f"Programme du {aujourdhui.strftime('%d/%m/%Y')}:"
+
+        rdvs, taches = _requetes_programme(utilisateur, aujourdhui)
+        occurrences_rdv, occurrences_taches = await sync_to_async(_occurrences_programme)(
+            utilisateur, aujourdhui
+        )
+        yield _section_rdvs(
+            _premiers_rdvs([r async for r in rdvs[:5]], occurrences_rdv),
+            await rdvs.acount() + len(occurrences_rdv),
+        )
+        yield _section_taches(
+            ([t async for t in taches[:5]] + occurrences_taches)[:5],
+            await taches.acount() + len(occurrences_taches),
+        )
+    except Exception as e:
+        yield f"Erreur: {str(e)}"
+
+
+# =============================================================================
+# DOSSIERS
+# =============================================================================
+
+def _requete_recherche_dossier(terme):
+    from gestion.models import Dossier
+
+    return Dossier.objects.filter(
+        Q(reference__icontains=terme) |
+        Q(demandeurs__nom__icontains=terme) |
+        Q(demandeurs__denomination__icontains=terme) |
+        Q(defendeurs__nom__icontains=terme) |
+        Q(defendeurs__denomination__icontains=terme) |
+        Q(creancier__nom__icontains=terme)
+    ).distinct().prefetch_related('demandeurs', 'defendeurs')[:10]
+
+
+def _intitule_dossier(dossier):
+    """Equivalent de Dossier.get_intitule() sur les parties prechargees."""
+    demandeurs = list(dossier.demandeurs.all())
+    defendeurs = list(dossier.defendeurs.all())
+    if dossier.is_contentieux and demandeurs and defendeurs:
+        return f"{demandeurs[0].get_nom_complet()} C/ {defendeurs[0].get_nom_complet()}"
+    elif demandeurs:
+        return demandeurs[0].get_nom_complet()
+    return "Sans parties"
+
+
+def _resultat_recherche(terme, dossiers):
+    if not dossiers:
         return {
-            'success': False,
-            'message': f"Erreur: {str(e)}",
-            'data': {}
+            'success': True,
+            'message': f"Aucun dossier trouve pour '{terme}'.",
+            'data': {'resultats': []}
         }
 
+    message = f"Resultats pour '{terme}':"
+    for d in dossiers:
+        message += f"\n- {d.reference}: {_intitule_dossier(d)}"
+
+    return {
+        'success': True,
+        'message': message,
+        'data': {'resultats': [d.reference for d in dossiers]}
+    }
+
 
 def rechercher_dossier(terme, utilisateur):
     """Recherche un dossier."""
     try:
-        from gestion.models import Dossier
-        from django.db.models import Q
-
-        dossiers = Dossier.objects.filter(
-            Q(reference__icontains=terme) |
-            Q(debiteur__nom__icontains=terme) |
-            Q(creancier__nom__icontains=terme)
-        )[:10]
-
-        if not dossiers.exists():
-            return {
-                'success': True,
-                'message': f"Aucun dossier trouve pour '{terme}'.",
-                'data': {'resultats': []}
-            }
-
-        message = f"Resultats pour '{terme}':"
-        for d in dossiers:
-            message += f"\n- {d.reference}: {d.debiteur}"
+        return _resultat_recherche(terme, list(_requete_recherche_dossier(terme)))
+    except Exception as e:
+        return _erreur(f"Erreur: {str(e)}")
 
-        return {
-            'success': True,
-            'message': message,
-            'data': {'resultats': [d.reference for d in dossiers]}
-        }
+
+async def arechercher_dossier(terme, utilisateur):
+    """Version asynchrone de rechercher_dossier."""
+    try:
+        dossiers = [d async for d in _requete_recherche_dossier(terme)]
+        return _resultat_recherche(terme, dossiers)
     except Exception as e:
-        return {
-            'success': False,
-            'message': f"Erreur: {str(e)}",
-            'data': {}
-        }
+        return _erreur(f"Erreur: {str(e)}")
@@ -1,12 +1,43 @@
 """
 Consumer WebSocket pour le chatbot.
 Section 18 DSTD v3.2 - Exigence 1: "Interface WebSocket temps reel"
+
+Le traitement d'un message ne bloque pas la boucle d'evenements partagee
+par toutes les connexions du worker :
+- l'analyse NLP (CPU, sans base) tourne dans le pool de threads ;
+- les commandes de donnees utilisent l'ORM asynchrone (chatbot.commands) ;
+- la reponse est envoyee par morceaux ('reponse_partielle') au fil des
+  requetes, puis en entier ('reponse') ;
+- les messages sont enregistres par lots (bulk_create), au plus tard
+  CHATBOT_MESSAGES_DELAI_MAX secondes apres le premier message en attente
+  et a la deconnexion.
 """
 
+import asyncio
 import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from django.conf import settings
 from django.utils import timezone
+from gestion.services.permissions import oublier_permissions
+
+from . import commands
+from .models import Message, SessionConversation, TypeMessage
+from .nlp_processor import analyser_message
+from .permissions import verifier_permission_commande
+
+logger = logging.getLogger(__name__)
+
+# Analyse NLP hors de la boucle, sans passer par le thread unique de l'ORM
+analyser_message_async = sync_to_async(analyser_message, thread_sensitive=False)
+
+REPONSES_SIMPLES = {
+    'aide': "Je peux vous aider avec: la tresorerie, la comptabilite, les dossiers, les courriers et l'agenda. Que souhaitez-vous faire?",
+    'autre': "Je n'ai pas bien compris votre demande. Pouvez-vous reformuler?",
+}
 
 
 class ChatbotConsumer(AsyncWebsocketConsumer):
@@ -21,7 +52,9 @@ class ChatbotConsumer(AsyncWebsocketConsumer):
             return
 
         self.user_group_name = f"chatbot_user_{self.user.id}"
-        self.session_id = None
+        self.session = None
+        self.messages_en_attente = []
+        self.ecriture_programmee = None
 
         # Joindre le groupe utilisateur
         await self.channel_layer.group_add(
@@ -45,6 +78,8 @@ class ChatbotConsumer(AsyncWebsocketConsumer):
                 self.user_group_name,
                 self.channel_name
             )
+        if getattr(self, 'messages_en_attente', None):
+            await self.enregistrer_messages()
 
     async def receive(self, text_data):
         """Reception d'un message."""
@@ -61,8 +96,25 @@ class ChatbotConsumer(AsyncWebsocketConsumer):
             await self.send_error("Message vide")
             return
 
-        # Traiter le message
-        reponse = await self.traiter_message(contenu)
+        debut = time.monotonic()
+        analyse = await analyser_message_async(contenu, self.user)
+        await self.send(text_data=json.dumps({
+            'type': 'analyse',
+            'intention': analyse['intention'],
+            'confiance': analyse['confiance'],
+            'entites': analyse['entites'],
+        }))
+
+        # Traiter le message en envoyant chaque morceau des qu'il est pret
+        morceaux = []
+        type_reponse = TypeMessage.ASSISTANT
+        async for morceau, type_reponse in self.traiter_message(analyse):
+            morceaux.append(morceau)
+            await self.send(text_data=json.dumps({
+                'type': 'reponse_partielle',
+                'message': morceau,
+            }))
+        reponse = "\n\n".join(morceaux)
 
         await self.send(text_data=json.dumps({
             'type': 'reponse',
@@ -70,28 +122,92 @@ class ChatbotConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
 
-    async def traiter_message(self, contenu):
-        """Traite un message et retourne une reponse."""
-        from .nlp_processor import analyser_message
-        from .permissions import verifier_permission_commande
+        await self.memoriser_echange(contenu, analyse, reponse, type_reponse, debut)
 
-        # Analyser le message
-        analyse = analyser_message(contenu, self.user)
+    async def traiter_message(self, analyse):
+        """
+        Traite un message analyse. Generateur de (morceau de reponse,
+        type de message).
+        """
         intention = analyse.get('intention', 'autre')
 
-        # Verifier les permissions RBAC
-        if not await database_sync_to_async(verifier_permission_commande)(intention, self.user):
-            return "Desole, vous n'avez pas les permissions necessaires pour cette action."
+        # Verifier les permissions RBAC via le resolveur de droits (sans requete
+        # si le cache est chaud). La memorisation sur l'utilisateur est effacee
+        # a chaque message : la connexion dure, les droits peuvent changer.
+        oublier_permissions(self.user)
+        autorise = await sync_to_async(verifier_permission_commande)(intention, self.user)
+        if not autorise:
+            yield "Desole, vous n'avez pas les permissions necessaires pour cette action.", TypeMessage.ERREUR
+            return
 
-        # Reponses simples basees sur l'intention
-        reponses = {
-            'aide': "Je peux vous aider avec: la tresorerie, la comptabilite, les dossiers, les courriers et l'agenda. Que souhaitez-vous faire?",
-            'tresorerie_solde': "Pour consulter le solde de tresorerie, veuillez acceder au module Tresorerie.",
-            'agenda_aujourdhui': "Pour voir votre programme du jour, consultez le module Agenda.",
-            'autre': "Je n'ai pas bien compris votre demande. Pouvez-vous reformuler?",
-        }
+        if intention == 'tresorerie_solde':
+            resultat = await commands.aget_solde_tresorerie(self.user)
+            yield resultat['message'], TypeMessage.ASSISTANT
+
+        elif intention == 'agenda_aujourdhui':
+            async for morceau in commands.aget_programme_jour(self.user):
+                yield morceau, TypeMessage.ASSISTANT
+
+        elif intention == 'dossier_recherche':
+            terme = analyse.get('entites', {}).get('terme_recherche', '')
+            if terme:
+                resultat = await commands.arechercher_dossier(terme, self.user)
+                yield resultat['message'], TypeMessage.ASSISTANT
+            else:
+                yield "Que recherchez-vous? Donnez-moi une reference ou un nom.", TypeMessage.ASSISTANT
+
+        else:
+            yield REPONSES_SIMPLES.get(intention, REPONSES_SIMPLES['autre']), TypeMessage.ASSISTANT
+
+    async def memoriser_echange(self, contenu, analyse, reponse, type_reponse, debut):
+        """Met le message et sa reponse en attente d'enregistrement."""
+        if self.session is None:
+            self.session = await SessionConversation.objects.acreate(
+                utilisateur=self.user,
+                canal='websocket',
+                titre=contenu[:255],
+            )
 
-        return reponses.get(intention, reponses['autre'])
+        self.messages_en_attente.extend([
+            Message(
+                session=self.session,
+                type_message=TypeMessage.UTILISATEUR,
+                contenu=contenu,
+                intention_detectee=analyse.get('intention'),
+                entites_extraites=analyse.get('entites', {}),
+                confiance_intention=analyse.get('confiance'),
+            ),
+            Message(
+                session=self.session,
+                type_message=type_reponse,
+                contenu=reponse,
+                temps_traitement_ms=int((time.monotonic() - debut) * 1000),
+            ),
+        ])
+
+        if len(self.messages_en_attente) >= getattr(settings, 'CHATBOT_MESSAGES_TAILLE_LOT', 20):
+            await self.enregistrer_messages()
+        elif self.ecriture_programmee is None:
+            self.ecriture_programmee = asyncio.create_task(self.enregistrer_plus_tard())
+
+    async def enregistrer_plus_tard(self):
+        await asyncio.sleep(getattr(settings, 'CHATBOT_MESSAGES_DELAI_MAX', 5))
+        self.ecriture_programmee = None
+        await self.enregistrer_messages()
+
+    async def enregistrer_messages(self):
+        """Ecrit les messages en attente en un seul bulk_create."""
+        if self.ecriture_programmee is not None and self.ecriture_programmee is not asyncio.current_task():
+            self.ecriture_programmee.cancel()
+        self.ecriture_programmee = None
+
+        messages, self.messages_en_attente = self.messages_en_attente, []
+        if not messages:
+            return
+        try:
+            await Message.objects.abulk_create(messages)
+        except Exception:
+            logger.exception("Enregistrement de %d message(s) du chatbot impossible", len(messages))
 
     async def send_error(self, message):
         """Envoie un message d'erreur."""
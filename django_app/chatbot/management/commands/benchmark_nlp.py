@@ -0,0 +1,129 @@
+"""
+Commande de gestion pour mesurer le temps d'analyse NLP du chatbot
+
+Utilisation: python manage.py benchmark_nlp [--iterations N] [--seuil-us US]
+
+Analyse un corpus de commandes réelles en français (avec accents, fautes
+et montants) et affiche le temps moyen par message pour la détection
+d'intention, l'extraction d'entités et l'analyse complète. Échoue si
+l'analyse complète dépasse le seuil (par défaut 1 ms par message).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import nlp_processor
+
+
+CORPUS = [
+    "Quel est le solde de la caisse ?",
+    "Combien on a en banque aujourd'hui",
+    "Voir la trésorerie",
+    "Situation de la trésorerie au 31/12/2024",
+    "Encaisser 150 000 FCFA pour le dossier 2024/125",
+    "Faire une sortie de caisse de 25 000 F CFA",
+    "Nouveau mouvement de banque de 1 250 000 francs",
+    "Alerte trésorerie caisse principale",
+    "Passer une écriture comptable de 75 000 FCFA au compte 571000",
+    "Créer une nouvelle écriture",
+    "Solde du compte 411000",
+    "Consulter le compte 401",
+    "Générer la balance générale",
+    "Afficher le grand livre du compte 521",
+    "Rechercher le dossier de KOFFI Mathieu",
+    "Où est le dossier 125/2024 ?",
+    "Statut du dossier 2024-087",
+    "Où en est le dossier de la société SOBEBRA",
+    "Créer un nouveau dossier pour ECOBANK",
+    "Nouvelle affaire client BOA",
+    "Enregistrer un encaissement de 500 000 FCFA sur le dossier 2025/012",
+    "Le débiteur a payé 200000 xof hier",
+    "Règlement reçu de monsieur DOSSOU",
+    "Rédiger une mise en demeure pour le dossier 2024/310",
+    "Générer un commandement de payer",
+    "Liste des courriers en attente",
+    "Historique des courriers envoyés",
+    "Envoyer le courrier à maître AHO",
+    "Prendre un rendez-vous avec madame ADJOVI demain",
+    "Fixer un rdv le 15/03/2025",
+    "Ajouter une tâche pour vendredi",
+    "Rappel pour la signification après-demain",
+    "Qu'est-ce que j'ai aujourd'hui ?",
+    "Mes rendez-vous d'aujourd'hui",
+    "Générer un rapport du mois",
+    "Statistiques sur les encaissements",
+    "Bilan mensuel",
+    "Aller à la page des factures",
+    "Montre-moi les dossiers urgents",
+    "Aide",
+    "Qu'est-ce que tu peux faire ?",
+    "Commandes disponibles",
+    "Facturer le client SOGEMA pour 350 000 FCFA",
+    "Je ne veux pas de relance",
+    "Bonjour",
+]
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps d'analyse NLP du chatbot sur un corpus de commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Nombre de passages sur le corpus',
+        )
+        parser.add_argument(
+            '--seuil-us',
+            type=float,
+            default=1000,
+            help="Temps maximal d'analyse complète par message (microsecondes)",
+        )
+        parser.add_argument(
+            '--details',
+            action='store_true',
+            help='Affiche l\'intention et les entités détectées pour chaque message',
+        )
+
+    def mesurer(self, fonction, iterations):
+        debut = time.perf_counter()
+        for _ in range(iterations):
+            for message in CORPUS:
+                fonction(message)
+        duree = time.perf_counter() - debut
+        return duree / (iterations * len(CORPUS)) * 1e6
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        if options['details']:
+            for message in CORPUS:
+                analyse = nlp_processor.analyser_message(message)
+                self.stdout.write(
+                    f"{message!r:75} {analyse['intention']:22} "
+                    f"{analyse['confiance']:.2f} {analyse['entites']}"
+                )
+
+        mesures = [
+            ('normalisation', lambda m: nlp_processor.corriger_orthographe_commune(
+                nlp_processor.normaliser_texte(m))),
+            ('intention', nlp_processor.detecter_intention),
+            ('entites', lambda m: nlp_processor.extraire_toutes_entites(
+                nlp_processor.normaliser_texte(m))),
+            ('analyse complete', nlp_processor.analyser_message),
+        ]
+
+        self.stdout.write(f"{len(CORPUS)} messages x {iterations} passages")
+        resultats = {}
+        for nom, fonction in mesures:
+            resultats[nom] = self.mesurer(fonction, iterations)
+            self.stdout.write(f"{nom:18} {resultats[nom]:8.1f} µs/message")
+
+        if resultats['analyse complete'] > options['seuil_us']:
+            raise CommandError(
+                f"Analyse trop lente : {resultats['analyse complete']:.1f} µs/message "
+                f"(seuil {options['seuil_us']:.0f} µs)"
+            )
+        self.stdout.write(self.style.SUCCESS('Analyse NLP sous le seuil'))
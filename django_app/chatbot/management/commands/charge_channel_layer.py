@@ -0,0 +1,114 @@
+"""
+Commande de gestion pour mesurer la diffusion de la channel layer entre processus
+
+Utilisation: python manage.py charge_channel_layer [--workers N] [--clients C] [--messages M]
+
+Lance N processus « workers », chacun avec C canaux abonnés au même groupe
+(comme C utilisateurs connectés par worker), puis envoie M group_send depuis
+le processus principal. Affiche le débit de remise (messages reçus par
+seconde, tous workers confondus) et le nombre de messages perdus.
+
+Utilise la couche configurée dans CHANNEL_LAYERS (SQLite ou Redis).
+"""
+
+import asyncio
+import multiprocessing
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels import DEFAULT_CHANNEL_LAYER
+from channels.layers import channel_layers
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _worker(groupe, nb_clients, nb_messages, delai, pret, resultats):
+    """Processus abonné : reçoit les messages du groupe sur chacun de ses canaux."""
+
+    async def executer():
+        couche = channel_layers.make_backend(DEFAULT_CHANNEL_LAYER)
+        canaux = [await couche.new_channel() for _ in range(nb_clients)]
+        for canal in canaux:
+            await couche.group_add(groupe, canal)
+        pret.put(True)
+
+        recus = 0
+
+        async def client(canal):
+            nonlocal recus
+            for _ in range(nb_messages):
+                await couche.receive(canal)
+                recus += 1
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*map(client, canaux)), delai)
+        except asyncio.TimeoutError:
+            pass
+        fin = time.perf_counter()
+
+        for canal in canaux:
+            await couche.group_discard(groupe, canal)
+        await couche.close()
+        resultats.put((recus, fin))
+
+    asyncio.run(executer())
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de diffusion de groupe de la channel layer sur plusieurs processus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Nombre de processus abonnés')
+        parser.add_argument('--clients', type=int, default=25, help='Canaux abonnés par processus')
+        parser.add_argument(
+            '--messages', type=int, default=50,
+            help='Nombre de group_send (au plus la capacité des canaux)',
+        )
+        parser.add_argument('--delai', type=float, default=60, help='Délai maximal de réception (secondes)')
+
+    def handle(self, *args, **options):
+        nb_workers = options['workers']
+        nb_clients = options['clients']
+        nb_messages = options['messages']
+        groupe = f"charge_{uuid.uuid4().hex[:12]}"
+
+        contexte = multiprocessing.get_context('spawn')
+        pret = contexte.Queue()
+        resultats = contexte.Queue()
+        processus = [
+            contexte.Process(
+                target=_worker,
+                args=(groupe, nb_clients, nb_messages, options['delai'], pret, resultats),
+            )
+            for _ in range(nb_workers)
+        ]
+        for p in processus:
+            p.start()
+        for _ in processus:
+            pret.get(timeout=60)
+
+        couche = channel_layers.make_backend(DEFAULT_CHANNEL_LAYER)
+        debut = time.perf_counter()
+        for numero in range(nb_messages):
+            async_to_sync(couche.group_send)(groupe, {'type': 'charge.message', 'numero': numero})
+        duree_envoi = time.perf_counter() - debut
+
+        bilans = [resultats.get(timeout=options['delai'] + 30) for _ in processus]
+        for p in processus:
+            p.join()
+
+        attendus = nb_workers * nb_clients * nb_messages
+        recus = sum(recu for recu, _fin in bilans)
+        duree = max(fin for _recu, fin in bilans) - debut
+
+        self.stdout.write(
+            f"{nb_workers} workers x {nb_clients} canaux, {nb_messages} group_send "
+            f"({type(couche).__name__})"
+        )
+        self.stdout.write(f"Envoi        : {duree_envoi * 1000:.0f} ms ({nb_messages / duree_envoi:.0f} group_send/s)")
+        self.stdout.write(f"Remise       : {recus}/{attendus} messages en {duree * 1000:.0f} ms")
+        self.stdout.write(f"Débit        : {recus / duree:.0f} messages remis/s")
+
+        if recus < attendus:
+            raise CommandError(f"{attendus - recus} message(s) non remis")
+        self.stdout.write(self.style.SUCCESS('Diffusion complète sur tous les workers'))
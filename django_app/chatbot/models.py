@@ -15,7 +15,7 @@ Fonctionnalités:
 
 import uuid
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -273,9 +273,14 @@ class SessionConversation(models.Model):
     @classmethod
     def nettoyer_sessions_expirees(cls):
         """Supprime les sessions expirées (à appeler via cron/celery)"""
+        from gestion.services import archivage
+
         sessions_expirees = cls.objects.filter(date_expiration__lt=timezone.now())
         count = sessions_expirees.count()
-        sessions_expirees.delete()
+        with transaction.atomic():
+            # La cascade de l'ORM ne couvre pas les messages déjà archivés
+            archivage.supprimer('messages_chatbot', session__in=sessions_expirees)
+            sessions_expirees.delete()
         return count
 
 
@@ -155,6 +155,27 @@ PATTERNS_INTENTIONS = {
 }
 
 
+def _compiler_intentions(patterns_intentions):
+    """
+    Compile les patterns une fois pour toutes.
+
+    Pour chaque intention : une alternance de tous ses patterns, qui sert de
+    pre-filtre (une seule recherche ecarte l'intention), puis les patterns
+    individuels pour le score, evalues seulement si le pre-filtre correspond.
+    """
+    return [
+        (
+            intention,
+            re.compile('|'.join(f'(?:{p})' for p in patterns)),
+            [re.compile(p) for p in patterns],
+        )
+        for intention, patterns in patterns_intentions.items()
+    ]
+
+
+INTENTIONS_COMPILEES = _compiler_intentions(PATTERNS_INTENTIONS)
+
+
 # =============================================================================
 # PATTERNS D'EXTRACTION D'ENTITES
 # =============================================================================
@@ -185,6 +206,7 @@ DATES_RELATIVES = {
     "aujourdhui": 0,
     "demain": 1,
     "apres-demain": 2,
+    "après-demain": 2,
     "hier": -1,
     "avant-hier": -2,
 }
@@ -195,11 +217,59 @@ JOURS_SEMAINE = {
     'vendredi': 4, 'samedi': 5, 'dimanche': 6
 }
 
+# Mots entiers, les plus longs d'abord ("apres-demain" avant "demain")
+# Les entites sont extraites du texte avec ses accents (noms des parties)
+PATTERN_DATE_RELATIVE = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, DATES_RELATIVES), key=len, reverse=True)) + r')\b'
+)
+PATTERN_JOUR_SEMAINE = re.compile(r'\b(' + '|'.join(JOURS_SEMAINE) + r')\b')
+
+# Nom de partie apres certains mots-cles
+PATTERNS_NOM_PARTIE = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'dossier\s+(?:de|du|pour)\s+(\w+(?:\s+\w+)?)',
+        r'client\s+(\w+(?:\s+\w+)?)',
+        r'(?:monsieur|madame|m\.|mme)\s+(\w+(?:\s+\w+)?)',
+        r'soci[eé]t[eé]\s+(\w+(?:\s+\w+)?)',
+    )
+]
+
+# Mots communs qui ne sont pas des noms
+MOTS_EXCLUS_NOM = frozenset({'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de'})
+
+PATTERN_NEGATION = re.compile(
+    r'\bne\b.*\bpas\b|\bne\b.*\bplus\b|\bne\b.*\bjamais\b|\bnon\b'
+    r'|\bpas\s+de\b|\baucun|\bsans\b'
+)
+
 
 # =============================================================================
 # NORMALISATION DU TEXTE
 # =============================================================================
 
+# Les patterns sont ecrits sans accents : le texte est ramene a l'ASCII
+TABLE_SANS_ACCENTS = str.maketrans({
+    'à': 'a', 'â': 'a', 'ä': 'a', 'ç': 'c', 'é': 'e', 'è': 'e', 'ê': 'e',
+    'ë': 'e', 'î': 'i', 'ï': 'i', 'ô': 'o', 'ö': 'o', 'ù': 'u', 'û': 'u',
+    'ü': 'u', 'ÿ': 'y', 'œ': 'oe', 'æ': 'ae',
+})
+
+CORRECTIONS_ORTHOGRAPHE = {
+    'encaissment': 'encaissement',
+    'factur': 'facture',
+    'solde compte': 'solde du compte',
+}
+
+# Une seule passe pour toutes les corrections (mots entiers)
+PATTERN_CORRECTIONS = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, CORRECTIONS_ORTHOGRAPHE)) + r')\b'
+)
+
+PATTERN_APOSTROPHES = re.compile(r"[\u2018\u2019`]")
+PATTERN_PONCTUATION = re.compile(r"[^\w\s'\-/]")
+PATTERN_ESPACES = re.compile(r'\s+')
+
+
 def normaliser_texte(texte):
     """
     Normalise le texte francais pour l'analyse.
@@ -214,38 +284,21 @@ def normaliser_texte(texte):
     texte = texte.lower()
 
     # Normaliser les apostrophes
-    texte = re.sub(r"['`]", "'", texte)
+    texte = PATTERN_APOSTROPHES.sub("'", texte)
 
     # Remplacer la ponctuation par des espaces (sauf apostrophes)
-    texte = re.sub(r"[^\w\s'\-/]", ' ', texte)
+    texte = PATTERN_PONCTUATION.sub(' ', texte)
 
     # Normaliser les espaces multiples
-    texte = re.sub(r'\s+', ' ', texte).strip()
+    texte = PATTERN_ESPACES.sub(' ', texte).strip()
 
     return texte
 
 
 def corriger_orthographe_commune(texte):
-    """Corrige les erreurs d'orthographe courantes en francais."""
-    corrections = {
-        'tresorerie': 'tresorerie',
-        'ecrit': 'ecrit',
-        'ecriture': 'ecriture',
-        'comptabilite': 'comptabilite',
-        'creance': 'creance',
-        'creancier': 'creancier',
-        'debiteur': 'debiteur',
-        'regle': 'regle',
-        'reglement': 'reglement',
-        'factur': 'facture',
-        'encaissment': 'encaissement',
-        'solde compte': 'solde du compte',
-    }
-
-    for erreur, correction in corrections.items():
-        texte = texte.replace(erreur, correction)
-
-    return texte
+    """Corrige les erreurs d'orthographe courantes en francais (accents compris)."""
+    texte = texte.translate(TABLE_SANS_ACCENTS)
+    return PATTERN_CORRECTIONS.sub(lambda m: CORRECTIONS_ORTHOGRAPHE[m.group(0)], texte)
 
 
 # =============================================================================
@@ -305,19 +358,19 @@ def extraire_date(texte):
     texte_lower = texte.lower()
 
     # Dates relatives
-    for mot, delta in DATES_RELATIVES.items():
-        if mot in texte_lower:
-            return (timezone.now() + timedelta(days=delta)).date()
+    match = PATTERN_DATE_RELATIVE.search(texte_lower)
+    if match:
+        return (timezone.now() + timedelta(days=DATES_RELATIVES[match.group(1)])).date()
 
     # Jours de la semaine
-    for jour, num_jour in JOURS_SEMAINE.items():
-        if jour in texte_lower:
-            aujourdhui = timezone.now().date()
-            jour_actuel = aujourdhui.weekday()
-            delta = (num_jour - jour_actuel) % 7
-            if delta == 0:
-                delta = 7  # Prochain occurrence
-            return aujourdhui + timedelta(days=delta)
+    match = PATTERN_JOUR_SEMAINE.search(texte_lower)
+    if match:
+        aujourdhui = timezone.now().date()
+        jour_actuel = aujourdhui.weekday()
+        delta = (JOURS_SEMAINE[match.group(1)] - jour_actuel) % 7
+        if delta == 0:
+            delta = 7  # Prochain occurrence
+        return aujourdhui + timedelta(days=delta)
 
     # Date absolue (format francais: JJ/MM/AAAA)
     match = PATTERN_DATE_FR.search(texte)
@@ -343,21 +396,11 @@ def extraire_nom_partie(texte):
     Tente d'extraire un nom de partie du texte.
     Retourne une string ou None.
     """
-    # Patterns pour detecter un nom apres certains mots-cles
-    patterns = [
-        r'dossier\s+(?:de|du|pour)\s+(\w+(?:\s+\w+)?)',
-        r'client\s+(\w+(?:\s+\w+)?)',
-        r'(?:monsieur|madame|m\.|mme)\s+(\w+(?:\s+\w+)?)',
-        r'societe\s+(\w+(?:\s+\w+)?)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, texte, re.IGNORECASE)
+    for pattern in PATTERNS_NOM_PARTIE:
+        match = pattern.search(texte)
         if match:
             nom = match.group(1).strip()
-            # Filtrer les mots communs qui ne sont pas des noms
-            mots_exclus = {'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de'}
-            if nom.lower() not in mots_exclus and len(nom) > 1:
+            if nom.lower() not in MOTS_EXCLUS_NOM and len(nom) > 1:
                 return nom
 
     return None
@@ -366,6 +409,8 @@ def extraire_nom_partie(texte):
 def extraire_toutes_entites(texte):
     """
     Extrait toutes les entites detectables du texte.
+    Le texte est deja normalise, accents conserves (voir analyser_message) :
+    tous les extracteurs travaillent sur la meme chaine.
     Retourne un dictionnaire.
     """
     entites = {}
@@ -402,15 +447,23 @@ def detecter_intention(texte):
     Detecte l'intention principale du message.
     Retourne (intention, score_confiance).
     """
-    texte_normalise = normaliser_texte(texte)
-    texte_corrige = corriger_orthographe_commune(texte_normalise)
+    texte_corrige = corriger_orthographe_commune(normaliser_texte(texte))
+    return _detecter_intention(texte_corrige)
 
+
+def _detecter_intention(texte_corrige):
+    """Detection sur un texte deja normalise et corrige."""
     meilleure_intention = 'autre'
     meilleur_score = 0
 
-    for intention, patterns in PATTERNS_INTENTIONS.items():
+    if not texte_corrige:
+        return meilleure_intention, meilleur_score
+
+    for intention, prefiltre, patterns in INTENTIONS_COMPILEES:
+        if not prefiltre.search(texte_corrige):
+            continue
         for pattern in patterns:
-            match = re.search(pattern, texte_corrige, re.IGNORECASE)
+            match = pattern.search(texte_corrige)
             if match:
                 # Calculer un score base sur la longueur du match
                 score = len(match.group(0)) / len(texte_corrige)
@@ -451,15 +504,16 @@ def analyser_message(texte, utilisateur=None):
             'texte_normalise': ''
         }
 
-    # Normaliser le texte
+    # Normaliser le texte (une seule fois pour l'intention et les entites)
     texte_normalise = normaliser_texte(texte)
     texte_corrige = corriger_orthographe_commune(texte_normalise)
 
     # Detecter l'intention
-    intention, confiance = detecter_intention(texte_corrige)
+    intention, confiance = _detecter_intention(texte_corrige)
 
-    # Extraire les entites
-    entites = extraire_toutes_entites(texte_corrige)
+    # Extraire les entites du texte avec ses accents : les noms de parties
+    # sont recherches tels quels en base
+    entites = extraire_toutes_entites(texte_normalise)
 
     # Enrichir avec le contexte utilisateur si disponible
     if utilisateur:
@@ -506,15 +560,4 @@ def est_question(texte):
 
 def detecter_negation(texte):
     """Detecte si le message contient une negation."""
-    patterns_negation = [
-        r'\bne\b.*\bpas\b',
-        r'\bne\b.*\bplus\b',
-        r'\bne\b.*\bjamais\b',
-        r'\bnon\b',
-        r'\bpas\s+de\b',
-        r'\baucun',
-        r'\bsans\b',
-    ]
-
-    texte_lower = texte.lower()
-    return any(re.search(p, texte_lower) for p in patterns_negation)
+    return bool(PATTERN_NEGATION.search(texte.lower()))
@@ -4,10 +4,17 @@ IMPORTANT: Toute action DOIT passer par ce module AVANT exécution.
 
 Section 18 DSTD v3.2 - Exigence 4:
 "Vérification des autorisations RBAC AVANT toute action"
+
+Une commande est autorisée pour les rôles listés, ou lorsque le résolveur
+de droits (gestion.services.permissions) accorde son code 'module.action'
+(rôle, permissions granulaires, surcharges individuelles ; superuser et
+rôle 'admin' ont tous les droits). Le cache est celui du résolveur,
+invalidé à chaque modification des droits.
 """
 
 from functools import wraps
-from django.core.cache import cache
+
+from gestion.services import permissions as resolveur
 
 
 # =============================================================================
@@ -18,16 +25,19 @@ PERMISSIONS_COMMANDES = {
     # Trésorerie
     'tresorerie_solde': {
         'permission': 'tresorerie.view_comptebancaire',
+        'code': 'tresorerie.voir_soldes',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Consulter les soldes de trésorerie',
     },
     'tresorerie_mouvement': {
         'permission': 'tresorerie.add_mouvementtresorerie',
+        'code': 'tresorerie.mouvements',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Créer un mouvement de trésorerie',
     },
     'tresorerie_alerte': {
         'permission': 'tresorerie.view_alertetresorerie',
+        'code': 'tresorerie.voir',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Consulter les alertes de trésorerie',
     },
@@ -35,22 +45,26 @@ PERMISSIONS_COMMANDES = {
     # Comptabilité
     'compta_ecriture': {
         'permission': 'comptabilite.add_ecriturecomptable',
+        'code': 'comptabilite.ecritures',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Créer une écriture comptable',
         'critique': True,  # Nécessite validation humaine
     },
     'compta_solde': {
         'permission': 'comptabilite.view_comptecomptable',
+        'code': 'comptabilite.voir',
         'roles': ['huissier', 'comptable', 'clerc', 'admin'],
         'description': 'Consulter le solde d\'un compte',
     },
     'compta_balance': {
         'permission': 'comptabilite.view_rapportcomptable',
+        'code': 'comptabilite.etats',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Générer une balance comptable',
     },
     'compta_grand_livre': {
         'permission': 'comptabilite.view_ligneecriture',
+        'code': 'comptabilite.voir',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Consulter le grand livre',
     },
@@ -58,21 +72,25 @@ PERMISSIONS_COMMANDES = {
     # Dossiers
     'dossier_recherche': {
         'permission': 'gestion.view_dossier',
+        'code': 'dossiers.voir',
         'roles': ['huissier', 'comptable', 'clerc', 'secretaire', 'admin'],
         'description': 'Rechercher un dossier',
     },
     'dossier_statut': {
         'permission': 'gestion.view_dossier',
+        'code': 'dossiers.voir',
         'roles': ['huissier', 'comptable', 'clerc', 'secretaire', 'admin'],
         'description': 'Consulter le statut d\'un dossier',
     },
     'dossier_creer': {
         'permission': 'gestion.add_dossier',
+        'code': 'dossiers.creer',
         'roles': ['huissier', 'clerc', 'admin'],
         'description': 'Créer un nouveau dossier',
     },
     'dossier_encaissement': {
         'permission': 'gestion.add_encaissement',
+        'code': 'recouvrement.encaisser',
         'roles': ['huissier', 'comptable', 'clerc', 'admin'],
         'description': 'Enregistrer un encaissement',
     },
@@ -80,16 +98,19 @@ PERMISSIONS_COMMANDES = {
     # Courriers
     'courrier_generer': {
         'permission': 'documents.add_document',
+        'code': 'documents.uploader',
         'roles': ['huissier', 'clerc', 'secretaire', 'admin'],
         'description': 'Générer un courrier',
     },
     'courrier_liste': {
         'permission': 'documents.view_document',
+        'code': 'documents.voir',
         'roles': ['huissier', 'comptable', 'clerc', 'secretaire', 'admin'],
         'description': 'Lister les courriers',
     },
     'courrier_envoyer': {
         'permission': 'documents.change_document',
+        'code': 'documents.uploader',
         'roles': ['huissier', 'clerc', 'secretaire', 'admin'],
         'description': 'Envoyer un courrier',
     },
@@ -97,16 +118,19 @@ PERMISSIONS_COMMANDES = {
     # Agenda
     'agenda_rdv': {
         'permission': 'agenda.add_rendezvous',
+        'code': 'agenda.creer',
         'roles': ['huissier', 'clerc', 'secretaire', 'admin'],
         'description': 'Créer un rendez-vous',
     },
     'agenda_tache': {
         'permission': 'agenda.add_tache',
+        'code': 'agenda.taches',
         'roles': ['huissier', 'comptable', 'clerc', 'secretaire', 'admin'],
         'description': 'Créer une tâche',
     },
     'agenda_aujourdhui': {
         'permission': 'agenda.view_rendezvous',
+        'code': 'agenda.voir',
         'roles': ['huissier', 'comptable', 'clerc', 'secretaire', 'admin'],
         'description': 'Consulter le programme du jour',
     },
@@ -114,6 +138,7 @@ PERMISSIONS_COMMANDES = {
     # Rapports
     'rapport_generer': {
         'permission': 'comptabilite.view_rapportcomptable',
+        'code': 'rapports.generer',
         'roles': ['huissier', 'comptable', 'admin'],
         'description': 'Générer un rapport',
     },
@@ -206,8 +231,15 @@ def verifier_permission_commande(type_commande, utilisateur):
     if not utilisateur or not utilisateur.is_authenticated:
         return False
 
-    role_utilisateur = getattr(utilisateur, 'role', None)
-    return role_utilisateur in config['roles']
+    return _commande_autorisee(config, utilisateur, resolveur.get_permissions(utilisateur))
+
+
+def _commande_autorisee(config, utilisateur, permissions):
+    """Rôle listé pour la commande, ou code accordé par le résolveur."""
+    if config['roles'] == ['*'] or getattr(utilisateur, 'role', None) in config['roles']:
+        return True
+    code = config.get('code')
+    return code is not None and code in permissions
 
 
 def est_action_critique(type_commande):
@@ -232,14 +264,11 @@ def obtenir_permissions_utilisateur(utilisateur):
     if not utilisateur or not utilisateur.is_authenticated:
         return ['navigation', 'aide']
 
-    role = getattr(utilisateur, 'role', None)
-    commandes_autorisees = []
-
-    for code, config in PERMISSIONS_COMMANDES.items():
-        if config['roles'] == ['*'] or role in config['roles']:
-            commandes_autorisees.append(code)
-
-    return commandes_autorisees
+    permissions = resolveur.get_permissions(utilisateur)
+    return [
+        code for code, config in PERMISSIONS_COMMANDES.items()
+        if _commande_autorisee(config, utilisateur, permissions)
+    ]
 
 
 def obtenir_description_permission(type_commande):
@@ -280,31 +309,16 @@ def require_chatbot_permission(type_commande):
 # CACHE DES PERMISSIONS
 # =============================================================================
 
-def get_permissions_cache_key(user_id):
-    """Génère la clé de cache pour les permissions d'un utilisateur."""
-    return f"chatbot_permissions_{user_id}"
-
-
 def get_cached_permissions(utilisateur):
     """
-    Récupère les permissions cachées d'un utilisateur.
-    Cache de 5 minutes pour performance.
+    Commandes autorisées d'un utilisateur.
+    Mises en cache par le résolveur de droits (invalidé par signal).
     """
     if not utilisateur:
         return None
-
-    cache_key = get_permissions_cache_key(utilisateur.id)
-    permissions = cache.get(cache_key)
-
-    if permissions is None:
-        permissions = obtenir_permissions_utilisateur(utilisateur)
-        cache.set(cache_key, permissions, 300)  # 5 minutes
-
-    return permissions
+    return obtenir_permissions_utilisateur(utilisateur)
 
 
-def invalidate_permissions_cache(utilisateur):
-    """Invalide le cache des permissions d'un utilisateur."""
-    if utilisateur:
-        cache_key = get_permissions_cache_key(utilisateur.id)
-        cache.delete(cache_key)
+def invalidate_permissions_cache(utilisateur=None):
+    """Invalide le cache des permissions (celui du résolveur, tous utilisateurs)."""
+    resolveur.invalidate_permissions_cache()
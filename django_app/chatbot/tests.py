@@ -0,0 +1,263 @@
+"""
+Tests pour le module Chatbot
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.testing import ApplicationCommunicator
+from channels.exceptions import ChannelFull
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import commands, nlp_processor, permissions
+from .channel_layers import SQLiteChannelLayer
+from .consumers import ChatbotConsumer
+
+# channels.testing importe daphne (extra channels[daphne]) : à défaut,
+# communicateur réduit aux méthodes utilisées par les tests
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:
+    class WebsocketCommunicator(ApplicationCommunicator):
+        """Équivalent de channels.testing.WebsocketCommunicator, sans daphne"""
+
+        def __init__(self, application, path):
+            self.scope = {'type': 'websocket', 'path': path, 'query_string': b'', 'headers': [], 'subprotocols': []}
+            super().__init__(application, self.scope)
+
+        async def send_input(self, message):
+            # La connexion de la transaction du test ne doit pas être fermée
+            with mock.patch('channels.db.close_old_connections', lambda: None):
+                return await super().send_input(message)
+
+        async def receive_output(self, timeout=1):
+            with mock.patch('channels.db.close_old_connections', lambda: None):
+                return await super().receive_output(timeout)
+
+        async def connect(self, timeout=1):
+            await self.send_input({'type': 'websocket.connect'})
+            reponse = await self.receive_output(timeout)
+            if reponse['type'] == 'websocket.close':
+                return False, reponse.get('code', 1000)
+            return True, reponse.get('subprotocol')
+
+        async def send_json_to(self, data):
+            await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+        async def receive_json_from(self, timeout=1):
+            reponse = await self.receive_output(timeout)
+            assert reponse['type'] == 'websocket.send', reponse
+            return json.loads(reponse['text'])
+
+        async def disconnect(self, code=1000, timeout=1):
+            await self.send_input({'type': 'websocket.disconnect', 'code': code})
+            await self.wait(timeout)
+
+
+class AnalyseMessageTest(TestCase):
+    """Tests pour l'analyse des messages"""
+
+    def test_accents_ignores_pour_l_intention(self):
+        """Les patterns sans accents reconnaissent les mots accentués"""
+        analyse = nlp_processor.analyser_message("Passer une écriture comptable")
+        self.assertEqual(analyse['intention'], 'compta_ecriture')
+
+    def test_nom_de_partie_accentue(self):
+        """Le nom extrait garde ses accents et retrouve le dossier de la partie"""
+        from gestion.models import Dossier, Partie
+        dossier = Dossier.objects.create(reference='2026/014', description="Recouvrement")
+        dossier.defendeurs.add(Partie.objects.create(nom='Dégbé', prenoms='Hervé'))
+
+        analyse = nlp_processor.analyser_message("Ouvre le dossier de Dégbé")
+        self.assertEqual(analyse['intention'], 'dossier_recherche')
+        self.assertEqual(analyse['entites']['terme_recherche'], 'dégbé')
+
+        resultat = commands.rechercher_dossier(analyse['entites']['terme_recherche'], None)
+        self.assertEqual(resultat['data']['resultats'], ['2026/014'])
+
+    def test_date_relative_accentuee(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        analyse = nlp_processor.analyser_message("Mes rendez-vous après-demain")
+        self.assertEqual(
+            analyse['entites']['date'], (timezone.now() + timedelta(days=2)).date().isoformat()
+        )
+
+
+class PermissionsCommandesTest(TestCase):
+    """Tests pour les permissions des commandes (résolveur de droits)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from gestion.models import Utilisateur
+        cache.clear()
+        self.user = Utilisateur.objects.create_user(
+            username='secretaire', password='x', role='secretaire', is_staff=True
+        )
+
+    def test_role_et_droits_accordes(self):
+        from gestion.models import PermissionsGranulaires, Utilisateur
+        self.assertTrue(permissions.verifier_permission_commande('dossier_recherche', self.user))
+        # Le staff seul ne donne pas accès à la trésorerie
+        self.assertFalse(permissions.verifier_permission_commande('tresorerie_solde', self.user))
+
+        PermissionsGranulaires.objects.create(utilisateur=self.user, tresorerie_voir_soldes=True)
+        user = Utilisateur.objects.get(pk=self.user.pk)
+        self.assertTrue(permissions.verifier_permission_commande('tresorerie_solde', user))
+        self.assertIn('tresorerie_solde', permissions.get_cached_permissions(user))
+        self.assertNotIn('compta_ecriture', permissions.get_cached_permissions(user))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatbotConsumerTest(TestCase):
+    """Tests pour le consumer WebSocket du chatbot"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from gestion.models import Dossier, Partie, Utilisateur
+        cache.clear()
+        self.huissier = Utilisateur.objects.create_user(username='huissier', password='x', role='huissier')
+        self.secretaire = Utilisateur.objects.create_user(username='secretaire', password='x', role='secretaire')
+        dossier = Dossier.objects.create(reference='2026/014', description="Recouvrement")
+        dossier.defendeurs.add(Partie.objects.create(nom='Dégbé', prenoms='Hervé'))
+
+    async def connecter(self, utilisateur):
+        communicator = WebsocketCommunicator(ChatbotConsumer.as_asgi(), '/ws/chatbot/')
+        communicator.scope['user'] = utilisateur
+        connecte, _ = await communicator.connect()
+        self.assertTrue(connecte)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'connection_etablie')
+        return communicator
+
+    async def echanger(self, communicator, contenu):
+        """Envoie un message et retourne (analyse, réponses partielles, réponse finale)"""
+        await communicator.send_json_to({'type': 'message', 'contenu': contenu})
+        analyse = await communicator.receive_json_from()
+        partielles = []
+        while True:
+            message = await communicator.receive_json_from()
+            if message['type'] != 'reponse_partielle':
+                return analyse, partielles, message
+            partielles.append(message['message'])
+
+    async def test_commande_aller_retour(self):
+        """Une recherche de dossier est analysée, exécutée et enregistrée"""
+        from .models import Message
+        communicator = await self.connecter(self.huissier)
+        analyse, partielles, reponse = await self.echanger(communicator, "Ouvre le dossier de Dégbé")
+
+        self.assertEqual(analyse['intention'], 'dossier_recherche')
+        self.assertEqual(reponse['type'], 'reponse')
+        self.assertIn('2026/014', reponse['message'])
+        self.assertEqual(partielles, [reponse['message']])
+
+        await communicator.disconnect()
+        self.assertEqual(await Message.objects.filter(session__utilisateur=self.huissier).acount(), 2)
+
+    async def test_permission_refusee(self):
+        """La trésorerie est refusée à une secrétaire, sans exécuter la commande"""
+        from .models import Message, TypeMessage
+        communicator = await self.connecter(self.secretaire)
+        analyse, _, reponse = await self.echanger(communicator, "Quel est le solde de la trésorerie ?")
+
+        self.assertEqual(analyse['intention'], 'tresorerie_solde')
+        self.assertIn("pas les permissions", reponse['message'])
+
+        await communicator.disconnect()
+        self.assertTrue(await Message.objects.filter(
+            session__utilisateur=self.secretaire, type_message=TypeMessage.ERREUR
+        ).aexists())
+
+    async def test_connexion_anonyme_refusee(self):
+        from django.contrib.auth.models import AnonymousUser
+        communicator = WebsocketCommunicator(ChatbotConsumer.as_asgi(), '/ws/chatbot/')
+        communicator.scope['user'] = AnonymousUser()
+        connecte, _ = await communicator.connect()
+        self.assertFalse(connecte)
+
+
+class SQLiteChannelLayerTest(SimpleTestCase):
+    """Tests pour le channel layer partagé entre processus"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.chemin = os.path.join(self.dossier.name, 'channels.sqlite3')
+        self.couches = []
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def couche(self, **config):
+        couche = SQLiteChannelLayer(chemin=self.chemin, **config)
+        self.couches.append(couche)
+        return couche
+
+    async def fermer(self):
+        for couche in self.couches:
+            await couche.close()
+
+    async def test_group_send_entre_processus(self):
+        """Un group_send émis par un processus atteint le canal d'un autre"""
+        emetteur, recepteur = self.couche(), self.couche()
+        canal = await recepteur.new_channel()
+        await recepteur.group_add('chatbot_user_1', canal)
+
+        await emetteur.group_send('chatbot_user_1', {'type': 'notification', 'texte': 'Bonjour'})
+        message = await asyncio.wait_for(recepteur.receive(canal), 2)
+        self.assertEqual(message, {'type': 'notification', 'texte': 'Bonjour'})
+
+        await recepteur.group_discard('chatbot_user_1', canal)
+        await emetteur.group_send('chatbot_user_1', {'type': 'notification'})
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(recepteur.receive(canal), 0.2)
+        await self.fermer()
+
+    async def test_releve_espacee_au_repos(self):
+        """Sans message, la relève s'espace ; un message arrivé est remis sans attendre le maximum"""
+        couche, autre = self.couche(intervalle_releve_max=0.2), self.couche()
+        canal = await couche.new_channel()
+        releves = []
+        version = couche._version
+        couche._version = lambda: releves.append(1) or version()
+
+        reception = asyncio.ensure_future(couche.receive(canal))
+        await asyncio.sleep(1)
+        # 5 ms fixes donneraient environ 200 relèves
+        self.assertLess(len(releves), 15)
+
+        await autre.send(canal, {'n': 1})
+        self.assertEqual(await asyncio.wait_for(reception, 0.5), {'n': 1})
+        await self.fermer()
+
+    async def test_capacite_et_expiration(self):
+        couche = self.couche(capacity=2, expiry=0.2)
+        await couche.send('file', {'n': 1})
+        await couche.send('file', {'n': 2})
+        with self.assertRaises(ChannelFull):
+            await couche.send('file', {'n': 3})
+
+        # Les messages expirés ne comptent plus et ne sont plus remis
+        await asyncio.sleep(0.3)
+        await couche.send('file', {'n': 4})
+        self.assertEqual(await asyncio.wait_for(couche.receive('file'), 2), {'n': 4})
+        await self.fermer()
+
+    async def test_receive_annule_ne_perd_pas_de_message(self):
+        """Les messages envoyés après un receive() annulé restent à remettre"""
+        couche, autre = self.couche(), self.couche()
+        canal = await couche.new_channel()
+        # Un autre consumer du processus garde la relève active
+        ecoute = asyncio.ensure_future(couche.receive(await couche.new_channel()))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(couche.receive(canal), 0.1)
+
+        await autre.send(canal, {'n': 1})
+        await asyncio.sleep(0.1)
+        await autre.send(canal, {'n': 2})
+        self.assertEqual(await asyncio.wait_for(couche.receive(canal), 2), {'n': 1})
+        self.assertEqual(await asyncio.wait_for(couche.receive(canal), 2), {'n': 2})
+        ecoute.cancel()
+        await self.fermer()
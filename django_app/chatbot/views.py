@@ -21,6 +21,7 @@ from .models import (
 from .permissions import verifier_permission_commande, obtenir_permissions_utilisateur
 from .nlp_processor import analyser_message
 from .voice_handler import get_config_reconnaissance_vocale, get_config_synthese_vocale
+from gestion.services import archivage
 
 
 # =============================================================================
@@ -509,12 +510,17 @@ def api_nettoyer_sessions(request):
             'error': 'Token invalide'
         }, status=403)
 
-    # Nettoyer les sessions expirées
+    # Archiver l'historique puis appliquer la rétention par mois entiers,
+    # avant de supprimer les sessions expirées et leurs messages (table
+    # chaude et archives)
+    archivage.archiver('messages_chatbot')
+    mois_purges = archivage.purger('messages_chatbot')
     count = SessionConversation.nettoyer_sessions_expirees()
 
     return JsonResponse({
         'success': True,
         'sessions_supprimees': count,
+        'mois_historique_purges': mois_purges,
         'timestamp': timezone.now().isoformat()
     })
 
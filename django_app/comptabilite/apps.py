@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ComptabiliteConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "comptabilite"
+
+    def ready(self):
+        """Charge les signaux au démarrage de l'application."""
+        import comptabilite.signals  # noqa: F401
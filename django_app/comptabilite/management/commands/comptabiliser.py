@@ -0,0 +1,62 @@
+"""
+Commande de gestion pour la comptabilisation par lots
+
+Utilisation: python manage.py comptabiliser --du AAAA-MM-JJ --au AAAA-MM-JJ
+             [--factures | --mouvements]
+
+Génère en brouillon les écritures des factures émises et des mouvements
+de trésorerie validés de la période qui ne sont pas encore comptabilisés,
+et affiche le nombre d'écritures créées, de pièces déjà comptabilisées ou
+ignorées (compte, journal ou exercice manquant) et le temps de calcul.
+La commande peut être relancée sans créer de doublon.
+"""
+
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comptabilite.services import comptabilisation
+
+
+def _date(valeur):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Date invalide : {valeur} (format AAAA-MM-JJ attendu)")
+
+
+class Command(BaseCommand):
+    help = "Comptabilisation par lots des factures et des mouvements de trésorerie d'une période"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--du', dest='date_debut', required=True, help='Date de début (AAAA-MM-JJ)')
+        parser.add_argument('--au', dest='date_fin', required=True, help='Date de fin (AAAA-MM-JJ)')
+        sources = parser.add_mutually_exclusive_group()
+        sources.add_argument('--factures', action='store_true', help='Factures uniquement')
+        sources.add_argument('--mouvements', action='store_true', help='Mouvements de trésorerie uniquement')
+
+    def handle(self, *args, **options):
+        from gestion.models import Facture
+        from tresorerie.models import MouvementTresorerie
+
+        date_debut, date_fin = _date(options['date_debut']), _date(options['date_fin'])
+
+        debut = time.perf_counter()
+        if options['factures']:
+            resultat = comptabilisation.comptabiliser_factures(Facture.objects.filter(
+                statut__in=comptabilisation.STATUTS_FACTURE, date_emission__range=(date_debut, date_fin)
+            ))
+        elif options['mouvements']:
+            resultat = comptabilisation.comptabiliser_mouvements(MouvementTresorerie.objects.filter(
+                statut__in=comptabilisation.STATUTS_MOUVEMENT, date_mouvement__range=(date_debut, date_fin)
+            ))
+        else:
+            resultat = comptabilisation.comptabiliser_periode(date_debut, date_fin)
+        duree = (time.perf_counter() - debut) * 1000
+
+        self.stdout.write(f"Déjà comptabilisées : {resultat.deja_comptabilises}")
+        self.stdout.write(f"Ignorées            : {resultat.ignores}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat.crees} écriture(s) générée(s) en {duree:.0f} ms"
+        ))
@@ -0,0 +1,62 @@
+"""
+Commande de gestion pour le lettrage automatique des comptes de tiers
+
+Utilisation: python manage.py lettrage_automatique [--type clients|fournisseurs]
+             [--fenetre JOURS] [--appliquer]
+
+Rapproche les postes ouverts des comptes 411/401 (correspondance exacte
+puis combinaisons dans la fenêtre de dates) et affiche le nombre de
+propositions et le temps de calcul. Avec --appliquer, enregistre les
+lettrages par lots.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from comptabilite.services import lettrage
+
+
+class Command(BaseCommand):
+    help = "Lettrage automatique des postes ouverts des comptes clients et fournisseurs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            choices=sorted(lettrage.PREFIXES_TIERS),
+            help='Type de comptes à lettrer (par défaut : clients et fournisseurs)',
+        )
+        parser.add_argument(
+            '--fenetre',
+            type=int,
+            default=lettrage.FENETRE_JOURS,
+            help='Écart maximal en jours entre les lignes d\'une combinaison',
+        )
+        parser.add_argument(
+            '--appliquer',
+            action='store_true',
+            help='Enregistre les lettrages proposés',
+        )
+
+    def handle(self, *args, **options):
+        comptes = lettrage.get_comptes(options['type'])
+
+        debut = time.perf_counter()
+        postes = len(lettrage.postes_ouverts(comptes))
+        propositions = lettrage.proposer(comptes, fenetre_jours=options['fenetre'])
+        duree = (time.perf_counter() - debut) * 1000
+
+        exactes = sum(1 for p in propositions if p.methode == 'exact')
+        self.stdout.write(f"Postes ouverts : {postes}")
+        self.stdout.write(
+            f"Propositions   : {len(propositions)} ({exactes} exactes, "
+            f"{len(propositions) - exactes} par combinaison) en {duree:.0f} ms"
+        )
+
+        if not options['appliquer']:
+            return
+
+        debut = time.perf_counter()
+        crees = lettrage.appliquer(propositions)
+        duree = (time.perf_counter() - debut) * 1000
+        self.stdout.write(self.style.SUCCESS(f"{crees} lettrage(s) enregistré(s) en {duree:.0f} ms"))
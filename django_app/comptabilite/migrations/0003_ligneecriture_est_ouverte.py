@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:11
+
+from django.db import migrations, models
+
+
+def marquer_lignes_lettrees(apps, schema_editor):
+    """Ferme les lignes déjà couvertes par un lettrage complet"""
+    LigneEcriture = apps.get_model('comptabilite', 'LigneEcriture')
+    LigneEcriture.objects.filter(lettrages__est_partiel=False).update(est_ouverte=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comptabilite', '0002_add_lettrage_and_class9'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ligneecriture',
+            name='est_ouverte',
+            field=models.BooleanField(default=True, verbose_name='Non lettrée'),
+        ),
+        migrations.AddIndex(
+            model_name='ligneecriture',
+            index=models.Index(fields=['compte', 'est_ouverte'], name='ligne_compte_ouverte_idx'),
+        ),
+        migrations.RunPython(marquer_lignes_lettrees, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+def renseigner_cle_origine(apps, schema_editor):
+    """Marque comme comptabilisées les factures ayant déjà une écriture générée"""
+    EcritureComptable = apps.get_model('comptabilite', 'EcritureComptable')
+    deja_vues = set()
+    a_marquer = []
+    for ecriture_id, facture_id in EcritureComptable.objects.filter(
+        origine='facture', facture__isnull=False
+    ).order_by('date_creation', 'id').values_list('id', 'facture_id'):
+        if facture_id not in deja_vues:
+            deja_vues.add(facture_id)
+            a_marquer.append(EcritureComptable(id=ecriture_id, cle_origine=f"facture:{facture_id}"))
+    EcritureComptable.objects.bulk_update(a_marquer, ['cle_origine'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comptabilite', '0003_ligneecriture_est_ouverte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecriturecomptable',
+            name='cle_origine',
+            field=models.CharField(blank=True, max_length=60, verbose_name="Clé d'origine"),
+        ),
+        migrations.AddConstraint(
+            model_name='ecriturecomptable',
+            constraint=models.UniqueConstraint(condition=models.Q(('cle_origine', ''), _negated=True), fields=('cle_origine',), name='ecriture_cle_origine_unique'),
+        ),
+        migrations.RunPython(renseigner_cle_origine, migrations.RunPython.noop),
+    ]
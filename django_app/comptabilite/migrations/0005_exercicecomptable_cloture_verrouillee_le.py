@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comptabilite', '0004_ecriturecomptable_cle_origine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercicecomptable',
+            name='cloture_verrouillee_le',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Clôture en cours depuis'),
+        ),
+    ]
@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
 import datetime
 
+from gestion.services import sequences
+
 
 class ExerciceComptable(models.Model):
     """Exercice comptable (année fiscale)"""
@@ -18,6 +20,10 @@ class ExerciceComptable(models.Model):
     date_fin = models.DateField(verbose_name="Date de fin")
     statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='ouvert', verbose_name="Statut")
     est_premier_exercice = models.BooleanField(default=False, verbose_name="Premier exercice")
+    # Verrou de la clôture en arrière-plan (posé par UPDATE conditionnel, prolongé à chaque étape)
+    cloture_verrouillee_le = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Clôture en cours depuis"
+    )
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
 
@@ -192,6 +198,8 @@ class EcritureComptable(models.Model):
                                  related_name='ecritures_comptables', verbose_name="Facture liée")
     dossier = models.ForeignKey('gestion.Dossier', on_delete=models.SET_NULL, null=True, blank=True,
                                  related_name='ecritures_comptables', verbose_name="Dossier lié")
+    # Pièce source d'une écriture générée ('facture:<id>', 'mouvement:<id>')
+    cle_origine = models.CharField(max_length=60, blank=True, verbose_name="Clé d'origine")
 
     # Audit
     cree_par = models.ForeignKey('gestion.Utilisateur', on_delete=models.SET_NULL, null=True,
@@ -204,6 +212,13 @@ class EcritureComptable(models.Model):
         verbose_name = "Écriture comptable"
         verbose_name_plural = "Écritures comptables"
         ordering = ['-date', '-numero']
+        constraints = [
+            # Une pièce source n'est comptabilisée qu'une fois
+            models.UniqueConstraint(
+                fields=['cle_origine'], condition=~models.Q(cle_origine=''),
+                name='ecriture_cle_origine_unique'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.numero} - {self.libelle} ({self.date})"
@@ -244,15 +259,25 @@ class EcritureComptable(models.Model):
         mois = date.month
         prefix = f"{journal.code}{annee}{mois:02d}"
 
-        last_ecriture = cls.objects.filter(numero__startswith=prefix).order_by('-numero').first()
-        if last_ecriture:
-            last_num = int(last_ecriture.numero[-4:])
-            new_num = last_num + 1
-        else:
-            new_num = 1
+        new_num = sequences.prochain(
+            f"ECR-{journal.code}", f"{annee}{mois:02d}",
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'numero', prefix),
+        )
 
         return f"{prefix}{new_num:04d}"
 
+    @classmethod
+    def generer_numeros(cls, journal, date, quantite):
+        """Génère `quantite` numéros d'écriture consécutifs en une réservation"""
+        prefix = f"{journal.code}{date.year}{date.month:02d}"
+
+        numeros = sequences.reserver(
+            f"ECR-{journal.code}", f"{date.year}{date.month:02d}", quantite,
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'numero', prefix),
+        )
+
+        return [f"{prefix}{num:04d}" for num in numeros]
+
 
 class LigneEcriture(models.Model):
     """Ligne d'écriture comptable"""
@@ -266,14 +291,29 @@ class LigneEcriture(models.Model):
     # Analytique (optionnel)
     tiers = models.CharField(max_length=200, blank=True, verbose_name="Tiers")
 
+    # Poste ouvert : ligne sans lettrage complet (tenu à jour par Lettrage
+    # et comptabilite/signals.py)
+    est_ouverte = models.BooleanField(default=True, verbose_name="Non lettrée")
+
     class Meta:
         verbose_name = "Ligne d'écriture"
         verbose_name_plural = "Lignes d'écriture"
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['compte', 'est_ouverte'], name='ligne_compte_ouverte_idx'),
+        ]
 
     def __str__(self):
         return f"{self.compte.numero} - {self.libelle}"
 
+    @classmethod
+    def recalculer_ouverture(cls, ids):
+        """Recalcule est_ouverte : une ligne reste ouverte tant qu'aucun lettrage complet ne la contient"""
+        lettree = Lettrage.lignes.through.objects.filter(
+            ligneecriture_id=models.OuterRef('pk'), lettrage__est_partiel=False
+        )
+        return cls.objects.filter(id__in=ids).update(est_ouverte=~models.Exists(lettree))
+
     def clean(self):
         # Une ligne doit avoir soit un débit, soit un crédit, pas les deux
         if self.debit > 0 and self.credit > 0:
@@ -316,38 +356,49 @@ class Lettrage(models.Model):
                     f"Le lettrage n'est pas équilibré: Débit={total_debit}, Crédit={total_credit}"
                 )
 
+    @staticmethod
+    def code_depuis_rang(rang):
+        """Rang séquentiel -> code (1 -> AAA001, 999 -> AAA999, 1000 -> AAB001)"""
+        index, num = divmod(rang - 1, 999)
+        lettres = ''
+        for _ in range(3):
+            index, reste = divmod(index, 26)
+            lettres = chr(ord('A') + reste) + lettres
+        return f"{lettres}{num + 1:03d}"
+
+    @staticmethod
+    def rang_depuis_code(code):
+        """Code -> rang séquentiel (0 si le code n'est pas au format AAA001)"""
+        lettres, num = code[:3], code[3:]
+        if len(code) != 6 or not lettres.isalpha() or not lettres.isupper() or not num.isdigit():
+            return 0
+        index = 0
+        for lettre in lettres:
+            index = index * 26 + ord(lettre) - ord('A')
+        return index * 999 + int(num)
+
+    @classmethod
+    def generer_codes(cls, quantite):
+        """Réserve `quantite` codes de lettrage consécutifs en une requête"""
+        def dernier_rang():
+            dernier = cls.objects.order_by('-code').values_list('code', flat=True).first()
+            return cls.rang_depuis_code(dernier) if dernier else 0
+
+        return [cls.code_depuis_rang(rang) for rang in sequences.reserver('LET', '', quantite, initial=dernier_rang)]
+
     @classmethod
-    def generer_code(cls, compte):
-        """Génère un code de lettrage unique pour un compte"""
-        import string
-        # Format: 3 lettres + numéro séquentiel (ex: AAA001)
-        last_lettrage = cls.objects.filter(compte=compte).order_by('-code').first()
-        if last_lettrage:
-            last_code = last_lettrage.code
-            # Extraire les lettres et le numéro
-            letters = last_code[:3]
-            num = int(last_code[3:]) + 1
-            if num > 999:
-                # Passer aux lettres suivantes
-                num = 1
-                # Incrémenter les lettres
-                letter_list = list(letters)
-                for i in range(2, -1, -1):
-                    if letter_list[i] != 'Z':
-                        letter_list[i] = chr(ord(letter_list[i]) + 1)
-                        break
-                    else:
-                        letter_list[i] = 'A'
-                letters = ''.join(letter_list)
-            return f"{letters}{num:03d}"
-        return "AAA001"
+    def generer_code(cls, compte=None):
+        """Génère un code de lettrage unique (format: 3 lettres + numéro, ex: AAA001)"""
+        # Le code est unique pour tout le plan comptable, pas seulement pour le compte
+        return cls.generer_codes(1)[0]
 
     @classmethod
     def creer_lettrage(cls, compte, lignes, utilisateur=None, commentaire=''):
         """Crée un lettrage pour un ensemble de lignes d'écriture"""
+        lignes = list(lignes)
         # Vérifier que toutes les lignes appartiennent au même compte
         for ligne in lignes:
-            if ligne.compte != compte:
+            if ligne.compte_id != compte.id:
                 raise ValidationError(f"La ligne {ligne} n'appartient pas au compte {compte}")
 
         # Calculer le montant total
@@ -357,18 +408,28 @@ class Lettrage(models.Model):
         montant = min(total_debit, total_credit)
 
         # Créer le lettrage
-        code = cls.generer_code(compte)
-        lettrage = cls.objects.create(
-            code=code,
-            compte=compte,
-            montant=montant,
-            est_partiel=est_partiel,
-            lettre_par=utilisateur,
-            commentaire=commentaire
-        )
-        lettrage.lignes.set(lignes)
+        with transaction.atomic():
+            lettrage = cls.objects.create(
+                code=cls.generer_code(compte),
+                compte=compte,
+                montant=montant,
+                est_partiel=est_partiel,
+                lettre_par=utilisateur,
+                commentaire=commentaire
+            )
+            # est_ouverte est mis à jour par le signal m2m_changed
+            lettrage.lignes.set(lignes)
         return lettrage
 
+    def rouvrir_lignes(self):
+        """Rouvre les lignes qui ne restent lettrées par aucun autre lettrage complet"""
+        if self.est_partiel:
+            return 0
+        autres = Lettrage.objects.filter(est_partiel=False).exclude(pk=self.pk)
+        return LigneEcriture.objects.filter(lettrages=self).exclude(
+            lettrages__in=autres
+        ).update(est_ouverte=True)
+
 
 class TypeOperation(models.Model):
     """Types d'opérations pour le mode facile"""
@@ -464,28 +525,20 @@ class DeclarationTVA(models.Model):
 
     def calculer(self):
         """Calcule les montants de TVA pour la période"""
-        from django.db.models import Sum
+        from comptabilite.services import etats
 
         # Récupérer les paramètres fiscaux
         params = self.exercice.parametres_fiscaux
 
+        # Collectée et déductible en une seule requête
+        totaux = etats.totaux_tva(
+            params.compte_tva_collectee, params.compte_tva_deductible,
+            date_debut=self.periode_debut, date_fin=self.periode_fin
+        )
         if params.compte_tva_collectee:
-            lignes_collectee = LigneEcriture.objects.filter(
-                compte=params.compte_tva_collectee,
-                ecriture__statut='valide',
-                ecriture__date__gte=self.periode_debut,
-                ecriture__date__lte=self.periode_fin
-            )
-            self.tva_collectee = lignes_collectee.aggregate(total=Sum('credit'))['total'] or 0
-
+            self.tva_collectee = totaux['tva_collectee']
         if params.compte_tva_deductible:
-            lignes_deductible = LigneEcriture.objects.filter(
-                compte=params.compte_tva_deductible,
-                ecriture__statut='valide',
-                ecriture__date__gte=self.periode_debut,
-                ecriture__date__lte=self.periode_fin
-            )
-            self.tva_deductible = lignes_deductible.aggregate(total=Sum('debit'))['total'] or 0
+            self.tva_deductible = totaux['tva_deductible']
 
         diff = self.tva_collectee - self.tva_deductible
         if diff > 0:
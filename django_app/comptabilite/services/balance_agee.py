@@ -0,0 +1,130 @@
+"""
+Balance âgée des comptes de tiers calculée en base.
+
+Une seule requête : les postes ouverts (LigneEcriture.est_ouverte) des
+comptes 411 ou 401 sont regroupés par tiers et répartis par tranche
+d'ancienneté avec une agrégation conditionnelle (SUM(CASE WHEN ...)).
+Les tranches sont exprimées en bornes de dates calculées une fois pour
+la date de référence : la comparaison porte directement sur la date de
+l'écriture.
+
+À une date de référence passée, la balance reflète l'état du lettrage à
+cette date : une ligne lettrée après cette date y figure encore.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case, DecimalField, Exists, F, Min, OuterRef, Q, Sum, Value, When,
+)
+from django.db.models.functions import Abs, Coalesce, Substr
+from django.utils import timezone
+
+PREFIXES_TIERS = {'clients': '411', 'fournisseurs': '401'}
+
+# (code, libellé, ancienneté maximale en jours ; None = sans limite)
+TRANCHES = [
+    ('non_echu', 'Non échu', -1),
+    ('0_30', '0-30 j', 30),
+    ('31_60', '31-60 j', 60),
+    ('61_90', '61-90 j', 90),
+    ('plus_90', '> 90 j', None),
+]
+
+
+@dataclass
+class BalanceAgee:
+    """Lignes par tiers (dictionnaires) et totaux par tranche."""
+    type_compte: str
+    date_reference: object
+    lignes: list
+    totaux: dict
+
+    @property
+    def titre(self):
+        return 'Clients' if self.type_compte == 'clients' else 'Fournisseurs'
+
+
+def _montant(type_compte):
+    """Solde d'une ligne dans le sens normal du compte de tiers."""
+    if type_compte == 'clients':
+        return F('debit') - F('credit')
+    return F('credit') - F('debit')
+
+
+def _tranche(type_compte, date_reference, age_min, age_max):
+    """Somme des soldes des lignes dont l'ancienneté est dans [age_min, age_max]."""
+    condition = Q()
+    if age_min is not None:
+        condition &= Q(ecriture__date__lte=date_reference - timedelta(days=age_min))
+    if age_max is not None:
+        condition &= Q(ecriture__date__gte=date_reference - timedelta(days=age_max))
+    return Coalesce(
+        Sum(Case(When(condition, then=_montant(type_compte)), default=Value(0),
+                 output_field=DecimalField(max_digits=15, decimal_places=0))),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=15, decimal_places=0),
+    )
+
+
+def postes_ouverts(type_compte, date_reference, exercice=None):
+    """Lignes non lettrées à la date de référence des comptes du type de tiers."""
+    from comptabilite.models import Lettrage, LigneEcriture
+
+    lignes = LigneEcriture.objects.filter(
+        compte__numero__startswith=PREFIXES_TIERS.get(type_compte, '401'),
+        ecriture__statut='valide',
+    )
+    if exercice:
+        lignes = lignes.filter(ecriture__exercice=exercice)
+
+    if date_reference >= timezone.localdate():
+        return lignes.filter(est_ouverte=True)
+
+    # Lignes ouvertes, ou lettrées après la date de référence
+    fin_journee = timezone.make_aware(datetime.combine(date_reference, time.max))
+    lettree_apres = Lettrage.lignes.through.objects.filter(
+        ligneecriture_id=OuterRef('pk'),
+        lettrage__est_partiel=False,
+        lettrage__date_lettrage__gt=fin_journee,
+    )
+    return lignes.filter(Q(est_ouverte=True) | Exists(lettree_apres))
+
+
+def calculer(type_compte, date_reference, exercice=None):
+    """Balance âgée par tiers, en une requête groupée."""
+    # Tranches contiguës ; ancienneté négative (non échu) : écritures
+    # postérieures à la date de référence
+    age_min = None
+    tranches = {}
+    for code, _libelle, age_max in TRANCHES:
+        tranches[code] = _tranche(type_compte, date_reference, age_min, age_max)
+        age_min = age_max + 1 if age_max is not None else None
+
+    lignes = list(
+        postes_ouverts(type_compte, date_reference, exercice).annotate(
+            # Sans tiers saisi, le libellé de l'écriture sert de tiers
+            nom_tiers=Case(
+                When(tiers='', then=Substr('ecriture__libelle', 1, 30)),
+                default=F('tiers'),
+            ),
+        ).values('nom_tiers').annotate(
+            compte_numero=Min('compte__numero'),
+            total=Coalesce(
+                Sum(_montant(type_compte), output_field=DecimalField(max_digits=15, decimal_places=0)),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=15, decimal_places=0),
+            ),
+            **tranches,
+        ).exclude(total=0).order_by(Abs('total').desc(), 'nom_tiers')
+    )
+
+    totaux = {code: Decimal('0') for code, _libelle, _age in TRANCHES}
+    totaux['total'] = Decimal('0')
+    for ligne in lignes:
+        ligne['tiers'] = ligne.pop('nom_tiers')
+        for code in totaux:
+            totaux[code] += ligne[code]
+
+    return BalanceAgee(type_compte, date_reference, lignes, totaux)
@@ -0,0 +1,401 @@
+"""
+Clôture d'exercice ensembliste et reprenable.
+
+Les soldes de tous les comptes sont calculés en une seule requête groupée
+(au lieu d'un get_solde() par compte), puis les écritures de clôture et
+d'à-nouveaux sont insérées par lots (bulk_create).
+
+- preparer() construit le plan de clôture sans rien écrire : résultat,
+  lignes de solde des comptes de gestion, lignes d'à-nouveaux. Il sert
+  d'aperçu (simulation) à la pré-clôture et à la clôture.
+- cloturer() exécute la clôture en étapes courtes, chacune dans sa propre
+  transaction : la base n'est jamais verrouillée pendant toute l'opération.
+  Chaque étape vérifie si elle a déjà été faite : après une erreur ou un
+  arrêt du serveur, relancer la clôture reprend là où elle s'était arrêtée.
+- lancer() exécute cloturer() dans un thread ; l'avancement est suivi
+  dans le cache (progression()). Le verrou contre un double lancement est
+  en base (ExerciceComptable.cloture_verrouillee_le), posé par un UPDATE
+  conditionnel : un seul processus l'obtient. Il est prolongé à chaque
+  étape et repris après DELAI_VERROU si le processus s'est arrêté.
+
+L'exercice ne passe au statut « clôturé » qu'à la dernière étape.
+"""
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CLASSES_BILAN = ['1', '2', '3', '4', '5']
+CLASSES_GESTION = ['6', '7']
+
+# Comptes de résultat de l'exercice, par ordre de préférence
+NUMEROS_COMPTE_RESULTAT = ['130', '13']
+
+TAILLE_LOT = 500
+
+# Dotation aux amortissements de la pré-clôture (linéaire, exemple)
+NUMERO_COMPTE_DOTATION = '6811'
+TAUX_AMORTISSEMENT = Decimal('0.20')
+
+CACHE_TIMEOUT_PROGRESSION = 86400  # 24 heures
+DELAI_VERROU = timedelta(hours=1)  # sans étape terminée, le verrou peut être repris
+
+
+@dataclass
+class SoldeCompte:
+    """Solde (débit - crédit) d'un compte sur l'exercice."""
+    compte_id: int
+    numero: str
+    libelle: str
+    classe: str
+    solde: Decimal
+
+
+@dataclass
+class PlanCloture:
+    """Écritures que la clôture va générer (aucune écriture en base)."""
+    exercice: object
+    compte_resultat: object
+    soldes_gestion: list = field(default_factory=list)
+    soldes_bilan: list = field(default_factory=list)
+
+    @property
+    def resultat(self):
+        """Produits - charges, soit l'opposé du solde des classes 6 et 7."""
+        return -sum((s.solde for s in self.soldes_gestion), Decimal('0'))
+
+    @property
+    def erreurs(self):
+        erreurs = []
+        if self.compte_resultat is None:
+            erreurs.append(
+                f"Compte de résultat introuvable ({' ou '.join(NUMEROS_COMPTE_RESULTAT)})"
+            )
+        return erreurs
+
+    def lignes_resultat(self):
+        """Lignes (compte_id, libellé, débit, crédit) de détermination du résultat."""
+        lignes = [
+            (s.compte_id, f"Solde {s.numero}", max(-s.solde, 0), max(s.solde, 0))
+            for s in self.soldes_gestion
+        ]
+        resultat = self.resultat
+        if resultat > 0:
+            lignes.append((self.compte_resultat.pk, "Résultat de l'exercice (bénéfice)", 0, resultat))
+        elif resultat < 0:
+            lignes.append((self.compte_resultat.pk, "Résultat de l'exercice (perte)", -resultat, 0))
+        return lignes
+
+    def soldes_report(self):
+        """Soldes des comptes de bilan après affectation du résultat."""
+        soldes = {s.compte_id: s.solde for s in self.soldes_bilan}
+        if self.compte_resultat is not None and self.resultat:
+            pk = self.compte_resultat.pk
+            soldes[pk] = soldes.get(pk, Decimal('0')) - self.resultat
+        return soldes
+
+    def resume(self):
+        """Aperçu sérialisable en JSON."""
+        lignes_resultat = self.lignes_resultat() if self.compte_resultat else []
+        report = [solde for solde in self.soldes_report().values() if solde]
+        return {
+            'exercice': self.exercice.libelle,
+            'resultat': float(self.resultat),
+            'comptes_gestion_soldes': len(self.soldes_gestion),
+            'lignes_resultat': len(lignes_resultat),
+            'lignes_a_nouveau': len(report),
+            'total_a_nouveau': float(sum((s for s in report if s > 0), Decimal('0'))),
+            'erreurs': self.erreurs,
+        }
+
+
+def soldes_par_compte(exercice, classes, **filtres):
+    """
+    Soldes non nuls des comptes des classes données sur l'exercice,
+    en une requête groupée (mêmes critères que CompteComptable.get_solde).
+    """
+    from comptabilite.models import LigneEcriture
+
+    lignes = LigneEcriture.objects.filter(
+        ecriture__statut='valide',
+        ecriture__date__gte=exercice.date_debut,
+        ecriture__date__lte=exercice.date_fin,
+        compte__classe__in=classes,
+        **filtres
+    ).values(
+        'compte_id', 'compte__numero', 'compte__libelle', 'compte__classe'
+    ).annotate(
+        solde=Coalesce(Sum('debit'), Decimal('0')) - Coalesce(Sum('credit'), Decimal('0'))
+    ).exclude(solde=0).order_by('compte__numero').values_list(
+        'compte_id', 'compte__numero', 'compte__libelle', 'compte__classe', 'solde'
+    )
+
+    return [SoldeCompte(*ligne) for ligne in lignes]
+
+
+def get_compte_resultat():
+    from comptabilite.models import CompteComptable
+
+    comptes = {c.numero: c for c in CompteComptable.objects.filter(numero__in=NUMEROS_COMPTE_RESULTAT)}
+    return next((comptes[n] for n in NUMEROS_COMPTE_RESULTAT if n in comptes), None)
+
+
+def preparer(exercice):
+    """Plan de clôture de l'exercice (simulation, 2 requêtes)."""
+    soldes = soldes_par_compte(exercice, CLASSES_BILAN + CLASSES_GESTION)
+    return PlanCloture(
+        exercice=exercice,
+        compte_resultat=get_compte_resultat(),
+        soldes_gestion=[s for s in soldes if s.classe in CLASSES_GESTION],
+        soldes_bilan=[s for s in soldes if s.classe in CLASSES_BILAN],
+    )
+
+
+def generer_amortissements(exercice):
+    """
+    Pré-clôture : une écriture de dotation (brouillon) par immobilisation
+    de solde débiteur ayant son compte d'amortissement 28xx.
+
+    Returns:
+        list: Numéros des écritures générées
+    """
+    from comptabilite.models import CompteComptable, EcritureComptable, Journal, LigneEcriture
+
+    immobilisations = [
+        s for s in soldes_par_compte(exercice, ['2'], compte__actif=True)
+        if not s.numero.startswith('28') and s.solde > 0
+    ]
+    numeros_comptes = {f"28{s.numero[1:]}" for s in immobilisations} | {NUMERO_COMPTE_DOTATION}
+    comptes = dict(CompteComptable.objects.filter(numero__in=numeros_comptes).values_list('numero', 'pk'))
+    compte_dotation = comptes.get(NUMERO_COMPTE_DOTATION)
+
+    dotations = []
+    for immo in immobilisations:
+        montant = (immo.solde * TAUX_AMORTISSEMENT).quantize(Decimal('1'))
+        compte_amort = comptes.get(f"28{immo.numero[1:]}")
+        if compte_amort and compte_dotation and montant > 0:
+            dotations.append((immo, compte_amort, montant))
+
+    if not dotations:
+        return []
+
+    journal_od = Journal.objects.get(code='OD')
+    date_cloture = exercice.date_fin
+    with transaction.atomic():
+        numeros = EcritureComptable.generer_numeros(journal_od, date_cloture, len(dotations))
+        ecritures = EcritureComptable.objects.bulk_create([
+            EcritureComptable(
+                numero=numero,
+                date=date_cloture,
+                journal=journal_od,
+                exercice=exercice,
+                libelle=f"Dotation amortissement {immo.libelle}",
+                statut='brouillon',
+                origine='cloture',
+            )
+            for numero, (immo, _compte, _montant) in zip(numeros, dotations)
+        ], batch_size=TAILLE_LOT)
+
+        lignes = []
+        for ecriture, (immo, compte_amort, montant) in zip(ecritures, dotations):
+            lignes.append(LigneEcriture(
+                ecriture=ecriture, compte_id=compte_dotation,
+                libelle=f"Dotation amortissement {immo.numero}", debit=montant, credit=0,
+            ))
+            lignes.append(LigneEcriture(
+                ecriture=ecriture, compte_id=compte_amort,
+                libelle=f"Amortissement {immo.numero}", debit=0, credit=montant,
+            ))
+        LigneEcriture.objects.bulk_create(lignes, batch_size=TAILLE_LOT)
+
+    return numeros
+
+
+# ============================================================================
+# Exécution
+# ============================================================================
+
+def get_progression_cache_key(exercice_id):
+    return f"comptabilite_cloture_{exercice_id}"
+
+
+def progression(exercice_id):
+    """État de la dernière clôture lancée pour l'exercice (None si aucune)."""
+    return cache.get(get_progression_cache_key(exercice_id))
+
+
+def _signaler(exercice, etat, message, **donnees):
+    cache.set(
+        get_progression_cache_key(exercice.pk),
+        {'etat': etat, 'message': message, **donnees},
+        CACHE_TIMEOUT_PROGRESSION,
+    )
+    if etat == 'en_cours':
+        _prolonger_verrou(exercice)
+
+
+def prendre_verrou(exercice):
+    """
+    Pose le verrou de clôture par un UPDATE conditionnel (atomique en base).
+
+    Returns:
+        bool: False si une clôture est en cours ou l'exercice déjà clôturé
+    """
+    from comptabilite.models import ExerciceComptable
+
+    maintenant = timezone.now()
+    return ExerciceComptable.objects.filter(pk=exercice.pk, statut='ouvert').filter(
+        Q(cloture_verrouillee_le__isnull=True) |
+        Q(cloture_verrouillee_le__lt=maintenant - DELAI_VERROU)
+    ).update(cloture_verrouillee_le=maintenant) == 1
+
+
+def _prolonger_verrou(exercice):
+    from comptabilite.models import ExerciceComptable
+
+    ExerciceComptable.objects.filter(
+        pk=exercice.pk, cloture_verrouillee_le__isnull=False
+    ).update(cloture_verrouillee_le=timezone.now())
+
+
+def liberer_verrou(exercice):
+    from comptabilite.models import ExerciceComptable
+
+    ExerciceComptable.objects.filter(pk=exercice.pk).update(cloture_verrouillee_le=None)
+
+
+def _journal(code, libelle):
+    from comptabilite.models import Journal
+
+    return Journal.objects.get_or_create(
+        code=code,
+        defaults={'libelle': libelle, 'type_journal': code, 'actif': True}
+    )[0]
+
+
+def _creer_ecriture(exercice, journal, date_ecriture, libelle, lignes):
+    """Crée une écriture validée et ses lignes (compte_id, libellé, débit, crédit) par lots."""
+    from comptabilite.models import EcritureComptable, LigneEcriture
+
+    with transaction.atomic():
+        ecriture = EcritureComptable.objects.create(
+            numero=EcritureComptable.generer_numero(journal, date_ecriture),
+            date=date_ecriture,
+            journal=journal,
+            exercice=exercice,
+            libelle=libelle,
+            statut='valide',
+            origine='cloture',
+        )
+        LigneEcriture.objects.bulk_create(
+            [
+                LigneEcriture(ecriture=ecriture, compte_id=compte_id, libelle=libelle_ligne,
+                              debit=debit, credit=credit)
+                for compte_id, libelle_ligne, debit, credit in lignes
+            ],
+            batch_size=TAILLE_LOT,
+        )
+    return ecriture
+
+
+def _ecriture_cloture_existe(exercice, journal):
+    from comptabilite.models import EcritureComptable
+
+    return EcritureComptable.objects.filter(
+        exercice=exercice, journal=journal, origine='cloture'
+    ).exists()
+
+
+def cloturer(exercice):
+    """
+    Clôture l'exercice : détermination du résultat, ouverture de l'exercice
+    suivant, à-nouveaux, puis statut « clôturé ». Reprend après la dernière
+    étape terminée si elle est relancée.
+
+    Returns:
+        ExerciceComptable: Le nouvel exercice
+    """
+    from comptabilite.models import ExerciceComptable
+
+    journal_cloture = _journal('CL', 'Journal de clôture')
+    journal_an = _journal('AN', 'À nouveau')
+
+    # 1. Détermination du résultat (solde des classes 6 et 7)
+    if not _ecriture_cloture_existe(exercice, journal_cloture):
+        _signaler(exercice, 'en_cours', "Détermination du résultat")
+        plan = preparer(exercice)
+        if plan.erreurs:
+            raise ValueError(plan.erreurs[0])
+        _creer_ecriture(
+            exercice, journal_cloture, exercice.date_fin,
+            "Détermination du résultat de l'exercice", plan.lignes_resultat(),
+        )
+
+    # 2. Exercice suivant
+    _signaler(exercice, 'en_cours', "Ouverture de l'exercice suivant")
+    nouvel_exercice, _ = ExerciceComptable.objects.get_or_create(
+        date_debut=exercice.date_fin + timedelta(days=1),
+        defaults={
+            'libelle': f"Exercice {exercice.date_fin.year + 1}",
+            'date_fin': date(exercice.date_fin.year + 1, exercice.date_fin.month, exercice.date_fin.day),
+            'statut': 'ouvert',
+            'est_premier_exercice': False,
+        }
+    )
+
+    # 3. À-nouveaux (classes 1 à 5, résultat compris)
+    if not _ecriture_cloture_existe(nouvel_exercice, journal_an):
+        _signaler(exercice, 'en_cours', "Report à nouveau")
+        lignes = [
+            (s.compte_id, f"À nouveau {s.numero}", max(s.solde, 0), max(-s.solde, 0))
+            for s in soldes_par_compte(exercice, CLASSES_BILAN)
+        ]
+        _creer_ecriture(nouvel_exercice, journal_an, nouvel_exercice.date_debut, "Report à nouveau", lignes)
+
+    # 4. Clôture de l'exercice
+    ExerciceComptable.objects.filter(pk=exercice.pk).update(statut='cloture')
+    exercice.statut = 'cloture'
+
+    _signaler(
+        exercice, 'termine',
+        f"Exercice clôturé. Nouvel exercice {nouvel_exercice.libelle} créé.",
+        nouvel_exercice_id=nouvel_exercice.pk,
+    )
+    return nouvel_exercice
+
+
+def lancer(exercice):
+    """
+    Lance la clôture en arrière-plan.
+
+    Returns:
+        bool: False si une clôture de cet exercice est déjà en cours
+        (ou s'il est déjà clôturé)
+    """
+    if not prendre_verrou(exercice):
+        return False
+
+    _signaler(exercice, 'en_cours', "Clôture lancée")
+
+    def executer():
+        try:
+            cloturer(exercice)
+        except Exception as e:
+            logger.exception("Clôture de l'exercice %s interrompue", exercice.pk)
+            _signaler(exercice, 'erreur', f"Clôture interrompue : {e}. Relancez-la pour la reprendre.")
+        finally:
+            liberer_verrou(exercice)
+            # Le thread a sa propre connexion
+            connection.close()
+
+    threading.Thread(target=executer, name=f"cloture-{exercice.pk}", daemon=True).start()
+    return True
@@ -0,0 +1,322 @@
+"""
+Comptabilisation par lots des factures et des mouvements de trésorerie.
+
+Les pièces sources sont lues par lots. Pour chaque lot :
+- les pièces déjà comptabilisées sont écartées d'une seule requête sur
+  la clé d'origine indexée (EcritureComptable.cle_origine) ;
+- les comptes sont résolus dans le plan comptable en cache (numéro -> id,
+  invalidé par signal), les journaux et exercices ouverts sont chargés
+  une fois par appel ;
+- les numéros d'écriture sont réservés en bloc par journal et par mois ;
+- écritures et lignes sont insérées par bulk_create.
+
+Une pièce dont un compte, un journal ou l'exercice est introuvable est
+ignorée (comme par la génération unitaire) et comptée comme telle.
+Les écritures générées sont des brouillons, à valider en comptabilité.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+
+TAILLE_LOT = 500
+
+CACHE_KEY_PLAN_COMPTABLE = 'comptabilite_plan_comptable'
+CACHE_TIMEOUT_PLAN_COMPTABLE = 3600  # 1 heure (invalidé par signal)
+
+# Comptes utilisés à défaut de la configuration comptable
+COMPTE_CLIENTS = '411'
+COMPTE_PRODUITS = '706'
+COMPTE_TVA_COLLECTEE = '4431'
+COMPTE_CAISSE = '571'
+COMPTE_BANQUE = '5211'
+COMPTE_PRODUITS_DIVERS = '758'
+COMPTE_CHARGES_DIVERSES = '658'
+
+# Contrepartie d'un mouvement de trésorerie selon sa catégorie
+CONTREPARTIES_CATEGORIE = {
+    'loyer': '6131',
+    'salaire': '6411',
+    'virement_interne': '585',
+}
+
+# Factures comptabilisables (ni brouillon, ni annulée)
+STATUTS_FACTURE = ['attente', 'payee']
+STATUTS_MOUVEMENT = ['valide', 'rapproche']
+
+
+@dataclass
+class Resultat:
+    """Bilan d'une comptabilisation par lots."""
+    crees: int = 0
+    deja_comptabilises: int = 0
+    ignores: int = 0
+    ecriture_ids: list = field(default_factory=list)
+
+    def __iadd__(self, autre):
+        self.crees += autre.crees
+        self.deja_comptabilises += autre.deja_comptabilises
+        self.ignores += autre.ignores
+        self.ecriture_ids += autre.ecriture_ids
+        return self
+
+    def as_dict(self):
+        return {
+            'crees': self.crees,
+            'deja_comptabilises': self.deja_comptabilises,
+            'ignores': self.ignores,
+        }
+
+
+@dataclass
+class _Piece:
+    cle: str
+    journal: object
+    exercice: object
+    date: object
+    libelle: str
+    reference: str
+    origine: str
+    lignes: list  # (compte_id, libellé, débit, crédit, tiers)
+    facture_id: int = None
+    dossier_id: int = None
+
+
+def get_plan_comptable():
+    """Plan comptable en cache : numéro de compte -> id."""
+    plan = cache.get(CACHE_KEY_PLAN_COMPTABLE)
+
+    if plan is None:
+        from comptabilite.models import CompteComptable
+        plan = dict(CompteComptable.objects.values_list('numero', 'id'))
+        cache.set(CACHE_KEY_PLAN_COMPTABLE, plan, CACHE_TIMEOUT_PLAN_COMPTABLE)
+
+    return plan
+
+
+def invalidate_plan_comptable_cache():
+    """Invalide le plan comptable en cache."""
+    cache.delete(CACHE_KEY_PLAN_COMPTABLE)
+
+
+class _Contexte:
+    """Référentiels chargés une fois par comptabilisation."""
+
+    def __init__(self):
+        from comptabilite.models import ConfigurationComptable, ExerciceComptable, Journal
+
+        self.plan = get_plan_comptable()
+        self.config = ConfigurationComptable.get_instance()
+        self.journaux = {j.code: j for j in Journal.objects.filter(code__in=['VE', 'BQ', 'CA'])}
+        self.exercices = list(ExerciceComptable.objects.filter(statut='ouvert'))
+
+    def compte(self, numero, configure_id=None):
+        return configure_id or self.plan.get(numero)
+
+    def exercice(self, date_piece):
+        return next(
+            (e for e in self.exercices if e.date_debut <= date_piece <= e.date_fin), None
+        )
+
+
+def _piece_facture(facture, contexte):
+    """Écriture de vente d'une facture (sens inversé pour un avoir)."""
+    journal = contexte.journaux.get('VE')
+    exercice = contexte.exercice(facture.date_emission)
+    compte_client = contexte.compte(COMPTE_CLIENTS, contexte.config.compte_clients_id)
+    compte_produit = contexte.compte(COMPTE_PRODUITS, contexte.config.compte_honoraires_id)
+    compte_tva = contexte.plan.get(COMPTE_TVA_COLLECTEE)
+    if not (journal and exercice and compte_client and compte_produit):
+        return None
+    if facture.montant_tva and not compte_tva:
+        return None
+
+    libelle = f"Facture {facture.numero}"
+    sens = -1 if facture.montant_ttc < 0 else 1
+
+    def montants(montant):
+        """(débit, crédit) d'une ligne au débit pour une facture"""
+        return (abs(montant), 0) if sens > 0 else (0, abs(montant))
+
+    lignes = [(compte_client, libelle, *montants(facture.montant_ttc), facture.client or '')]
+    lignes.append((compte_produit, libelle, *reversed(montants(facture.montant_ht)), ''))
+    if facture.montant_tva:
+        lignes.append((compte_tva, f"TVA {libelle}", *reversed(montants(facture.montant_tva)), ''))
+
+    return _Piece(
+        cle=f"facture:{facture.pk}",
+        journal=journal,
+        exercice=exercice,
+        date=facture.date_emission,
+        libelle=f"{libelle} - {facture.client}"[:200],
+        reference=facture.numero,
+        origine='facture',
+        lignes=lignes,
+        facture_id=facture.pk,
+        dossier_id=facture.dossier_id,
+    )
+
+
+def _piece_mouvement(mouvement, contexte):
+    """Écriture de caisse ou de banque d'un mouvement de trésorerie."""
+    if mouvement.compte.type_compte == 'caisse':
+        journal = contexte.journaux.get('CA')
+        compte_tresorerie = contexte.compte(COMPTE_CAISSE, contexte.config.compte_caisse_id)
+    else:
+        journal = contexte.journaux.get('BQ')
+        compte_tresorerie = contexte.compte(COMPTE_BANQUE, contexte.config.compte_banque_principal_id)
+
+    if mouvement.categorie in CONTREPARTIES_CATEGORIE:
+        contrepartie = contexte.plan.get(CONTREPARTIES_CATEGORIE[mouvement.categorie])
+    elif mouvement.type_mouvement == 'entree':
+        contrepartie = (
+            contexte.compte(COMPTE_CLIENTS, contexte.config.compte_clients_id)
+            if mouvement.facture_id else contexte.plan.get(COMPTE_PRODUITS_DIVERS)
+        )
+    else:
+        contrepartie = contexte.plan.get(COMPTE_CHARGES_DIVERSES)
+
+    exercice = contexte.exercice(mouvement.date_mouvement)
+    if not (journal and exercice and compte_tresorerie and contrepartie):
+        return None
+
+    libelle = (mouvement.libelle or f"Mouvement {mouvement.get_type_mouvement_display()}")[:200]
+    tiers = mouvement.tiers or ''
+    if mouvement.type_mouvement == 'entree':
+        debite, credite = compte_tresorerie, contrepartie
+    else:
+        debite, credite = contrepartie, compte_tresorerie
+
+    return _Piece(
+        cle=f"mouvement:{mouvement.pk}",
+        journal=journal,
+        exercice=exercice,
+        date=mouvement.date_mouvement,
+        libelle=libelle,
+        reference=(mouvement.reference or '')[:100],
+        origine='tresorerie',
+        lignes=[
+            (debite, libelle, mouvement.montant, 0, tiers),
+            (credite, libelle, 0, mouvement.montant, tiers),
+        ],
+        facture_id=mouvement.facture_id,
+        dossier_id=mouvement.dossier_id,
+    )
+
+
+def _comptabiliser(sources, construire, prefixe, utilisateur, taille_lot):
+    from comptabilite.models import EcritureComptable, LigneEcriture
+
+    contexte = _Contexte()
+    resultat = Resultat()
+    lot = []
+
+    def traiter(lot):
+        cles = [f"{prefixe}:{source.pk}" for source in lot]
+        existantes = set(
+            EcritureComptable.objects.filter(cle_origine__in=cles).values_list('cle_origine', flat=True)
+        )
+        pieces = []
+        for source, cle in zip(lot, cles):
+            if cle in existantes:
+                resultat.deja_comptabilises += 1
+                continue
+            piece = construire(source, contexte)
+            if piece is None:
+                resultat.ignores += 1
+            else:
+                pieces.append(piece)
+        if not pieces:
+            return
+
+        with transaction.atomic():
+            # Numéros réservés en bloc par journal et par mois
+            par_periode = defaultdict(list)
+            for piece in pieces:
+                par_periode[(piece.journal.code, piece.date.year, piece.date.month)].append(piece)
+            numeros = {}
+            for groupe in par_periode.values():
+                premiere = groupe[0]
+                for piece, numero in zip(
+                    groupe, EcritureComptable.generer_numeros(premiere.journal, premiere.date, len(groupe))
+                ):
+                    numeros[piece.cle] = numero
+
+            ecritures = EcritureComptable.objects.bulk_create([
+                EcritureComptable(
+                    numero=numeros[piece.cle],
+                    date=piece.date,
+                    journal=piece.journal,
+                    exercice=piece.exercice,
+                    libelle=piece.libelle,
+                    reference=piece.reference,
+                    statut='brouillon',
+                    origine=piece.origine,
+                    facture_id=piece.facture_id,
+                    dossier_id=piece.dossier_id,
+                    cle_origine=piece.cle,
+                    cree_par=utilisateur,
+                )
+                for piece in pieces
+            ])
+            LigneEcriture.objects.bulk_create([
+                LigneEcriture(
+                    ecriture_id=ecriture.id,
+                    compte_id=compte_id,
+                    libelle=libelle,
+                    debit=debit,
+                    credit=credit,
+                    tiers=tiers[:200],
+                )
+                for ecriture, piece in zip(ecritures, pieces)
+                for compte_id, libelle, debit, credit, tiers in piece.lignes
+            ], batch_size=taille_lot)
+
+        resultat.crees += len(ecritures)
+        resultat.ecriture_ids += [e.id for e in ecritures]
+
+    for source in sources:
+        lot.append(source)
+        if len(lot) >= taille_lot:
+            traiter(lot)
+            lot = []
+    if lot:
+        traiter(lot)
+    return resultat
+
+
+def comptabiliser_factures(factures, utilisateur=None, taille_lot=TAILLE_LOT):
+    """Génère les écritures de vente des factures non encore comptabilisées."""
+    return _comptabiliser(
+        factures.order_by('date_emission', 'pk').iterator(chunk_size=taille_lot),
+        _piece_facture, 'facture', utilisateur, taille_lot,
+    )
+
+
+def comptabiliser_mouvements(mouvements, utilisateur=None, taille_lot=TAILLE_LOT):
+    """Génère les écritures de trésorerie des mouvements non encore comptabilisés."""
+    return _comptabiliser(
+        mouvements.select_related('compte').order_by('date_mouvement', 'pk').iterator(chunk_size=taille_lot),
+        _piece_mouvement, 'mouvement', utilisateur, taille_lot,
+    )
+
+
+def comptabiliser_periode(date_debut, date_fin, utilisateur=None, taille_lot=TAILLE_LOT):
+    """Comptabilise les factures émises et les mouvements validés de la période."""
+    from gestion.models import Facture
+    from tresorerie.models import MouvementTresorerie
+
+    resultat = comptabiliser_factures(
+        Facture.objects.filter(
+            statut__in=STATUTS_FACTURE, date_emission__range=(date_debut, date_fin)
+        ),
+        utilisateur, taille_lot,
+    )
+    resultat += comptabiliser_mouvements(
+        MouvementTresorerie.objects.filter(
+            statut__in=STATUTS_MOUVEMENT, date_mouvement__range=(date_debut, date_fin)
+        ),
+        utilisateur, taille_lot,
+    )
+    return resultat
@@ -0,0 +1,137 @@
+"""
+Agrégats des états comptables, une requête groupée par état.
+
+- totaux_journaux() : journal centralisateur (débit, crédit et nombre
+  d'écritures par journal, et par mois si demandé) ;
+- totaux_tva() : TVA collectée et déductible d'une période, globale ou
+  mois par mois ;
+- soldes_prefixes() : débit et crédit cumulés de plusieurs racines de
+  comptes (agrégation conditionnelle), pour le bilan, le compte de
+  résultat et les tableaux de flux.
+
+Seules les écritures validées sont prises en compte.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+MONTANT = DecimalField(max_digits=15, decimal_places=0)
+
+
+def _somme(champ, condition=None):
+    """SUM(champ), restreint aux lignes vérifiant `condition`, 0 si aucune."""
+    expression = Case(When(condition, then=champ), output_field=MONTANT) if condition else champ
+    return Coalesce(Sum(expression, output_field=MONTANT), Value(Decimal('0')), output_field=MONTANT)
+
+
+def _lignes_validees(exercice=None, date_debut=None, date_fin=None):
+    from comptabilite.models import LigneEcriture
+
+    lignes = LigneEcriture.objects.filter(ecriture__statut='valide')
+    if exercice:
+        lignes = lignes.filter(ecriture__exercice=exercice)
+    if date_debut:
+        lignes = lignes.filter(ecriture__date__gte=date_debut)
+    if date_fin:
+        lignes = lignes.filter(ecriture__date__lte=date_fin)
+    return lignes
+
+
+def totaux_journaux(exercice=None, date_debut=None, date_fin=None, par_mois=False):
+    """
+    Totaux par journal actif (et par mois avec par_mois=True).
+
+    Retourne des dictionnaires journal_id, code, libelle, type_journal,
+    type_libelle, mois (None sans détail mensuel), nb_ecritures,
+    total_debit, total_credit, triés par code de journal puis par mois.
+    """
+    from comptabilite.models import Journal
+
+    lignes = _lignes_validees(exercice, date_debut, date_fin).filter(ecriture__journal__actif=True)
+    champs = ['ecriture__journal_id', 'ecriture__journal__code', 'ecriture__journal__libelle',
+              'ecriture__journal__type_journal']
+    if par_mois:
+        lignes = lignes.annotate(mois=TruncMonth('ecriture__date'))
+        champs.append('mois')
+
+    types = dict(Journal.TYPE_CHOICES)
+    resultats = []
+    for ligne in lignes.values(*champs).annotate(
+        nb_ecritures=Count('ecriture', distinct=True),
+        total_debit=_somme('debit'),
+        total_credit=_somme('credit'),
+    ).order_by('ecriture__journal__code', *(['mois'] if par_mois else [])):
+        resultats.append({
+            'journal_id': ligne['ecriture__journal_id'],
+            'code': ligne['ecriture__journal__code'],
+            'libelle': ligne['ecriture__journal__libelle'],
+            'type_journal': ligne['ecriture__journal__type_journal'],
+            'type_libelle': types.get(ligne['ecriture__journal__type_journal'], ''),
+            'mois': ligne.get('mois'),
+            'nb_ecritures': ligne['nb_ecritures'],
+            'total_debit': ligne['total_debit'],
+            'total_credit': ligne['total_credit'],
+        })
+    return resultats
+
+
+def totaux_tva(compte_collectee, compte_deductible, exercice=None, date_debut=None,
+               date_fin=None, par_mois=False):
+    """
+    TVA collectée (crédits du compte collectée) et déductible (débits du
+    compte déductible) en une requête.
+
+    Retourne {'tva_collectee', 'tva_deductible'}, ou avec par_mois=True une
+    liste de ces dictionnaires complétés de 'mois', triée par mois.
+    Un compte non paramétré donne un montant nul.
+    """
+    agregats = {}
+    if compte_collectee:
+        agregats['tva_collectee'] = _somme('credit', Q(compte=compte_collectee))
+    if compte_deductible:
+        agregats['tva_deductible'] = _somme('debit', Q(compte=compte_deductible))
+    zero = {'tva_collectee': Decimal('0'), 'tva_deductible': Decimal('0')}
+    if not agregats:
+        return [] if par_mois else zero
+
+    lignes = _lignes_validees(exercice, date_debut, date_fin).filter(
+        compte__in=[c for c in (compte_collectee, compte_deductible) if c]
+    )
+    if not par_mois:
+        return {**zero, **lignes.aggregate(**agregats)}
+
+    return [
+        {**zero, **mois}
+        for mois in lignes.annotate(mois=TruncMonth('ecriture__date')).values('mois').annotate(
+            **agregats
+        ).order_by('mois')
+    ]
+
+
+def soldes_prefixes(prefixes, exercice=None, date_debut=None, date_fin=None):
+    """
+    Débit et crédit cumulés des comptes commençant par chaque racine.
+
+    Retourne {racine: (debit, credit)} ; les racines peuvent se recouvrir
+    ('40' et '401'), chacune est agrégée séparément dans la même requête.
+    """
+    prefixes = list(dict.fromkeys(prefixes))
+    if not prefixes:
+        return {}
+
+    filtre = Q()
+    for prefixe in prefixes:
+        filtre |= Q(compte__numero__startswith=prefixe)
+
+    agregats = {}
+    for i, prefixe in enumerate(prefixes):
+        condition = Q(compte__numero__startswith=prefixe)
+        agregats[f'debit_{i}'] = _somme('debit', condition)
+        agregats[f'credit_{i}'] = _somme('credit', condition)
+
+    totaux = _lignes_validees(exercice, date_debut, date_fin).filter(filtre).aggregate(**agregats)
+    return {
+        prefixe: (totaux[f'debit_{i}'], totaux[f'credit_{i}'])
+        for i, prefixe in enumerate(prefixes)
+    }
@@ -0,0 +1,220 @@
+"""
+Lettrage automatique des comptes de tiers (clients 411, fournisseurs 401).
+
+Ne lit que les postes ouverts (LigneEcriture.est_ouverte, indexé avec le
+compte) de tous les comptes demandés, en une seule requête, puis rapproche
+les lignes en mémoire :
+
+1. correspondance exacte par hachage : même compte, même tiers, même
+   référence de pièce et même montant (une facture, son règlement) ;
+2. combinaison : pour une ligne restante, recherche d'un sous-ensemble de
+   lignes de sens opposé du même tiers, datées dans une fenêtre autour
+   d'elle, dont la somme est exactement son montant (règlement de
+   plusieurs factures, facture réglée en plusieurs fois).
+
+proposer() ne fait aucune écriture : les propositions peuvent être
+affichées pour validation. appliquer() les enregistre par lots (codes
+réservés en bloc, bulk_create des lettrages et de leurs lignes, une mise
+à jour des postes ouverts par lot). Une proposition dont une ligne a été
+lettrée entre-temps est ignorée.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Q
+
+TAILLE_LOT = 500
+
+# Écart maximal de dates entre les lignes d'une combinaison
+FENETRE_JOURS = 90
+
+# Bornes de la recherche de combinaisons (coût en 2^CANDIDATS_MAX au pire)
+CANDIDATS_MAX = 12
+LIGNES_MAX_COMBINAISON = 5
+
+PREFIXES_TIERS = {'clients': '411', 'fournisseurs': '401'}
+
+COMMENTAIRE_AUTOMATIQUE = 'Lettrage automatique'
+
+
+@dataclass(frozen=True)
+class Proposition:
+    """Lignes d'un même compte dont les débits égalent les crédits."""
+    compte_id: int
+    ligne_ids: tuple
+    montant: int
+    methode: str  # 'exact' ou 'combinaison'
+
+    def as_dict(self):
+        return {
+            'compte_id': self.compte_id,
+            'lignes': list(self.ligne_ids),
+            'montant': self.montant,
+            'methode': self.methode,
+        }
+
+
+@dataclass
+class _Poste:
+    id: int
+    compte_id: int
+    tiers: str
+    reference: str
+    date: object
+    montant: int  # débit - crédit
+
+    @property
+    def sens(self):
+        return 1 if self.montant > 0 else -1
+
+
+def get_comptes(type_compte=None, compte_id=None):
+    """Comptes à lettrer : un compte précis, ou les comptes d'un type de tiers."""
+    from comptabilite.models import CompteComptable
+
+    comptes = CompteComptable.objects.all()
+    if compte_id:
+        return comptes.filter(id=compte_id)
+    prefixes = [PREFIXES_TIERS[type_compte]] if type_compte in PREFIXES_TIERS else PREFIXES_TIERS.values()
+    filtre = Q()
+    for prefixe in prefixes:
+        filtre |= Q(numero__startswith=prefixe)
+    return comptes.filter(filtre)
+
+
+def postes_ouverts(comptes, exercice=None):
+    """Lignes validées non lettrées des comptes (une requête)."""
+    from comptabilite.models import LigneEcriture
+
+    lignes = LigneEcriture.objects.filter(
+        compte__in=comptes,
+        est_ouverte=True,
+        ecriture__statut='valide',
+    )
+    if exercice:
+        lignes = lignes.filter(ecriture__exercice=exercice)
+
+    return [
+        _Poste(id_, compte_id, tiers, reference, date_, int(debit - credit))
+        for id_, compte_id, tiers, reference, date_, debit, credit in lignes.order_by(
+            'ecriture__date', 'id'
+        ).values_list(
+            'id', 'compte_id', 'tiers', 'ecriture__reference', 'ecriture__date', 'debit', 'credit'
+        )
+        if debit != credit
+    ]
+
+
+def _apparier_exact(postes):
+    """Passe 1 : appariement 1-1 par (compte, tiers, référence, montant)."""
+    attente = defaultdict(list)
+    propositions = []
+    for poste in postes:
+        cle = (poste.compte_id, poste.tiers, poste.reference, abs(poste.montant))
+        # Lignes de sens opposé en attente sur la même clé (la plus ancienne d'abord)
+        opposees = attente[cle + (-poste.sens,)]
+        if opposees:
+            autre = opposees.pop(0)
+            propositions.append(Proposition(
+                poste.compte_id, (autre.id, poste.id), abs(poste.montant), 'exact'
+            ))
+        else:
+            attente[cle + (poste.sens,)].append(poste)
+    lettres = {i for p in propositions for i in p.ligne_ids}
+    return propositions, [p for p in postes if p.id not in lettres]
+
+
+def _sous_ensemble(cible, candidats, lignes_max):
+    """Sous-ensemble de candidats (montant, id) de somme exactement `cible`."""
+    atteintes = {0: ()}
+    for montant, id_ in candidats:
+        for somme, ids in list(atteintes.items()):
+            total = somme + montant
+            if total > cible or total in atteintes or len(ids) >= lignes_max:
+                continue
+            atteintes[total] = ids + (id_,)
+            if total == cible:
+                return atteintes[total]
+    return None
+
+
+def _apparier_combinaisons(postes, fenetre_jours, candidats_max, lignes_max):
+    """Passe 2 : une ligne contre une combinaison de lignes opposées du même tiers."""
+    groupes = defaultdict(list)
+    for poste in postes:
+        groupes[(poste.compte_id, poste.tiers)].append(poste)
+
+    propositions = []
+    for (compte_id, _tiers), lignes in groupes.items():
+        if not any(p.sens > 0 for p in lignes) or not any(p.sens < 0 for p in lignes):
+            continue
+        lettres = set()
+        for poste in lignes:
+            if poste.id in lettres:
+                continue
+            cible = abs(poste.montant)
+            candidats = sorted(
+                (
+                    p for p in lignes
+                    if p.sens != poste.sens and p.id not in lettres and abs(p.montant) <= cible
+                    and abs((p.date - poste.date).days) <= fenetre_jours
+                ),
+                key=lambda p: (abs((p.date - poste.date).days), p.id),
+            )[:candidats_max]
+            ids = _sous_ensemble(cible, [(abs(p.montant), p.id) for p in candidats], lignes_max)
+            if ids:
+                lettres.update(ids)
+                lettres.add(poste.id)
+                propositions.append(Proposition(compte_id, (poste.id,) + ids, cible, 'combinaison'))
+    return propositions
+
+
+def proposer(comptes, exercice=None, fenetre_jours=FENETRE_JOURS,
+             candidats_max=CANDIDATS_MAX, lignes_max=LIGNES_MAX_COMBINAISON):
+    """Propositions de lettrage des postes ouverts des comptes (aucune écriture)."""
+    postes = postes_ouverts(comptes, exercice)
+    propositions, restants = _apparier_exact(postes)
+    propositions += _apparier_combinaisons(restants, fenetre_jours, candidats_max, lignes_max)
+    return propositions
+
+
+def appliquer(propositions, utilisateur=None, commentaire=COMMENTAIRE_AUTOMATIQUE, taille_lot=TAILLE_LOT):
+    """Enregistre les propositions par lots ; retourne le nombre de lettrages créés."""
+    from comptabilite.models import Lettrage, LigneEcriture
+
+    Through = Lettrage.lignes.through
+    crees = 0
+    for debut in range(0, len(propositions), taille_lot):
+        lot = propositions[debut:debut + taille_lot]
+        with transaction.atomic():
+            ids = [i for p in lot for i in p.ligne_ids]
+            ouvertes = set(
+                LigneEcriture.objects.filter(id__in=ids, est_ouverte=True).values_list('id', flat=True)
+            )
+            lot = [p for p in lot if ouvertes.issuperset(p.ligne_ids)]
+            if not lot:
+                continue
+
+            codes = Lettrage.generer_codes(len(lot))
+            lettrages = Lettrage.objects.bulk_create([
+                Lettrage(
+                    code=code,
+                    compte_id=p.compte_id,
+                    montant=p.montant,
+                    est_partiel=False,
+                    lettre_par=utilisateur,
+                    commentaire=commentaire,
+                )
+                for code, p in zip(codes, lot)
+            ])
+            Through.objects.bulk_create([
+                Through(lettrage_id=lettrage.id, ligneecriture_id=ligne_id)
+                for lettrage, p in zip(lettrages, lot)
+                for ligne_id in p.ligne_ids
+            ], batch_size=taille_lot)
+            LigneEcriture.objects.filter(
+                id__in=[i for p in lot for i in p.ligne_ids]
+            ).update(est_ouverte=False)
+            crees += len(lot)
+    return crees
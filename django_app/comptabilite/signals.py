@@ -0,0 +1,46 @@
+"""
+Signaux Django pour le module Comptabilité.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .services.comptabilisation import invalidate_plan_comptable_cache
+
+
+@receiver(pre_delete, sender='comptabilite.Lettrage')
+def rouvrir_lignes_lettrage(sender, instance, **kwargs):
+    """Les lignes d'un lettrage supprimé redeviennent des postes ouverts"""
+    instance.rouvrir_lignes()
+
+
+@receiver(m2m_changed, sender='comptabilite.Lettrage_lignes')
+def suivre_lignes_lettrage(sender, instance, action, reverse, pk_set, **kwargs):
+    """Lignes ajoutées ou retirées d'un lettrage (création, admin) : postes ouverts recalculés"""
+    from .models import LigneEcriture
+
+    if action == 'pre_clear':
+        # pk_set n'est pas fourni pour un clear : on retient les lignes concernées
+        instance._lignes_avant_clear = [instance.pk] if reverse else list(
+            instance.lignes.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            ids = instance.__dict__.pop('_lignes_avant_clear', [])
+        else:
+            ids = [instance.pk] if reverse else pk_set
+        LigneEcriture.recalculer_ouverture(ids)
+
+
+@receiver(post_save, sender='comptabilite.Lettrage')
+def suivre_lettrage_partiel(sender, instance, created, **kwargs):
+    """Un lettrage modifié (complet <-> partiel) ouvre ou ferme ses lignes"""
+    if not created:
+        from .models import LigneEcriture
+        LigneEcriture.recalculer_ouverture(instance.lignes.values('pk'))
+
+
+@receiver(post_save, sender='comptabilite.CompteComptable')
+@receiver(post_delete, sender='comptabilite.CompteComptable')
+def invalider_plan_comptable(sender, **kwargs):
+    """Le plan comptable en cache est recalculé à la prochaine comptabilisation"""
+    invalidate_plan_comptable_cache()
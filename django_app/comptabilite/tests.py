@@ -1,3 +1,441 @@
+"""
+Tests pour le module Comptabilité
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from gestion.models import Facture
+
+
+class ClotureExerciceTest(TestCase):
+    """Tests pour la clôture d'exercice ensembliste"""
+
+    def setUp(self):
+        from datetime import date
+        from comptabilite.models import CompteComptable, EcritureComptable, ExerciceComptable, Journal, LigneEcriture
+        self.exercice = ExerciceComptable.objects.create(
+            libelle='Exercice 2024', date_debut=date(2024, 1, 1), date_fin=date(2024, 12, 31)
+        )
+        journal = Journal.objects.create(code='OD', libelle='Opérations diverses', type_journal='OD')
+        comptes = {
+            numero: CompteComptable.objects.create(numero=numero, libelle=numero, solde_normal='debiteur')
+            for numero in ['130', '411', '521', '601', '706']
+        }
+        for jour, lignes in [(5, [('411', 1000, 0), ('706', 0, 1000)]), (9, [('601', 300, 0), ('521', 0, 300)])]:
+            ecriture = EcritureComptable.objects.create(
+                numero=f"OD{jour}", date=date(2024, 3, jour), journal=journal,
+                exercice=self.exercice, libelle='Test', statut='valide'
+            )
+            for numero, debit, credit in lignes:
+                LigneEcriture.objects.create(
+                    ecriture=ecriture, compte=comptes[numero], libelle='Test', debit=debit, credit=credit
+                )
+
+    def lignes(self, exercice, journal):
+        from comptabilite.models import LigneEcriture
+        return sorted(LigneEcriture.objects.filter(
+            ecriture__exercice=exercice, ecriture__journal__code=journal
+        ).values_list('compte__numero', 'debit', 'credit'))
+
+    def test_apercu(self):
+        """L'aperçu calcule tous les soldes en une requête groupée"""
+        from comptabilite.services import cloture
+        with self.assertNumQueries(2):
+            apercu = cloture.preparer(self.exercice).resume()
+        self.assertEqual(apercu['resultat'], 700)
+        self.assertEqual(apercu['lignes_resultat'], 3)
+        self.assertEqual(apercu['lignes_a_nouveau'], 3)
+        self.assertEqual(apercu['erreurs'], [])
+
+    def test_cloture_et_reprise(self):
+        """Écritures de clôture équilibrées, relance sans doublon"""
+        from comptabilite.services import cloture
+        nouvel_exercice = cloture.cloturer(self.exercice)
+
+        self.assertEqual(self.lignes(self.exercice, 'CL'), [
+            ('130', 0, 700), ('601', 0, 300), ('706', 1000, 0),
+        ])
+        self.assertEqual(self.lignes(nouvel_exercice, 'AN'), [
+            ('130', 0, 700), ('411', 1000, 0), ('521', 0, 300),
+        ])
+        self.exercice.refresh_from_db()
+        self.assertEqual(self.exercice.statut, 'cloture')
+        self.assertEqual(cloture.progression(self.exercice.pk)['etat'], 'termine')
+
+        self.assertEqual(cloture.cloturer(self.exercice), nouvel_exercice)
+        self.assertEqual(len(self.lignes(self.exercice, 'CL')), 3)
+        self.assertEqual(len(self.lignes(nouvel_exercice, 'AN')), 3)
+
+
+    def test_verrou_en_base(self):
+        """Un seul lancement obtient le verrou ; un verrou expiré peut être repris"""
+        from comptabilite.models import ExerciceComptable
+        from comptabilite.services import cloture
+        self.assertTrue(cloture.prendre_verrou(self.exercice))
+        self.assertFalse(cloture.prendre_verrou(self.exercice))
+
+        ExerciceComptable.objects.filter(pk=self.exercice.pk).update(
+            cloture_verrouillee_le=timezone.now() - cloture.DELAI_VERROU - timedelta(minutes=1)
+        )
+        self.assertTrue(cloture.prendre_verrou(self.exercice))
+
+        cloture.liberer_verrou(self.exercice)
+        ExerciceComptable.objects.filter(pk=self.exercice.pk).update(statut='cloture')
+        self.assertFalse(cloture.prendre_verrou(self.exercice))
+
+
+class LettrageAutomatiqueTest(TestCase):
+    """Tests pour le lettrage automatique des comptes tiers"""
+
+    def setUp(self):
+        from datetime import date
+        from comptabilite.models import CompteComptable, EcritureComptable, ExerciceComptable, Journal, LigneEcriture
+        exercice = ExerciceComptable.objects.create(
+            libelle='Exercice 2024', date_debut=date(2024, 1, 1), date_fin=date(2024, 12, 31)
+        )
+        journal = Journal.objects.create(code='VT', libelle='Ventes', type_journal='VT')
+        self.client_a = CompteComptable.objects.create(numero='411001', libelle='Client A', solde_normal='debiteur')
+        self.lignes = {}
+        # (nom, date, référence, tiers, débit, crédit)
+        for nom, jour, reference, tiers, debit, credit in [
+            ('fac1', date(2024, 1, 10), 'F1', 'A', 1000, 0),
+            ('reg1', date(2024, 1, 20), 'F1', 'A', 0, 1000),
+            ('fac2', date(2024, 2, 1), 'F2', 'A', 500, 0),
+            ('fac3', date(2024, 2, 3), 'F3', 'A', 700, 0),
+            ('reg23', date(2024, 2, 15), 'VIR', 'A', 0, 1200),
+            ('fac4', date(2024, 3, 1), 'F4', 'A', 900, 0),
+            ('reg4', date(2024, 9, 1), 'VIR2', 'A', 0, 900),
+        ]:
+            ecriture = EcritureComptable.objects.create(
+                numero=nom, date=jour, journal=journal, exercice=exercice,
+                libelle=nom, reference=reference, statut='valide'
+            )
+            self.lignes[nom] = LigneEcriture.objects.create(
+                ecriture=ecriture, compte=self.client_a, libelle=nom, tiers=tiers, debit=debit, credit=credit
+            ).id
+
+    def test_propositions(self):
+        """Correspondance exacte, puis combinaison dans la fenêtre de dates"""
+        from comptabilite.services import lettrage
+        comptes = lettrage.get_comptes('clients')
+        with self.assertNumQueries(1):
+            propositions = lettrage.proposer(comptes, fenetre_jours=90)
+        self.assertEqual(
+            sorted((p.methode, sorted(p.ligne_ids), p.montant) for p in propositions),
+            [
+                ('combinaison', sorted([self.lignes['reg23'], self.lignes['fac2'], self.lignes['fac3']]), 1200),
+                ('exact', sorted([self.lignes['fac1'], self.lignes['reg1']]), 1000),
+            ]
+        )
+        # Hors fenêtre, fac4 / reg4 restent proposées avec une fenêtre plus large
+        self.assertEqual(len(lettrage.proposer(comptes, fenetre_jours=200)), 3)
+
+    def test_appliquer_ferme_les_postes(self):
+        """Les lettrages enregistrés ferment les lignes ; une suppression les rouvre"""
+        from comptabilite.models import Lettrage, LigneEcriture
+        from comptabilite.services import lettrage
+        comptes = lettrage.get_comptes('clients')
+        propositions = lettrage.proposer(comptes)
+
+        self.assertEqual(lettrage.appliquer(propositions), 2)
+        # Une seconde application ne crée rien : les lignes ne sont plus ouvertes
+        self.assertEqual(lettrage.appliquer(propositions), 0)
+        self.assertEqual(
+            set(LigneEcriture.objects.filter(est_ouverte=True).values_list('id', flat=True)),
+            {self.lignes['fac4'], self.lignes['reg4']}
+        )
+        self.assertEqual(Lettrage.objects.filter(lignes__isnull=False).distinct().count(), 2)
+
+        Lettrage.objects.get(lignes=self.lignes['fac1']).delete()
+        self.assertTrue(LigneEcriture.objects.get(id=self.lignes['fac1']).est_ouverte)
+
+    def test_lignes_modifiees_a_la_main(self):
+        """Ajouter, retirer des lignes ou rendre un lettrage partiel met à jour les postes ouverts"""
+        from comptabilite.models import Lettrage, LigneEcriture
+
+        def ouverte(nom):
+            return LigneEcriture.objects.get(id=self.lignes[nom]).est_ouverte
+
+        lettrage = Lettrage.creer_lettrage(
+            self.client_a, LigneEcriture.objects.filter(id__in=[self.lignes['fac1'], self.lignes['reg1']])
+        )
+        self.assertFalse(ouverte('fac1'))
+
+        # Comme l'admin (filter_horizontal) : set() retire une ligne et en ajoute une
+        lettrage.lignes.set([self.lignes['fac1'], self.lignes['fac4']])
+        self.assertTrue(ouverte('reg1'))
+        self.assertFalse(ouverte('fac4'))
+
+        lettrage.est_partiel = True
+        lettrage.save()
+        self.assertTrue(ouverte('fac4'))
+
+        lettrage.est_partiel = False
+        lettrage.save()
+        LigneEcriture.objects.get(id=self.lignes['fac4']).lettrages.clear()
+        self.assertTrue(ouverte('fac4'))
+        lettrage.lignes.clear()
+        self.assertTrue(ouverte('fac1'))
+
+    def test_codes_uniques_entre_comptes(self):
+        """Les codes de lettrage sont uniques sur tous les comptes"""
+        from comptabilite.models import CompteComptable, Lettrage
+        fournisseur = CompteComptable.objects.create(numero='401001', libelle='F', solde_normal='crediteur')
+        Lettrage.objects.create(code='AAA999', compte=self.client_a)
+        self.assertEqual(Lettrage.generer_code(fournisseur), 'AAB001')
+        self.assertEqual(Lettrage.generer_codes(2), ['AAB002', 'AAB003'])
+        self.assertEqual(Lettrage.rang_depuis_code(Lettrage.code_depuis_rang(26 * 999 + 5)), 26 * 999 + 5)
+
+
+class BalanceAgeeTest(TestCase):
+    """Tests pour la balance âgée calculée en base"""
+
+    def setUp(self):
+        from datetime import date
+        from comptabilite.models import CompteComptable, EcritureComptable, ExerciceComptable, Journal, LigneEcriture
+        self.reference = date(2024, 6, 30)
+        exercice = ExerciceComptable.objects.create(
+            libelle='Exercice 2024', date_debut=date(2024, 1, 1), date_fin=date(2024, 12, 31)
+        )
+        journal = Journal.objects.create(code='VT', libelle='Ventes', type_journal='VT')
+        compte = CompteComptable.objects.create(numero='411001', libelle='Clients', solde_normal='debiteur')
+        self.lignes = []
+        for jour, tiers, debit, credit in [
+            (date(2024, 7, 5), 'A', 100, 0),    # non échu
+            (date(2024, 6, 30), 'A', 200, 0),   # 0 jour
+            (date(2024, 5, 31), 'A', 300, 0),   # 30 jours
+            (date(2024, 5, 30), 'A', 400, 0),   # 31 jours
+            (date(2024, 4, 1), 'A', 0, 50),     # 90 jours
+            (date(2024, 3, 1), 'B', 600, 0),    # > 90 jours
+            (date(2024, 3, 2), '', 70, 0),      # sans tiers : libellé de l'écriture
+        ]:
+            ecriture = EcritureComptable.objects.create(
+                numero=f"VT{len(self.lignes)}", date=jour, journal=journal, exercice=exercice,
+                libelle='Facture sans tiers', statut='valide'
+            )
+            self.lignes.append(LigneEcriture.objects.create(
+                ecriture=ecriture, compte=compte, libelle='Test', tiers=tiers, debit=debit, credit=credit
+            ))
+
+    def test_tranches(self):
+        """Tranches par tiers et totaux en une requête"""
+        from comptabilite.services import balance_agee
+        with self.assertNumQueries(1):
+            balance = balance_agee.calculer('clients', self.reference)
+        lignes = {ligne['tiers']: ligne for ligne in balance.lignes}
+        self.assertEqual(list(lignes), ['A', 'B', 'Facture sans tiers'])
+        self.assertEqual(
+            [lignes['A'][code] for code in ['non_echu', '0_30', '31_60', '61_90', 'plus_90', 'total']],
+            [100, 500, 400, -50, 0, 950]
+        )
+        self.assertEqual(lignes['B']['plus_90'], 600)
+        self.assertEqual(lignes['A']['compte_numero'], '411001')
+        self.assertEqual(balance.totaux['total'], 1620)
+
+    def test_lettrage_a_la_date(self):
+        """Une ligne lettrée figure dans la balance d'une date antérieure au lettrage"""
+        from comptabilite.models import Lettrage
+        from comptabilite.services import balance_agee
+        lettrage = Lettrage.objects.create(code='AAA001', compte=self.lignes[0].compte, montant=600)
+        lettrage.lignes.set([self.lignes[5]])
+        self.lignes[5].est_ouverte = False
+        self.lignes[5].save()
+
+        from django.utils import timezone
+        self.assertEqual(balance_agee.calculer('clients', self.reference).totaux['total'], 1620)
+        self.assertEqual(balance_agee.calculer('clients', timezone.localdate()).totaux['total'], 1020)
+
+
+class EtatsComptablesTest(TestCase):
+    """Tests pour les agrégats groupés des états comptables"""
+
+    def setUp(self):
+        from datetime import date
+        from comptabilite.models import CompteComptable, EcritureComptable, ExerciceComptable, Journal, LigneEcriture
+        self.exercice = ExerciceComptable.objects.create(
+            libelle='Exercice 2024', date_debut=date(2024, 1, 1), date_fin=date(2024, 12, 31)
+        )
+        journaux = {
+            code: Journal.objects.create(code=code, libelle=code, type_journal=code[:2], actif=code != 'OD')
+            for code in ['VE', 'AC', 'OD']
+        }
+        self.comptes = {
+            numero: CompteComptable.objects.create(numero=numero, libelle=numero, solde_normal='debiteur')
+            for numero in ['401', '4011', '411', '4431', '4452', '601', '706']
+        }
+        for numero, code, jour, statut, lignes in [
+            ('VE1', 'VE', date(2024, 1, 10), 'valide', [('411', 1180, 0), ('706', 0, 1000), ('4431', 0, 180)]),
+            ('VE2', 'VE', date(2024, 2, 10), 'valide', [('411', 590, 0), ('706', 0, 500), ('4431', 0, 90)]),
+            ('AC1', 'AC', date(2024, 2, 12), 'valide', [('601', 200, 0), ('4452', 36, 0), ('4011', 0, 236)]),
+            ('AC2', 'AC', date(2024, 2, 20), 'brouillon', [('601', 999, 0), ('4011', 0, 999)]),
+            ('OD1', 'OD', date(2024, 2, 25), 'valide', [('601', 10, 0), ('401', 0, 10)]),
+        ]:
+            ecriture = EcritureComptable.objects.create(
+                numero=numero, date=jour, journal=journaux[code], exercice=self.exercice,
+                libelle=numero, statut=statut
+            )
+            for compte, debit, credit in lignes:
+                LigneEcriture.objects.create(
+                    ecriture=ecriture, compte=self.comptes[compte], libelle=numero, debit=debit, credit=credit
+                )
+
+    def test_journal_centralisateur(self):
+        """Totaux par journal actif, et par mois, en une requête"""
+        from comptabilite.services import etats
+        with self.assertNumQueries(1):
+            totaux = etats.totaux_journaux(self.exercice)
+        self.assertEqual(
+            [(t['code'], t['type_libelle'], t['nb_ecritures'], t['total_debit'], t['total_credit']) for t in totaux],
+            [('AC', 'Achats', 1, 236, 236), ('VE', 'Ventes', 2, 1770, 1770)]
+        )
+        mensuel = etats.totaux_journaux(self.exercice, par_mois=True)
+        self.assertEqual(
+            [(t['code'], t['mois'].month, t['total_debit']) for t in mensuel],
+            [('AC', 2, 236), ('VE', 1, 1180), ('VE', 2, 590)]
+        )
+
+    def test_tva(self):
+        """TVA collectée et déductible en une requête, globale ou mensuelle"""
+        from datetime import date
+        from comptabilite.services import etats
+        collectee, deductible = self.comptes['4431'], self.comptes['4452']
+        with self.assertNumQueries(1):
+            totaux = etats.totaux_tva(collectee, deductible, date_debut=date(2024, 2, 1), date_fin=date(2024, 2, 29))
+        self.assertEqual(totaux, {'tva_collectee': 90, 'tva_deductible': 36})
+        self.assertEqual(
+            [(t['mois'].month, t['tva_collectee'], t['tva_deductible'])
+             for t in etats.totaux_tva(collectee, deductible, self.exercice, par_mois=True)],
+            [(1, 180, 0), (2, 90, 36)]
+        )
+        self.assertEqual(etats.totaux_tva(None, deductible, self.exercice)['tva_collectee'], 0)
+
+    def test_soldes_prefixes(self):
+        """Racines qui se recouvrent agrégées séparément dans la même requête"""
+        from comptabilite.services import etats
+        with self.assertNumQueries(1):
+            soldes = etats.soldes_prefixes(['40', '401', '4011', '6'], self.exercice)
+        self.assertEqual(soldes, {'40': (0, 246), '401': (0, 246), '4011': (0, 236), '6': (210, 0)})
+
+
+class ComptabilisationLotTest(TestCase):
+    """Tests pour la comptabilisation par lots des factures et de la trésorerie"""
+
+    def setUp(self):
+        from datetime import date
+        from comptabilite.models import CompteComptable, ExerciceComptable, Journal
+        from tresorerie.models import CompteBancaire
+        cache.clear()
+        ExerciceComptable.objects.create(
+            libelle='Exercice 2024', date_debut=date(2024, 1, 1), date_fin=date(2024, 12, 31)
+        )
+        for code in ['VE', 'BQ', 'CA']:
+            Journal.objects.create(code=code, libelle=code, type_journal=code)
+        self.comptes = {
+            numero: CompteComptable.objects.create(numero=numero, libelle=numero)
+            for numero in ['411', '706', '4431', '5211', '571', '658', '6131', '758']
+        }
+        self.banque = CompteBancaire.objects.create(nom='BOA', numero='1', banque='BOA')
+        self.caisse = CompteBancaire.objects.create(nom='Caisse', numero='2', banque='-', type_compte='caisse')
+
+    def creer_factures(self, nombre, debut=0):
+        from datetime import date
+        return [
+            Facture.objects.create(
+                numero=f"F{debut + i:04d}", client=f"Client {i}", montant_ht=1000, montant_tva=180,
+                montant_ttc=1180, date_emission=date(2024, 1 + i % 2, 10)
+            )
+            for i in range(nombre)
+        ]
+
+    def soldes(self, ecriture):
+        return sorted(
+            (ligne.compte.numero, ligne.debit, ligne.credit)
+            for ligne in ecriture.lignes.select_related('compte')
+        )
+
+    def test_factures_et_avoir(self):
+        """Une écriture équilibrée par facture, sens inversé pour un avoir, numéros consécutifs"""
+        from comptabilite.models import EcritureComptable
+        from comptabilite.services import comptabilisation
+        facture = self.creer_factures(3)[0]
+        facture.statut_mecef = 'normalise'
+        avoir = facture.creer_avoir('Erreur de montant')
+        Facture.objects.filter(pk=avoir.pk).update(date_emission=facture.date_emission)
+
+        resultat = comptabilisation.comptabiliser_factures(Facture.objects.all())
+        self.assertEqual((resultat.crees, resultat.ignores), (4, 0))
+
+        ecriture = EcritureComptable.objects.get(facture=facture)
+        self.assertEqual(
+            self.soldes(ecriture), [('411', 1180, 0), ('4431', 0, 180), ('706', 0, 1000)]
+        )
+        self.assertEqual(
+            self.soldes(EcritureComptable.objects.get(facture=avoir)),
+            [('411', 0, 1180), ('4431', 180, 0), ('706', 1000, 0)]
+        )
+        self.assertEqual(
+            sorted(EcritureComptable.objects.filter(date__month=1).values_list('numero', flat=True)),
+            ['VE2024010001', 'VE2024010002', 'VE2024010003']
+        )
+
+        # Relancer ne crée rien
+        resultat = comptabilisation.comptabiliser_factures(Facture.objects.all())
+        self.assertEqual((resultat.crees, resultat.deja_comptabilises), (0, 4))
+
+    def test_requetes_independantes_du_lot(self):
+        """Le nombre de requêtes ne dépend pas du nombre de factures"""
+        from comptabilite.services import comptabilisation
+        self.creer_factures(4)
+        comptabilisation.comptabiliser_factures(Facture.objects.all())
+        self.creer_factures(4, debut=100)
+        with CaptureQueriesContext(connection) as petit:
+            comptabilisation.comptabiliser_factures(Facture.objects.all())
+        self.creer_factures(40, debut=200)
+        with CaptureQueriesContext(connection) as grand:
+            resultat = comptabilisation.comptabiliser_factures(Facture.objects.all())
+        self.assertEqual((resultat.crees, resultat.deja_comptabilises), (40, 8))
+        self.assertEqual(len(grand.captured_queries), len(petit.captured_queries))
+
+    def test_mouvements(self):
+        """Journal de banque ou de caisse, contrepartie selon le sens et la catégorie"""
+        from datetime import date
+        from comptabilite.models import EcritureComptable
+        from comptabilite.services import comptabilisation
+        from tresorerie.models import MouvementTresorerie
+        facture = self.creer_factures(1)[0]
+        for compte, type_mouvement, categorie, montant, facture_liee in [
+            (self.banque, 'entree', 'encaissement', 1180, facture),
+            (self.banque, 'entree', 'autre', 50, None),
+            (self.caisse, 'sortie', 'loyer', 300, None),
+            (self.caisse, 'sortie', 'transport', 20, None),
+            (self.banque, 'sortie', 'virement_interne', 500, None),
+        ]:
+            MouvementTresorerie.objects.create(
+                compte=compte, type_mouvement=type_mouvement, categorie=categorie, montant=montant,
+                date_mouvement=date(2024, 3, 1), libelle=categorie, statut='valide', facture=facture_liee
+            )
+
+        resultat = comptabilisation.comptabiliser_periode(date(2024, 3, 1), date(2024, 3, 31))
+        # Virement interne : compte 585 absent du plan comptable
+        self.assertEqual((resultat.crees, resultat.ignores), (4, 1))
+        self.assertEqual(
+            sorted((e.journal.code, *self.soldes(e)) for e in EcritureComptable.objects.filter(origine='tresorerie')),
+            [
+                ('BQ', ('411', 0, 1180), ('5211', 1180, 0)),
+                ('BQ', ('5211', 50, 0), ('758', 0, 50)),
+                ('CA', ('571', 0, 20), ('658', 20, 0)),
+                ('CA', ('571', 0, 300), ('6131', 300, 0)),
+            ]
+        )
 
-# Create your tests here.
+        # Le compte créé après coup est pris en compte (cache invalidé)
+        from comptabilite.models import CompteComptable
+        CompteComptable.objects.create(numero='585', libelle='Virements de fonds')
+        resultat = comptabilisation.comptabiliser_periode(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual((resultat.crees, resultat.deja_comptabilises), (1, 4))
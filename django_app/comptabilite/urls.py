@@ -57,16 +57,23 @@ urlpatterns = [
     # API endpoints - Clôture
     path('api/pre-cloture/', views.api_pre_cloture, name='api_pre_cloture'),
     path('api/cloture/', views.api_cloture_exercice, name='api_cloture'),
+    path('api/cloture/<int:exercice_id>/statut/', views.api_cloture_statut, name='api_cloture_statut'),
 
     # API endpoints - TVA
     path('api/declaration-tva/', views.api_creer_declaration_tva, name='api_creer_declaration_tva'),
 
     # API endpoints - Lettrage
     path('api/lettrage/', views.api_creer_lettrage, name='api_creer_lettrage'),
+    path('api/lettrage/automatique/', views.api_lettrage_automatique, name='api_lettrage_automatique'),
+
+    # API endpoints - Comptabilisation des factures et de la trésorerie
+    path('api/comptabiliser/', views.api_comptabiliser_periode, name='api_comptabiliser_periode'),
 
     # Exports
     path('export/balance/pdf/', views.export_balance_pdf, name='export_balance_pdf'),
     path('export/balance/excel/', views.export_balance_excel, name='export_balance_excel'),
+    path('export/balance-agee/pdf/', views.export_balance_agee_pdf, name='export_balance_agee_pdf'),
+    path('export/balance-agee/excel/', views.export_balance_agee_excel, name='export_balance_agee_excel'),
     path('export/grand-livre/excel/', views.export_grand_livre_excel, name='export_grand_livre_excel'),
     path('export/csv/', views.export_csv, name='export_csv'),
 ]
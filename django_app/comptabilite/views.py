@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -7,12 +7,12 @@ from django.db.models import Sum, Q, F, Count
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db import transaction
 from decimal import Decimal
 import json
 import csv
 import io
-from datetime import datetime, date, timedelta
+import tempfile
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 from .models import (
@@ -20,6 +20,9 @@ from .models import (
     LigneEcriture, TypeOperation, ParametrageFiscal, DeclarationTVA,
     RapportComptable, ConfigurationComptable, Lettrage
 )
+from .services import (
+    balance_agee as balance_agee_service, cloture, comptabilisation, etats, lettrage as lettrage_auto,
+)
 
 # Imports conditionnels pour exports
 try:
@@ -685,20 +688,12 @@ def etats_financiers(request):
 
 def generer_bilan(exercice):
     """Génère les données du bilan"""
+    soldes = etats.soldes_prefixes(
+        ['2', '3', '411', '41', '52', '57', '10', '11', '401', '44', '40', '7', '6'], exercice
+    )
+
     def get_solde_comptes(prefix_list):
-        total = Decimal('0')
-        for prefix in prefix_list:
-            lignes = LigneEcriture.objects.filter(
-                compte__numero__startswith=prefix,
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            )
-            agg = lignes.aggregate(
-                debit=Coalesce(Sum('debit'), Decimal('0')),
-                credit=Coalesce(Sum('credit'), Decimal('0'))
-            )
-            total += agg['debit'] - agg['credit']
-        return total
+        return sum((soldes[prefix][0] - soldes[prefix][1] for prefix in prefix_list), Decimal('0'))
 
     bilan = {
         'actif': {
@@ -733,24 +728,20 @@ def generer_bilan(exercice):
 
 def generer_compte_resultat(exercice):
     """Génère les données du compte de résultat"""
+    soldes = etats.soldes_prefixes(
+        ['706', '707', '70', '76', '77', '60', '61', '62', '64', '63', '68', '67'], exercice
+    )
+
     def get_solde_comptes(prefix_list):
         total = Decimal('0')
         for prefix in prefix_list:
-            lignes = LigneEcriture.objects.filter(
-                compte__numero__startswith=prefix,
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            )
-            agg = lignes.aggregate(
-                debit=Coalesce(Sum('debit'), Decimal('0')),
-                credit=Coalesce(Sum('credit'), Decimal('0'))
-            )
+            debit, credit = soldes[prefix]
             # Pour les produits, le solde est créditeur
             # Pour les charges, le solde est débiteur
             if prefix.startswith('7'):
-                total += agg['credit'] - agg['debit']
+                total += credit - debit
             else:
-                total += agg['debit'] - agg['credit']
+                total += debit - credit
         return total
 
     resultat = {
@@ -779,20 +770,10 @@ def generer_compte_resultat(exercice):
 
 def generer_flux_tresorerie(exercice):
     """Génère un tableau simplifié des flux de trésorerie"""
+    soldes = etats.soldes_prefixes(['52', '57', '2', '10'], exercice)
+
     def get_variation(prefix_list):
-        total = Decimal('0')
-        for prefix in prefix_list:
-            lignes = LigneEcriture.objects.filter(
-                compte__numero__startswith=prefix,
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            )
-            agg = lignes.aggregate(
-                debit=Coalesce(Sum('debit'), Decimal('0')),
-                credit=Coalesce(Sum('credit'), Decimal('0'))
-            )
-            total += agg['debit'] - agg['credit']
-        return total
+        return sum((soldes[prefix][0] - soldes[prefix][1] for prefix in prefix_list), Decimal('0'))
 
     flux = {
         'exploitation': {
@@ -851,23 +832,19 @@ def gestion_tva(request):
     # Calcul TVA courante
     tva_collectee = Decimal('0')
     tva_deductible = Decimal('0')
+    tva_mensuelle = []
 
     if exercice:
         try:
             params = exercice.parametres_fiscaux
-            if params.compte_tva_collectee:
-                tva_collectee = LigneEcriture.objects.filter(
-                    compte=params.compte_tva_collectee,
-                    ecriture__exercice=exercice,
-                    ecriture__statut='valide'
-                ).aggregate(total=Coalesce(Sum('credit'), Decimal('0')))['total']
-
-            if params.compte_tva_deductible:
-                tva_deductible = LigneEcriture.objects.filter(
-                    compte=params.compte_tva_deductible,
-                    ecriture__exercice=exercice,
-                    ecriture__statut='valide'
-                ).aggregate(total=Coalesce(Sum('debit'), Decimal('0')))['total']
+            # Détail mensuel en une requête, le cumul de l'exercice en découle
+            tva_mensuelle = etats.totaux_tva(
+                params.compte_tva_collectee, params.compte_tva_deductible, exercice, par_mois=True
+            )
+            for mois in tva_mensuelle:
+                mois['tva_a_payer'] = mois['tva_collectee'] - mois['tva_deductible']
+                tva_collectee += mois['tva_collectee']
+                tva_deductible += mois['tva_deductible']
         except ParametrageFiscal.DoesNotExist:
             pass
 
@@ -878,6 +855,7 @@ def gestion_tva(request):
         'tva_collectee': tva_collectee,
         'tva_deductible': tva_deductible,
         'tva_a_payer': tva_collectee - tva_deductible,
+        'tva_mensuelle': tva_mensuelle,
     }
 
     return render(request, 'comptabilite/gestion_tva.html', context)
@@ -919,6 +897,18 @@ def cloture_exercice(request):
             'message': 'Balance équilibrée' if equilibre else 'La balance n\'est pas équilibrée'
         })
 
+        # Simulation de la clôture
+        apercu = cloture.preparer(exercice).resume()
+        verifications.append({
+            'label': 'Résultat de l\'exercice',
+            'valeur': f"{apercu['resultat']:,.0f}".replace(',', ' '),
+            'ok': not apercu['erreurs'],
+            'message': ' '.join(apercu['erreurs']) or (
+                f"{apercu['lignes_resultat']} ligne(s) de clôture, "
+                f"{apercu['lignes_a_nouveau']} ligne(s) d'à-nouveaux"
+            )
+        })
+
     context = {
         'page_title': 'Clôture d\'exercice',
         'exercice': exercice,
@@ -1007,106 +997,124 @@ def rapports(request):
 # ============================================================================
 # CORRECTION 7 : Balance âgée clients/fournisseurs
 # ============================================================================
-def balance_agee(request):
-    """Balance âgée des comptes clients (411) et fournisseurs (401)"""
-    exercice = ExerciceComptable.get_exercice_courant()
+def _parametres_balance_agee(request):
+    """Type de tiers, date de référence et exercice de la balance âgée"""
     type_compte = request.GET.get('type', 'clients')  # clients ou fournisseurs
-    date_reference = request.GET.get('date', timezone.now().date())
-
-    if isinstance(date_reference, str):
+    date_reference = request.GET.get('date')
+    try:
         date_reference = datetime.strptime(date_reference, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        date_reference = timezone.now().date()
+    return type_compte, date_reference, ExerciceComptable.get_exercice_courant()
 
-    # Définir le préfixe de compte selon le type
-    prefix = '411' if type_compte == 'clients' else '401'
-    titre = 'Clients' if type_compte == 'clients' else 'Fournisseurs'
-
-    # Récupérer les écritures non lettrées sur les comptes tiers
-    lignes_query = LigneEcriture.objects.filter(
-        compte__numero__startswith=prefix,
-        ecriture__statut='valide'
-    ).select_related('ecriture', 'compte')
-
-    if exercice:
-        lignes_query = lignes_query.filter(ecriture__exercice=exercice)
-
-    # Exclure les lignes déjà lettrées (entièrement)
-    lignes_query = lignes_query.exclude(
-        lettrages__est_partiel=False
-    )
-
-    # Calculer l'âge de chaque ligne et regrouper
-    balance_data = []
-    totaux = {
-        'non_echu': Decimal('0'),
-        '0_30': Decimal('0'),
-        '31_60': Decimal('0'),
-        '61_90': Decimal('0'),
-        'plus_90': Decimal('0'),
-        'total': Decimal('0'),
-    }
 
-    # Grouper par tiers
-    tiers_dict = {}
-    for ligne in lignes_query:
-        tiers = ligne.tiers or ligne.ecriture.libelle[:30]
-        if tiers not in tiers_dict:
-            tiers_dict[tiers] = {
-                'tiers': tiers,
-                'compte': ligne.compte,
-                'non_echu': Decimal('0'),
-                '0_30': Decimal('0'),
-                '31_60': Decimal('0'),
-                '61_90': Decimal('0'),
-                'plus_90': Decimal('0'),
-                'total': Decimal('0'),
-            }
-
-        # Calculer le solde (débit - crédit pour clients, crédit - débit pour fournisseurs)
-        if type_compte == 'clients':
-            solde = ligne.debit - ligne.credit
-        else:
-            solde = ligne.credit - ligne.debit
-
-        # Calculer l'âge
-        age = (date_reference - ligne.ecriture.date).days
-
-        # Classer par tranche d'âge
-        if age < 0:
-            tiers_dict[tiers]['non_echu'] += solde
-            totaux['non_echu'] += solde
-        elif age <= 30:
-            tiers_dict[tiers]['0_30'] += solde
-            totaux['0_30'] += solde
-        elif age <= 60:
-            tiers_dict[tiers]['31_60'] += solde
-            totaux['31_60'] += solde
-        elif age <= 90:
-            tiers_dict[tiers]['61_90'] += solde
-            totaux['61_90'] += solde
-        else:
-            tiers_dict[tiers]['plus_90'] += solde
-            totaux['plus_90'] += solde
-
-        tiers_dict[tiers]['total'] += solde
-        totaux['total'] += solde
+def balance_agee(request):
+    """Balance âgée des comptes clients (411) et fournisseurs (401)"""
+    type_compte, date_reference, exercice = _parametres_balance_agee(request)
 
-    # Filtrer les tiers avec un solde non nul
-    balance_data = [v for v in tiers_dict.values() if v['total'] != 0]
-    balance_data.sort(key=lambda x: abs(x['total']), reverse=True)
+    # Tranches d'ancienneté calculées en base, une ligne par tiers
+    balance = balance_agee_service.calculer(type_compte, date_reference, exercice)
 
     context = {
-        'page_title': f'Balance âgée {titre}',
+        'page_title': f'Balance âgée {balance.titre}',
         'type_compte': type_compte,
-        'titre': titre,
+        'titre': balance.titre,
         'date_reference': date_reference,
-        'balance_data': balance_data,
-        'totaux': totaux,
+        'balance_data': balance.lignes,
+        'totaux': balance.totaux,
         'exercice': exercice,
     }
 
     return render(request, 'comptabilite/balance_agee.html', context)
 
 
+def _fichier_temporaire():
+    """Fichier d'export en mémoire, déversé sur disque au-delà de 5 Mo"""
+    return tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024)
+
+
+def export_balance_agee_pdf(request):
+    """Export de la balance âgée en PDF"""
+    if not REPORTLAB_AVAILABLE:
+        return JsonResponse({
+            'success': False,
+            'error': 'Le module reportlab n\'est pas installé. Installez-le avec: pip install reportlab'
+        })
+
+    type_compte, date_reference, exercice = _parametres_balance_agee(request)
+    balance = balance_agee_service.calculer(type_compte, date_reference, exercice)
+    codes = [code for code, _libelle, _age in balance_agee_service.TRANCHES] + ['total']
+
+    data = [['Tiers', 'Compte'] + [libelle for _code, libelle, _age in balance_agee_service.TRANCHES] + ['Total']]
+    for item in balance.lignes:
+        data.append([item['tiers'][:30], item['compte_numero']] + [f"{item[code]:,.0f}" for code in codes])
+    data.append(['TOTAUX', ''] + [f"{balance.totaux[code]:,.0f}" for code in codes])
+
+    fichier = _fichier_temporaire()
+    doc = SimpleDocTemplate(fichier, pagesize=landscape(A4), topMargin=1.5*cm, bottomMargin=1.5*cm)
+    styles = getSampleStyleSheet()
+    elements = [
+        Paragraph(f"Balance âgée {balance.titre}", styles['Heading1']),
+        Paragraph(f"Au {date_reference.strftime('%d/%m/%Y')}", styles['Normal']),
+        Spacer(1, 12),
+    ]
+
+    table = Table(data, colWidths=[6*cm, 2.5*cm] + [2.6*cm] * len(codes), repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f3f4f6')]),
+    ]))
+    elements.append(table)
+    doc.build(elements)
+    fichier.seek(0)
+
+    return FileResponse(
+        fichier, as_attachment=True, content_type='application/pdf',
+        filename=f"balance_agee_{type_compte}_{date_reference:%Y%m%d}.pdf",
+    )
+
+
+def export_balance_agee_excel(request):
+    """Export de la balance âgée en Excel (classeur en écriture seule, ligne à ligne)"""
+    if not OPENPYXL_AVAILABLE:
+        return JsonResponse({
+            'success': False,
+            'error': 'Le module openpyxl n\'est pas installé. Installez-le avec: pip install openpyxl'
+        })
+
+    type_compte, date_reference, exercice = _parametres_balance_agee(request)
+    balance = balance_agee_service.calculer(type_compte, date_reference, exercice)
+    codes = [code for code, _libelle, _age in balance_agee_service.TRANCHES] + ['total']
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Balance âgée")
+    ws.column_dimensions['A'].width = 40
+    for lettre in 'BCDEFGH':
+        ws.column_dimensions[lettre].width = 15
+
+    ws.append([f"Balance âgée {balance.titre} au {date_reference.strftime('%d/%m/%Y')}"])
+    ws.append(['Tiers', 'Compte'] + [libelle for _code, libelle, _age in balance_agee_service.TRANCHES] + ['Total'])
+    for item in balance.lignes:
+        ws.append([item['tiers'], item['compte_numero']] + [float(item[code]) for code in codes])
+    ws.append(['TOTAUX', ''] + [float(balance.totaux[code]) for code in codes])
+
+    fichier = _fichier_temporaire()
+    wb.save(fichier)
+    fichier.seek(0)
+
+    return FileResponse(
+        fichier, as_attachment=True,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        filename=f"balance_agee_{type_compte}_{date_reference:%Y%m%d}.xlsx",
+    )
+
+
 # ============================================================================
 # CORRECTION 8 : Journal centralisateur
 # ============================================================================
@@ -1126,49 +1134,17 @@ def journal_centralisateur(request):
     if isinstance(date_fin, str):
         date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
 
-    journaux_data = []
-    total_general_debit = Decimal('0')
-    total_general_credit = Decimal('0')
+    par_mois = request.GET.get('detail') == 'mois'
 
-    journaux = Journal.objects.filter(actif=True)
-
-    for journal in journaux:
-        ecritures = EcritureComptable.objects.filter(
-            journal=journal,
-            statut='valide'
-        )
-
-        if exercice:
-            ecritures = ecritures.filter(exercice=exercice)
-        if date_debut:
-            ecritures = ecritures.filter(date__gte=date_debut)
-        if date_fin:
-            ecritures = ecritures.filter(date__lte=date_fin)
-
-        # Calculer les totaux
-        totaux = LigneEcriture.objects.filter(
-            ecriture__in=ecritures
-        ).aggregate(
-            total_debit=Coalesce(Sum('debit'), Decimal('0')),
-            total_credit=Coalesce(Sum('credit'), Decimal('0'))
-        )
-
-        nb_ecritures = ecritures.count()
-
-        if nb_ecritures > 0:
-            journaux_data.append({
-                'journal': journal,
-                'nb_ecritures': nb_ecritures,
-                'total_debit': totaux['total_debit'],
-                'total_credit': totaux['total_credit'],
-            })
-
-            total_general_debit += totaux['total_debit']
-            total_general_credit += totaux['total_credit']
+    # Totaux par journal (et par mois) en une requête groupée
+    journaux_data = etats.totaux_journaux(exercice, date_debut, date_fin, par_mois=par_mois)
+    total_general_debit = sum((item['total_debit'] for item in journaux_data), Decimal('0'))
+    total_general_credit = sum((item['total_credit'] for item in journaux_data), Decimal('0'))
 
     context = {
         'page_title': 'Journal centralisateur',
         'journaux_data': journaux_data,
+        'par_mois': par_mois,
         'total_debit': total_general_debit,
         'total_credit': total_general_credit,
         'date_debut': date_debut,
@@ -1191,79 +1167,15 @@ def generer_ecriture_facture(facture, utilisateur=None):
         utilisateur: Utilisateur qui génère l'écriture
 
     Returns:
-        EcritureComptable ou None si erreur
+        EcritureComptable (existante si la facture est déjà comptabilisée) ou None si erreur
     """
-    try:
-        exercice = ExerciceComptable.get_exercice_courant()
-        if not exercice:
-            return None
-
-        config = ConfigurationComptable.get_instance()
+    from gestion.models import Facture
 
-        # Déterminer le journal et les comptes selon le type de facture
-        if facture.type_facture == 'honoraires':
-            journal = Journal.objects.get(code='VE')
-            compte_produit = CompteComptable.objects.filter(numero='7061').first()
-        elif facture.type_facture == 'emoluments':
-            journal = Journal.objects.get(code='VE')
-            compte_produit = CompteComptable.objects.filter(numero='7062').first()
-        else:
-            journal = Journal.objects.get(code='VE')
-            compte_produit = CompteComptable.objects.filter(numero='706').first()
-
-        compte_client = config.compte_clients or CompteComptable.objects.filter(numero='411').first()
-
-        if not compte_produit or not compte_client:
-            return None
-
-        # Créer l'écriture
-        numero = EcritureComptable.generer_numero(journal, facture.date_facture)
-        ecriture = EcritureComptable.objects.create(
-            numero=numero,
-            date=facture.date_facture,
-            journal=journal,
-            exercice=exercice,
-            libelle=f"Facture {facture.numero} - {facture.client}",
-            reference=facture.numero,
-            statut='brouillon',
-            origine='facture',
-            facture=facture,
-            cree_par=utilisateur
-        )
-
-        # Ligne client (débit)
-        LigneEcriture.objects.create(
-            ecriture=ecriture,
-            compte=compte_client,
-            libelle=f"Facture {facture.numero}",
-            debit=facture.montant_ttc,
-            credit=0,
-            tiers=str(facture.client) if facture.client else ''
-        )
-
-        # Ligne produit (crédit HT)
-        LigneEcriture.objects.create(
-            ecriture=ecriture,
-            compte=compte_produit,
-            libelle=f"Facture {facture.numero}",
-            debit=0,
-            credit=facture.montant_ht
+    try:
+        comptabilisation.comptabiliser_factures(
+            Facture.objects.filter(pk=facture.pk), utilisateur
         )
-
-        # Ligne TVA si applicable
-        if facture.montant_tva and facture.montant_tva > 0:
-            compte_tva = CompteComptable.objects.filter(numero='4431').first()
-            if compte_tva:
-                LigneEcriture.objects.create(
-                    ecriture=ecriture,
-                    compte=compte_tva,
-                    libelle=f"TVA Facture {facture.numero}",
-                    debit=0,
-                    credit=facture.montant_tva
-                )
-
-        return ecriture
-
+        return EcritureComptable.objects.filter(cle_origine=f"facture:{facture.pk}").first()
     except Exception as e:
         print(f"Erreur génération écriture facture: {e}")
         return None
@@ -1281,98 +1193,44 @@ def generer_ecriture_mouvement(mouvement, utilisateur=None):
         utilisateur: Utilisateur qui génère l'écriture
 
     Returns:
-        EcritureComptable ou None si erreur
+        EcritureComptable (existante si le mouvement est déjà comptabilisé) ou None si erreur
     """
-    try:
-        exercice = ExerciceComptable.get_exercice_courant()
-        if not exercice:
-            return None
+    from tresorerie.models import MouvementTresorerie
 
-        config = ConfigurationComptable.get_instance()
-
-        # Déterminer le journal et le compte de trésorerie
-        if mouvement.compte_bancaire.type_compte == 'caisse':
-            journal = Journal.objects.get(code='CA')
-            compte_tresorerie = config.compte_caisse or CompteComptable.objects.filter(numero='571').first()
-        else:
-            journal = Journal.objects.get(code='BQ')
-            compte_tresorerie = config.compte_banque_principal or CompteComptable.objects.filter(numero='5211').first()
-
-        if not compte_tresorerie:
-            return None
+    try:
+        comptabilisation.comptabiliser_mouvements(
+            MouvementTresorerie.objects.filter(pk=mouvement.pk), utilisateur
+        )
+        return EcritureComptable.objects.filter(cle_origine=f"mouvement:{mouvement.pk}").first()
+    except Exception as e:
+        print(f"Erreur génération écriture mouvement: {e}")
+        return None
 
-        # Déterminer le compte de contrepartie selon le type de mouvement
-        if mouvement.type_mouvement == 'encaissement':
-            # Encaissement = débit trésorerie, crédit contrepartie
-            if mouvement.facture:
-                compte_contrepartie = CompteComptable.objects.filter(numero='411').first()
-            else:
-                compte_contrepartie = CompteComptable.objects.filter(numero='758').first()  # Produits divers
-        else:
-            # Décaissement = crédit trésorerie, débit contrepartie
-            if mouvement.categorie == 'loyer':
-                compte_contrepartie = CompteComptable.objects.filter(numero='6131').first()
-            elif mouvement.categorie == 'salaire':
-                compte_contrepartie = CompteComptable.objects.filter(numero='6411').first()
-            elif mouvement.categorie == 'fournisseur':
-                compte_contrepartie = CompteComptable.objects.filter(numero='401').first()
-            else:
-                compte_contrepartie = CompteComptable.objects.filter(numero='658').first()  # Charges diverses
 
-        if not compte_contrepartie:
-            return None
+@login_required
+@require_POST
+def api_comptabiliser_periode(request):
+    """
+    API de comptabilisation par lots des factures et mouvements de trésorerie.
 
-        # Créer l'écriture
-        numero = EcritureComptable.generer_numero(journal, mouvement.date)
-        ecriture = EcritureComptable.objects.create(
-            numero=numero,
-            date=mouvement.date,
-            journal=journal,
-            exercice=exercice,
-            libelle=mouvement.libelle or f"Mouvement {mouvement.type_mouvement}",
-            reference=mouvement.reference or '',
-            statut='brouillon',
-            origine='tresorerie',
-            cree_par=utilisateur
-        )
+    Body JSON: {"date_debut": "AAAA-MM-JJ", "date_fin": "AAAA-MM-JJ"}
+    Les pièces déjà comptabilisées sont ignorées : l'appel peut être répété.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        date_debut = datetime.strptime(data['date_debut'], '%Y-%m-%d').date()
+        date_fin = datetime.strptime(data['date_fin'], '%Y-%m-%d').date()
 
-        # Créer les lignes selon le type
-        if mouvement.type_mouvement == 'encaissement':
-            LigneEcriture.objects.create(
-                ecriture=ecriture,
-                compte=compte_tresorerie,
-                libelle=ecriture.libelle,
-                debit=mouvement.montant,
-                credit=0
-            )
-            LigneEcriture.objects.create(
-                ecriture=ecriture,
-                compte=compte_contrepartie,
-                libelle=ecriture.libelle,
-                debit=0,
-                credit=mouvement.montant
-            )
-        else:
-            LigneEcriture.objects.create(
-                ecriture=ecriture,
-                compte=compte_contrepartie,
-                libelle=ecriture.libelle,
-                debit=mouvement.montant,
-                credit=0
-            )
-            LigneEcriture.objects.create(
-                ecriture=ecriture,
-                compte=compte_tresorerie,
-                libelle=ecriture.libelle,
-                debit=0,
-                credit=mouvement.montant
-            )
+        resultat = comptabilisation.comptabiliser_periode(date_debut, date_fin, request.user)
 
-        return ecriture
+        return JsonResponse({
+            'success': True,
+            **resultat.as_dict(),
+            'message': f'{resultat.crees} écriture(s) générée(s) en brouillon'
+        })
 
-    except Exception as e:
-        print(f"Erreur génération écriture mouvement: {e}")
-        return None
+    except (KeyError, ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
 # ============================================================================
@@ -1711,64 +1569,16 @@ def api_pre_cloture(request):
                 'error': f'Il reste {nb_brouillons} écriture(s) en brouillon. Validez-les d\'abord.'
             })
 
-        with transaction.atomic():
-            journal_od = Journal.objects.get(code='OD')
-            date_cloture = exercice.date_fin
-            ecritures_generees = []
-
-            # 1. Générer les écritures d'amortissement
-            # Récupérer les immobilisations (classe 2)
-            immobilisations = CompteComptable.objects.filter(
-                numero__startswith='2',
-                actif=True
-            ).exclude(numero__startswith='28')  # Exclure les comptes d'amortissement
-
-            compte_dotation = CompteComptable.objects.filter(numero='6811').first()
-
-            for immo in immobilisations:
-                solde = immo.get_solde(exercice=exercice)
-                if solde > 0:
-                    # Calculer l'amortissement (exemple: 20% linéaire)
-                    taux = Decimal('0.20')
-                    montant_amort = solde * taux
-
-                    # Trouver le compte d'amortissement correspondant
-                    numero_amort = '28' + immo.numero[1:]
-                    compte_amort = CompteComptable.objects.filter(numero=numero_amort).first()
-
-                    if compte_amort and compte_dotation and montant_amort > 0:
-                        numero = EcritureComptable.generer_numero(journal_od, date_cloture)
-                        ecriture = EcritureComptable.objects.create(
-                            numero=numero,
-                            date=date_cloture,
-                            journal=journal_od,
-                            exercice=exercice,
-                            libelle=f"Dotation amortissement {immo.libelle}",
-                            statut='brouillon',
-                            origine='cloture'
-                        )
-
-                        LigneEcriture.objects.create(
-                            ecriture=ecriture,
-                            compte=compte_dotation,
-                            libelle=f"Dotation amortissement {immo.numero}",
-                            debit=montant_amort,
-                            credit=0
-                        )
-                        LigneEcriture.objects.create(
-                            ecriture=ecriture,
-                            compte=compte_amort,
-                            libelle=f"Amortissement {immo.numero}",
-                            debit=0,
-                            credit=montant_amort
-                        )
-                        ecritures_generees.append(ecriture.numero)
+        # 1. Générer les écritures d'amortissement (brouillons à valider)
+        ecritures_generees = cloture.generer_amortissements(exercice)
 
-            return JsonResponse({
-                'success': True,
-                'message': f'Pré-clôture effectuée. {len(ecritures_generees)} écriture(s) d\'inventaire générée(s).',
-                'ecritures': ecritures_generees
-            })
+        return JsonResponse({
+            'success': True,
+            'message': f'Pré-clôture effectuée. {len(ecritures_generees)} écriture(s) d\'inventaire générée(s).',
+            'ecritures': ecritures_generees,
+            # Simulation de la clôture (hors écritures d'inventaire non validées)
+            'apercu': cloture.preparer(exercice).resume(),
+        })
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -1776,12 +1586,21 @@ def api_pre_cloture(request):
 
 @require_POST
 def api_cloture_exercice(request):
-    """Effectue la clôture définitive de l'exercice"""
+    """
+    Effectue la clôture définitive de l'exercice, en arrière-plan
+    (suivi par api_cloture_statut). Avec {"simulation": true}, retourne
+    seulement l'aperçu des écritures de clôture.
+    """
     try:
+        data = json.loads(request.body or '{}')
         exercice = ExerciceComptable.get_exercice_courant()
         if not exercice:
             return JsonResponse({'success': False, 'error': 'Aucun exercice ouvert'})
 
+        plan = cloture.preparer(exercice)
+        if data.get('simulation'):
+            return JsonResponse({'success': True, 'apercu': plan.resume()})
+
         # Vérifications
         nb_brouillons = EcritureComptable.objects.filter(
             exercice=exercice,
@@ -1794,173 +1613,47 @@ def api_cloture_exercice(request):
                 'error': f'Il reste {nb_brouillons} écriture(s) en brouillon.'
             })
 
-        with transaction.atomic():
-            journal_cloture = Journal.objects.get_or_create(
-                code='CL',
-                defaults={
-                    'libelle': 'Journal de clôture',
-                    'type_journal': 'CL',
-                    'actif': True
-                }
-            )[0]
-
-            journal_an = Journal.objects.get_or_create(
-                code='AN',
-                defaults={
-                    'libelle': 'À nouveau',
-                    'type_journal': 'AN',
-                    'actif': True
-                }
-            )[0]
-
-            date_cloture = exercice.date_fin
-
-            # 1. Calculer le résultat (produits - charges)
-            produits = LigneEcriture.objects.filter(
-                compte__classe='7',
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            ).aggregate(
-                total=Coalesce(Sum('credit'), Decimal('0')) - Coalesce(Sum('debit'), Decimal('0'))
-            )['total']
-
-            charges = LigneEcriture.objects.filter(
-                compte__classe='6',
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            ).aggregate(
-                total=Coalesce(Sum('debit'), Decimal('0')) - Coalesce(Sum('credit'), Decimal('0'))
-            )['total']
-
-            resultat = produits - charges
-
-            # 2. Écriture de détermination du résultat
-            compte_resultat = CompteComptable.objects.filter(numero='130').first()
-            if not compte_resultat:
-                compte_resultat = CompteComptable.objects.filter(numero='13').first()
-
-            if compte_resultat:
-                numero = EcritureComptable.generer_numero(journal_cloture, date_cloture)
-                ecriture_resultat = EcritureComptable.objects.create(
-                    numero=numero,
-                    date=date_cloture,
-                    journal=journal_cloture,
-                    exercice=exercice,
-                    libelle="Détermination du résultat de l'exercice",
-                    statut='valide',
-                    origine='cloture'
-                )
-
-                # Solder les comptes de classe 6 et 7
-                for classe in ['6', '7']:
-                    comptes = CompteComptable.objects.filter(classe=classe, actif=True)
-                    for compte in comptes:
-                        solde = compte.get_solde(exercice=exercice)
-                        if solde != 0:
-                            if classe == '6':
-                                LigneEcriture.objects.create(
-                                    ecriture=ecriture_resultat,
-                                    compte=compte,
-                                    libelle=f"Solde {compte.numero}",
-                                    debit=0 if solde > 0 else abs(solde),
-                                    credit=solde if solde > 0 else 0
-                                )
-                            else:
-                                LigneEcriture.objects.create(
-                                    ecriture=ecriture_resultat,
-                                    compte=compte,
-                                    libelle=f"Solde {compte.numero}",
-                                    debit=abs(solde) if solde < 0 else solde,
-                                    credit=0 if solde < 0 else 0
-                                )
-
-                # Écriture au résultat
-                if resultat >= 0:
-                    LigneEcriture.objects.create(
-                        ecriture=ecriture_resultat,
-                        compte=compte_resultat,
-                        libelle="Résultat de l'exercice (bénéfice)",
-                        debit=0,
-                        credit=resultat
-                    )
-                else:
-                    LigneEcriture.objects.create(
-                        ecriture=ecriture_resultat,
-                        compte=compte_resultat,
-                        libelle="Résultat de l'exercice (perte)",
-                        debit=abs(resultat),
-                        credit=0
-                    )
-
-            # 3. Clôturer l'exercice
-            exercice.statut = 'cloture'
-            exercice.save()
-
-            # 4. Créer le nouvel exercice
-            nouvel_exercice = ExerciceComptable.objects.create(
-                libelle=f"Exercice {exercice.date_fin.year + 1}",
-                date_debut=exercice.date_fin + timedelta(days=1),
-                date_fin=date(exercice.date_fin.year + 1, exercice.date_fin.month, exercice.date_fin.day),
-                statut='ouvert',
-                est_premier_exercice=False
-            )
+        if plan.erreurs:
+            return JsonResponse({'success': False, 'error': ' '.join(plan.erreurs)})
 
-            # 5. Générer les écritures de report à nouveau (classes 1-5)
-            numero = EcritureComptable.generer_numero(journal_an, nouvel_exercice.date_debut)
-            ecriture_an = EcritureComptable.objects.create(
-                numero=numero,
-                date=nouvel_exercice.date_debut,
-                journal=journal_an,
-                exercice=nouvel_exercice,
-                libelle="Report à nouveau",
-                statut='valide',
-                origine='cloture'
-            )
-
-            for classe in ['1', '2', '3', '4', '5']:
-                comptes = CompteComptable.objects.filter(classe=classe, actif=True)
-                for compte in comptes:
-                    solde = compte.get_solde(exercice=exercice)
-                    if solde != 0:
-                        LigneEcriture.objects.create(
-                            ecriture=ecriture_an,
-                            compte=compte,
-                            libelle=f"À nouveau {compte.numero}",
-                            debit=solde if solde > 0 else 0,
-                            credit=abs(solde) if solde < 0 else 0
-                        )
+        if not cloture.lancer(exercice):
+            return JsonResponse({'success': False, 'error': 'Une clôture de cet exercice est déjà en cours.'})
 
-            return JsonResponse({
-                'success': True,
-                'message': f'Exercice clôturé. Nouvel exercice {nouvel_exercice.libelle} créé.',
-                'nouvel_exercice_id': nouvel_exercice.id
-            })
+        return JsonResponse({
+            'success': True,
+            'message': 'Clôture lancée.',
+            'exercice_id': exercice.id,
+            'apercu': plan.resume(),
+        }, status=202)
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+@require_GET
+def api_cloture_statut(request, exercice_id):
+    """Avancement de la clôture d'un exercice"""
+    progression = cloture.progression(exercice_id)
+    if progression is None:
+        return JsonResponse({'success': False, 'error': 'Aucune clôture en cours pour cet exercice'}, status=404)
+    return JsonResponse({'success': True, **progression})
+
+
 # ============================================================================
 # CORRECTION 14 : Flux de trésorerie détaillé
 # ============================================================================
 def generer_flux_tresorerie_detaille(exercice):
     """Génère un tableau détaillé des flux de trésorerie selon SYSCOHADA"""
+    soldes = etats.soldes_prefixes(['7', '6', '68', '3', '41', '40', '2', '82', '10', '16'], exercice)
+
     def get_variation(prefix_list, sens='debit'):
         total = Decimal('0')
         for prefix in prefix_list:
-            lignes = LigneEcriture.objects.filter(
-                compte__numero__startswith=prefix,
-                ecriture__exercice=exercice,
-                ecriture__statut='valide'
-            )
-            agg = lignes.aggregate(
-                debit=Coalesce(Sum('debit'), Decimal('0')),
-                credit=Coalesce(Sum('credit'), Decimal('0'))
-            )
+            debit, credit = soldes[prefix]
             if sens == 'debit':
-                total += agg['debit'] - agg['credit']
+                total += debit - credit
             else:
-                total += agg['credit'] - agg['debit']
+                total += credit - debit
         return total
 
     # Flux d'exploitation
@@ -2101,9 +1794,8 @@ def lettrage(request):
         compte_selectionne = get_object_or_404(CompteComptable, id=compte_id)
         lignes_non_lettrees = LigneEcriture.objects.filter(
             compte=compte_selectionne,
+            est_ouverte=True,
             ecriture__statut='valide'
-        ).exclude(
-            lettrages__est_partiel=False
         ).select_related('ecriture').order_by('ecriture__date')
 
         if exercice:
@@ -2162,3 +1854,41 @@ def api_creer_lettrage(request):
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
+
+
+@login_required
+@require_POST
+def api_lettrage_automatique(request):
+    """
+    API de lettrage automatique des comptes tiers.
+
+    Body JSON: {"type": "clients"|"fournisseurs", "compte_id": id (optionnel),
+                "fenetre_jours": 90, "appliquer": false}
+    Sans "appliquer", retourne les propositions sans rien enregistrer.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        fenetre_jours = int(data.get('fenetre_jours') or lettrage_auto.FENETRE_JOURS)
+        comptes = lettrage_auto.get_comptes(data.get('type'), data.get('compte_id'))
+
+        propositions = lettrage_auto.proposer(
+            comptes, ExerciceComptable.get_exercice_courant(), fenetre_jours=fenetre_jours
+        )
+        resultat = {
+            'success': True,
+            'nombre': len(propositions),
+            'exactes': sum(1 for p in propositions if p.methode == 'exact'),
+            'combinaisons': sum(1 for p in propositions if p.methode == 'combinaison'),
+        }
+
+        if data.get('appliquer'):
+            crees = lettrage_auto.appliquer(propositions, utilisateur=request.user)
+            resultat['lettrages_crees'] = crees
+            resultat['message'] = f'{crees} lettrage(s) créé(s)'
+        else:
+            resultat['propositions'] = [p.as_dict() for p in propositions[:200]]
+
+        return JsonResponse(resultat)
+
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_alter_dossiervirtuel_type_dossier_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditdocument',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
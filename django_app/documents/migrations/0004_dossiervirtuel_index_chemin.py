@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+def recalculer_chemins(apps, schema_editor):
+    """Recalcule les chemins laissés obsolètes par d'anciens renommages"""
+    DossierVirtuel = apps.get_model('documents', 'DossierVirtuel')
+    dossiers = list(DossierVirtuel.objects.only('id', 'nom', 'parent_id', 'chemin'))
+    enfants = {}
+    for dossier in dossiers:
+        enfants.setdefault(dossier.parent_id, []).append(dossier)
+
+    a_corriger = []
+    pile = [(dossier, f"/{dossier.nom}") for dossier in enfants.get(None, [])]
+    while pile:
+        dossier, chemin = pile.pop()
+        if dossier.chemin != chemin:
+            dossier.chemin = chemin
+            a_corriger.append(dossier)
+        pile.extend((enfant, f"{chemin}/{enfant.nom}") for enfant in enfants.get(dossier.id, []))
+
+    DossierVirtuel.objects.bulk_update(a_corriger, ['chemin'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_audit_horodatage_action'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dossiervirtuel',
+            name='chemin',
+            field=models.CharField(db_index=True, max_length=1000, verbose_name='Chemin complet'),
+        ),
+        migrations.RunPython(recalculer_chemins, migrations.RunPython.noop),
+    ]
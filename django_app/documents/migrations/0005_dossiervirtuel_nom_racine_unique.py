@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:15
+
+from django.db import migrations, models
+
+
+def normaliser_noms(apps, schema_editor):
+    """
+    Remplace les « / » des noms et renomme les doublons d'un même parent
+    (dossiers racine compris), puis recalcule les chemins de l'arborescence.
+    """
+    DossierVirtuel = apps.get_model('documents', 'DossierVirtuel')
+    dossiers = list(DossierVirtuel.objects.only('id', 'nom', 'parent_id', 'chemin').order_by('date_creation'))
+
+    # Les nouveaux noms évitent tous les noms existants du parent : aucun
+    # conflit transitoire pendant la mise à jour
+    originaux = {}
+    for dossier in dossiers:
+        originaux.setdefault(dossier.parent_id, set()).add(dossier.nom)
+
+    a_renommer = []
+    attribues = {}
+    for dossier in dossiers:
+        pris = attribues.setdefault(dossier.parent_id, set())
+        nom = base = dossier.nom.replace('/', '-')
+        n = 1
+        while nom in pris or (nom != dossier.nom and nom in originaux[dossier.parent_id]):
+            n += 1
+            nom = f"{base} ({n})"
+        pris.add(nom)
+        if nom != dossier.nom:
+            dossier.nom = nom
+            a_renommer.append(dossier)
+    DossierVirtuel.objects.bulk_update(a_renommer, ['nom'], batch_size=500)
+
+    enfants = {}
+    for dossier in dossiers:
+        enfants.setdefault(dossier.parent_id, []).append(dossier)
+
+    a_corriger = []
+    pile = [(dossier, f"/{dossier.nom}") for dossier in enfants.get(None, [])]
+    while pile:
+        dossier, chemin = pile.pop()
+        if dossier.chemin != chemin:
+            dossier.chemin = chemin
+            a_corriger.append(dossier)
+        pile.extend((enfant, f"{chemin}/{enfant.nom}") for enfant in enfants.get(dossier.id, []))
+
+    DossierVirtuel.objects.bulk_update(a_corriger, ['chemin'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_dossiervirtuel_index_chemin'),
+    ]
+
+    operations = [
+        migrations.RunPython(normaliser_noms, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dossiervirtuel',
+            constraint=models.UniqueConstraint(condition=models.Q(('parent__isnull', True)), fields=('nom',), name='dossiervirtuel_nom_racine_unique'),
+        ),
+    ]
@@ -2,7 +2,10 @@
 Module Documents - Gestion Automatique de Documents pour Étude d'Huissier
 Génération automatique, stockage cloud, modèles, signatures électroniques
 """
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.db.models.lookups import Exact
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -105,7 +108,8 @@ class DossierVirtuel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     nom = models.CharField(max_length=255)
     type_dossier = models.CharField(max_length=50, choices=TYPE_DOSSIER_CHOICES, default='personnel')
-    chemin = models.CharField(max_length=1000, verbose_name="Chemin complet")
+    # Chemin matérialisé (/Racine/Sous-dossier) : index de l'arborescence
+    chemin = models.CharField(max_length=1000, db_index=True, verbose_name="Chemin complet")
     parent = models.ForeignKey(
         'self',
         on_delete=models.CASCADE,
@@ -144,27 +148,119 @@ class DossierVirtuel(models.Model):
         verbose_name_plural = "Dossiers Virtuels"
         ordering = ['chemin']
         unique_together = ['parent', 'nom']
+        constraints = [
+            # NULL != NULL : unique_together ne couvre pas les dossiers racine
+            models.UniqueConstraint(
+                fields=['nom'], condition=Q(parent__isnull=True),
+                name='dossiervirtuel_nom_racine_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.chemin
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémorise le chemin chargé pour détecter un renommage/déplacement
+        instance._chemin_initial = instance.__dict__.get('chemin')
+        return instance
+
     def save(self, *args, **kwargs):
+        # Le chemin est construit à partir des noms : un « / » le rendrait ambigu
+        if '/' in self.nom:
+            raise ValidationError("Le nom d'un dossier ne peut pas contenir « / »")
+        chemin_initial = getattr(self, '_chemin_initial', None)
         if self.parent:
+            if chemin_initial and (
+                self.parent_id == self.pk or self.parent.chemin.startswith(f"{chemin_initial}/")
+            ):
+                raise ValidationError("Un dossier ne peut pas être déplacé dans sa propre arborescence")
             self.chemin = f"{self.parent.chemin}/{self.nom}"
         else:
             self.chemin = f"/{self.nom}"
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if chemin_initial and chemin_initial != self.chemin:
+                self._reecrire_chemins_descendants(chemin_initial)
+        self._chemin_initial = self.chemin
+
+    @staticmethod
+    def _sous_chemin(champ, chemin):
+        """
+        Condition « `champ` est sous `chemin` » (chemin : valeur ou OuterRef).
+
+        startswith (LIKE) profite de l'index mais est insensible à la casse
+        sous SQLite : le préfixe est aussi comparé exactement.
+        """
+        if isinstance(chemin, str):
+            prefixe = f"{chemin}/"
+            longueur = len(prefixe)
+        else:
+            prefixe = Concat(chemin, Value('/'))
+            longueur = Length(chemin) + 1
+        return Q(**{f'{champ}__startswith': prefixe}) & Q(Exact(Substr(champ, 1, longueur), prefixe))
+
+    @classmethod
+    def _descendants_de(cls, chemin):
+        """Dossiers sous `chemin` (préfixe exact)"""
+        return cls.objects.filter(cls._sous_chemin('chemin', chemin))
+
+    def _reecrire_chemins_descendants(self, ancien_chemin):
+        """Réécrit le préfixe de chemin de tout le sous-arbre en un seul UPDATE"""
+        return DossierVirtuel._descendants_de(ancien_chemin).update(
+            chemin=Concat(Value(self.chemin), Substr('chemin', len(ancien_chemin) + 1)),
+            date_modification=timezone.now(),
+        )
 
     @property
     def profondeur(self):
         return self.chemin.count('/') - 1
 
+    def get_descendants(self, inclure_soi=False):
+        """Sous-dossiers à toutes profondeurs (une requête, par chemin)"""
+        descendants = DossierVirtuel._descendants_de(self.chemin)
+        if inclure_soi:
+            descendants = descendants | DossierVirtuel.objects.filter(pk=self.pk)
+        return descendants
+
     def get_arborescence(self):
-        """Retourne tous les sous-dossiers récursivement"""
-        result = [self]
-        for enfant in self.sous_dossiers.all():
-            result.extend(enfant.get_arborescence())
-        return result
+        """Retourne ce dossier et tous ses sous-dossiers, dans l'ordre de l'arbre"""
+        return list(self.get_descendants(inclure_soi=True).order_by('chemin'))
+
+    @classmethod
+    def avec_statistiques(cls, queryset=None):
+        """
+        Annote chaque dossier, en une seule requête SQL, avec :
+        nb_documents / taille_documents (documents directs non supprimés),
+        nb_sous_dossiers (enfants directs), et nb_documents_total /
+        taille_totale (tout le sous-arbre, via le chemin matérialisé).
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+
+        documents = Document.objects.exclude(statut='supprime').order_by()
+        directs = documents.filter(dossier=OuterRef('pk')).values('dossier')
+        sous_arbre = documents.filter(
+            Q(dossier=OuterRef('pk')) |
+            cls._sous_chemin('dossier__chemin', OuterRef('chemin'))
+        ).annotate(groupe=Value(1)).values('groupe')
+        enfants = cls.objects.filter(parent=OuterRef('pk')).order_by().values('parent')
+
+        return queryset.annotate(
+            nb_documents=Coalesce(Subquery(directs.annotate(n=Count('pk')).values('n')), 0),
+            taille_documents=Coalesce(Subquery(directs.annotate(t=Sum('taille')).values('t')), 0),
+            nb_sous_dossiers=Coalesce(Subquery(enfants.annotate(n=Count('pk')).values('n')), 0),
+            nb_documents_total=Coalesce(Subquery(sous_arbre.annotate(n=Count('pk')).values('n')), 0),
+            taille_totale=Coalesce(Subquery(sous_arbre.annotate(t=Sum('taille')).values('t')), 0),
+        )
+
+    @classmethod
+    def sous_arbre_avec_statistiques(cls, racine=None):
+        """Sous-arbre complet (tout le drive si racine est None), annoté, trié par chemin"""
+        queryset = racine.get_descendants(inclure_soi=True) if racine else cls.objects.all()
+        return cls.avec_statistiques(queryset).order_by('chemin')
 
 
 class Document(models.Model):
@@ -701,6 +797,9 @@ class AuditDocument(models.Model):
         ('generation', 'Génération'),
     ]
 
+    # Actions écrites immédiatement, hors tampon d'audit
+    ACTIONS_CRITIQUES = {'suppression', 'partage'}
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     document = models.ForeignKey(
         Document,
@@ -725,7 +824,7 @@ class AuditDocument(models.Model):
         on_delete=models.SET_NULL,
         null=True
     )
-    date = models.DateTimeField(auto_now_add=True)
+    date = models.DateTimeField(default=timezone.now, editable=False)
     ip = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True)
 
@@ -928,7 +1027,9 @@ class NumeroActe(models.Model):
         """Génère le prochain numéro d'acte pour l'année"""
         if annee is None:
             annee = timezone.now().year
-        compteur, created = cls.objects.get_or_create(annee=annee)
-        compteur.dernier_numero += 1
-        compteur.save()
+        with transaction.atomic():
+            compteur, created = cls.objects.get_or_create(annee=annee)
+            # Incrément atomique : pas de numéro en double entre deux clercs
+            cls.objects.filter(pk=compteur.pk).update(dernier_numero=F('dernier_numero') + 1)
+            compteur.refresh_from_db(fields=['dernier_numero'])
         return f"{compteur.dernier_numero:04d}/{annee}"
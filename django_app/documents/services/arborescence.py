@@ -0,0 +1,212 @@
+"""
+Provisionnement en bloc de l'arborescence Drive des dossiers juridiques.
+
+L'arborescence d'un dossier (dossier principal + sous-dossiers métier)
+est décrite par STRUCTURE_DOSSIER_JURIDIQUE. Pour un lot de dossiers,
+les chemins sont précalculés et tous les dossiers virtuels sont insérés
+par un seul bulk_create, au lieu d'un save() (et d'une lecture du
+parent) par dossier virtuel.
+
+Les imports massifs peuvent différer le provisionnement déclenché par le
+signal post_save de Dossier :
+
+    with provisionnement_differe(utilisateur=request.user):
+        ...création des dossiers...
+    # l'arborescence de tous les dossiers créés est provisionnée ici
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import DossierVirtuel
+
+logger = logging.getLogger(__name__)
+
+
+# Sous-dossiers métier d'une étude d'huissier
+# Format: (nom, type_dossier, icone, couleur, description)
+STRUCTURE_DOSSIER_JURIDIQUE = [
+    ("Projets d'actes", 'projets_actes', 'edit', '#805ad5',
+     "Brouillons et projets d'actes en cours de rédaction"),
+    ("Actes formalisés", 'actes_formalises', 'file-text', '#2f855a',
+     "Actes finaux signés et formalisés"),
+    ("Pièces", 'pieces', 'folder-open', '#dd6b20',
+     "Pièces justificatives et documents probatoires"),
+    ("Courrier arrivée", 'courrier_arrivee', 'inbox', '#3182ce',
+     "Correspondances reçues (clients, avocats, tribunaux)"),
+    ("Courrier départ", 'courrier_depart', 'send', '#00b5d8',
+     "Correspondances envoyées"),
+    ("Factures", 'factures', 'receipt', '#c05621',
+     "Factures et documents de facturation"),
+    ("Actes extérieurs", 'actes_exterieurs', 'users', '#718096',
+     "Actes provenant d'avocats, confrères huissiers, notaires"),
+]
+
+_etat = threading.local()
+
+
+def _annee_dossier(dossier_juridique):
+    if getattr(dossier_juridique, 'date_creation', None):
+        return str(dossier_juridique.date_creation.year)
+    return str(timezone.now().year)
+
+
+def _get_dossiers_annee(annees, utilisateur):
+    """Dossiers racine par année : une lecture, un bulk_create des manquants."""
+    existants = {
+        d.nom: d for d in DossierVirtuel.objects.filter(
+            nom__in=annees, parent__isnull=True, type_dossier='annee'
+        )
+    }
+    manquants = [
+        DossierVirtuel(
+            nom=annee,
+            chemin=f"/{annee}",
+            type_dossier='annee',
+            est_systeme=True,
+            icone='calendar',
+            couleur='#4a5568',
+            cree_par=utilisateur,
+        )
+        for annee in sorted(set(annees) - set(existants))
+    ]
+    try:
+        with transaction.atomic():
+            DossierVirtuel.objects.bulk_create(manquants)
+    except IntegrityError:
+        # Le nom d'un dossier racine est unique : une autre requête vient de
+        # créer l'année, on relit les dossiers racine
+        manquants = DossierVirtuel.objects.filter(
+            nom__in=[d.nom for d in manquants], parent__isnull=True
+        )
+    existants.update((d.nom, d) for d in manquants)
+    return existants
+
+
+def provisionner_dossiers(dossiers_juridiques, utilisateur=None):
+    """
+    Crée l'arborescence Drive d'un lot de dossiers juridiques.
+
+    Les dossiers ayant déjà un dossier principal sont ignorés. Le nombre de
+    requêtes ne dépend pas de la taille du lot (hors lecture des parties,
+    à précharger avec prefetch_related('demandeurs', 'defendeurs')).
+
+    Returns:
+        dict: {pk du dossier juridique: DossierVirtuel principal}
+    """
+    from .document_service import generer_reference_dossier
+
+    dossiers_juridiques = list(dossiers_juridiques)
+    if not dossiers_juridiques:
+        return {}
+
+    principaux = {
+        d.dossier_juridique_id: d for d in DossierVirtuel.objects.filter(
+            dossier_juridique__in=[d.pk for d in dossiers_juridiques],
+            type_dossier='dossier_juridique',
+        )
+    }
+    a_creer = [d for d in dossiers_juridiques if d.pk not in principaux]
+    if not a_creer:
+        return principaux
+
+    noms = {d.pk: generer_reference_dossier(d) for d in a_creer}
+    annees = _get_dossiers_annee({_annee_dossier(d) for d in a_creer}, utilisateur)
+
+    # Un nom déjà pris sous l'année renvoie le dossier existant (comme avant)
+    pris = {
+        (d.parent_id, d.nom): d for d in DossierVirtuel.objects.filter(
+            parent__in=list(annees.values()), nom__in=set(noms.values())
+        )
+    }
+
+    nouveaux = []
+    for dossier_juridique in a_creer:
+        annee = annees[_annee_dossier(dossier_juridique)]
+        nom = noms[dossier_juridique.pk]
+        if (annee.pk, nom) in pris:
+            principaux[dossier_juridique.pk] = pris[(annee.pk, nom)]
+            continue
+
+        principal = DossierVirtuel(
+            nom=nom,
+            chemin=f"{annee.chemin}/{nom}",
+            type_dossier='dossier_juridique',
+            parent=annee,
+            dossier_juridique=dossier_juridique,
+            est_systeme=True,
+            icone='briefcase',
+            couleur='#1a365d',
+            cree_par=utilisateur,
+        )
+        pris[(annee.pk, nom)] = principal
+        principaux[dossier_juridique.pk] = principal
+        nouveaux.append(principal)
+
+        for nom_sous, type_dossier, icone, couleur, _description in STRUCTURE_DOSSIER_JURIDIQUE:
+            nouveaux.append(DossierVirtuel(
+                nom=nom_sous,
+                chemin=f"{principal.chemin}/{nom_sous}",
+                type_dossier=type_dossier,
+                parent=principal,
+                dossier_juridique=dossier_juridique,
+                icone=icone,
+                couleur=couleur,
+                est_systeme=True,
+                cree_par=utilisateur,
+            ))
+
+    # Clés UUID générées côté Python : parents et enfants partent dans le
+    # même bulk_create
+    with transaction.atomic():
+        DossierVirtuel.objects.bulk_create(nouveaux, batch_size=500)
+    for dossier in nouveaux:
+        dossier._chemin_initial = dossier.chemin
+
+    return principaux
+
+
+def est_differe(dossier_juridique):
+    """
+    Si un provisionnement différé est en cours dans ce thread, met le
+    dossier en attente et retourne True.
+    """
+    en_attente = getattr(_etat, 'en_attente', None)
+    if en_attente is None:
+        return False
+    en_attente.append(dossier_juridique.pk)
+    return True
+
+
+@contextmanager
+def provisionnement_differe(utilisateur=None, taille_lot=500):
+    """
+    Diffère le provisionnement déclenché par la création de dossiers, puis
+    provisionne tous les dossiers créés par lots de `taille_lot` à la sortie
+    du bloc (les parties sont alors liées, d'où des noms complets).
+    """
+    from gestion.models import Dossier
+
+    if getattr(_etat, 'en_attente', None) is not None:
+        # Bloc imbriqué : le bloc englobant provisionnera
+        yield
+        return
+
+    _etat.en_attente = []
+    try:
+        yield
+    finally:
+        en_attente, _etat.en_attente = _etat.en_attente, None
+
+    for debut in range(0, len(en_attente), taille_lot):
+        lot = Dossier.objects.filter(
+            pk__in=en_attente[debut:debut + taille_lot]
+        ).prefetch_related('demandeurs', 'defendeurs')
+        try:
+            provisionner_dossiers(lot, utilisateur=utilisateur)
+        except Exception as e:
+            # Ne pas faire échouer l'opération englobante
+            logger.error(f"Erreur provisionnement Drive différé ({len(lot)} dossiers): {e}")
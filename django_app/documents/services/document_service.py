@@ -19,7 +19,9 @@ from ..models import (
     AuditDocument, PartageDocument, NumeroActe, ConfigurationDocuments,
     VersionDocument
 )
+from . import arborescence
 from .pdf_generator import PDFGenerator
+from gestion.services import archivage, audit
 
 
 # ==========================================
@@ -215,80 +217,21 @@ class DocumentService:
             DossierVirtuel: Le dossier principal créé
         """
         utilisateur = user or self.utilisateur
+        dossier_principal = arborescence.provisionner_dossiers(
+            [dossier_juridique], utilisateur=utilisateur
+        )[dossier_juridique.pk]
 
-        # Récupérer l'année de création
-        if hasattr(dossier_juridique, 'date_creation') and dossier_juridique.date_creation:
-            annee = str(dossier_juridique.date_creation.year)
-        else:
-            annee = str(datetime.now().year)
-
-        # Créer ou récupérer le dossier année (racine)
-        dossier_annee, created = DossierVirtuel.objects.get_or_create(
-            nom=annee,
-            parent=None,
-            type_dossier='annee',
-            defaults={
-                'cree_par': utilisateur,
-                'est_systeme': True,
-                'icone': 'calendar',
-                'couleur': '#4a5568',
-            }
-        )
-
-        # Générer le nom complet du dossier avec le nouveau format
+        # Arborescence créée par le signal avant l'ajout des parties :
+        # on la renomme avec la référence complète (chemins des descendants
+        # réécrits par DossierVirtuel.save)
         nom_dossier = generer_reference_dossier(dossier_juridique)
-
-        # Vérifier si un dossier avec ce nom existe déjà
-        existing = DossierVirtuel.objects.filter(
-            nom=nom_dossier,
-            parent=dossier_annee
-        ).first()
-
-        if existing:
-            return existing
-
-        # Créer le dossier principal du dossier juridique
-        dossier_principal = DossierVirtuel.objects.create(
-            nom=nom_dossier,
-            type_dossier='dossier_juridique',
-            parent=dossier_annee,
-            dossier_juridique=dossier_juridique,
-            est_systeme=True,
-            icone='briefcase',
-            couleur='#1a365d',
-            cree_par=utilisateur,
-        )
-
-        # Sous-dossiers métier d'une étude d'huissier
-        # Format: (nom, type_dossier, icone, couleur, description)
-        sous_dossiers = [
-            ("Projets d'actes", 'projets_actes', 'edit', '#805ad5',
-             "Brouillons et projets d'actes en cours de rédaction"),
-            ("Actes formalisés", 'actes_formalises', 'file-text', '#2f855a',
-             "Actes finaux signés et formalisés"),
-            ("Pièces", 'pieces', 'folder-open', '#dd6b20',
-             "Pièces justificatives et documents probatoires"),
-            ("Courrier arrivée", 'courrier_arrivee', 'inbox', '#3182ce',
-             "Correspondances reçues (clients, avocats, tribunaux)"),
-            ("Courrier départ", 'courrier_depart', 'send', '#00b5d8',
-             "Correspondances envoyées"),
-            ("Factures", 'factures', 'receipt', '#c05621',
-             "Factures et documents de facturation"),
-            ("Actes extérieurs", 'actes_exterieurs', 'users', '#718096',
-             "Actes provenant d'avocats, confrères huissiers, notaires"),
-        ]
-
-        for nom, type_dossier, icone, couleur, description in sous_dossiers:
-            DossierVirtuel.objects.create(
-                nom=nom,
-                type_dossier=type_dossier,
-                parent=dossier_principal,
-                dossier_juridique=dossier_juridique,
-                icone=icone,
-                couleur=couleur,
-                est_systeme=True,
-                cree_par=utilisateur,
-            )
+        if (dossier_principal.dossier_juridique_id == dossier_juridique.pk
+                and dossier_principal.nom != nom_dossier
+                and not DossierVirtuel.objects.filter(
+                    parent_id=dossier_principal.parent_id, nom=nom_dossier
+                ).exists()):
+            dossier_principal.nom = nom_dossier
+            dossier_principal.save()
 
         return dossier_principal
 
@@ -817,6 +760,25 @@ class DocumentService:
 
         return document
 
+    def deplacer_dossier(self, dossier, nouveau_parent):
+        """
+        Déplace un dossier virtuel sous un autre parent (None pour la racine).
+        Les chemins de tout le sous-arbre sont réécrits en un seul UPDATE.
+        """
+        ancien_chemin = dossier.chemin
+        dossier.parent = nouveau_parent
+        dossier.save()
+
+        if self.config.audit_actif:
+            audit.enregistrer(AuditDocument(
+                dossier=dossier,
+                action='deplacement',
+                details={'ancien_chemin': ancien_chemin, 'nouveau_chemin': dossier.chemin},
+                utilisateur=self.utilisateur,
+            ))
+
+        return dossier
+
     def copier_document(self, document, dossier_destination):
         """Copie un document vers un autre dossier"""
         nouveau_doc = Document.objects.create(
@@ -1041,11 +1003,14 @@ class DocumentService:
         if not self.config.audit_actif:
             return
 
-        AuditDocument.objects.create(
-            document=document,
-            action=action,
-            details=details or {},
-            utilisateur=self.utilisateur
+        audit.enregistrer(
+            AuditDocument(
+                document=document,
+                action=action,
+                details=details or {},
+                utilisateur=self.utilisateur
+            ),
+            immediat=action in AuditDocument.ACTIONS_CRITIQUES,
         )
 
     def obtenir_historique(self, document):
@@ -1085,12 +1050,13 @@ class DocumentService:
         return count
 
     def nettoyer_audit(self, jours_retention=None):
-        """Supprime les anciens enregistrements d'audit"""
+        """
+        Archive les anciens mois d'audit puis supprime les tables d'archive
+        échues (voir gestion/services/archivage.py). Retourne le nombre de
+        mois supprimés.
+        """
         if jours_retention is None:
             jours_retention = self.config.duree_retention_audit
 
-        date_limite = timezone.now() - timedelta(days=jours_retention)
-
-        deleted, _ = AuditDocument.objects.filter(date__lt=date_limite).delete()
-
-        return deleted
+        archivage.archiver('audit_documents')
+        return archivage.purger('audit_documents', jours_retention)
@@ -33,6 +33,7 @@ urlpatterns = [
     path('api/dossiers/creer/', views.api_dossier_creer, name='api_dossier_creer'),
     path('api/dossiers/supprimer/', views.api_dossier_supprimer, name='api_dossier_supprimer'),
     path('api/dossiers/renommer/', views.api_dossier_renommer, name='api_dossier_renommer'),
+    path('api/dossiers/deplacer/', views.api_dossier_deplacer, name='api_dossier_deplacer'),
 
     # API Modèles de documents
     path('api/modeles/', views.api_modeles_liste, name='api_modeles_liste'),
@@ -13,6 +13,8 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
 from django.conf import settings
@@ -38,38 +40,8 @@ except ImportError:
 
 def get_default_context(request):
     """Retourne le contexte par défaut pour les templates Documents"""
-    user = request.user
-
-    modules = [
-        # Principal
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'layout-dashboard', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers'},
-        {'id': 'facturation', 'label': 'Facturation', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        # Finance
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'wallet', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        # Gestion
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        # Admin
-        {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    return {
-        'current_user': {
-            'id': user.id if user.is_authenticated else None,
-            'nom': user.get_full_name() if user.is_authenticated else 'Invité',
-            'role': getattr(user, 'role', '') if user.is_authenticated else '',
-            'initials': user.get_initials() if user.is_authenticated and hasattr(user, 'get_initials') else 'XX',
-        },
-        'modules': modules,
-        'active_module': 'drive',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'drive'}
 
 
 # ==========================================
@@ -667,29 +639,33 @@ def api_generer_lettre(request):
 @require_http_methods(["GET"])
 def api_dossiers_liste(request):
     """
-    Liste des dossiers virtuels
+    Liste des dossiers virtuels, avec compteurs et tailles (une seule requête)
 
     GET params:
         - parent_id: ID du dossier parent
         - dossier_juridique_id: ID du dossier juridique
+        - arbre: 1 pour le sous-arbre complet de parent_id (ou tout le drive),
+          trié par chemin
     """
-    qs = DossierVirtuel.objects.all()
-
     parent_id = request.GET.get('parent_id')
-    if parent_id:
-        qs = qs.filter(parent_id=parent_id)
-    elif not request.GET.get('all'):
-        qs = qs.filter(parent__isnull=True)
+
+    if request.GET.get('arbre'):
+        racine = get_object_or_404(DossierVirtuel, id=parent_id) if parent_id else None
+        qs = DossierVirtuel.sous_arbre_avec_statistiques(racine)
+    else:
+        qs = DossierVirtuel.objects.all()
+        if parent_id:
+            qs = qs.filter(parent_id=parent_id)
+        elif not request.GET.get('all'):
+            qs = qs.filter(parent__isnull=True)
+        qs = DossierVirtuel.avec_statistiques(qs).order_by('nom')
 
     dossier_juridique_id = request.GET.get('dossier_juridique_id')
     if dossier_juridique_id:
         qs = qs.filter(dossier_juridique_id=dossier_juridique_id)
 
     dossiers = []
-    for d in qs.order_by('nom'):
-        nb_docs = d.documents.exclude(statut='supprime').count()
-        nb_sous_dossiers = d.sous_dossiers.count()
-
+    for d in qs:
         dossiers.append({
             'id': str(d.id),
             'nom': d.nom,
@@ -700,8 +676,12 @@ def api_dossiers_liste(request):
             'couleur': d.couleur,
             'icone': d.icone,
             'est_systeme': d.est_systeme,
-            'nb_documents': nb_docs,
-            'nb_sous_dossiers': nb_sous_dossiers,
+            'profondeur': d.profondeur,
+            'nb_documents': d.nb_documents,
+            'taille_documents': d.taille_documents,
+            'nb_sous_dossiers': d.nb_sous_dossiers,
+            'nb_documents_total': d.nb_documents_total,
+            'taille_totale': d.taille_totale,
             'date_creation': d.date_creation.isoformat(),
         })
 
@@ -752,6 +732,10 @@ def api_dossier_creer(request):
             }
         })
 
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'success': False, 'error': 'Un dossier de ce nom existe déjà ici'}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
@@ -813,6 +797,7 @@ def api_dossier_renommer(request):
                 'error': 'Impossible de renommer un dossier système'
             }, status=400)
 
+        # Les chemins du sous-arbre sont réécrits en un seul UPDATE
         dossier.nom = nouveau_nom
         dossier.save()
 
@@ -821,10 +806,60 @@ def api_dossier_renommer(request):
             'message': 'Dossier renommé',
             'dossier': {
                 'id': str(dossier.id),
-                'nom': dossier.nom
+                'nom': dossier.nom,
+                'chemin': dossier.chemin,
+            }
+        })
+
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'success': False, 'error': 'Un dossier de ce nom existe déjà ici'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["POST"])
+def api_dossier_deplacer(request):
+    """
+    Déplacement d'un dossier virtuel (et de tout son sous-arbre)
+
+    POST (JSON):
+        - dossier_id: ID du dossier à déplacer
+        - parent_id: ID du nouveau parent (vide pour la racine)
+    """
+    try:
+        data = json.loads(request.body)
+        dossier = get_object_or_404(DossierVirtuel, id=data.get('dossier_id'))
+
+        if dossier.est_systeme:
+            return JsonResponse({
+                'success': False,
+                'error': 'Impossible de déplacer un dossier système'
+            }, status=400)
+
+        nouveau_parent = None
+        if data.get('parent_id'):
+            nouveau_parent = get_object_or_404(DossierVirtuel, id=data['parent_id'])
+
+        service = DocumentService(request.user)
+        service.deplacer_dossier(dossier, nouveau_parent)
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Dossier déplacé',
+            'dossier': {
+                'id': str(dossier.id),
+                'nom': dossier.nom,
+                'chemin': dossier.chemin,
             }
         })
 
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'success': False, 'error': 'Un dossier de ce nom existe déjà ici'}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
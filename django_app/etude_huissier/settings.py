@@ -81,6 +81,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "gestion.context_processors.navigation",
             ],
         },
     },
@@ -90,16 +91,27 @@ WSGI_APPLICATION = "etude_huissier.wsgi.application"
 ASGI_APPLICATION = "etude_huissier.asgi.application"
 
 # Django Channels - Configuration WebSocket pour Chatbot
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
-        # En production, utiliser Redis:
-        # "BACKEND": "channels_redis.core.RedisChannelLayer",
-        # "CONFIG": {
-        #     "hosts": [("127.0.0.1", 6379)],
-        # },
-    },
-}
+# Couche SQLite partagée par tous les workers ASGI de la machine
+# (chatbot/channel_layers.py). Sur plusieurs machines, définir
+# CHANNEL_LAYER_REDIS_URL (ex: redis://127.0.0.1:6379/0, paquet channels_redis).
+if os.environ.get('CHANNEL_LAYER_REDIS_URL'):
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [os.environ['CHANNEL_LAYER_REDIS_URL']],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "chatbot.channel_layers.SQLiteChannelLayer",
+            "CONFIG": {
+                "chemin": BASE_DIR / "channels.sqlite3",
+            },
+        },
+    }
 
 
 # Database
@@ -216,3 +228,43 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # EMAIL_HOST_USER = 'votre-email@example.com'
 # EMAIL_HOST_PASSWORD = 'votre-mot-de-passe'
 # DEFAULT_FROM_EMAIL = 'Étude Me BIAOU <no-reply@etude-biaou.com>'
+#
+# Si un serveur SMTP est renseigné dans Paramètres > Notifications, il est utilisé
+# en priorité par le worker d'envoi (python manage.py envoyer_notifications).
+
+# Passerelle SMS (HTTP, POST JSON {"to", "from", "text"}) utilisée par le worker
+# d'envoi des notifications. La clé API et l'expéditeur viennent des Paramètres.
+# Ex: SMS_GATEWAY_URL = 'https://api.fournisseur-sms.bj/v1/messages'
+SMS_GATEWAY_URL = os.environ.get('SMS_GATEWAY_URL', '')
+
+# Journal d'audit : écriture différée par lots (gestion/services/audit.py).
+# Les événements de sécurité restent écrits immédiatement.
+AUDIT_ECRITURE_DIFFEREE = True
+AUDIT_TAILLE_LOT = 100  # entrées
+AUDIT_DELAI_MAX = 5  # secondes
+
+# Journaux en ajout seul (audit, messages chatbot, notifications) : les derniers
+# mois restent dans les tables principales, les plus anciens sont déplacés dans
+# des tables d'archive mensuelles (python manage.py archiver_journaux).
+JOURNAUX_MOIS_CHAUDS = 3
+JOURNAL_AUDIT_RETENTION_JOURS = 3650  # 10 ans
+NOTIFICATIONS_RETENTION_JOURS = 365
+
+# Chatbot WebSocket : messages des conversations enregistrés par lots
+CHATBOT_MESSAGES_TAILLE_LOT = 20  # messages
+CHATBOT_MESSAGES_DELAI_MAX = 5  # secondes
+
+# Synchronisation incrémentale de l'agenda (api/synchronisation/ et abonnement ICS).
+# La marge relit les changements des dernières secondes avant le jeton (transactions
+# encore ouvertes) ; les traces de suppression sont purgées après la rétention
+# (python manage.py purger_synchronisation), un jeton plus ancien impose une
+# resynchronisation complète.
+AGENDA_SYNC_MARGE_SECONDES = 60
+AGENDA_SYNC_RETENTION_JOURS = 30
+AGENDA_ICS_JOURS_PASSES = 31
+AGENDA_ICS_JOURS_FUTURS = 365
+
+# Récurrences de l'agenda : les occurrences futures sont calculées à la lecture
+# (seules les exceptions sont enregistrées). Horizon par défaut d'une liste
+# sans date de fin, en jours.
+AGENDA_RECURRENCE_HORIZON_JOURS = 90
@@ -9,6 +9,8 @@ from django.utils import timezone
 from decimal import Decimal
 import uuid
 
+from gestion.services import sequences
+
 User = get_user_model()
 
 
@@ -339,6 +341,11 @@ class Loyer(models.Model):
         return f"Loyer {self.mois}/{self.annee} - {self.bail.bien.designation}"
 
     def save(self, *args, **kwargs):
+        self.calculer_statut()
+        super().save(*args, **kwargs)
+
+    def calculer_statut(self):
+        """Reste à payer et statut (aussi appelé avant un bulk_create, qui n'exécute pas save)"""
         self.reste_a_payer = self.montant_total - self.montant_paye
         if self.reste_a_payer <= 0:
             self.statut = 'paye'
@@ -346,7 +353,6 @@ class Loyer(models.Model):
             self.statut = 'partiel'
         elif self.date_echeance < timezone.now().date():
             self.statut = 'retard'
-        super().save(*args, **kwargs)
 
 
 class Quittance(models.Model):
@@ -372,6 +378,17 @@ class Quittance(models.Model):
     def __str__(self):
         return f"Quittance {self.numero}"
 
+    @classmethod
+    def generer_numeros(cls, quantite, annee=None):
+        """Réserve en un bloc les numéros de `quantite` quittances de l'année"""
+        annee = annee or timezone.now().year
+        prefix = f"QUIT-{annee}-"
+        numeros = sequences.reserver(
+            'QUIT', str(annee), quantite,
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'numero', prefix),
+        )
+        return [f"{prefix}{num:05d}" for num in numeros]
+
 
 class EtatDesLieux(models.Model):
     """État des lieux"""
@@ -17,49 +17,13 @@ from .models import (
     Proprietaire, BienImmobilier, Locataire, Bail, Loyer,
     Quittance, EtatDesLieux, Incident, ReversementProprietaire
 )
+from gestion.services import sequences
 
 
 def get_default_context(request):
     """Contexte par defaut pour tous les templates"""
-    # CORRECTION #17: Utiliser request.user au lieu de current_user hardcode
-    if request.user.is_authenticated:
-        current_user = {
-            'id': request.user.id,
-            'nom': request.user.get_full_name() or request.user.username,
-            'role': 'admin' if request.user.is_superuser else 'user',
-            'email': request.user.email,
-            'initials': ''.join([n[0].upper() for n in (request.user.get_full_name() or request.user.username).split()[:2]])
-        }
-    else:
-        current_user = {
-            'id': 0,
-            'nom': 'Utilisateur',
-            'role': 'guest',
-            'email': '',
-            'initials': 'U'
-        }
-
-    modules = [
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'home', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers', 'badge': 14},
-        {'id': 'facturation', 'label': 'Facturation & MECeF', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Creances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        {'id': 'tresorerie', 'label': 'Tresorerie', 'icon': 'piggy-bank', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilite', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gerance Immobiliere', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        {'id': 'parametres', 'label': 'Parametres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Securite & Acces', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    return {
-        'current_user': current_user,
-        'modules': modules,
-        'active_module': 'gerance',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'gerance'}
 
 
 @login_required
@@ -460,7 +424,10 @@ def api_creer_bail(request):
 
         # Generer reference du bail
         annee = timezone.now().year
-        count = Bail.objects.filter(reference__startswith=f"BAIL-{annee}").count() + 1
+        count = sequences.prochain(
+            'BAIL', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(Bail.objects.all(), 'reference', f"BAIL-{annee}-"),
+        )
         reference = f"BAIL-{annee}-{count:04d}"
 
         bail = Bail.objects.create(
@@ -506,9 +473,6 @@ def api_enregistrer_paiement(request):
 
         # Generer quittance si paiement complet
         if loyer.statut == 'paye':
-            annee = timezone.now().year
-            count = Quittance.objects.filter(numero__startswith=f"QUIT-{annee}").count() + 1
-
             # CORRECTION #32: Corriger periode_fin (dernier jour du mois)
             _, dernier_jour = calendar.monthrange(loyer.annee, loyer.mois)
             periode_debut = timezone.now().date().replace(year=loyer.annee, month=loyer.mois, day=1)
@@ -516,7 +480,7 @@ def api_enregistrer_paiement(request):
 
             Quittance.objects.create(
                 loyer=loyer,
-                numero=f"QUIT-{annee}-{count:05d}",
+                numero=Quittance.generer_numeros(1)[0],
                 montant=loyer.montant_total,
                 periode_debut=periode_debut,
                 periode_fin=periode_fin,
@@ -592,30 +556,33 @@ def api_generer_loyers(request):
         mois = int(data.get('mois', timezone.now().month))
         annee = int(data.get('annee', timezone.now().year))
 
-        baux_actifs = Bail.objects.filter(statut='actif')
-        loyers_crees = 0
+        # Baux actifs sans loyer pour le mois (une requête), loyers insérés en un lot
+        baux_actifs = Bail.objects.filter(statut='actif').exclude(
+            pk__in=Loyer.objects.filter(mois=mois, annee=annee).values('bail')
+        )
+        # CORRECTION #31: Gerer jours > 28 avec calendar.monthrange
+        _, dernier_jour_mois = calendar.monthrange(annee, mois)
 
+        loyers = []
         for bail in baux_actifs:
-            # Verifier si le loyer existe deja
-            if not Loyer.objects.filter(bail=bail, mois=mois, annee=annee).exists():
-                # CORRECTION #31: Gerer jours > 28 avec calendar.monthrange
-                _, dernier_jour_mois = calendar.monthrange(annee, mois)
-                jour_paiement = min(bail.jour_paiement, dernier_jour_mois)
-
-                date_echeance = timezone.now().date().replace(
-                    year=annee, month=mois, day=jour_paiement
-                )
+            loyer = Loyer(
+                bail=bail,
+                mois=mois,
+                annee=annee,
+                date_echeance=timezone.now().date().replace(
+                    year=annee, month=mois, day=min(bail.jour_paiement, dernier_jour_mois)
+                ),
+                montant_loyer=bail.loyer_mensuel,
+                montant_charges=bail.charges_mensuelles,
+                montant_total=bail.loyer_total,
+            )
+            loyer.calculer_statut()
+            loyers.append(loyer)
 
-                Loyer.objects.create(
-                    bail=bail,
-                    mois=mois,
-                    annee=annee,
-                    date_echeance=date_echeance,
-                    montant_loyer=bail.loyer_mensuel,
-                    montant_charges=bail.charges_mensuelles,
-                    montant_total=bail.loyer_total,
-                )
-                loyers_crees += 1
+        # Un loyer créé entre-temps par une autre génération est conservé : on
+        # ne compte que les lignes réellement insérées (clés générées ici)
+        Loyer.objects.bulk_create(loyers, batch_size=500, ignore_conflicts=True)
+        loyers_crees = Loyer.objects.filter(pk__in=[loyer.pk for loyer in loyers]).count() if loyers else 0
 
         return JsonResponse({
             'success': True,
@@ -17,7 +17,9 @@ from .models import (
     SessionUtilisateur, JournalAudit, AlerteSecurite,
     PolitiqueSecurite, AdresseIPAutorisee, AdresseIPBloquee,
     # Modèles supplémentaires
-    CalendrierSaisieImmo, PermissionsGranulaires
+    CalendrierSaisieImmo, PermissionsGranulaires,
+    # Numérotation
+    CompteurSequence
 )
 
 
@@ -155,6 +157,13 @@ class HistoriqueCalculAdmin(admin.ModelAdmin):
     date_hierarchy = 'date_creation'
 
 
+@admin.register(CompteurSequence)
+class CompteurSequenceAdmin(admin.ModelAdmin):
+    list_display = ('serie', 'periode', 'dernier_numero', 'date_modification')
+    list_filter = ('serie',)
+    readonly_fields = ('date_modification',)
+
+
 @admin.register(TauxLegal)
 class TauxLegalAdmin(admin.ModelAdmin):
     list_display = ('annee', 'taux', 'source')
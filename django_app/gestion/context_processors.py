@@ -0,0 +1,20 @@
+"""
+Processeurs de contexte du module Gestion.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from gestion.services.navigation import get_navigation_context
+
+
+def navigation(request):
+    """
+    Contexte de navigation (modules, utilisateur, collaborateurs) de tous
+    les templates ; les vues ne fournissent que active_module (voir les
+    get_default_context). Calculé seulement si le template l'utilise :
+    les fragments sans barre latérale n'en paient pas le coût.
+    """
+    contexte = SimpleLazyObject(lambda: get_navigation_context(request))
+    return {
+        cle: SimpleLazyObject(lambda cle=cle: contexte[cle])
+        for cle in ('current_user', 'modules', 'collaborateurs')
+    }
@@ -0,0 +1,40 @@
+"""
+Commande de gestion pour archiver les journaux par mois et appliquer la rétention
+
+Utilisation: python manage.py archiver_journaux [--journal CLE] [--sans-purge]
+
+Déplace les mois antérieurs à la fenêtre chaude (JOURNAUX_MOIS_CHAUDS) vers
+des tables d'archive mensuelles, puis supprime les tables des mois dont la
+rétention est échue. À exécuter chaque nuit via cron.
+"""
+
+from django.core.management.base import BaseCommand
+from gestion.services import archivage
+
+
+class Command(BaseCommand):
+    help = 'Archive les journaux (audit, chatbot, notifications) par mois et applique la rétention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--journal',
+            choices=sorted(archivage.JOURNAUX),
+            action='append',
+            help='Journal à traiter (par défaut: tous)',
+        )
+        parser.add_argument(
+            '--sans-purge',
+            action='store_true',
+            help="Archive sans supprimer les mois échus",
+        )
+
+    def handle(self, *args, **options):
+        for cle in options['journal'] or archivage.JOURNAUX:
+            lignes = archivage.archiver(cle)
+            self.stdout.write(f'{cle}: {lignes} ligne(s) archivée(s)')
+
+            if not options['sans_purge']:
+                mois = archivage.purger(cle)
+                self.stdout.write(f'{cle}: {mois} mois purgé(s)')
+
+        self.stdout.write(self.style.SUCCESS('Archivage des journaux terminé'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0021_add_proforma_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=30, verbose_name='Série')),
+                ('periode', models.CharField(blank=True, default='', max_length=20, verbose_name='Période')),
+                ('dernier_numero', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de séquence',
+                'verbose_name_plural': 'Compteurs de séquence',
+                'ordering': ['serie', 'periode'],
+                'constraints': [models.UniqueConstraint(fields=('serie', 'periode'), name='unique_compteur_serie_periode')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0022_compteursequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalaudit',
+            name='date_heure',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Date/Heure'),
+        ),
+    ]
@@ -5,6 +5,8 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import json
 
+from gestion.services import sequences
+
 
 class Utilisateur(AbstractUser):
     """Modele utilisateur personnalise"""
@@ -468,20 +470,39 @@ class Dossier(models.Model):
 
         return basculement
 
+    # Numéro de la loi (premier numéro de chaque mois) et initiales de l'huissier
+    PREFIXE_REFERENCE = 175
+    SUFFIXE_REFERENCE = "MAB"
+
     @classmethod
-    def generer_reference(cls):
-        now = timezone.now()
-        prefix = 175  # Numero de la loi
-        mois = str(now.month).zfill(2)
-        annee = str(now.year)[-2:]
-        suffix = "MAB"  # Initiales de l'huissier
+    def _dernier_numero_reference(cls, periode):
+        """Rang du dernier dossier déjà référencé pour la période MMAA"""
+        dernier = 0
+        references = cls.objects.filter(
+            reference__contains=f"_{periode}_"
+        ).values_list('reference', flat=True)
+        for reference in references.order_by().iterator():
+            numero = reference.split('_', 1)[0]
+            if numero.isdigit():
+                dernier = max(dernier, int(numero) - cls.PREFIXE_REFERENCE + 1)
+        return dernier
 
-        # Trouver le prochain numero
-        derniers = cls.objects.filter(
-            reference__startswith=f"{prefix}_{mois}{annee}"
-        ).count()
+    @classmethod
+    def generer_reference(cls, apercu=False):
+        """
+        Attribue la référence du prochain dossier (175_MMAA_MAB, 176_MMAA_MAB...).
+        Avec apercu=True, retourne la référence suivante sans la consommer.
+        """
+        now = timezone.localtime()
+        periode = f"{now.month:02d}{str(now.year)[-2:]}"
+        initial = lambda: cls._dernier_numero_reference(periode)
+
+        if apercu:
+            rang = sequences.apercu('DOS', periode, initial=initial)
+        else:
+            rang = sequences.prochain('DOS', periode, initial=initial)
 
-        return f"{prefix + derniers}_{mois}{annee}_{suffix}"
+        return f"{cls.PREFIXE_REFERENCE + rang - 1}_{periode}_{cls.SUFFIXE_REFERENCE}"
 
 
 class Facture(models.Model):
@@ -636,10 +657,39 @@ class Facture(models.Model):
             self.net_a_payer = self.montant_ttc or Decimal('0')
 
     @classmethod
-    def generer_numero(cls):
-        now = timezone.now()
-        count = cls.objects.filter(date_emission__year=now.year).count() + 1
-        return f"FAC-{now.year}-{str(count).zfill(3)}"
+    def generer_numero(cls, apercu=False):
+        """
+        Attribue le prochain numéro de facture (FAC-AAAA-NNN).
+
+        Série sans trou : à appeler dans la transaction qui crée la facture.
+        Avec apercu=True, retourne le numéro suivant sans le consommer.
+        """
+        annee = timezone.now().year
+        prefixe = f"FAC-{annee}-"
+        initial = lambda: sequences.dernier_numero_existant(cls.objects.all(), 'numero', prefixe)
+
+        if apercu:
+            numero = sequences.apercu('FAC', str(annee), initial=initial)
+        else:
+            numero = sequences.prochain('FAC', str(annee), initial=initial, sans_trou=True)
+
+        return f"{prefixe}{numero:03d}"
+
+    @classmethod
+    def generer_numero_mecef(cls):
+        """
+        Attribue le prochain numéro de normalisation MECeF (MECeF-AAAA-NNNNN).
+
+        Série légale sans trou : à appeler dans la transaction qui enregistre
+        la normalisation.
+        """
+        annee = timezone.now().year
+        prefixe = f"MECeF-{annee}-"
+        numero = sequences.prochain(
+            'MECEF', str(annee), sans_trou=True,
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'mecef_numero', prefixe),
+        )
+        return f"{prefixe}{numero:05d}"
 
     # ═══════════════════════════════════════════════════════════════
     # MÉTHODES AVOIR ET FACTURES CORRECTIVES
@@ -802,20 +852,13 @@ class Proforma(models.Model):
 
     @classmethod
     def generer_numero(cls):
-        from django.utils import timezone
         annee = timezone.now().year
-        dernier = cls.objects.filter(
-            numero__startswith=f'PRO-{annee}-'
-        ).order_by('-numero').first()
-
-        if dernier:
-            try:
-                num = int(dernier.numero.split('-')[-1]) + 1
-            except:
-                num = 1
-        else:
-            num = 1
-        return f'PRO-{annee}-{num:05d}'
+        prefixe = f'PRO-{annee}-'
+        num = sequences.prochain(
+            'PRO', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'numero', prefixe),
+        )
+        return f'{prefixe}{num:05d}'
 
     def calculer_totaux(self):
         """Recalcule les totaux depuis les lignes"""
@@ -834,6 +877,7 @@ class Proforma(models.Model):
 
         with transaction.atomic():
             facture = Facture.objects.create(
+                numero=Facture.generer_numero(),
                 dossier=self.dossier,
                 client=self.client,
                 ifu=self.ifu,
@@ -1227,8 +1271,11 @@ class Creancier(models.Model):
     @classmethod
     def generer_code(cls):
         """Génère un code créancier unique"""
-        count = cls.objects.count() + 1
-        return f"CR-{str(count).zfill(4)}"
+        numero = sequences.prochain(
+            'CR',
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'code', 'CR-'),
+        )
+        return f"CR-{numero:04d}"
 
     def get_total_creances(self):
         """Retourne le total des créances confiées"""
@@ -1453,9 +1500,13 @@ class Encaissement(models.Model):
     @classmethod
     def generer_reference(cls):
         """Génère une référence unique pour l'encaissement"""
-        now = timezone.now()
-        count = cls.objects.filter(date_creation__year=now.year).count() + 1
-        return f"ENC-{now.year}-{str(count).zfill(5)}"
+        annee = timezone.now().year
+        prefixe = f"ENC-{annee}-"
+        numero = sequences.prochain(
+            'ENC', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefixe),
+        )
+        return f"{prefixe}{numero:05d}"
 
     def save(self, *args, **kwargs):
         # Générer la référence si nouvelle
@@ -1656,9 +1707,13 @@ class Reversement(models.Model):
     @classmethod
     def generer_reference(cls):
         """Génère une référence unique pour le reversement"""
-        now = timezone.now()
-        count = cls.objects.filter(date_creation__year=now.year).count() + 1
-        return f"REV-{now.year}-{str(count).zfill(4)}"
+        annee = timezone.now().year
+        prefixe = f"REV-{annee}-"
+        numero = sequences.prochain(
+            'REV', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefixe),
+        )
+        return f"{prefixe}{numero:04d}"
 
     def save(self, *args, **kwargs):
         if not self.reference:
@@ -1776,18 +1831,9 @@ class BasculementAmiableForce(models.Model):
         return f"Basculement {self.dossier.reference} - {self.date_basculement.strftime('%d/%m/%Y')}"
 
     def calculer_emoluments_ohada(self, montant):
-        """Calcule les émoluments selon le barème OHADA"""
-        # Barème des émoluments OHADA (simplifié)
-        if montant <= 500000:
-            return montant * 0.10
-        elif montant <= 1000000:
-            return 50000 + (montant - 500000) * 0.08
-        elif montant <= 5000000:
-            return 90000 + (montant - 1000000) * 0.05
-        elif montant <= 10000000:
-            return 290000 + (montant - 5000000) * 0.03
-        else:
-            return 440000 + (montant - 10000000) * 0.01
+        """Calcule les émoluments selon le barème OHADA (arrondis à l'entier)"""
+        from recouvrement.services.baremes import BAREME_EMOLUMENTS_OHADA_COMPILE, calculer_droit_recette
+        return calculer_droit_recette(montant, BAREME_EMOLUMENTS_OHADA_COMPILE)
 
 
 # =============================================================================
@@ -2306,9 +2352,14 @@ class Memoire(models.Model):
     @classmethod
     def generer_numero(cls):
         """Génère un numéro de mémoire unique"""
-        now = timezone.now()
-        count = cls.objects.filter(date_creation__year=now.year).count() + 1
-        return f"{count}"
+        annee = timezone.now().year
+        numero = sequences.prochain(
+            'MEM', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(
+                cls.objects.filter(date_creation__year=annee), 'numero'
+            ),
+        )
+        return f"{numero}"
 
     def calculer_totaux(self):
         """Recalcule tous les totaux du mémoire"""
@@ -3117,6 +3168,12 @@ class JournalAudit(models.Model):
         ('parametrage', 'Modification paramètres'),
     ]
 
+    # Actions écrites immédiatement, hors tampon d'audit
+    ACTIONS_CRITIQUES = {
+        'connexion', 'deconnexion', 'echec_connexion', 'changement_mdp',
+        'reset_mdp', 'acces_refuse', 'parametrage',
+    }
+
     MODULES = [
         ('connexion', 'Connexion'),
         ('dossiers', 'Dossiers'),
@@ -3133,7 +3190,8 @@ class JournalAudit(models.Model):
         ('systeme', 'Système'),
     ]
 
-    date_heure = models.DateTimeField(auto_now_add=True, verbose_name='Date/Heure')
+    # Horodatée à l'action et non à l'écriture (voir gestion/services/audit.py)
+    date_heure = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Date/Heure')
     utilisateur = models.ForeignKey(
         Utilisateur, on_delete=models.SET_NULL, null=True, blank=True,
         related_name='actions_audit'
@@ -3183,10 +3241,18 @@ class JournalAudit(models.Model):
 
     @classmethod
     def log_action(cls, utilisateur, action, module, details='', objet=None,
-                   donnees_avant=None, donnees_apres=None, request=None):
-        """Méthode utilitaire pour créer une entrée d'audit"""
+                   donnees_avant=None, donnees_apres=None, request=None, immediat=None):
+        """
+        Méthode utilitaire pour créer une entrée d'audit.
+
+        L'entrée est écrite en différé par lots, sauf pour les actions
+        critiques (ACTIONS_CRITIQUES, module sécurité) ou si immediat=True.
+        """
+        from gestion.services import audit
+
         entry = cls(
             utilisateur=utilisateur,
+            utilisateur_nom=str(utilisateur) if utilisateur else '',
             action=action,
             module=module,
             details=details,
@@ -3197,14 +3263,45 @@ class JournalAudit(models.Model):
         if objet:
             entry.objet_type = objet.__class__.__name__
             entry.objet_id = str(objet.pk) if hasattr(objet, 'pk') else ''
-            entry.objet_representation = str(objet)[:500]
+            if getattr(objet, 'pk', None) is None or action == 'suppression':
+                # L'objet ne pourra plus être relu à l'écriture
+                entry.objet_representation = str(objet)[:500]
+            else:
+                # Libellé calculé à l'écriture du lot (preparer_ecriture)
+                from django.contrib.contenttypes.models import ContentType
+                entry._objet_a_decrire = (ContentType.objects.get_for_model(objet).pk, objet.pk)
 
         if request:
             entry.adresse_ip = cls.get_client_ip(request)
             entry.user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
 
-        entry.save()
-        return entry
+        if immediat is None:
+            immediat = action in cls.ACTIONS_CRITIQUES or module == 'securite'
+        return audit.enregistrer(entry, immediat=immediat)
+
+    @classmethod
+    def preparer_ecriture(cls, entrees):
+        """
+        Calcule les libellés des objets référencés par les entrées, juste
+        avant leur écriture : une requête par type d'objet.
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        par_type = {}
+        for entree in entrees:
+            reference = entree.__dict__.pop('_objet_a_decrire', None)
+            if reference:
+                content_type_id, pk = reference
+                par_type.setdefault(content_type_id, []).append((entree, pk))
+
+        for content_type_id, references in par_type.items():
+            modele = ContentType.objects.get_for_id(content_type_id).model_class()
+            objets = modele._base_manager.in_bulk({pk for _, pk in references}) if modele else {}
+            for entree, pk in references:
+                objet = objets.get(pk)
+                entree.objet_representation = (
+                    str(objet)[:500] if objet else f"{entree.objet_type} #{entree.objet_id}"
+                )
 
     @staticmethod
     def get_client_ip(request):
@@ -3630,9 +3727,13 @@ class CalendrierSaisieImmo(models.Model):
     @classmethod
     def generer_reference(cls):
         """Génère une référence unique pour le calendrier"""
-        now = timezone.now()
-        count = cls.objects.filter(created_at__year=now.year).count() + 1
-        return f"SAI-{now.year}-{str(count).zfill(4)}"
+        annee = timezone.now().year
+        prefixe = f"SAI-{annee}-"
+        numero = sequences.prochain(
+            'SAI', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefixe),
+        )
+        return f"{prefixe}{numero:04d}"
 
     def save(self, *args, **kwargs):
         if not self.reference:
@@ -3842,10 +3943,13 @@ class PaiementGlobalMemoires(models.Model):
     @classmethod
     def generer_reference(cls):
         """Génère une référence unique pour le paiement global"""
-        from datetime import datetime
-        annee = datetime.now().year
-        count = cls.objects.filter(created_at__year=annee).count() + 1
-        return f"PGM-{annee}-{count:04d}"
+        annee = timezone.now().year
+        prefixe = f"PGM-{annee}-"
+        numero = sequences.prochain(
+            'PGM', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefixe),
+        )
+        return f"{prefixe}{numero:04d}"
 
 
 class HistoriqueValidationMemoire(models.Model):
@@ -4312,5 +4416,31 @@ class ActeSecurise(models.Model):
         self.save(update_fields=['nombre_verifications', 'derniere_verification'])
 
 
+class CompteurSequence(models.Model):
+    """
+    Compteur de numérotation par série et par période (ex: FAC / 2025).
+
+    Une ligne par clé : l'attribution d'un numéro est un UPDATE atomique
+    sur cette ligne (voir gestion/services/sequences.py), sans parcourir
+    la table métier.
+    """
+    serie = models.CharField(max_length=30, verbose_name='Série')
+    periode = models.CharField(max_length=20, blank=True, default='', verbose_name='Période')
+    dernier_numero = models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Compteur de séquence'
+        verbose_name_plural = 'Compteurs de séquence'
+        ordering = ['serie', 'periode']
+        constraints = [
+            models.UniqueConstraint(fields=['serie', 'periode'], name='unique_compteur_serie_periode'),
+        ]
+
+    def __str__(self):
+        cle = f"{self.serie}/{self.periode}" if self.periode else self.serie
+        return f"Compteur {cle}: {self.dernier_numero}"
+
+
 # Import des modèles d'import (pour les inclure dans les migrations)
 from gestion.models_import import SessionImport, DossierImportTemp
@@ -0,0 +1,293 @@
+"""
+Archivage mensuel des journaux en ajout seul.
+
+Concerne le journal d'audit, l'audit des documents, les messages du
+chatbot et les notifications de l'agenda. SQLite n'offre pas de
+partitionnement natif. Chaque journal garde donc :
+
+- une table « chaude » : les JOURNAUX_MOIS_CHAUDS derniers mois ;
+- des tables d'archive mensuelles <table>_aAAAAMM, créées à la volée.
+
+Les opérations :
+
+- archiver() déplace chaque mois complet plus ancien que la fenêtre
+  chaude. Pour chaque mois : un INSERT ... SELECT puis un DELETE par
+  intervalle de dates, dans une transaction. Aucune ligne n'est chargée
+  en Python.
+- purger() applique la rétention en supprimant des tables d'archive
+  entières (DROP TABLE), quelle que soit leur taille.
+- lire() n'interroge que les tables d'archive dont le mois recoupe
+  l'intervalle demandé, en plus de la table chaude, et s'arrête dès que
+  les mois plus anciens ne peuvent plus figurer dans le résultat.
+- supprimer() efface des lignes de la table chaude et des archives
+  (la cascade de l'ORM ne voit pas les tables d'archive).
+
+Une archive est créée avec les colonnes du modèle au moment de sa
+création. Avant chaque écriture ou lecture, les colonnes ajoutées depuis
+par une migration y sont ajoutées (NULL pour les lignes archivées) ; les
+colonnes supprimées y restent, ignorées car toutes les requêtes nomment
+leurs colonnes.
+
+Les lignes encore référencées par une clé étrangère ou un lien un-à-un
+CASCADE restent dans la table chaude, par exemple un message qui porte
+une action en attente ou une commande vocale.
+Les références SET_NULL sont mises à NULL avant le déplacement, comme le
+ferait l'ORM.
+"""
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+
+def _retention_audit():
+    return getattr(settings, 'JOURNAL_AUDIT_RETENTION_JOURS', 3650)
+
+
+def _retention_audit_documents():
+    from documents.models import ConfigurationDocuments
+    return ConfigurationDocuments.get_instance().duree_retention_audit
+
+
+def _retention_chatbot():
+    from chatbot.models import ConfigurationChatbot
+    return ConfigurationChatbot.get_instance().duree_retention_jours
+
+
+def _retention_notifications():
+    return getattr(settings, 'NOTIFICATIONS_RETENTION_JOURS', 365)
+
+
+@dataclass(frozen=True)
+class Journal:
+    """Journal archivable : modèle, champ de date et rétention (jours)."""
+    modele: str
+    champ_date: str
+    retention: object
+
+    def get_modele(self):
+        return apps.get_model(self.modele)
+
+
+JOURNAUX = {
+    'audit': Journal('gestion.JournalAudit', 'date_heure', _retention_audit),
+    'audit_documents': Journal('documents.AuditDocument', 'date', _retention_audit_documents),
+    'messages_chatbot': Journal('chatbot.Message', 'date_creation', _retention_chatbot),
+    'notifications': Journal('agenda.Notification', 'date_creation', _retention_notifications),
+}
+
+
+def _debut_mois(date, decalage=0):
+    """Premier instant (local) du mois de `date`, décalé de `decalage` mois."""
+    mois = date.year * 12 + date.month - 1 + decalage
+    return timezone.make_aware(timezone.datetime(mois // 12, mois % 12 + 1, 1))
+
+
+def debut_fenetre_chaude(maintenant=None):
+    """Date à partir de laquelle les lignes restent dans les tables chaudes."""
+    maintenant = timezone.localtime(maintenant or timezone.now())
+    mois_chauds = getattr(settings, 'JOURNAUX_MOIS_CHAUDS', 3)
+    return _debut_mois(maintenant, -(mois_chauds - 1))
+
+
+def nom_table_archive(modele, debut_mois):
+    return f"{modele._meta.db_table}_a{debut_mois:%Y%m}"
+
+
+def tables_archive(modele):
+    """Tables d'archive existantes : liste triée de (début du mois, nom)."""
+    motif = re.compile(rf"^{re.escape(modele._meta.db_table)}_a(\d{{4}})(\d{{2}})$")
+    tables = []
+    for nom in connection.introspection.table_names():
+        correspondance = motif.match(nom)
+        if correspondance:
+            annee, mois = map(int, correspondance.groups())
+            tables.append((timezone.make_aware(timezone.datetime(annee, mois, 1)), nom))
+    return sorted(tables)
+
+
+_archives_alignees = set()
+
+
+def _aligner_archive(cursor, modele, archive):
+    """Ajoute à l'archive les colonnes du modèle qu'elle n'a pas encore."""
+    champs = modele._meta.concrete_fields
+    cle = (archive, tuple(f.column for f in champs))
+    if cle in _archives_alignees:
+        return
+    existantes = {c.name for c in connection.introspection.get_table_description(cursor, archive)}
+    for champ in champs:
+        if champ.column not in existantes:
+            # Sans contrainte : les lignes déjà archivées prennent NULL
+            cursor.execute(
+                f"ALTER TABLE {connection.ops.quote_name(archive)} "
+                f"ADD COLUMN {connection.ops.quote_name(champ.column)} {champ.db_type(connection)}"
+            )
+    _archives_alignees.add(cle)
+
+
+def _lignes_du_mois(journal, debut, fin):
+    """Lignes de la table chaude à déplacer pour le mois [debut, fin)."""
+    modele = journal.get_modele()
+    lignes = modele.objects.filter(**{
+        f'{journal.champ_date}__gte': debut,
+        f'{journal.champ_date}__lt': fin,
+    })
+    for relation in modele._meta.related_objects:
+        if (relation.one_to_many or relation.one_to_one) and relation.on_delete is models.CASCADE:
+            lignes = lignes.exclude(**{f'{relation.name}__isnull': False})
+    return lignes
+
+
+def _archiver_mois(journal, debut, fin):
+    modele = journal.get_modele()
+    table = connection.ops.quote_name(modele._meta.db_table)
+    archive = nom_table_archive(modele, debut)
+    archive_q = connection.ops.quote_name(archive)
+    colonne_date = modele._meta.get_field(journal.champ_date).column
+    colonnes = ', '.join(connection.ops.quote_name(f.column) for f in modele._meta.concrete_fields)
+    pk = connection.ops.quote_name(modele._meta.pk.column)
+
+    lignes = _lignes_du_mois(journal, debut, fin)
+    if not lignes.exists():
+        return 0
+    sql_pks, params = lignes.values('pk').query.sql_with_params()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive_q} AS SELECT {colonnes} FROM {table} WHERE 1 = 0")
+        _aligner_archive(cursor, modele, archive)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {connection.ops.quote_name(archive + '_date')} "
+            f"ON {archive_q} ({connection.ops.quote_name(colonne_date)})"
+        )
+
+        for relation in modele._meta.related_objects:
+            if (relation.one_to_many or relation.one_to_one) and relation.on_delete is models.SET_NULL:
+                enfant = relation.related_model
+                cursor.execute(
+                    f"UPDATE {connection.ops.quote_name(enfant._meta.db_table)} "
+                    f"SET {connection.ops.quote_name(relation.field.column)} = NULL "
+                    f"WHERE {connection.ops.quote_name(relation.field.column)} IN ({sql_pks})",
+                    params,
+                )
+
+        cursor.execute(
+            f"INSERT INTO {archive_q} ({colonnes}) SELECT {colonnes} FROM {table} WHERE {pk} IN ({sql_pks})",
+            params,
+        )
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql_pks})", params)
+        return cursor.rowcount
+
+
+def archiver(cle, maintenant=None):
+    """
+    Déplace vers les tables d'archive les mois complets antérieurs à la
+    fenêtre chaude. Retourne le nombre de lignes déplacées.
+    """
+    journal = JOURNAUX[cle]
+    modele = journal.get_modele()
+    limite = debut_fenetre_chaude(maintenant)
+
+    plus_ancienne = modele.objects.filter(
+        **{f'{journal.champ_date}__lt': limite}
+    ).aggregate(date=Min(journal.champ_date))['date']
+    if plus_ancienne is None:
+        return 0
+
+    total = 0
+    debut = _debut_mois(timezone.localtime(plus_ancienne))
+    while debut < limite:
+        fin = _debut_mois(debut, 1)
+        total += _archiver_mois(journal, debut, fin)
+        debut = fin
+    return total
+
+
+def purger(cle, jours_retention=None, maintenant=None):
+    """
+    Applique la rétention : supprime les tables d'archive des mois
+    entièrement échus, puis les lignes résiduelles de la table chaude.
+    Retourne le nombre de tables supprimées.
+    """
+    journal = JOURNAUX[cle]
+    modele = journal.get_modele()
+    if jours_retention is None:
+        jours_retention = journal.retention()
+    limite = (maintenant or timezone.now()) - timedelta(days=jours_retention)
+
+    supprimees = 0
+    with connection.cursor() as cursor:
+        for debut, nom in tables_archive(modele):
+            if _debut_mois(debut, 1) <= limite:
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(nom)}")
+                supprimees += 1
+
+    modele.objects.filter(**{f'{journal.champ_date}__lt': limite}).delete()
+    return supprimees
+
+
+def lire(cle, debut=None, fin=None, limite=50, **filtres):
+    """
+    Entrées d'un journal sur [debut, fin), les plus récentes d'abord.
+
+    La table chaude est toujours interrogée (petite et indexée) ; seules les
+    tables d'archive dont le mois recoupe l'intervalle le sont.
+    """
+    journal = JOURNAUX[cle]
+    modele = journal.get_modele()
+    if debut is not None:
+        filtres[f'{journal.champ_date}__gte'] = debut
+    if fin is not None:
+        filtres[f'{journal.champ_date}__lt'] = fin
+
+    requete = modele.objects.filter(**filtres).order_by(f'-{journal.champ_date}')[:limite]
+    entrees = list(requete)
+
+    table = connection.ops.quote_name(modele._meta.db_table)
+    sql, params = requete.query.sql_with_params()
+    with connection.cursor() as cursor:
+        # Du mois le plus récent au plus ancien
+        for debut_mois, nom in reversed(tables_archive(modele)):
+            fin_mois = _debut_mois(debut_mois, 1)
+            if debut is not None and fin_mois <= debut:
+                break
+            if fin is not None and debut_mois >= fin:
+                continue
+            if len(entrees) >= limite:
+                entrees.sort(key=lambda e: getattr(e, journal.champ_date), reverse=True)
+                if getattr(entrees[limite - 1], journal.champ_date) >= fin_mois:
+                    # Les mois plus anciens ne peuvent plus entrer dans le résultat
+                    break
+            _aligner_archive(cursor, modele, nom)
+            entrees.extend(modele.objects.raw(sql.replace(table, connection.ops.quote_name(nom)), params))
+
+    entrees.sort(key=lambda e: getattr(e, journal.champ_date), reverse=True)
+    return entrees[:limite]
+
+
+def supprimer(cle, **filtres):
+    """
+    Supprime les entrées d'un journal correspondant aux filtres, dans la
+    table chaude (par l'ORM) et dans toutes les tables d'archive.
+    Retourne le nombre de lignes archivées supprimées.
+    """
+    journal = JOURNAUX[cle]
+    modele = journal.get_modele()
+    table = connection.ops.quote_name(modele._meta.db_table)
+    pk = connection.ops.quote_name(modele._meta.pk.column)
+    sql, params = modele.objects.filter(**filtres).values('pk').query.sql_with_params()
+
+    supprimees = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for _, nom in tables_archive(modele):
+            archive_q = connection.ops.quote_name(nom)
+            _aligner_archive(cursor, modele, nom)
+            cursor.execute(f"DELETE FROM {archive_q} WHERE {pk} IN ({sql.replace(table, archive_q)})", params)
+            supprimees += cursor.rowcount
+        modele.objects.filter(**filtres).delete()
+    return supprimees
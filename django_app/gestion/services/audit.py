@@ -0,0 +1,133 @@
+"""
+Écriture différée des journaux d'audit (JournalAudit, AuditDocument).
+
+Les entrées ne sont plus insérées une par une dans la requête de
+l'utilisateur : elles sont mises en tampon en mémoire puis écrites par
+lots (bulk_create), pour ne plus disputer le verrou d'écriture SQLite
+aux enregistrements métier.
+
+- Dans une transaction, l'entrée n'est mise en tampon qu'au commit
+  (une action annulée n'est pas journalisée).
+- Le tampon est vidé dès qu'il atteint AUDIT_TAILLE_LOT entrées, ou au
+  plus tard AUDIT_DELAI_MAX secondes après la première entrée en
+  attente, ainsi qu'à l'arrêt du processus (atexit).
+- Les événements de sécurité sont écrits immédiatement (immediat=True).
+- Un modèle peut définir preparer_ecriture(entrees), appelé juste avant
+  l'écriture (ex. JournalAudit calcule alors les libellés des objets,
+  au lieu de str(objet) dans la requête).
+- AUDIT_ECRITURE_DIFFEREE = False rétablit l'écriture synchrone.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class TamponAudit:
+    """Tampon d'entrées d'audit partagé par les threads du processus."""
+
+    def __init__(self, taille_lot=100, delai_max=5):
+        self.taille_lot = taille_lot
+        self.delai_max = delai_max
+        self._verrou = threading.Lock()
+        self._entrees = []
+        self._minuteur = None
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def ajouter(self, entree):
+        """Met une instance non sauvegardée en attente d'écriture."""
+        with self._verrou:
+            self._entrees.append(entree)
+            plein = len(self._entrees) >= self.taille_lot
+            if not plein and self._minuteur is None:
+                self._minuteur = threading.Timer(self.delai_max, self._vider_en_arriere_plan)
+                self._minuteur.daemon = True
+                self._minuteur.start()
+
+        if plein:
+            self.vider()
+
+    def vider(self):
+        """Écrit toutes les entrées en attente, un bulk_create par modèle."""
+        with self._verrou:
+            entrees, self._entrees = self._entrees, []
+            if self._minuteur is not None:
+                self._minuteur.cancel()
+                self._minuteur = None
+
+        if not entrees:
+            return 0
+
+        par_modele = defaultdict(list)
+        for entree in entrees:
+            par_modele[type(entree)].append(entree)
+
+        for modele, lot in par_modele.items():
+            try:
+                preparer_ecriture(modele, lot)
+                modele.objects.bulk_create(lot)
+            except Exception:
+                # Un lot invalide ne doit pas faire perdre les autres entrées
+                logger.exception("Écriture groupée de %s impossible, écriture unitaire", modele.__name__)
+                for entree in lot:
+                    try:
+                        entree.save()
+                    except Exception:
+                        logger.exception("Entrée d'audit perdue : %r", entree)
+
+        return len(entrees)
+
+    def _vider_en_arriere_plan(self):
+        with self._verrou:
+            self._minuteur = None
+        try:
+            self.vider()
+        finally:
+            # Le thread du minuteur a sa propre connexion
+            connection.close()
+
+
+def preparer_ecriture(modele, entrees):
+    """Complète les entrées juste avant leur écriture (hook optionnel du modèle)."""
+    preparer = getattr(modele, 'preparer_ecriture', None)
+    if preparer is not None:
+        preparer(entrees)
+
+
+tampon = TamponAudit(
+    taille_lot=getattr(settings, 'AUDIT_TAILLE_LOT', 100),
+    delai_max=getattr(settings, 'AUDIT_DELAI_MAX', 5),
+)
+atexit.register(tampon.vider)
+
+
+def enregistrer(entree, immediat=False):
+    """
+    Enregistre une entrée d'audit (instance non sauvegardée).
+
+    Args:
+        entree: Instance de JournalAudit, AuditDocument...
+        immediat: Écriture synchrone (événements de sécurité)
+    """
+    if immediat or not getattr(settings, 'AUDIT_ECRITURE_DIFFEREE', True):
+        preparer_ecriture(type(entree), [entree])
+        entree.save()
+        return entree
+
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: tampon.ajouter(entree))
+    else:
+        tampon.ajouter(entree)
+    return entree
+
+
+def vider():
+    """Force l'écriture des entrées en attente (tests, commandes)."""
+    return tampon.vider()
@@ -0,0 +1,140 @@
+"""
+Contexte de navigation partagé par tous les modules.
+
+Fourni à tous les templates par le processeur de contexte
+gestion.context_processors.navigation ; les get_default_context des
+applications n'ajoutent que le module actif. La liste des modules est
+définie une seule fois, la liste des collaborateurs actifs et les badges
+par utilisateur sont mis en cache.
+
+- Collaborateurs : invalidés par les signaux post_save/post_delete de
+  Collaborateur (voir gestion/signals.py), avec une durée de vie de
+  secours pour les déploiements multi-processus.
+- Badges : cache court par utilisateur (compteurs indicatifs).
+"""
+from django.core.cache import cache
+
+
+# Modules de navigation (ordre d'affichage dans la barre latérale)
+MODULES_NAVIGATION = [
+    # Principal
+    {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'layout-dashboard', 'category': 'main', 'url': 'gestion:dashboard'},
+    {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers'},
+    {'id': 'facturation', 'label': 'Facturation & MECeF', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
+    {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
+    {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
+    # Finance
+    {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'wallet', 'category': 'finance', 'url': 'tresorerie:dashboard'},
+    {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
+    # Gestion
+    {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
+    {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
+    {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
+    {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
+    # Admin
+    {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
+    {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
+]
+
+# Collaborateurs affichés si aucun n'est encore saisi en base
+COLLABORATEURS_PAR_DEFAUT = [
+    {'id': 1, 'nom': 'Me BIAOU Martial', 'role': 'Huissier'},
+    {'id': 2, 'nom': 'ADJOVI Carine', 'role': 'Clerc Principal'},
+    {'id': 3, 'nom': 'HOUNKPATIN Paul', 'role': 'Clerc'},
+    {'id': 4, 'nom': 'DOSSOU Marie', 'role': 'Secretaire'},
+]
+
+CACHE_KEY_COLLABORATEURS = 'navigation_collaborateurs'
+CACHE_TIMEOUT_COLLABORATEURS = 3600  # 1 heure (invalidé par signal)
+CACHE_TIMEOUT_BADGES = 60  # 1 minute
+
+
+def get_badges_cache_key(user_id):
+    """Clé de cache des badges de navigation d'un utilisateur."""
+    return f"navigation_badges_{user_id}"
+
+
+def get_collaborateurs_actifs():
+    """Liste (en cache) des collaborateurs actifs pour les sélecteurs."""
+    collaborateurs = cache.get(CACHE_KEY_COLLABORATEURS)
+
+    if collaborateurs is None:
+        from gestion.models import Collaborateur
+        collaborateurs = [
+            {'id': c.id, 'nom': c.nom, 'role': c.get_role_display()}
+            for c in Collaborateur.objects.filter(actif=True).order_by('nom')
+        ]
+        cache.set(CACHE_KEY_COLLABORATEURS, collaborateurs, CACHE_TIMEOUT_COLLABORATEURS)
+
+    return collaborateurs or COLLABORATEURS_PAR_DEFAUT
+
+
+def invalidate_collaborateurs_cache():
+    """Invalide la liste des collaborateurs en cache."""
+    cache.delete(CACHE_KEY_COLLABORATEURS)
+
+
+def get_badges(user):
+    """
+    Compteurs affichés dans la navigation pour un utilisateur :
+    dossiers urgents et notifications agenda non lues.
+    """
+    if not user or not user.is_authenticated:
+        return {}
+
+    cache_key = get_badges_cache_key(user.id)
+    badges = cache.get(cache_key)
+
+    if badges is None:
+        from gestion.models import Dossier
+        from agenda.models import Notification
+        badges = {
+            'dossiers': Dossier.objects.filter(statut='urgent').count(),
+            'agenda': Notification.objects.filter(destinataire=user, est_lu=False).count(),
+        }
+        cache.set(cache_key, badges, CACHE_TIMEOUT_BADGES)
+
+    return badges
+
+
+def invalidate_badges_cache(user_id):
+    """Invalide les badges en cache d'un utilisateur."""
+    cache.delete(get_badges_cache_key(user_id))
+
+
+def get_current_user_context(user):
+    """Informations de l'utilisateur connecté affichées dans la barre latérale."""
+    if not user or not user.is_authenticated:
+        return {'id': None, 'nom': 'Invité', 'role': '', 'email': '', 'initials': 'XX'}
+
+    return {
+        'id': user.id,
+        'nom': user.get_full_name() or user.username,
+        'role': getattr(user, 'role', ''),
+        'email': user.email,
+        'initials': user.get_initials() if hasattr(user, 'get_initials') else user.username[:2].upper(),
+    }
+
+
+def get_navigation_context(request, active_module=''):
+    """
+    Contexte par défaut pour tous les templates.
+
+    Aucune requête SQL lorsque le cache est chaud.
+    """
+    user = getattr(request, 'user', None)
+    badges = get_badges(user)
+
+    modules = []
+    for module in MODULES_NAVIGATION:
+        module = dict(module)
+        if badges.get(module['id']):
+            module['badge'] = badges[module['id']]
+        modules.append(module)
+
+    return {
+        'current_user': get_current_user_context(user),
+        'modules': modules,
+        'collaborateurs': get_collaborateurs_actifs(),
+        'active_module': active_module,
+    }
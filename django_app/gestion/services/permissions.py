@@ -0,0 +1,223 @@
+"""
+Résolution des permissions effectives d'un utilisateur.
+
+Point d'entrée unique des contrôles d'accès. Les sources de droits sont
+fusionnées en un ensemble de codes « module.action » (ex. dossiers.creer) :
+
+- permissions du rôle (Role / RolePermission, rôle actif uniquement) ;
+- permissions granulaires cochées par l'administrateur
+  (PermissionsGranulaires, valeurs par défaut du modèle si aucune ligne) ;
+- surcharges individuelles (PermissionUtilisateur), qui accordent ou
+  retirent une permission et l'emportent sur les deux précédentes.
+
+Le superuser et le rôle 'admin' ont toutes les permissions sans aucune
+requête. Le staff accède aux pages d'administration (est_admin) mais n'a
+que les permissions métier qui lui sont accordées.
+
+L'ensemble est calculé une seule fois par requête (mémorisé sur
+request.user). Si le cache par défaut est partagé entre processus
+(Redis, Memcached, base de données...), il y est aussi conservé entre
+les requêtes, sous une clé qui inclut un numéro de version global des
+droits. Les signaux post_save/post_delete des modèles de droits
+incrémentent ce numéro (voir gestion/signals.py) : toutes les entrées
+deviennent obsolètes d'un coup. La clé contient aussi le rôle et les
+indicateurs du compte, un changement de rôle prend donc effet
+immédiatement.
+
+Avec un cache local à chaque processus (LocMemCache, réglage par défaut),
+l'invalidation n'atteindrait que le processus qui a modifié les droits :
+les permissions sont alors recalculées à chaque requête.
+"""
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+
+CACHE_KEY_VERSION = 'permissions_version'
+CACHE_TIMEOUT_PERMISSIONS = 300  # 5 minutes (invalidé par signal)
+
+# Attribut de mémorisation sur l'utilisateur de la requête
+ATTRIBUT_MEMOIRE = '_permissions_effectives'
+
+# Backends de cache propres à chaque processus
+CACHES_LOCAUX = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@dataclass(frozen=True)
+class PermissionsEffectives:
+    """Permissions d'un utilisateur, prêtes pour des tests d'appartenance."""
+
+    codes: frozenset = frozenset()
+    admin: bool = False
+
+    def __contains__(self, code):
+        return self.admin or code in self.codes
+
+
+AUCUNE_PERMISSION = PermissionsEffectives()
+TOUTES_PERMISSIONS = PermissionsEffectives(admin=True)
+
+
+def code_permission_granulaire(champ):
+    """'dossiers_voir_tous' -> 'dossiers.voir_tous'"""
+    return champ.replace('_', '.', 1)
+
+
+def get_champs_granulaires():
+    """Champs booléens de PermissionsGranulaires (une permission chacun)."""
+    from django.db.models import BooleanField
+    from gestion.models import PermissionsGranulaires
+    return [
+        f for f in PermissionsGranulaires._meta.get_fields()
+        if isinstance(f, BooleanField)
+    ]
+
+
+def cache_partage():
+    """Le cache par défaut est-il commun à tous les processus ?"""
+    return settings.CACHES.get('default', {}).get('BACKEND') not in CACHES_LOCAUX
+
+
+def get_version():
+    """Numéro de version courant des droits."""
+    version = cache.get(CACHE_KEY_VERSION)
+    if version is None:
+        # Valeur initiale horodatée : une version perdue (éviction, redémarrage)
+        # ne fait jamais réapparaître d'anciennes entrées
+        cache.add(CACHE_KEY_VERSION, time.time_ns(), None)
+        version = cache.get(CACHE_KEY_VERSION)
+    return version
+
+
+def invalidate_permissions_cache():
+    """Rend obsolètes les permissions en cache de tous les utilisateurs."""
+    try:
+        cache.incr(CACHE_KEY_VERSION)
+    except ValueError:
+        cache.set(CACHE_KEY_VERSION, time.time_ns(), None)
+
+
+def est_admin(user):
+    """Superuser, rôle 'admin' ou membre du staff (sans requête)."""
+    if not user or not user.is_authenticated:
+        return False
+    return a_tous_les_droits(user) or user.is_staff
+
+
+def a_tous_les_droits(user):
+    """Superuser ou rôle 'admin' : toutes les permissions métier."""
+    return user.is_superuser or getattr(user, 'role', None) == 'admin'
+
+
+def get_permissions_cache_key(user, version):
+    """Clé de cache des permissions d'un utilisateur pour une version des droits."""
+    return (
+        f"permissions_{version}_{user.pk}_{getattr(user, 'role', '')}"
+        f"_{int(user.is_superuser)}_{int(user.is_staff)}"
+    )
+
+
+def calculer_permissions(user):
+    """Calcule les permissions effectives depuis la base (3 requêtes au plus)."""
+    from gestion.models import Permission, PermissionUtilisateur, PermissionsGranulaires
+
+    role = getattr(user, 'role', None)
+    codes = set(
+        Permission.objects.filter(
+            roles_permission__role__code=role,
+            roles_permission__role__actif=True,
+        ).order_by().values_list('code', flat=True)
+    ) if role else set()
+
+    champs = get_champs_granulaires()
+    valeurs = PermissionsGranulaires.objects.filter(utilisateur=user).values(
+        *[f.name for f in champs]
+    ).first() or {f.name: f.default for f in champs}
+    codes.update(code_permission_granulaire(nom) for nom, autorise in valeurs.items() if autorise)
+
+    for code, autorise in PermissionUtilisateur.objects.filter(utilisateur=user).values_list(
+        'permission__code', 'autorise'
+    ):
+        if autorise:
+            codes.add(code)
+        else:
+            codes.discard(code)
+
+    return PermissionsEffectives(codes=frozenset(codes))
+
+
+def get_permissions(user):
+    """
+    Permissions effectives de l'utilisateur.
+
+    Aucune requête SQL pour un administrateur, ni lorsque le cache
+    (partagé) est chaud.
+    """
+    if not user or not user.is_authenticated or not user.is_active:
+        return AUCUNE_PERMISSION
+    if a_tous_les_droits(user):
+        return TOUTES_PERMISSIONS
+
+    permissions = getattr(user, ATTRIBUT_MEMOIRE, None)
+    if permissions is not None:
+        return permissions
+
+    if cache_partage():
+        cache_key = get_permissions_cache_key(user, get_version())
+        permissions = cache.get(cache_key)
+        if permissions is None:
+            permissions = calculer_permissions(user)
+            cache.set(cache_key, permissions, CACHE_TIMEOUT_PERMISSIONS)
+    else:
+        permissions = calculer_permissions(user)
+
+    setattr(user, ATTRIBUT_MEMOIRE, permissions)
+    return permissions
+
+
+def oublier_permissions(user):
+    """Efface la mémorisation sur l'utilisateur (connexions longues, WebSocket)."""
+    if hasattr(user, ATTRIBUT_MEMOIRE):
+        delattr(user, ATTRIBUT_MEMOIRE)
+
+
+def a_permission(user, code):
+    """Vérifie une permission 'module.action' (ex. 'factures.creer')."""
+    return code in get_permissions(user)
+
+
+def permission_requise(code, json=False):
+    """
+    Décorateur de vue : refuse l'accès sans la permission donnée.
+
+    Usage:
+        @permission_requise('factures.creer')
+        def ma_vue(request):
+            ...
+
+    Refus : PermissionDenied (403), ou réponse JSON 403 avec json=True (vues API).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect('login')
+            if not a_permission(request.user, code):
+                if json:
+                    return JsonResponse({
+                        'success': False,
+                        'error': "Vous n'avez pas les droits pour cette action."
+                    }, status=403)
+                raise PermissionDenied(f"Permission requise : {code}")
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,104 @@
+"""
+Numérotation métier centralisée (factures, encaissements, écritures...).
+
+Chaque série (ex: 'FAC') et période (ex: '2025') possède une ligne dans
+CompteurSequence. Un numéro est attribué par un UPDATE ... SET
+dernier_numero = dernier_numero + n sur cette seule ligne : coût constant
+quel que soit le volume de la table métier, et deux clercs qui créent
+une pièce en même temps obtiennent des numéros distincts (la ligne reste
+verrouillée jusqu'à la fin de la transaction).
+
+- reserver() attribue un bloc de numéros consécutifs en une requête
+  (paie, quittances, imports).
+- apercu() affiche le prochain numéro sans le consommer (formulaires).
+- sans_trou=True impose d'être dans la transaction qui enregistre la
+  pièce : si elle échoue, l'incrément est annulé avec elle et la
+  numérotation reste continue (factures normalisées MECeF).
+
+Au premier usage d'une clé, le compteur est initialisé par la fonction
+`initial` (dernier numéro déjà présent en base), une seule fois.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def _get_modele():
+    from gestion.models import CompteurSequence
+    return CompteurSequence
+
+
+def _creer_compteur(serie, periode, initial):
+    """Crée la ligne du compteur si elle n'existe pas encore."""
+    CompteurSequence = _get_modele()
+    if CompteurSequence.objects.filter(serie=serie, periode=periode).exists():
+        return
+    dernier = initial() if initial else 0
+    try:
+        with transaction.atomic():
+            CompteurSequence.objects.create(serie=serie, periode=periode, dernier_numero=dernier)
+    except IntegrityError:
+        # Créé entre-temps par un autre processus
+        pass
+
+
+def reserver(serie, periode='', quantite=1, initial=None, sans_trou=False):
+    """
+    Réserve `quantite` numéros consécutifs et retourne le range correspondant.
+
+    Args:
+        serie: Code de la série (ex: 'FAC', 'ENC')
+        periode: Sous-clé de remise à zéro (année, année+mois...), '' si aucune
+        quantite: Nombre de numéros à réserver
+        initial: Callable retournant le dernier numéro déjà utilisé, appelé
+            uniquement à la création du compteur
+        sans_trou: Exige une transaction englobante (numérotation continue)
+    """
+    if quantite < 1:
+        raise ValueError("La quantité à réserver doit être positive")
+
+    if sans_trou and not transaction.get_connection().in_atomic_block:
+        raise transaction.TransactionManagementError(
+            f"La série {serie} est sans trou : le numéro doit être attribué "
+            "dans la transaction qui enregistre la pièce"
+        )
+
+    CompteurSequence = _get_modele()
+    compteurs = CompteurSequence.objects.filter(serie=serie, periode=periode)
+
+    with transaction.atomic():
+        if not compteurs.update(dernier_numero=F('dernier_numero') + quantite):
+            _creer_compteur(serie, periode, initial)
+            compteurs.update(dernier_numero=F('dernier_numero') + quantite)
+        dernier = compteurs.values_list('dernier_numero', flat=True).get()
+
+    return range(dernier - quantite + 1, dernier + 1)
+
+
+def prochain(serie, periode='', initial=None, sans_trou=False):
+    """Attribue et retourne le prochain numéro de la série."""
+    return reserver(serie, periode, 1, initial=initial, sans_trou=sans_trou)[0]
+
+
+def apercu(serie, periode='', initial=None):
+    """Prochain numéro de la série, sans le consommer (affichage uniquement)."""
+    CompteurSequence = _get_modele()
+    dernier = CompteurSequence.objects.filter(
+        serie=serie, periode=periode
+    ).values_list('dernier_numero', flat=True).first()
+    if dernier is None:
+        dernier = initial() if initial else 0
+    return dernier + 1
+
+
+def dernier_numero_existant(queryset, champ, prefixe=''):
+    """
+    Plus grand suffixe numérique des valeurs de `champ` commençant par
+    `prefixe` : sert à initialiser un compteur sur des données existantes.
+    """
+    dernier = 0
+    valeurs = queryset.filter(**{f'{champ}__startswith': prefixe}).values_list(champ, flat=True)
+    for valeur in valeurs.order_by().iterator():
+        suffixe = valeur[len(prefixe):]
+        if suffixe.isdigit():
+            dernier = max(dernier, int(suffixe))
+    return dernier
@@ -21,23 +21,22 @@ def creer_arborescence_drive(sender, instance, created, **kwargs):
     pour avoir accès au créancier/demandeur dans le nom du dossier.
 
     Ce signal ne crée l'arborescence que si elle n'existe pas déjà.
+    Dans un bloc provisionnement_differe() (imports), le dossier est mis en
+    attente et toute l'arborescence du lot est créée à la sortie du bloc.
     """
     if not created:
         return
 
-    # Vérifier si l'arborescence existe déjà (créée par la vue)
-    from documents.models import DossierVirtuel
-    if DossierVirtuel.objects.filter(dossier_juridique=instance).exists():
+    from documents.services import arborescence
+    if arborescence.est_differe(instance):
         return
 
     try:
-        from documents.services.document_service import DocumentService
-
         # Récupérer l'utilisateur créateur si disponible
         user = getattr(instance, 'cree_par', None)
 
-        service = DocumentService(utilisateur=user)
-        service.creer_structure_dossier_juridique(instance, user=user)
+        # Ignore les dossiers ayant déjà leur arborescence (créée par la vue)
+        arborescence.provisionner_dossiers([instance], utilisateur=user)
 
         logger.info(
             f"Arborescence Drive créée automatiquement pour le dossier {instance.reference}"
@@ -125,3 +124,27 @@ def supprimer_mouvement_reversement(sender, instance, **kwargs):
             instance.mouvement_tresorerie.delete()
         except:
             pass
+
+
+@receiver(post_save, sender='gestion.Collaborateur')
+@receiver(post_delete, sender='gestion.Collaborateur')
+def invalider_cache_collaborateurs(sender, instance, **kwargs):
+    """Invalide la liste des collaborateurs du contexte de navigation"""
+    from gestion.services.navigation import invalidate_collaborateurs_cache
+    invalidate_collaborateurs_cache()
+
+
+@receiver(post_save, sender='gestion.Role')
+@receiver(post_delete, sender='gestion.Role')
+@receiver(post_save, sender='gestion.Permission')
+@receiver(post_delete, sender='gestion.Permission')
+@receiver(post_save, sender='gestion.RolePermission')
+@receiver(post_delete, sender='gestion.RolePermission')
+@receiver(post_save, sender='gestion.PermissionUtilisateur')
+@receiver(post_delete, sender='gestion.PermissionUtilisateur')
+@receiver(post_save, sender='gestion.PermissionsGranulaires')
+@receiver(post_delete, sender='gestion.PermissionsGranulaires')
+def invalider_cache_permissions(sender, instance, **kwargs):
+    """Invalide les permissions effectives en cache après un changement de droits"""
+    from gestion.services.permissions import invalidate_permissions_cache
+    invalidate_permissions_cache()
@@ -1,3 +1,722 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Utilisateur, Collaborateur, Dossier, Facture, Encaissement, CompteurSequence, JournalAudit
+from .services import archivage, audit, permissions, sequences
+from .services.navigation import get_navigation_context
+
+
+class NavigationContextTest(TestCase):
+    """Tests pour le contexte de navigation partagé"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = Utilisateur.objects.create_user(
+            username='testuser',
+            email='test@test.com',
+            password='testpass123',
+            role='huissier'
+        )
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_aucune_requete_cache_chaud(self):
+        """Le contexte ne coûte aucune requête une fois le cache rempli"""
+        Collaborateur.objects.create(nom='ADJOVI Carine', role='clerc')
+        get_navigation_context(self.request)
+
+        with self.assertNumQueries(0):
+            context = get_navigation_context(self.request, active_module='agenda')
+        self.assertEqual(context['active_module'], 'agenda')
+        self.assertEqual(context['current_user']['id'], self.user.id)
+        self.assertEqual([c['nom'] for c in context['collaborateurs']], ['ADJOVI Carine'])
+
+    def test_invalidation_collaborateur(self):
+        """L'enregistrement d'un collaborateur invalide la liste en cache"""
+        collab = Collaborateur.objects.create(nom='ADJOVI Carine', role='clerc')
+        get_navigation_context(self.request)
+
+        collab.actif = False
+        collab.save()
+        Collaborateur.objects.create(nom='DOSSOU Marie', role='secretaire')
+
+        context = get_navigation_context(self.request)
+        self.assertEqual([c['nom'] for c in context['collaborateurs']], ['DOSSOU Marie'])
+
+    def test_processeur_de_contexte_paresseux(self):
+        """La navigation n'est calculée que si le template l'utilise, une fois par rendu"""
+        from django.template import engines
+        moteur = engines['django']
+        cache.clear()
+        with self.assertNumQueries(0):
+            moteur.from_string("{{ page_title }}").render({'page_title': 'Fragment'}, self.request)
+
+        get_navigation_context(self.request)
+        page = moteur.from_string(
+            "{{ current_user.nom }}{% for m in modules %}{% if m.id == active_module %}[{{ m.label }}]{% endif %}{% endfor %}"
+        ).render({'active_module': 'agenda'}, self.request)
+        self.assertEqual(page, 'testuser[Agenda]')
+
+
+CACHE_PARTAGE = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'etude_huissier_tests_cache'),
+}}
+
+
+@override_settings(CACHES=CACHE_PARTAGE)
+class PermissionsEffectivesTest(TestCase):
+    """Tests pour la résolution des permissions effectives (cache partagé)"""
+
+    def setUp(self):
+        from .models import Permission, Role, RolePermission
+        cache.clear()
+        self.user = Utilisateur.objects.create_user(
+            username='clerc', password='testpass123', role='clerc'
+        )
+        self.role = Role.objects.create(code='clerc', nom='Clerc')
+        self.permission = Permission.objects.create(
+            code='factures.normaliser_mecef', nom='Normaliser MECeF', module='facturation'
+        )
+        RolePermission.objects.create(role=self.role, permission=self.permission)
+
+    def recharger(self):
+        """Utilisateur d'une nouvelle requête (sans mémorisation)"""
+        return Utilisateur.objects.get(pk=self.user.pk)
+
+    def test_sources_fusionnees(self):
+        """Rôle, permissions granulaires par défaut et surcharges"""
+        from .models import Permission, PermissionUtilisateur
+        PermissionUtilisateur.objects.create(
+            utilisateur=self.user,
+            permission=Permission.objects.create(code='dossiers.voir', nom='Voir', module='dossiers'),
+            autorise=False,
+        )
+        user = self.recharger()
+        self.assertTrue(permissions.a_permission(user, 'factures.normaliser_mecef'))
+        self.assertTrue(permissions.a_permission(user, 'factures.voir'))
+        self.assertFalse(permissions.a_permission(user, 'dossiers.voir'))
+        self.assertFalse(permissions.a_permission(user, 'dossiers.supprimer'))
+
+    def test_aucune_requete_cache_chaud(self):
+        """Une fois en cache, la vérification ne coûte aucune requête"""
+        user = self.recharger()
+        with self.assertNumQueries(3):
+            permissions.get_permissions(user)
+
+        user = self.recharger()
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.a_permission(user, 'factures.normaliser_mecef'))
+            self.assertFalse(permissions.a_permission(user, 'factures.supprimer'))
+
+    def test_administrateur_sans_requete(self):
+        """Les administrateurs ont toutes les permissions sans requête"""
+        admin = Utilisateur.objects.create_user(username='admin', password='x', role='admin')
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.a_permission(admin, 'dossiers.supprimer'))
+
+    def test_invalidation_changement_droits(self):
+        """Retirer une permission au rôle invalide le cache de tous les utilisateurs"""
+        from .models import PermissionsGranulaires, RolePermission
+        self.assertTrue(permissions.a_permission(self.recharger(), 'factures.normaliser_mecef'))
+
+        RolePermission.objects.filter(role=self.role).delete()
+        self.assertFalse(permissions.a_permission(self.recharger(), 'factures.normaliser_mecef'))
+
+        PermissionsGranulaires.objects.create(utilisateur=self.user, factures_creer=True)
+        self.assertTrue(permissions.a_permission(self.recharger(), 'factures.creer'))
+
+    def test_changement_role(self):
+        """Un changement de rôle prend effet sans attendre l'expiration du cache"""
+        self.assertTrue(permissions.a_permission(self.recharger(), 'factures.normaliser_mecef'))
+        Utilisateur.objects.filter(pk=self.user.pk).update(role='secretaire')
+        self.assertFalse(permissions.a_permission(self.recharger(), 'factures.normaliser_mecef'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_local_par_requete_seulement(self):
+        """Sans cache partagé, un droit retiré par un autre processus est vu dès la requête suivante"""
+        from .models import Role
+        user = self.recharger()
+        self.assertTrue(permissions.a_permission(user, 'factures.normaliser_mecef'))
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.a_permission(user, 'factures.normaliser_mecef'))
+
+        # Sans signal : l'invalidation a eu lieu dans un autre processus
+        Role.objects.filter(pk=self.role.pk).update(actif=False)
+        self.assertFalse(permissions.a_permission(self.recharger(), 'factures.normaliser_mecef'))
+
+    def test_staff_sans_droits_metier(self):
+        """Le staff accède à l'administration sans recevoir toutes les permissions"""
+        staff = Utilisateur.objects.create_user(
+            username='staff', password='x', role='secretaire', is_staff=True
+        )
+        self.assertTrue(permissions.est_admin(staff))
+        self.assertFalse(permissions.a_permission(staff, 'dossiers.supprimer'))
+
+    def test_suppression_dossier(self):
+        """Supprimer un dossier exige 'dossiers.supprimer' : staff refusé, droit accordé accepté"""
+        from .models import PermissionsGranulaires
+        staff = Utilisateur.objects.create_user(
+            username='staff', password='x', role='secretaire', is_staff=True
+        )
+        dossier = Dossier.objects.create(reference='2026/031', description="Test")
+        self.client.force_login(staff)
+        reponse = self.client.post(
+            '/api/supprimer-dossier/', {'dossier_id': dossier.pk}, content_type='application/json'
+        )
+        self.assertEqual(reponse.status_code, 403)
+
+        PermissionsGranulaires.objects.create(utilisateur=self.user, dossiers_supprimer=True)
+        self.client.force_login(self.user)
+        reponse = self.client.post(
+            '/api/supprimer-dossier/', {'dossier_id': dossier.pk}, content_type='application/json'
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertFalse(Dossier.objects.filter(pk=dossier.pk).exists())
+
+class BaremeCompileTest(TestCase):
+    """Tests pour les barèmes compilés (droits de recette, OHADA, IPTS)"""
+
+    def test_droit_recette_aux_seuils(self):
+        from recouvrement.services.baremes import (
+            BAREME_RECOUVREMENT_FORCE, BAREME_RECOUVREMENT_FORCE_COMPILE, calculer_droit_recette
+        )
+        self.assertEqual(calculer_droit_recette(5_000_000, BAREME_RECOUVREMENT_FORCE), Decimal('500000'))
+        self.assertEqual(calculer_droit_recette(20_000_000, BAREME_RECOUVREMENT_FORCE), Decimal('1025000'))
+        self.assertEqual(calculer_droit_recette(60_000_000, BAREME_RECOUVREMENT_FORCE), Decimal('1725000'))
+        self.assertEqual(
+            BAREME_RECOUVREMENT_FORCE_COMPILE.evaluer_lot([0, -10, 5_000_001, '20000000']),
+            [Decimal('0'), Decimal('0'), Decimal('500000'), Decimal('1025000')]
+        )
+
+    def test_emoluments_ohada(self):
+        from .models import BasculementAmiableForce
+        basculement = BasculementAmiableForce()
+        self.assertEqual(basculement.calculer_emoluments_ohada(Decimal('750000')), Decimal('70000'))
+        self.assertEqual(basculement.calculer_emoluments_ohada(Decimal('12000000')), Decimal('460000'))
+
+    def test_ipts_bareme_relu_compile_une_fois(self):
+        """Les tranches sont relues à chaque calcul, la compilation est réutilisée"""
+        from parametres.models import TrancheIPTS
+        self.assertEqual(TrancheIPTS.calculer_ipts(200000), Decimal('18500'))
+        bareme = TrancheIPTS.get_bareme_compile()
+
+        with self.assertNumQueries(1):
+            self.assertIs(TrancheIPTS.get_bareme_compile(), bareme)
+
+        # Modification sans signal (autre processus) : prise en compte au calcul suivant
+        TrancheIPTS.objects.bulk_create([TrancheIPTS(ordre=1, montant_min=0, montant_max=None, taux=10)])
+        self.assertEqual(TrancheIPTS.calculer_ipts(200000), Decimal('20000'))
+
+
+class RapprochementReleveTest(TestCase):
+    """Tests pour l'import des relevés bancaires et le rapprochement automatique"""
+
+    CSV = (
+        "Date;Libellé;Référence;Débit;Crédit\n"
+        "05/03/2024;VIR CLIENT AHOUANDJINOU;F-101;;150 000,00\n"
+        "07/03/2024;CHQ 4521;4521;25 000,00;\n"
+        "12/03/2024;REMISE CHEQUES;;;80 000,00\n"
+        "20/03/2024;FRAIS TENUE COMPTE;;2 500,00;\n"
+    ).encode('cp1252')
+
+    OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240305<TRNAMT>150000.00<FITID>A1<NAME>VIR CLIENT</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240307120000<TRNAMT>-25000.00<FITID>A2<CHECKNUM>4521<MEMO>CHQ</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+    CAMT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="XOF">150000.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><BookgDt><Dt>2024-03-05</Dt></BookgDt>
+<AcctSvcrRef>C1</AcctSvcrRef><NtryDtls><TxDtls><Refs><EndToEndId>F-101</EndToEndId></Refs>
+<RmtInf><Ustrd>VIR CLIENT</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="XOF">25000.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><BookgDt><Dt>2024-03-07</Dt></BookgDt>
+<AcctSvcrRef>C2</AcctSvcrRef><AddtlNtryInf>CHQ 4521</AddtlNtryInf></Ntry>
+</Stmt></BkToCstmrStmt></Document>
+"""
+
+    def setUp(self):
+        from tresorerie.models import CompteBancaire
+        self.compte = CompteBancaire.objects.create(nom='Compte courant', numero='001', banque='BOA')
+
+    def mouvement(self, jour, type_mouvement, montant, **champs):
+        from datetime import date
+        from tresorerie.models import MouvementTresorerie
+        return MouvementTresorerie.objects.create(
+            compte=self.compte, type_mouvement=type_mouvement, montant=montant,
+            date_mouvement=date(2024, 3, jour), libelle=champs.pop('libelle', 'Mouvement'),
+            statut='valide', **champs
+        )
+
+    def importer(self, contenu, nom):
+        import io
+        from tresorerie.services import releves
+        return releves.importer(self.compte, io.BytesIO(contenu), nom)
+
+    def test_lecteurs(self):
+        """CSV (débit/crédit, cp1252), OFX et CAMT donnent les mêmes opérations signées"""
+        import io
+        from datetime import date
+        from tresorerie.services import releves
+        csv_ops = list(releves.lire_csv(io.BytesIO(self.CSV)))
+        self.assertEqual(
+            [(o.date_operation, o.montant, o.reference) for o in csv_ops],
+            [(date(2024, 3, 5), 150000, 'F-101'), (date(2024, 3, 7), -25000, '4521'),
+             (date(2024, 3, 12), 80000, ''), (date(2024, 3, 20), -2500, '')]
+        )
+        self.assertEqual(csv_ops[0].libelle, 'VIR CLIENT AHOUANDJINOU')
+
+        # Blocs <STMTTRN> coupés entre deux lectures
+        ofx_ops = list(releves.lire_ofx(io.BytesIO(self.OFX), taille_bloc=50))
+        camt_ops = list(releves.lire_camt(io.BytesIO(self.CAMT)))
+        for operations in (ofx_ops, camt_ops):
+            self.assertEqual(
+                [(o.date_operation, o.montant) for o in operations],
+                [(date(2024, 3, 5), 150000), (date(2024, 3, 7), -25000)]
+            )
+        self.assertEqual([o.identifiant for o in ofx_ops], ['A1', 'A2'])
+        self.assertEqual(ofx_ops[1].reference, '4521')
+        self.assertEqual(camt_ops[0].reference, 'F-101')
+
+        self.assertEqual(releves.detecter_format('releve.xml', io.BytesIO(self.CAMT)), 'camt')
+        self.assertEqual(releves.detecter_format('releve.txt', io.BytesIO(self.OFX)), 'ofx')
+        with self.assertRaises(releves.ErreurReleve):
+            list(releves.lire_csv(io.BytesIO(b"Colonne;Autre\n1;2\n")))
+
+    def test_import_sans_doublon(self):
+        """Réimporter un relevé, ou un relevé qui chevauche, n'ajoute que les nouvelles lignes"""
+        from tresorerie.models import LigneReleve
+        releve = self.importer(self.CSV, 'mars.csv')
+        self.assertEqual((releve.format, releve.nb_lignes, releve.nb_doublons), ('csv', 4, 0))
+
+        releve = self.importer(self.CSV + "25/03/2024;VIR LOYER;;;10 000\n".encode(), 'mars-bis.csv')
+        self.assertEqual((releve.nb_lignes, releve.nb_doublons), (1, 4))
+        self.assertEqual(LigneReleve.objects.filter(compte=self.compte).count(), 5)
+
+    def test_rapprochement_trois_passes(self):
+        """Exact, puis tolérance de dates, puis groupe ; le reste est proposé à la revue"""
+        from tresorerie.models import LigneReleve
+        from tresorerie.services import rapprochement
+        self.importer(self.CSV, 'mars.csv')
+        client = self.mouvement(5, 'entree', 150000, reference='F-101')
+        self.mouvement(5, 'entree', 150000, libelle='Autre client')
+        cheque = self.mouvement(9, 'sortie', 25000, numero_cheque='4521')
+        remise = [self.mouvement(11, 'entree', montant) for montant in (30000, 50000)]
+        frais = self.mouvement(2, 'sortie', 2500)
+
+        with self.assertNumQueries(2):
+            propositions = rapprochement.proposer(self.compte)
+        par_methode = {c.methode: c for c in propositions.correspondances}
+        self.assertEqual(sorted(par_methode), ['exact', 'groupe', 'tolerance'])
+        self.assertEqual(par_methode['exact'].mouvement_ids, (client.id,))
+        self.assertEqual(par_methode['tolerance'].mouvement_ids, (cheque.id,))
+        self.assertEqual(set(par_methode['groupe'].mouvement_ids), {m.id for m in remise})
+        # Frais à 18 jours : hors tolérance, suggéré à la revue
+        self.assertEqual(list(propositions.a_revoir.values()), [[frais.id]])
+
+        self.assertEqual(rapprochement.appliquer(propositions.correspondances), 3)
+        client.refresh_from_db()
+        self.assertEqual(client.statut, 'rapproche')
+        self.assertEqual(client.ligne_releve.methode, 'exact')
+        self.assertEqual(LigneReleve.objects.filter(statut='a_rapprocher').count(), 1)
+        # Déjà rapprochées : rien à refaire
+        self.assertEqual(rapprochement.appliquer(propositions.correspondances), 0)
+        self.assertEqual(rapprochement.proposer(self.compte).correspondances, [])
+
+        # Les mouvements rapprochés restent dans le solde du compte
+        self.compte.recalculer_solde()
+        self.assertEqual(self.compte.solde_actuel, 150000 * 2 - 25000 + 80000 - 2500)
+
+
+class SequenceServiceTest(TestCase):
+    """Tests pour la numérotation centralisée"""
+
+    def test_prochain_et_reservation(self):
+        """Les numéros se suivent, y compris par blocs réservés"""
+        self.assertEqual(sequences.prochain('TST', '2025'), 1)
+        self.assertEqual(list(sequences.reserver('TST', '2025', 3)), [2, 3, 4])
+        self.assertEqual(sequences.prochain('TST', '2025'), 5)
+        # Chaque période a son propre compteur
+        self.assertEqual(sequences.prochain('TST', '2026'), 1)
+
+    def test_apercu_ne_consomme_pas(self):
+        """L'aperçu n'incrémente pas le compteur"""
+        sequences.prochain('TST')
+        self.assertEqual(sequences.apercu('TST'), 2)
+        self.assertEqual(sequences.apercu('TST'), 2)
+        self.assertEqual(sequences.prochain('TST'), 2)
+
+    def test_cout_constant(self):
+        """Une fois le compteur créé, l'attribution ne parcourt pas la table métier"""
+        Encaissement.generer_reference()
+        with CaptureQueriesContext(connection) as requetes:
+            Encaissement.generer_reference()
+        sql = [q['sql'] for q in requetes.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(sql), 2)
+        self.assertFalse(any('gestion_encaissement' in q for q in sql))
+
+    def test_initialisation_sur_donnees_existantes(self):
+        """Un nouveau compteur reprend après le dernier numéro existant"""
+        annee = timezone.now().year
+        Facture.objects.create(numero=f"FAC-{annee}-007", client='Client', montant_ht=1000)
+        with transaction.atomic():
+            self.assertEqual(Facture.generer_numero(), f"FAC-{annee}-008")
+        self.assertEqual(Facture.generer_numero(apercu=True), f"FAC-{annee}-009")
+
+    def test_generation_des_loyers_en_bloc(self):
+        """Les loyers du mois sont insérés en un lot ; seuls les nouveaux sont comptés"""
+        import json
+        from datetime import date
+        from gerance.models import Bail, BienImmobilier, Locataire, Loyer, Proprietaire, Quittance
+        proprietaire = Proprietaire.objects.create(nom='HOUNSOU', adresse='Cotonou', ville='Cotonou', telephone='97')
+        locataire = Locataire.objects.create(nom='AGBO', telephone='96')
+        baux = []
+        for i in range(3):
+            bien = BienImmobilier.objects.create(
+                proprietaire=proprietaire, reference=f'BIEN-{i}', designation=f'Appartement {i}',
+                adresse='Cotonou', ville='Cotonou', loyer_mensuel=100000,
+            )
+            baux.append(Bail.objects.create(
+                bien=bien, locataire=locataire, reference=f'BAIL-{i}', date_debut=date(2026, 1, 1),
+                date_fin=date(2027, 1, 1), duree_mois=12, loyer_mensuel=100000, statut='actif',
+            ))
+        Loyer.objects.create(
+            bail=baux[0], mois=3, annee=2026, date_echeance=date(2026, 3, 5),
+            montant_loyer=100000, montant_total=100000,
+        )
+
+        self.client.force_login(Utilisateur.objects.create_user(username='gerant', password='x'))
+        reponse = self.client.post('/gerance/api/loyers/generer/', json.dumps({'mois': 3, 'annee': 2026}),
+                                   content_type='application/json')
+        self.assertEqual(reponse.json()['loyers_crees'], 2)
+        self.assertEqual(Loyer.objects.filter(mois=3, annee=2026).count(), 3)
+        self.assertEqual(
+            Quittance.generer_numeros(2, annee=2026), ['QUIT-2026-00001', 'QUIT-2026-00002']
+        )
+
+class SequenceSansTrouTest(TransactionTestCase):
+    """Tests de la numérotation sans trou (hors transaction de test)"""
+
+    def test_serie_sans_trou(self):
+        """Une série sans trou exige la transaction de la pièce et y est annulée"""
+        with self.assertRaises(transaction.TransactionManagementError):
+            Facture.generer_numero_mecef()
+
+        try:
+            with transaction.atomic():
+                Facture.generer_numero_mecef()
+                raise ValueError("échec de la normalisation")
+        except ValueError:
+            pass
+
+        with transaction.atomic():
+            numero = Facture.generer_numero_mecef()
+        self.assertTrue(numero.endswith('-00001'))
+        self.assertEqual(CompteurSequence.objects.get(serie='MECEF').dernier_numero, 1)
+
+
+class AuditDiffereTest(TestCase):
+    """Tests pour l'écriture différée du journal d'audit"""
+
+    def setUp(self):
+        audit.vider()
+        self.user = Utilisateur.objects.create_user(username='clerc', password='testpass123')
+
+    def test_ecriture_au_commit_puis_par_lot(self):
+        """L'entrée est mise en tampon au commit et écrite au vidage, horodatée à l'action"""
+        with self.captureOnCommitCallbacks(execute=True):
+            entree = JournalAudit.log_action(self.user, 'modification', 'dossiers', details='Test')
+        self.assertFalse(JournalAudit.objects.exists())
+        self.assertEqual(len(audit.tampon), 1)
+
+        self.assertEqual(audit.vider(), 1)
+        enregistree = JournalAudit.objects.get()
+        self.assertEqual(enregistree.date_heure, entree.date_heure)
+        self.assertEqual(enregistree.utilisateur_nom, str(self.user))
+
+    def test_action_critique_immediate(self):
+        """Les événements de sécurité sont écrits sans attendre"""
+        JournalAudit.log_action(self.user, 'echec_connexion', 'connexion')
+        self.assertEqual(JournalAudit.objects.count(), 1)
+        self.assertEqual(len(audit.tampon), 0)
+
+    def test_libelle_objet_calcule_a_l_ecriture(self):
+        """La mise en file ne rend pas l'objet : son libellé est calculé au vidage"""
+        from unittest import mock
+        conserve = Collaborateur.objects.create(nom='ADJOVI Carine', role='clerc')
+        supprime = Collaborateur.objects.create(nom='DOSSOU Marie', role='clerc')
+        pk_supprime = supprime.pk
+        with mock.patch.object(Collaborateur, '__str__', autospec=True, side_effect=lambda c: c.nom) as rendu:
+            with self.captureOnCommitCallbacks(execute=True):
+                for collaborateur in (conserve, supprime):
+                    JournalAudit.log_action(self.user, 'modification', 'dossiers', objet=collaborateur)
+            self.assertEqual(rendu.call_count, 0)
+
+            supprime.delete()
+            # Une lecture groupée des objets, puis l'insertion du lot
+            with self.assertNumQueries(2):
+                audit.vider()
+            self.assertEqual(rendu.call_count, 1)
+
+        self.assertEqual(
+            sorted(JournalAudit.objects.values_list('objet_representation', flat=True)),
+            ['ADJOVI Carine', f'Collaborateur #{pk_supprime}'],
+        )
+
+    def test_seuil_de_taille(self):
+        """Le tampon est vidé dès que le lot est complet"""
+        tampon = audit.TamponAudit(taille_lot=2, delai_max=60)
+        tampon.ajouter(JournalAudit(action='export', module='dossiers'))
+        self.assertFalse(JournalAudit.objects.exists())
+        tampon.ajouter(JournalAudit(action='export', module='dossiers'))
+        self.assertEqual(JournalAudit.objects.count(), 2)
+        self.assertEqual(len(tampon), 0)
+
+
+class ArchivageJournauxTest(TestCase):
+    """Tests pour l'archivage mensuel des journaux"""
+
+    def setUp(self):
+        maintenant = timezone.now()
+        self.ancienne = JournalAudit.objects.create(
+            action='export', module='dossiers', date_heure=maintenant - timedelta(days=240)
+        )
+        self.recente = JournalAudit.objects.create(action='export', module='facturation')
+
+    def test_archiver_et_lire(self):
+        """Les mois anciens quittent la table chaude mais restent consultables"""
+        self.assertEqual(archivage.archiver('audit'), 1)
+        self.assertEqual(list(JournalAudit.objects.all()), [self.recente])
+        self.assertEqual(len(archivage.tables_archive(JournalAudit)), 1)
+
+        recentes = archivage.lire('audit', debut=timezone.now() - timedelta(days=7))
+        self.assertEqual([e.pk for e in recentes], [self.recente.pk])
+
+        toutes = archivage.lire('audit', debut=timezone.now() - timedelta(days=365))
+        self.assertEqual([e.pk for e in toutes], [self.recente.pk, self.ancienne.pk])
+        self.assertEqual(toutes[1].date_heure, self.ancienne.date_heure)
+
+        filtrees = archivage.lire('audit', debut=timezone.now() - timedelta(days=365), module='dossiers')
+        self.assertEqual([e.pk for e in filtrees], [self.ancienne.pk])
+
+    def test_purger_supprime_les_mois_echus(self):
+        """La rétention supprime des tables d'archive entières"""
+        archivage.archiver('audit')
+        self.assertEqual(archivage.purger('audit', jours_retention=30), 1)
+        self.assertEqual(archivage.tables_archive(JournalAudit), [])
+        self.assertEqual(JournalAudit.objects.count(), 1)
+
+    def test_message_avec_commande_vocale_reste_chaud(self):
+        """Un message référencé par un lien un-à-un CASCADE n'est pas déplacé"""
+        from chatbot.models import CommandeVocale, Message, SessionConversation
+        utilisateur = Utilisateur.objects.create_user(username='vocal', password='testpass123')
+        session = SessionConversation.objects.create(utilisateur=utilisateur)
+        ancien = timezone.now() - timedelta(days=240)
+        vocal = Message.objects.create(session=session, contenu="Ouvre le dossier", est_vocal=True)
+        CommandeVocale.objects.create(
+            message=vocal, transcription_brute="ouvre le dossier",
+            transcription_normalisee="ouvre le dossier", score_confiance=Decimal('0.9')
+        )
+        texte = Message.objects.create(session=session, contenu="Bonjour")
+        Message.objects.filter(pk__in=[vocal.pk, texte.pk]).update(date_creation=ancien)
+
+        self.assertEqual(archivage.archiver('messages_chatbot'), 1)
+        self.assertEqual(list(Message.objects.values_list('pk', flat=True)), [vocal.pk])
+        self.assertTrue(CommandeVocale.objects.filter(message=vocal).exists())
+
+    def test_archive_anterieure_a_une_migration(self):
+        """Une archive sans une colonne ajoutée depuis reste utilisable"""
+        archivage.archiver('audit')
+        _, archive = archivage.tables_archive(JournalAudit)[0]
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{archive}" DROP COLUMN "user_agent"')
+        archivage._archives_alignees.clear()
+
+        autre = JournalAudit.objects.create(
+            action='export', module='dossiers', date_heure=self.ancienne.date_heure, user_agent='Firefox'
+        )
+        self.assertEqual(archivage.archiver('audit'), 1)
+        entrees = {e.pk: e for e in archivage.lire('audit')}
+        self.assertEqual(set(entrees), {self.recente.pk, self.ancienne.pk, autre.pk})
+        self.assertIsNone(entrees[self.ancienne.pk].user_agent)
+        self.assertEqual(entrees[autre.pk].user_agent, 'Firefox')
+
+    def test_lire_s_arrete_aux_mois_inutiles(self):
+        """Sans période, les dernières entrées ; les archives plus anciennes ne sont pas lues"""
+        archivage.archiver('audit')
+        with self.assertNumQueries(2):
+            # Table chaude + introspection des archives
+            self.assertEqual([e.pk for e in archivage.lire('audit', limite=1)], [self.recente.pk])
+        self.assertEqual(len(archivage.lire('audit')), 2)
+
+    def test_sessions_expirees_et_messages_archives(self):
+        """Supprimer une session expirée supprime aussi ses messages archivés"""
+        from chatbot.models import Message, SessionConversation
+        utilisateur = Utilisateur.objects.create_user(username='chat', password='testpass123')
+        expiree = SessionConversation.objects.create(utilisateur=utilisateur)
+        active = SessionConversation.objects.create(utilisateur=utilisateur)
+        for session in (expiree, active):
+            Message.objects.create(session=session, contenu="Bonjour")
+        Message.objects.update(date_creation=timezone.now() - timedelta(days=240))
+        archivage.archiver('messages_chatbot')
+        SessionConversation.objects.filter(pk=expiree.pk).update(
+            date_expiration=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(SessionConversation.nettoyer_sessions_expirees(), 1)
+        restants = archivage.lire('messages_chatbot')
+        self.assertEqual([m.session_id for m in restants], [active.pk])
+
+
+class ProvisionnementDriveTest(TestCase):
+    """Arborescence Drive des dossiers juridiques créée en bloc"""
+
+    def creer_dossiers(self, nombre):
+        from .models import Dossier
+        return [
+            Dossier.objects.create(reference=f"IMP-{i:03d}", description=f"Dossier importé {i}")
+            for i in range(nombre)
+        ]
+
+    def test_provisionnement_differe(self):
+        """Le signal met les dossiers en attente, l'arborescence est créée en sortie de bloc"""
+        from documents.models import DossierVirtuel
+        from documents.services.arborescence import (
+            STRUCTURE_DOSSIER_JURIDIQUE, provisionnement_differe,
+        )
+
+        with provisionnement_differe():
+            dossiers = self.creer_dossiers(5)
+            self.assertFalse(DossierVirtuel.objects.exists())
+
+        par_dossier = len(STRUCTURE_DOSSIER_JURIDIQUE) + 1
+        self.assertEqual(DossierVirtuel.objects.filter(type_dossier='annee').count(), 1)
+        self.assertEqual(DossierVirtuel.objects.exclude(type_dossier='annee').count(), 5 * par_dossier)
+
+        principal = DossierVirtuel.objects.get(dossier_juridique=dossiers[0], type_dossier='dossier_juridique')
+        self.assertEqual(principal.chemin, f"{principal.parent.chemin}/{principal.nom}")
+        self.assertEqual(
+            {d.chemin for d in principal.get_descendants()},
+            {f"{principal.chemin}/{nom}" for nom, *_ in STRUCTURE_DOSSIER_JURIDIQUE},
+        )
+        self.assertEqual(principal.sous_dossiers.count(), len(STRUCTURE_DOSSIER_JURIDIQUE))
+
+    def test_requetes_independantes_du_lot(self):
+        """Le nombre de requêtes ne dépend pas du nombre de dossiers"""
+        from .models import Dossier
+        from documents.services.arborescence import provisionner_dossiers
+
+        Dossier.objects.bulk_create(
+            Dossier(reference=f"IMP-{i:03d}", description=f"Dossier importé {i}") for i in range(20)
+        )
+        lot = list(Dossier.objects.prefetch_related('demandeurs', 'defendeurs'))
+
+        with CaptureQueriesContext(connection) as requetes:
+            principaux = provisionner_dossiers(lot)
+        self.assertEqual(len(principaux), 20)
+        # Dossiers déjà provisionnés, racines des années, noms déjà pris
+        lectures = [q for q in requetes.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(lectures), 3)
+
+        # Deuxième passage : rien à créer
+        self.assertEqual(provisionner_dossiers(lot), principaux)
+
+
+class DossierVirtuelTest(TestCase):
+    """Tests pour l'arborescence des dossiers virtuels (chemin matérialisé)"""
+
+    def setUp(self):
+        from documents.models import DossierVirtuel
+        self.user = Utilisateur.objects.create_user(username='clerc', password='x', role='clerc')
+        self.archives = DossierVirtuel.objects.create(nom='Archives')
+        self.annee = DossierVirtuel.objects.create(nom='2025', parent=self.archives)
+        self.mois = DossierVirtuel.objects.create(nom='Mars', parent=self.annee)
+        self.courant = DossierVirtuel.objects.create(nom='Courant')
+
+    def document(self, dossier, taille):
+        from documents.models import Document
+        return Document.objects.create(nom='Acte', nom_original='acte.pdf', dossier=dossier, taille=taille)
+
+    def test_deplacement_reecrit_le_sous_arbre(self):
+        from documents.models import DossierVirtuel
+        self.annee.parent = self.courant
+        self.annee.save()
+        self.mois.refresh_from_db()
+        self.assertEqual(self.mois.chemin, '/Courant/2025/Mars')
+        self.assertFalse(DossierVirtuel.objects.filter(chemin__startswith='/Archives/').exists())
+
+    def test_deplacement_dans_son_sous_arbre_refuse(self):
+        from django.core.exceptions import ValidationError
+        self.archives.parent = self.mois
+        with self.assertRaises(ValidationError):
+            self.archives.save()
+        self.archives.refresh_from_db()
+        self.assertEqual(self.archives.chemin, '/Archives')
+
+    def test_statistiques_du_sous_arbre_sensibles_a_la_casse(self):
+        """Un dossier '/archives' (autre casse) n'est pas compté sous '/Archives'"""
+        from documents.models import DossierVirtuel
+        homonyme = DossierVirtuel.objects.create(nom='archives')
+        self.document(self.archives, 10)
+        self.document(self.mois, 200)
+        self.document(DossierVirtuel.objects.create(nom='Vrac', parent=homonyme), 3000)
+
+        stats = {d.chemin: d for d in DossierVirtuel.avec_statistiques()}
+        self.assertEqual(
+            (stats['/Archives'].nb_documents, stats['/Archives'].nb_documents_total, stats['/Archives'].taille_totale),
+            (1, 2, 210),
+        )
+        self.assertEqual(stats['/Archives'].nb_sous_dossiers, 1)
+        self.assertEqual(stats['/archives'].taille_totale, 3000)
+        self.assertEqual(
+            {d.chemin for d in self.archives.get_descendants()}, {'/Archives/2025', '/Archives/2025/Mars'}
+        )
+
+    def test_api_deplacer(self):
+        import json
+        self.client.force_login(self.user)
+        reponse = self.client.post('/documents/api/dossiers/deplacer/', json.dumps({
+            'dossier_id': str(self.annee.pk), 'parent_id': str(self.courant.pk),
+        }), content_type='application/json')
+        self.assertEqual(reponse.json()['dossier']['chemin'], '/Courant/2025')
+        self.mois.refresh_from_db()
+        self.assertEqual(self.mois.chemin, '/Courant/2025/Mars')
+
+        reponse = self.client.post('/documents/api/dossiers/deplacer/', json.dumps({
+            'dossier_id': str(self.courant.pk), 'parent_id': str(self.mois.pk),
+        }), content_type='application/json')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertFalse(reponse.json()['success'])
+
+    def test_chemins_sans_ambiguite(self):
+        """Ni « / » dans un nom, ni deux dossiers racine homonymes"""
+        import json
+        from django.db import IntegrityError
+        from documents.models import DossierVirtuel
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DossierVirtuel.objects.create(nom='Archives')
+
+        self.client.force_login(self.user)
+        reponse = self.client.post('/documents/api/dossiers/creer/', json.dumps({
+            'nom': 'Archives/2025',
+        }), content_type='application/json')
+        self.assertEqual(reponse.status_code, 400)
+        reponse = self.client.post('/documents/api/dossiers/renommer/', json.dumps({
+            'dossier_id': str(self.courant.pk), 'nom': 'Archives',
+        }), content_type='application/json')
+        self.assertEqual(reponse.status_code, 400)
+        self.courant.refresh_from_db()
+        self.assertEqual(self.courant.chemin, '/Courant')
+        self.assertEqual(DossierVirtuel.objects.filter(chemin__startswith='/Archives/2025').count(), 2)
@@ -6,6 +6,7 @@ from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from django.core.paginator import Paginator
@@ -36,14 +37,7 @@ def admin_required(view_func):
         if not request.user.is_authenticated:
             return redirect('login')
 
-        # Vérifier si l'utilisateur est admin
-        is_admin = (
-            request.user.is_superuser or
-            getattr(request.user, 'role', None) == 'admin' or
-            request.user.is_staff
-        )
-
-        if not is_admin:
+        if not est_admin(request.user):
             raise PermissionDenied("Accès réservé aux administrateurs")
 
         return view_func(request, *args, **kwargs)
@@ -63,58 +57,17 @@ from .models import (
     ActeSecurise,
 )
 from .services.qr_service import QRCodeService, ActeSecuriseService
+from .services import archivage
+from .services.navigation import MODULES_NAVIGATION
+from .services.permissions import a_permission, est_admin
+from recouvrement.services.baremes import BAREMES_EMOLUMENTS_TITRE
 
 
 # Donnees par defaut pour le contexte (simulant les donnees React)
 def get_default_context(request):
     """Contexte par defaut pour tous les templates"""
-    # Utilisateur courant simule
-    current_user = {
-        'id': 1,
-        'nom': 'BIAOU Martial Arnaud',
-        'role': 'admin',
-        'email': 'mab@etude-biaou.bj',
-        'initials': 'MA'
-    }
-
-    # Modules de navigation
-    modules = [
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'home', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers', 'badge': 14},
-        {'id': 'facturation', 'label': 'Facturation & MECeF', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'piggy-bank', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        {'id': 'parametres', 'label': 'Parametres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Securite & Acces', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    # Charger les collaborateurs depuis la base de données
-    collaborateurs_db = Collaborateur.objects.filter(actif=True).order_by('nom')
-    collaborateurs = [
-        {'id': c.id, 'nom': c.nom, 'role': c.get_role_display()}
-        for c in collaborateurs_db
-    ]
-    # Fallback si aucun collaborateur en base
-    if not collaborateurs:
-        collaborateurs = [
-            {'id': 1, 'nom': 'Me BIAOU Martial', 'role': 'Huissier'},
-            {'id': 2, 'nom': 'ADJOVI Carine', 'role': 'Clerc Principal'},
-            {'id': 3, 'nom': 'HOUNKPATIN Paul', 'role': 'Clerc'},
-            {'id': 4, 'nom': 'DOSSOU Marie', 'role': 'Secretaire'},
-        ]
-
-    return {
-        'current_user': current_user,
-        'modules': modules,
-        'collaborateurs': collaborateurs,
-        'active_module': '',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': ''}
 
 
 @login_required
@@ -626,7 +579,8 @@ def nouveau_dossier(request):
 
         try:
             # Recuperer les donnees du formulaire
-            reference = data.get('reference', '') or Dossier.generer_reference()
+            # (la reference affichee n'est qu'un apercu : elle est attribuee ici)
+            reference = Dossier.generer_reference()
             type_dossier = data.get('type_dossier', '')
             is_contentieux = data.get('is_contentieux', 'false') == 'true'
             description = data.get('description', '')
@@ -738,8 +692,8 @@ def nouveau_dossier(request):
             messages.error(request, f'Erreur lors de la creation du dossier: {str(e)}')
             return redirect('gestion:nouveau_dossier')
 
-    # Generer une nouvelle reference
-    context['reference'] = Dossier.generer_reference()
+    # Apercu de la prochaine reference (attribuee a l'enregistrement)
+    context['reference'] = Dossier.generer_reference(apercu=True)
     context['types_dossier'] = Dossier.TYPE_DOSSIER_CHOICES
 
     return render(request, 'gestion/nouveau_dossier.html', context)
@@ -1099,7 +1053,7 @@ def securite(request):
 
     # Import des modeles de securite
     from .models import (
-        Role, Permission, SessionUtilisateur, JournalAudit,
+        Role, Permission, SessionUtilisateur,
         AlerteSecurite, PolitiqueSecurite, AdresseIPAutorisee, AdresseIPBloquee
     )
 
@@ -1292,8 +1246,31 @@ def securite(request):
     # =================================
     # SECTION 4: JOURNAL D'AUDIT
     # =================================
+    # Seules les tables d'archive de la période demandée sont interrogées ;
+    # sans période, les dernières entrées
+    periode_audit = request.GET.get('periode', '')
+    duree_periode = {
+        'jour': timedelta(days=1),
+        'semaine': timedelta(days=7),
+        'mois': timedelta(days=31),
+        'trimestre': timedelta(days=92),
+    }.get(periode_audit)
+    filtres_audit = {}
+    if request.GET.get('module'):
+        filtres_audit['module'] = request.GET['module']
+    if request.GET.get('utilisateur'):
+        filtres_audit['utilisateur_id'] = request.GET['utilisateur']
+    context['filtres_audit'] = {
+        'periode': periode_audit,
+        'module': request.GET.get('module', ''),
+        'utilisateur': request.GET.get('utilisateur', ''),
+    }
+
     try:
-        journal_entries = JournalAudit.objects.all()[:50]
+        journal_entries = archivage.lire(
+            'audit', debut=timezone.now() - duree_periode if duree_periode else None,
+            limite=50, **filtres_audit
+        )
         context['journal_audit'] = [{
             'id': e.id,
             'date_heure': e.date_heure,
@@ -1726,7 +1703,7 @@ def module_en_construction(request, module_name):
     context['active_module'] = module_name
 
     # Trouver le label du module
-    for m in context['modules']:
+    for m in MODULES_NAVIGATION:
         if m['id'] == module_name:
             context['page_title'] = m['label']
             break
@@ -1742,9 +1719,9 @@ def module_en_construction(request, module_name):
 
 @require_POST
 def api_generer_numero_facture(request):
-    """API pour generer un numero de facture unique"""
+    """API pour afficher le prochain numero de facture (attribue a l'enregistrement)"""
     try:
-        numero = Facture.generer_numero()
+        numero = Facture.generer_numero(apercu=True)
         return JsonResponse({'success': True, 'numero': numero})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
@@ -1757,7 +1734,6 @@ def api_sauvegarder_facture(request):
         data = json.loads(request.body)
 
         facture_id = data.get('id')
-        numero = data.get('numero')
         date_emission = datetime.strptime(data.get('date_emission'), '%Y-%m-%d').date()
         date_echeance = None
         if data.get('date_echeance'):
@@ -1774,47 +1750,48 @@ def api_sauvegarder_facture(request):
         montant_tva = montant_ht * Decimal('0.18')
         montant_ttc = montant_ht + montant_tva
 
-        if facture_id:
-            # Modification
-            facture = get_object_or_404(Facture, id=facture_id)
-            facture.date_emission = date_emission
-            facture.date_echeance = date_echeance
-            facture.statut = statut
-            facture.client = client
-            facture.ifu = ifu
-            facture.dossier_id = dossier_id
-            facture.observations = observations
-            facture.montant_ht = montant_ht
-            facture.montant_tva = montant_tva
-            facture.montant_ttc = montant_ttc
-            facture.save()
-
-            # Supprimer les anciennes lignes et recreer
-            facture.lignes.all().delete()
-        else:
-            # Creation
-            facture = Facture.objects.create(
-                numero=numero,
-                date_emission=date_emission,
-                date_echeance=date_echeance,
-                statut=statut,
-                client=client,
-                ifu=ifu,
-                dossier_id=dossier_id,
-                observations=observations,
-                montant_ht=montant_ht,
-                montant_tva=montant_tva,
-                montant_ttc=montant_ttc,
-            )
+        with transaction.atomic():
+            if facture_id:
+                # Modification
+                facture = get_object_or_404(Facture, id=facture_id)
+                facture.date_emission = date_emission
+                facture.date_echeance = date_echeance
+                facture.statut = statut
+                facture.client = client
+                facture.ifu = ifu
+                facture.dossier_id = dossier_id
+                facture.observations = observations
+                facture.montant_ht = montant_ht
+                facture.montant_tva = montant_tva
+                facture.montant_ttc = montant_ttc
+                facture.save()
+
+                # Supprimer les anciennes lignes et recreer
+                facture.lignes.all().delete()
+            else:
+                # Creation : le numero est attribue dans la meme transaction
+                facture = Facture.objects.create(
+                    numero=Facture.generer_numero(),
+                    date_emission=date_emission,
+                    date_echeance=date_echeance,
+                    statut=statut,
+                    client=client,
+                    ifu=ifu,
+                    dossier_id=dossier_id,
+                    observations=observations,
+                    montant_ht=montant_ht,
+                    montant_tva=montant_tva,
+                    montant_ttc=montant_ttc,
+                )
 
-        # Creer les lignes
-        for ligne in lignes:
-            LigneFacture.objects.create(
-                facture=facture,
-                description=ligne.get('description', ''),
-                quantite=ligne.get('quantite', 1),
-                prix_unitaire=ligne.get('prix_unitaire', 0)
-            )
+            # Creer les lignes
+            for ligne in lignes:
+                LigneFacture.objects.create(
+                    facture=facture,
+                    description=ligne.get('description', ''),
+                    quantite=ligne.get('quantite', 1),
+                    prix_unitaire=ligne.get('prix_unitaire', 0)
+                )
 
         return JsonResponse({
             'success': True,
@@ -1864,24 +1841,24 @@ def api_normaliser_mecef(request):
                 'error': 'Cette facture est deja normalisee'
             }, status=400)
 
-        # Generer le numero MECeF (simulation)
         now = timezone.now()
-        sequence = Facture.objects.filter(mecef_numero__isnull=False).count() + 1
-        mecef_numero = f"MECeF-{now.year}-{str(sequence).zfill(5)}"
-
-        # Generer le NIM (simulation)
-        nim = ''.join(random.choices(string.digits, k=10))
-
-        # Generer un QR code data (simulation)
-        qr_data = f"NIM:{nim}|NUM:{mecef_numero}|TTC:{facture.montant_ttc}|DATE:{now.strftime('%Y%m%d%H%M%S')}"
-        qr_hash = hashlib.md5(qr_data.encode()).hexdigest()[:16].upper()
-
-        # Mettre a jour la facture
-        facture.mecef_numero = mecef_numero
-        facture.nim = nim
-        facture.mecef_qr = qr_hash
-        facture.date_mecef = now
-        facture.save()
+        with transaction.atomic():
+            # Generer le numero MECeF (simulation) - serie sans trou
+            mecef_numero = Facture.generer_numero_mecef()
+
+            # Generer le NIM (simulation)
+            nim = ''.join(random.choices(string.digits, k=10))
+
+            # Generer un QR code data (simulation)
+            qr_data = f"NIM:{nim}|NUM:{mecef_numero}|TTC:{facture.montant_ttc}|DATE:{now.strftime('%Y%m%d%H%M%S')}"
+            qr_hash = hashlib.md5(qr_data.encode()).hexdigest()[:16].upper()
+
+            # Mettre a jour la facture
+            facture.mecef_numero = mecef_numero
+            facture.nim = nim
+            facture.mecef_qr = qr_hash
+            facture.date_mecef = now
+            facture.save()
 
         return JsonResponse({
             'success': True,
@@ -2111,48 +2088,18 @@ def api_calculer_interets(request):
 
         # Calcul des emoluments proportionnels
         def calculer_emoluments_prop(base):
-            baremes = {
-                'sans': [
-                    {'min': 1, 'max': 5000000, 'taux': Decimal('10')},
-                    {'min': 5000001, 'max': 20000000, 'taux': Decimal('8')},
-                    {'min': 20000001, 'max': 50000000, 'taux': Decimal('6')},
-                    {'min': 50000001, 'max': None, 'taux': Decimal('4')},  # None = illimite
-                ],
-                'avec': [
-                    {'min': 1, 'max': 5000000, 'taux': Decimal('10')},
-                    {'min': 5000001, 'max': 20000000, 'taux': Decimal('3.5')},
-                    {'min': 20000001, 'max': 50000000, 'taux': Decimal('2')},
-                    {'min': 50000001, 'max': None, 'taux': Decimal('1')},  # None = illimite
-                ]
-            }
-
-            restant = base
-            total = Decimal('0')
-            cumul = Decimal('0')
+            bareme = BAREMES_EMOLUMENTS_TITRE[type_titre]
             details = []
 
-            for tranche in baremes[type_titre]:
-                if restant <= 0:
-                    break
-                # Si max est None (illimite), prendre tout le restant
-                if tranche['max'] is None:
-                    taille_tranche = restant
-                else:
-                    taille_tranche = Decimal(str(tranche['max'])) - cumul
-                part = min(restant, taille_tranche)
-                if part > 0:
-                    em = (part * tranche['taux']) / 100
-                    total += em
-                    max_display = f"{tranche['max']:,.0f}" if tranche['max'] is not None else "+"
-                    details.append({
-                        'tranche': f"{int(cumul)+1:,.0f} - {max_display}" if tranche['max'] is not None else f"> {int(cumul):,.0f}",
-                        'taux': float(tranche['taux']),
-                        'base': float(part),
-                        'emolument': float(round(em) if arrondir else em)
-                    })
-                    restant -= part
-                    cumul += part
+            for borne, seuil, taux, part, em in bareme.detail(base):
+                details.append({
+                    'tranche': f"{int(borne)+1:,.0f} - {seuil:,.0f}" if seuil is not None else f"> {int(borne):,.0f}",
+                    'taux': float(taux * 100),
+                    'base': float(part),
+                    'emolument': float(round(em) if arrondir else em)
+                })
 
+            total = bareme.evaluer(base)
             return {
                 'total': float(round(total) if arrondir else total),
                 'details': details,
@@ -2253,47 +2200,18 @@ def api_calculer_emoluments(request):
         type_titre = data.get('type_titre', 'sans')
         arrondir = data.get('arrondir', True)
 
-        baremes = {
-            'sans': [
-                {'min': 1, 'max': 5000000, 'taux': Decimal('10')},
-                {'min': 5000001, 'max': 20000000, 'taux': Decimal('8')},
-                {'min': 20000001, 'max': 50000000, 'taux': Decimal('6')},
-                {'min': 50000001, 'max': None, 'taux': Decimal('4')},  # None = illimite
-            ],
-            'avec': [
-                {'min': 1, 'max': 5000000, 'taux': Decimal('10')},
-                {'min': 5000001, 'max': 20000000, 'taux': Decimal('3.5')},
-                {'min': 20000001, 'max': 50000000, 'taux': Decimal('2')},
-                {'min': 50000001, 'max': None, 'taux': Decimal('1')},  # None = illimite
-            ]
-        }
-
-        restant = base
-        total = Decimal('0')
-        cumul = Decimal('0')
+        bareme = BAREMES_EMOLUMENTS_TITRE[type_titre]
         details = []
 
-        for tranche in baremes[type_titre]:
-            if restant <= 0:
-                break
-            # Si max est None (illimite), prendre tout le restant
-            if tranche['max'] is None:
-                taille_tranche = restant
-            else:
-                taille_tranche = Decimal(str(tranche['max'])) - cumul
-            part = min(restant, taille_tranche)
-            if part > 0:
-                em = (part * tranche['taux']) / 100
-                total += em
-                details.append({
-                    'tranche': f"De {int(cumul)+1:,.0f} a {int(cumul + part):,.0f}" if tranche['max'] is not None else f"Au-dela de {int(cumul):,.0f}",
-                    'taux': float(tranche['taux']),
-                    'base': float(part),
-                    'emolument': float(round(em) if arrondir else em)
-                })
-                restant -= part
-                cumul += part
+        for borne, seuil, taux, part, em in bareme.detail(base):
+            details.append({
+                'tranche': f"De {int(borne)+1:,.0f} a {int(borne + part):,.0f}" if seuil is not None else f"Au-dela de {int(borne):,.0f}",
+                'taux': float(taux * 100),
+                'base': float(part),
+                'emolument': float(round(em) if arrondir else em)
+            })
 
+        total = bareme.evaluer(base)
         emol_total = float(round(total) if arrondir else total)
 
         resultats = {
@@ -2723,17 +2641,17 @@ def api_chatbot(request):
 @require_POST
 def api_supprimer_dossier(request):
     """
-    API pour supprimer un dossier - Réservé aux administrateurs
-    Sécurisé : vérification du rôle côté serveur uniquement
+    API pour supprimer un dossier - Permission 'dossiers.supprimer'
+    (superuser et rôle 'admin', ou droit accordé explicitement ; le staff
+    seul ne suffit pas)
+    Sécurisé : vérification des droits côté serveur uniquement
     """
     try:
         data = json.loads(request.body)
         dossier_id = data.get('dossier_id')
 
-        # SÉCURITÉ : Vérification du rôle côté SERVEUR (pas côté client)
-        user_is_admin = getattr(request.user, 'role', None) == 'admin' or request.user.is_superuser
-
-        if not user_is_admin:
+        # SÉCURITÉ : Vérification des droits côté SERVEUR (pas côté client)
+        if not a_permission(request.user, 'dossiers.supprimer'):
             return JsonResponse({
                 'success': False,
                 'error': "Vous n'avez pas les droits pour supprimer un dossier."
@@ -6751,6 +6669,7 @@ def import_donnees_executer(request, session_id):
     from gestion.models_import import SessionImport, DossierImportTemp
     from gestion.models import Dossier, Partie
     from django.db import transaction
+    from documents.services.arborescence import provisionnement_differe
 
     session = get_object_or_404(SessionImport, pk=session_id)
 
@@ -6769,66 +6688,68 @@ def import_donnees_executer(request, session_id):
     importes = 0
     erreurs = 0
 
-    for dossier_temp in dossiers_valides:
-        try:
-            with transaction.atomic():
-                # Créer ou récupérer le demandeur
-                if dossier_temp.demandeur_existant_id:
-                    demandeur = Partie.objects.get(pk=dossier_temp.demandeur_existant_id)
-                else:
-                    demandeur = Partie.objects.create(
-                        est_personne_morale=dossier_temp.demandeur_est_personne_morale,
-                        nom=dossier_temp.demandeur_nom,
-                        prenom=dossier_temp.demandeur_prenom,
-                        raison_sociale=dossier_temp.demandeur_raison_sociale,
-                        adresse=dossier_temp.demandeur_adresse,
-                        telephone=dossier_temp.demandeur_telephone,
-                        email=dossier_temp.demandeur_email,
-                    )
+    # Arborescence Drive créée en bloc à la fin de l'import (parties liées)
+    with provisionnement_differe(utilisateur=request.user):
+        for dossier_temp in dossiers_valides:
+            try:
+                with transaction.atomic():
+                    # Créer ou récupérer le demandeur
+                    if dossier_temp.demandeur_existant_id:
+                        demandeur = Partie.objects.get(pk=dossier_temp.demandeur_existant_id)
+                    else:
+                        demandeur = Partie.objects.create(
+                            est_personne_morale=dossier_temp.demandeur_est_personne_morale,
+                            nom=dossier_temp.demandeur_nom,
+                            prenom=dossier_temp.demandeur_prenom,
+                            raison_sociale=dossier_temp.demandeur_raison_sociale,
+                            adresse=dossier_temp.demandeur_adresse,
+                            telephone=dossier_temp.demandeur_telephone,
+                            email=dossier_temp.demandeur_email,
+                        )
 
-                # Créer ou récupérer le défendeur
-                if dossier_temp.defendeur_existant_id:
-                    defendeur = Partie.objects.get(pk=dossier_temp.defendeur_existant_id)
-                else:
-                    defendeur = Partie.objects.create(
-                        est_personne_morale=dossier_temp.defendeur_est_personne_morale,
-                        nom=dossier_temp.defendeur_nom,
-                        prenom=dossier_temp.defendeur_prenom,
-                        raison_sociale=dossier_temp.defendeur_raison_sociale,
-                        adresse=dossier_temp.defendeur_adresse,
-                        telephone=dossier_temp.defendeur_telephone,
-                        email=dossier_temp.defendeur_email,
-                    )
+                    # Créer ou récupérer le défendeur
+                    if dossier_temp.defendeur_existant_id:
+                        defendeur = Partie.objects.get(pk=dossier_temp.defendeur_existant_id)
+                    else:
+                        defendeur = Partie.objects.create(
+                            est_personne_morale=dossier_temp.defendeur_est_personne_morale,
+                            nom=dossier_temp.defendeur_nom,
+                            prenom=dossier_temp.defendeur_prenom,
+                            raison_sociale=dossier_temp.defendeur_raison_sociale,
+                            adresse=dossier_temp.defendeur_adresse,
+                            telephone=dossier_temp.defendeur_telephone,
+                            email=dossier_temp.defendeur_email,
+                        )
 
-                # Créer le dossier
-                dossier = Dossier.objects.create(
-                    reference=dossier_temp.reference_originale[:50],  # Garder la référence originale
-                    intitule=dossier_temp.intitule_genere,
-                    date_ouverture=dossier_temp.date_ouverture_parsee or timezone.now().date(),
-                    montant_principal=dossier_temp.montant_principal or 0,
-                    montant_interets=dossier_temp.montant_interets or 0,
-                    montant_frais=dossier_temp.montant_frais or 0,
-                    statut='ouvert',
-                    cree_par=request.user,
-                    observations=f"Importé depuis ancienne base - Réf originale: {dossier_temp.reference_originale}"
-                )
+                    # Créer le dossier
+                    dossier = Dossier.objects.create(
+                        reference=dossier_temp.reference_originale[:50],  # Garder la référence originale
+                        intitule=dossier_temp.intitule_genere,
+                        date_ouverture=dossier_temp.date_ouverture_parsee or timezone.now().date(),
+                        montant_principal=dossier_temp.montant_principal or 0,
+                        montant_interets=dossier_temp.montant_interets or 0,
+                        montant_frais=dossier_temp.montant_frais or 0,
+                        statut='ouvert',
+                        cree_par=request.user,
+                        observations=f"Importé depuis ancienne base - Réf originale: {dossier_temp.reference_originale}"
+                    )
 
-                # Lier les parties
-                dossier.demandeurs.add(demandeur)
-                dossier.defendeurs.add(defendeur)
+                    # Lier les parties
+                    dossier.demandeurs.add(demandeur)
+                    dossier.defendeurs.add(defendeur)
 
-                # Marquer comme importé
-                dossier_temp.statut = 'importe'
-                dossier_temp.dossier_cree_id = dossier.pk
-                dossier_temp.save()
+                    # Marquer comme importé
+                    dossier_temp.statut = 'importe'
+                    dossier_temp.dossier_cree_id = dossier.pk
+                    dossier_temp.save()
 
-                importes += 1
+                    importes += 1
 
-        except Exception as e:
-            dossier_temp.statut = 'erreur'
-            dossier_temp.message_validation = str(e)
-            dossier_temp.save()
-            erreurs += 1
+            except Exception as e:
+                dossier_temp.statut = 'erreur'
+                dossier_temp.message_validation = str(e)
+                dossier_temp.save()
+                erreurs += 1
 
     # Mettre à jour la session
     if erreurs == 0:
@@ -682,6 +682,31 @@ class ConfigurationEtude(models.Model):
             instance.save()
         return instance
 
+    def get_connexion_email(self, timeout=10):
+        """
+        Connexion email (backend Django) construite à partir de la
+        configuration SMTP de l'étude. Sans serveur SMTP configuré, retourne
+        le backend défini dans settings.EMAIL_BACKEND.
+
+        La connexion n'est pas ouverte : utiliser `with connexion:` pour
+        envoyer plusieurs messages sur une seule session SMTP.
+        """
+        from django.core.mail import get_connection
+
+        if not self.smtp_serveur:
+            return get_connection()
+
+        return get_connection(
+            'django.core.mail.backends.smtp.EmailBackend',
+            host=self.smtp_serveur,
+            port=self.smtp_port,
+            username=self.smtp_utilisateur or None,
+            password=self.smtp_mot_de_passe or None,
+            use_ssl=self.smtp_port == 465,
+            use_tls=self.smtp_port == 587,
+            timeout=timeout,
+        )
+
     @staticmethod
     def get_default_notif_config():
         """Configuration par défaut des notifications"""
@@ -1413,6 +1438,24 @@ class ModeleTypeBail(models.Model):
         }
 
 
+# Barème IPTS 2024 Bénin, utilisé si aucune tranche n'est configurée
+BAREME_IPTS_DEFAUT = [
+    (Decimal('0'), Decimal('50000'), Decimal('0')),
+    (Decimal('50001'), Decimal('130000'), Decimal('10')),
+    (Decimal('130001'), Decimal('280000'), Decimal('15')),
+    (Decimal('280001'), Decimal('480000'), Decimal('19')),
+    (Decimal('480001'), Decimal('730000'), Decimal('24')),
+    (Decimal('730001'), Decimal('1030000'), Decimal('28')),
+    (Decimal('1030001'), Decimal('1380000'), Decimal('32')),
+    (Decimal('1380001'), Decimal('1880000'), Decimal('35')),
+    (Decimal('1880001'), Decimal('3780000'), Decimal('37')),
+    (Decimal('3780001'), None, Decimal('40')),
+]
+
+# Barèmes compilés, par contenu des tranches (mémoire du processus)
+_BAREMES_IPTS_COMPILES = {}
+
+
 class TrancheIPTS(models.Model):
     """
     Tranches du barème IPTS (Impôt Progressif sur Traitements et Salaires)
@@ -1484,6 +1527,24 @@ class TrancheIPTS(models.Model):
             bareme.append((t.montant_min, t.montant_max, t.taux))
         return bareme
 
+    @classmethod
+    def get_bareme_compile(cls):
+        """
+        Barème IPTS actif compilé, partagé entre les bulletins de paie.
+
+        Les tranches actives sont relues à chaque appel (une petite requête),
+        une modification faite depuis un autre processus s'applique donc
+        immédiatement ; seule la compilation est mémorisée, par contenu.
+        """
+        from recouvrement.services.baremes import BaremeCompile
+
+        # Barème par défaut si aucun configuré (barème 2024 Bénin)
+        tranches = tuple(cls.get_bareme_actif() or BAREME_IPTS_DEFAUT)
+        bareme = _BAREMES_IPTS_COMPILES.get(tranches)
+        if bareme is None:
+            bareme = _BAREMES_IPTS_COMPILES[tranches] = BaremeCompile.depuis_bornes_incluses(tranches)
+        return bareme
+
     @classmethod
     def calculer_ipts(cls, salaire_imposable):
         """
@@ -1495,47 +1556,7 @@ class TrancheIPTS(models.Model):
         Returns:
             Montant de l'IPTS arrondi à l'entier
         """
-        bareme = cls.get_bareme_actif()
-
-        if not bareme:
-            # Barème par défaut si aucun configuré (barème 2024 Bénin)
-            bareme = [
-                (Decimal('0'), Decimal('50000'), Decimal('0')),
-                (Decimal('50001'), Decimal('130000'), Decimal('10')),
-                (Decimal('130001'), Decimal('280000'), Decimal('15')),
-                (Decimal('280001'), Decimal('480000'), Decimal('19')),
-                (Decimal('480001'), Decimal('730000'), Decimal('24')),
-                (Decimal('730001'), Decimal('1030000'), Decimal('28')),
-                (Decimal('1030001'), Decimal('1380000'), Decimal('32')),
-                (Decimal('1380001'), Decimal('1880000'), Decimal('35')),
-                (Decimal('1880001'), Decimal('3780000'), Decimal('37')),
-                (Decimal('3780001'), None, Decimal('40')),
-            ]
-
-        ipts = Decimal('0')
-        reste = Decimal(str(salaire_imposable))
-
-        for seuil_min, seuil_max, taux in bareme:
-            seuil_min = Decimal(str(seuil_min))
-            taux = Decimal(str(taux))
-
-            if seuil_max:
-                seuil_max = Decimal(str(seuil_max))
-                largeur_tranche = seuil_max - seuil_min + 1
-            else:
-                # Dernière tranche illimitée
-                if reste > 0:
-                    ipts += reste * taux / 100
-                break
-
-            if reste <= 0:
-                break
-
-            montant_dans_tranche = min(reste, largeur_tranche)
-            ipts += montant_dans_tranche * taux / 100
-            reste -= montant_dans_tranche
-
-        return ipts.quantize(Decimal('1'))
+        return cls.get_bareme_compile().evaluer(salaire_imposable).quantize(Decimal('1'))
 
     def to_dict(self):
         return {
@@ -35,32 +35,8 @@ def est_admin(user):
 
 def get_default_context(request):
     """Contexte par défaut pour toutes les vues"""
-    user = request.user
-    modules = [
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'layout-dashboard', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers'},
-        {'id': 'facturation', 'label': 'Facturation', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'wallet', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-    return {
-        'current_user': {
-            'id': user.id,
-            'nom': user.get_full_name() or user.username,
-            'role': getattr(user, 'role', ''),
-            'initials': user.get_initials() if hasattr(user, 'get_initials') else user.username[:2].upper(),
-        },
-        'modules': modules,
-        'active_module': 'parametres',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'parametres'}
 
 
 @login_required
@@ -1374,8 +1350,7 @@ def api_export_data(request, format_type):
 def api_test_smtp(request):
     """Teste la configuration SMTP en envoyant un email de test"""
     import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
+    from django.core.mail import EmailMessage
 
     try:
         config = ConfigurationEtude.get_instance()
@@ -1400,11 +1375,6 @@ def api_test_smtp(request):
             }, status=400)
 
         # Préparer le message de test
-        msg = MIMEMultipart()
-        msg['From'] = config.smtp_expediteur
-        msg['To'] = config.email
-        msg['Subject'] = 'Test SMTP - Gestion Étude Huissier'
-
         body = f"""
         Ce message confirme que la configuration SMTP fonctionne correctement.
 
@@ -1419,26 +1389,15 @@ def api_test_smtp(request):
         Gestion Étude Huissier - Message automatique
         """
 
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-        # Connexion et envoi
+        # Connexion et envoi (même connexion que le worker d'envoi des notifications)
         try:
-            if config.smtp_port == 465:
-                # SSL
-                server = smtplib.SMTP_SSL(config.smtp_serveur, config.smtp_port, timeout=10)
-            else:
-                # TLS ou non sécurisé
-                server = smtplib.SMTP(config.smtp_serveur, config.smtp_port, timeout=10)
-                if config.smtp_port == 587:
-                    server.starttls()
-
-            # Authentification si credentials fournis
-            if config.smtp_utilisateur and config.smtp_mot_de_passe:
-                server.login(config.smtp_utilisateur, config.smtp_mot_de_passe)
-
-            # Envoi
-            server.send_message(msg)
-            server.quit()
+            EmailMessage(
+                subject='Test SMTP - Gestion Étude Huissier',
+                body=body,
+                from_email=config.smtp_expediteur,
+                to=[config.email],
+                connection=config.get_connexion_email(),
+            ).send(fail_silently=False)
 
             return JsonResponse({
                 'success': True,
@@ -0,0 +1,94 @@
+"""
+Commande de gestion pour simuler les droits de recette d'un portefeuille
+
+Utilisation: python manage.py simuler_emoluments [--synthetique N] [--seuil-ms MS]
+
+Évalue en lot (BaremeCompile.evaluer_lot) les honoraires amiables et les
+émoluments de recouvrement forcé de tous les dossiers de recouvrement,
+puis, avec --synthetique, mesure le temps d'évaluation de N montants
+aléatoires sur chaque barème. Échoue si l'évaluation synthétique dépasse
+le seuil (par défaut 100 ms pour 10 000 montants).
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recouvrement.models import DossierRecouvrement
+from recouvrement.services.baremes import (
+    BAREME_EMOLUMENTS_OHADA_COMPILE,
+    BAREME_RECOUVREMENT_AMIABLE_COMPILE,
+    BAREME_RECOUVREMENT_FORCE_COMPILE,
+)
+
+
+BAREMES = [
+    ('amiable', BAREME_RECOUVREMENT_AMIABLE_COMPILE),
+    ('force', BAREME_RECOUVREMENT_FORCE_COMPILE),
+    ('ohada', BAREME_EMOLUMENTS_OHADA_COMPILE),
+]
+
+
+class Command(BaseCommand):
+    help = "Simule en lot les droits de recette du portefeuille de recouvrement"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetique',
+            type=int,
+            default=10000,
+            help='Nombre de montants aléatoires évalués par barème (0 pour ignorer)',
+        )
+        parser.add_argument(
+            '--seuil-ms',
+            type=float,
+            default=100,
+            help="Temps maximal d'évaluation des montants synthétiques par barème (millisecondes)",
+        )
+
+    def handle(self, *args, **options):
+        self.simuler_portefeuille()
+
+        nombre = options['synthetique']
+        if not nombre:
+            return
+
+        generateur = random.Random(2017066)
+        montants = [Decimal(generateur.randint(1, 200_000_000)) for _ in range(nombre)]
+        self.stdout.write(f"{nombre} montants synthétiques")
+
+        plus_lent = 0
+        for nom, bareme in BAREMES:
+            debut = time.perf_counter()
+            droits = bareme.evaluer_lot(montants)
+            duree = (time.perf_counter() - debut) * 1000
+            plus_lent = max(plus_lent, duree)
+            self.stdout.write(
+                f"{nom:8} {duree:8.1f} ms  total {sum(droits):>20,.0f} FCFA".replace(',', ' ')
+            )
+
+        if plus_lent > options['seuil_ms']:
+            raise CommandError(f"Évaluation trop lente : {plus_lent:.1f} ms (seuil {options['seuil_ms']:.0f} ms)")
+        self.stdout.write(self.style.SUCCESS('Évaluation des barèmes sous le seuil'))
+
+    def simuler_portefeuille(self):
+        """Droits de recette de tous les dossiers, par type de recouvrement."""
+        debut = time.perf_counter()
+        montants = {'amiable': [], 'force': []}
+        for type_recouvrement, montant in DossierRecouvrement.objects.values_list(
+            'type_recouvrement', 'montant_principal'
+        ):
+            montants.setdefault(type_recouvrement, []).append(montant or 0)
+
+        honoraires = BAREME_RECOUVREMENT_AMIABLE_COMPILE.evaluer_lot(montants['amiable'])
+        emoluments = BAREME_RECOUVREMENT_FORCE_COMPILE.evaluer_lot(montants['force'])
+        duree = (time.perf_counter() - debut) * 1000
+
+        self.stdout.write(
+            f"Portefeuille : {len(honoraires)} dossiers amiables, {len(emoluments)} forcés "
+            f"({duree:.1f} ms, lecture comprise)"
+        )
+        self.stdout.write(f"Honoraires amiables : {sum(honoraires):,.0f} FCFA".replace(',', ' '))
+        self.stdout.write(f"Émoluments forcés   : {sum(emoluments):,.0f} FCFA".replace(',', ' '))
@@ -6,9 +6,16 @@ BARÈME RECOUVREMENT AMIABLE (Article 1er - Décret 2017-066)
 
 BARÈME RECOUVREMENT FORCÉ (Article 2 - Décret 2017-066)
 - Droit de recette à la charge du DÉBITEUR (sauf disposition contraire)
+
+Chaque barème est compilé une seule fois (BaremeCompile) : seuils et
+droits cumulés en début de tranche sont précalculés, une évaluation se
+réduit à une recherche dichotomique et une multiplication. Les barèmes
+compilés sont partagés par les vues, les modèles et la paie (IPTS).
 """
 
+from bisect import bisect_left
 from decimal import Decimal
+from functools import lru_cache
 
 
 # BARÈME RECOUVREMENT AMIABLE (Article 1er - Décret 2017-066)
@@ -33,6 +40,148 @@ BAREME_RECOUVREMENT_FORCE = [
 # Même barème que le recouvrement forcé
 BAREME_DROIT_COMPLEMENTAIRE = BAREME_RECOUVREMENT_FORCE
 
+# BARÈME DES ÉMOLUMENTS OHADA (simplifié), appliqué lors du basculement
+# amiable -> forcé
+BAREME_EMOLUMENTS_OHADA = [
+    (500_000, Decimal('0.10')),
+    (1_000_000, Decimal('0.08')),
+    (5_000_000, Decimal('0.05')),
+    (10_000_000, Decimal('0.03')),
+    (None, Decimal('0.01')),
+]
+
+ZERO = Decimal('0')
+UNITE = Decimal('1')
+
+
+class BaremeCompile:
+    """
+    Barème proportionnel dégressif précompilé.
+
+    Args:
+        tranches: Liste des tranches [(seuil, taux), ...], seuils croissants,
+            taux en fraction (0.10 pour 10 %), seuil None pour la dernière
+            tranche (au-delà). Sans tranche illimitée, rien n'est dû au-delà
+            du dernier seuil.
+    """
+
+    __slots__ = ('seuils', 'bornes', 'taux', 'cumuls')
+
+    def __init__(self, tranches):
+        self.seuils = []    # Seuils hauts des tranches bornées
+        self.bornes = []    # Borne basse de chaque tranche
+        self.taux = []
+        self.cumuls = []    # Droit dû à la borne basse de chaque tranche
+
+        borne = cumul = ZERO
+        for seuil, taux in tranches:
+            taux = Decimal(str(taux))
+            self.bornes.append(borne)
+            self.taux.append(taux)
+            self.cumuls.append(cumul)
+            if seuil is None:
+                break
+            seuil = Decimal(str(seuil))
+            self.seuils.append(seuil)
+            cumul += (seuil - borne) * taux
+            borne = seuil
+        else:
+            self.bornes.append(borne)
+            self.taux.append(ZERO)
+            self.cumuls.append(cumul)
+
+    @classmethod
+    def depuis_bornes_incluses(cls, tranches):
+        """
+        Compile un barème décrit par bornes incluses [(min, max, taux %), ...]
+        (format de TrancheIPTS) : chaque tranche couvre max - min + 1 unités,
+        max None ou 0 pour la dernière tranche.
+        """
+        cumulees = []
+        seuil = ZERO
+        for montant_min, montant_max, taux in tranches:
+            taux = Decimal(str(taux)) / 100
+            if not montant_max:
+                cumulees.append((None, taux))
+                break
+            seuil += Decimal(str(montant_max)) - Decimal(str(montant_min)) + 1
+            cumulees.append((seuil, taux))
+        return cls(cumulees)
+
+    def evaluer(self, montant):
+        """Droit exact (non arrondi) pour un montant."""
+        if not isinstance(montant, Decimal):
+            montant = Decimal(str(montant))
+        if montant <= 0:
+            return ZERO
+        i = bisect_left(self.seuils, montant)
+        return self.cumuls[i] + (montant - self.bornes[i]) * self.taux[i]
+
+    def evaluer_lot(self, montants, arrondir=True):
+        """
+        Droits d'une série de montants (simulation sur un portefeuille).
+
+        Returns:
+            list: Un Decimal par montant, dans le même ordre, arrondi à
+            l'entier si arrondir est vrai.
+        """
+        seuils, bornes, taux, cumuls = self.seuils, self.bornes, self.taux, self.cumuls
+        resultats = []
+        for montant in montants:
+            if not isinstance(montant, Decimal):
+                montant = Decimal(str(montant))
+            if montant <= 0:
+                droit = ZERO
+            else:
+                i = bisect_left(seuils, montant)
+                droit = cumuls[i] + (montant - bornes[i]) * taux[i]
+            resultats.append(droit.quantize(UNITE) if arrondir else droit)
+        return resultats
+
+    def detail(self, montant):
+        """
+        Ventilation par tranche d'un montant.
+
+        Returns:
+            list: [(borne basse, seuil ou None, taux, montant dans la tranche,
+            droit exact de la tranche), ...] pour les tranches entamées.
+        """
+        if not isinstance(montant, Decimal):
+            montant = Decimal(str(montant))
+        if montant <= 0:
+            return []
+        dernier = bisect_left(self.seuils, montant)
+        lignes = []
+        for i in range(dernier + 1):
+            seuil = self.seuils[i] if i < len(self.seuils) else None
+            part = (seuil if i < dernier else montant) - self.bornes[i]
+            lignes.append((self.bornes[i], seuil, self.taux[i], part, part * self.taux[i]))
+        return lignes
+
+
+@lru_cache(maxsize=32)
+def _compiler(tranches):
+    return BaremeCompile(tranches)
+
+
+def compiler_bareme(bareme):
+    """Barème compilé (mis en cache) pour une liste de tranches [(seuil, taux), ...]."""
+    if isinstance(bareme, BaremeCompile):
+        return bareme
+    return _compiler(tuple(bareme))
+
+
+BAREME_RECOUVREMENT_AMIABLE_COMPILE = compiler_bareme(BAREME_RECOUVREMENT_AMIABLE)
+BAREME_RECOUVREMENT_FORCE_COMPILE = compiler_bareme(BAREME_RECOUVREMENT_FORCE)
+BAREME_EMOLUMENTS_OHADA_COMPILE = compiler_bareme(BAREME_EMOLUMENTS_OHADA)
+
+# Émoluments proportionnels du calculateur de créance, selon le titre :
+# sans titre exécutoire -> barème amiable, avec titre -> barème forcé
+BAREMES_EMOLUMENTS_TITRE = {
+    'sans': BAREME_RECOUVREMENT_AMIABLE_COMPILE,
+    'avec': BAREME_RECOUVREMENT_FORCE_COMPILE,
+}
+
 
 def calculer_droit_recette(montant, bareme):
     """
@@ -41,31 +190,12 @@ def calculer_droit_recette(montant, bareme):
 
     Args:
         montant: Montant de la créance à recouvrer
-        bareme: Liste des tranches [(seuil, taux), ...]
+        bareme: Liste des tranches [(seuil, taux), ...] ou BaremeCompile
 
     Returns:
         Decimal: Montant du droit de recette HT (arrondi à l'entier)
     """
-    droit = Decimal('0')
-    reste = Decimal(str(montant))
-    seuil_precedent = Decimal('0')
-
-    for seuil, taux in bareme:
-        if seuil is None:
-            # Dernière tranche (au-delà)
-            droit += reste * taux
-            break
-
-        tranche = min(reste, Decimal(str(seuil)) - seuil_precedent)
-        if tranche > 0:
-            droit += tranche * taux
-            reste -= tranche
-            seuil_precedent = Decimal(str(seuil))
-
-        if reste <= 0:
-            break
-
-    return droit.quantize(Decimal('1'))  # Arrondi à l'entier
+    return compiler_bareme(bareme).evaluer(montant).quantize(UNITE)  # Arrondi à l'entier
 
 
 def calculer_honoraires_amiable(montant):
@@ -116,7 +246,7 @@ def detail_calcul_droit_recette(montant, bareme, type_bareme="recouvrement"):
 
     Args:
         montant: Montant de la créance
-        bareme: Liste des tranches [(seuil, taux), ...]
+        bareme: Liste des tranches [(seuil, taux), ...] ou BaremeCompile
         type_bareme: Type de barème pour l'affichage
 
     Returns:
@@ -132,41 +262,18 @@ def detail_calcul_droit_recette(montant, bareme, type_bareme="recouvrement"):
         }
     """
     detail = []
-    total = Decimal('0')
-    reste = Decimal(str(montant))
-    seuil_precedent = Decimal('0')
-
-    for seuil, taux in bareme:
-        if reste <= 0:
-            break
-
-        if seuil is None:
-            # Dernière tranche
-            montant_tranche = reste
-            droit_tranche = (reste * taux).quantize(Decimal('1'))
-            detail.append({
-                'tranche_min': int(seuil_precedent) + 1 if seuil_precedent > 0 else 0,
-                'tranche_max': None,  # Au-delà
-                'taux': float(taux * 100),
-                'montant_tranche': int(montant_tranche),
-                'droit': int(droit_tranche)
-            })
-            total += droit_tranche
-            break
-
-        tranche = min(reste, Decimal(str(seuil)) - seuil_precedent)
-        if tranche > 0:
-            droit_tranche = (tranche * taux).quantize(Decimal('1'))
-            detail.append({
-                'tranche_min': int(seuil_precedent) + 1 if seuil_precedent > 0 else 0,
-                'tranche_max': int(seuil),
-                'taux': float(taux * 100),
-                'montant_tranche': int(tranche),
-                'droit': int(droit_tranche)
-            })
-            total += droit_tranche
-            reste -= tranche
-            seuil_precedent = Decimal(str(seuil))
+    total = ZERO
+
+    for borne, seuil, taux, montant_tranche, droit in compiler_bareme(bareme).detail(montant):
+        droit_tranche = droit.quantize(UNITE)
+        detail.append({
+            'tranche_min': int(borne) + 1 if borne > 0 else 0,
+            'tranche_max': int(seuil) if seuil is not None else None,  # None : au-delà
+            'taux': float(taux * 100),
+            'montant_tranche': int(montant_tranche),
+            'droit': int(droit_tranche)
+        })
+        total += droit_tranche
 
     return {
         'montant_creance': int(montant),
@@ -10,6 +10,8 @@ from django.utils import timezone
 from decimal import Decimal
 import datetime
 
+from gestion.services import sequences
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # CONSTANTES OBSOLÈTES - UTILISER ConfigurationEtude À LA PLACE
@@ -303,15 +305,18 @@ class Employe(models.Model):
         return ""
 
     @classmethod
-    def generer_matricule(cls):
-        """Génère un matricule unique"""
+    def generer_matricule(cls, apercu=False):
+        """
+        Génère un matricule unique.
+        Avec apercu=True, retourne le matricule suivant sans le consommer.
+        """
         annee = timezone.now().year
         prefix = f"EMP{annee}"
-        last = cls.objects.filter(matricule__startswith=prefix).order_by('-matricule').first()
-        if last:
-            num = int(last.matricule[-4:]) + 1
+        initial = lambda: sequences.dernier_numero_existant(cls.objects.all(), 'matricule', prefix)
+        if apercu:
+            num = sequences.apercu('EMP', str(annee), initial=initial)
         else:
-            num = 1
+            num = sequences.prochain('EMP', str(annee), initial=initial)
         return f"{prefix}{num:04d}"
 
     def clean(self):
@@ -472,11 +477,10 @@ class Contrat(models.Model):
         """Génère une référence de contrat unique"""
         annee = timezone.now().year
         prefix = f"CTR{annee}"
-        last = cls.objects.filter(reference__startswith=prefix).order_by('-reference').first()
-        if last:
-            num = int(last.reference[-4:]) + 1
-        else:
-            num = 1
+        num = sequences.prochain(
+            'CTR', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefix),
+        )
         return f"{prefix}{num:04d}"
 
     @property
@@ -1140,11 +1144,10 @@ class Pret(models.Model):
         """Génère une référence unique"""
         prefix = "AVS" if type_pret == 'avance' else "PRT"
         annee = timezone.now().year
-        last = cls.objects.filter(reference__startswith=f"{prefix}{annee}").order_by('-reference').first()
-        if last:
-            num = int(last.reference[-4:]) + 1
-        else:
-            num = 1
+        num = sequences.prochain(
+            prefix, str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', f"{prefix}{annee}"),
+        )
         return f"{prefix}{annee}{num:04d}"
 
     def clean(self):
@@ -1576,11 +1579,10 @@ class Sanction(models.Model):
         """Génère une référence unique"""
         annee = timezone.now().year
         prefix = f"SAN{annee}"
-        last = cls.objects.filter(reference__startswith=prefix).order_by('-reference').first()
-        if last:
-            num = int(last.reference[-4:]) + 1
-        else:
-            num = 1
+        num = sequences.prochain(
+            'SAN', str(annee),
+            initial=lambda: sequences.dernier_numero_existant(cls.objects.all(), 'reference', prefix),
+        )
         return f"{prefix}{num:04d}"
 
 
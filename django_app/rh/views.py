@@ -37,38 +37,8 @@ from .models import (
 
 def get_default_context(request):
     """Retourne le contexte par défaut pour tous les templates RH"""
-    user = request.user
-
-    modules = [
-        # Principal
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'layout-dashboard', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers'},
-        {'id': 'facturation', 'label': 'Facturation', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        # Finance
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'wallet', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        # Gestion
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        # Admin
-        {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    return {
-        'current_user': {
-            'id': user.id if user.is_authenticated else None,
-            'nom': user.get_full_name() if user.is_authenticated else 'Invité',
-            'role': user.role if user.is_authenticated and hasattr(user, 'role') else '',
-            'initials': user.get_initials() if user.is_authenticated and hasattr(user, 'get_initials') else 'XX',
-        },
-        'modules': modules,
-        'active_module': 'rh',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'rh'}
 
 
 # =============================================================================
@@ -308,7 +278,7 @@ def nouveau_employe(request):
     context['situations_matrimoniales'] = Employe.SITUATION_MATRIMONIALE_CHOICES
 
     # Générer le prochain matricule
-    context['prochain_matricule'] = Employe.generer_matricule()
+    context['prochain_matricule'] = Employe.generer_matricule(apercu=True)
 
     return render(request, 'rh/employe_form.html', context)
 
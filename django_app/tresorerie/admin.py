@@ -5,7 +5,7 @@ Administration du module Trésorerie
 from django.contrib import admin
 from .models import (
     CompteBancaire, MouvementTresorerie, RapprochementBancaire,
-    PrevisionTresorerie, AlerteTresorerie
+    PrevisionTresorerie, AlerteTresorerie, ReleveBancaire, LigneReleve
 )
 
 
@@ -34,6 +34,22 @@ class RapprochementBancaireAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'cree_le', 'modifie_le']
 
 
+@admin.register(ReleveBancaire)
+class ReleveBancaireAdmin(admin.ModelAdmin):
+    list_display = ['nom_fichier', 'compte', 'format', 'nb_lignes', 'nb_doublons', 'cree_le']
+    list_filter = ['format', 'compte']
+    readonly_fields = ['id', 'cree_le']
+
+
+@admin.register(LigneReleve)
+class LigneReleveAdmin(admin.ModelAdmin):
+    list_display = ['date_operation', 'compte', 'libelle', 'montant', 'statut', 'methode']
+    list_filter = ['statut', 'methode', 'compte']
+    search_fields = ['libelle', 'reference']
+    date_hierarchy = 'date_operation'
+    readonly_fields = ['id', 'empreinte']
+
+
 @admin.register(PrevisionTresorerie)
 class PrevisionTresorerieAdmin(admin.ModelAdmin):
     list_display = ['libelle', 'type_prevision', 'montant', 'date_prevue', 'statut']
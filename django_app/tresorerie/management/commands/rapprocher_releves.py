@@ -0,0 +1,91 @@
+"""
+Commande de gestion pour l'import et le rapprochement des relevés bancaires
+
+Utilisation: python manage.py rapprocher_releves [--compte ID] [--fichier CHEMIN]
+             [--du AAAA-MM-JJ] [--au AAAA-MM-JJ] [--tolerance JOURS] [--appliquer]
+
+Importe éventuellement un relevé (CSV, OFX ou CAMT.053) pour le compte,
+puis rapproche les lignes de relevé non rapprochées de chaque compte actif
+avec ses mouvements validés et affiche le nombre de correspondances par
+méthode, les lignes à revoir et le temps de calcul. Avec --appliquer,
+enregistre les correspondances par lots.
+"""
+
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tresorerie.models import CompteBancaire
+from tresorerie.services import rapprochement, releves
+
+
+class Command(BaseCommand):
+    help = "Import de relevés bancaires et rapprochement automatique avec les mouvements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compte', help='Identifiant du compte bancaire (par défaut : comptes actifs)')
+        parser.add_argument('--fichier', help='Relevé à importer avant le rapprochement (requiert --compte)')
+        parser.add_argument('--du', dest='date_debut', help='Date de début des lignes de relevé')
+        parser.add_argument('--au', dest='date_fin', help='Date de fin des lignes de relevé')
+        parser.add_argument(
+            '--tolerance',
+            type=int,
+            default=rapprochement.TOLERANCE_JOURS,
+            help='Écart maximal en jours entre une ligne et ses mouvements',
+        )
+        parser.add_argument(
+            '--appliquer',
+            action='store_true',
+            help='Enregistre les rapprochements proposés',
+        )
+
+    def handle(self, *args, **options):
+        if options['compte']:
+            comptes = CompteBancaire.objects.filter(id=options['compte'])
+            if not comptes:
+                raise CommandError(f"Compte introuvable : {options['compte']}")
+        elif options['fichier']:
+            raise CommandError("--fichier requiert --compte")
+        else:
+            comptes = CompteBancaire.objects.filter(statut='actif')
+
+        if options['fichier']:
+            debut = time.perf_counter()
+            try:
+                with open(options['fichier'], 'rb') as fichier:
+                    releve = releves.importer(comptes[0], fichier, os.path.basename(options['fichier']))
+            except releves.ErreurReleve as erreur:
+                raise CommandError(str(erreur))
+            duree = (time.perf_counter() - debut) * 1000
+            self.stdout.write(
+                f"Relevé {releve.format} : {releve.nb_lignes} ligne(s) importée(s), "
+                f"{releve.nb_doublons} doublon(s) en {duree:.0f} ms"
+            )
+
+        for compte in comptes:
+            debut = time.perf_counter()
+            propositions = rapprochement.proposer(
+                compte, options['date_debut'], options['date_fin'], tolerance_jours=options['tolerance']
+            )
+            duree = (time.perf_counter() - debut) * 1000
+
+            correspondances = propositions.correspondances
+            if not correspondances and not propositions.a_revoir:
+                continue
+            methodes = Counter(c.methode for c in correspondances)
+            self.stdout.write(f"{compte}")
+            self.stdout.write(
+                f"  Propositions : {len(correspondances)} ({methodes['exact']} exactes, "
+                f"{methodes['tolerance']} avec tolérance, {methodes['groupe']} groupées) en {duree:.0f} ms"
+            )
+            self.stdout.write(f"  À revoir     : {len(propositions.a_revoir)}")
+
+            if options['appliquer']:
+                debut = time.perf_counter()
+                rapprochees = rapprochement.appliquer(correspondances)
+                duree = (time.perf_counter() - debut) * 1000
+                self.stdout.write(self.style.SUCCESS(
+                    f"  {rapprochees} ligne(s) rapprochée(s) en {duree:.0f} ms"
+                ))
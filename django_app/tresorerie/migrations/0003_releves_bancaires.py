@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:30
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0023_audit_horodatage_action'),
+        ('tresorerie', '0002_remove_mouvementtresorerie_dossier_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReleveBancaire',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name='Fichier')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('ofx', 'OFX'), ('camt', 'CAMT.053')], max_length=10)),
+                ('nb_lignes', models.PositiveIntegerField(default=0, verbose_name='Lignes importées')),
+                ('nb_doublons', models.PositiveIntegerField(default=0, verbose_name='Doublons ignorés')),
+                ('cree_le', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Relevé bancaire',
+                'verbose_name_plural': 'Relevés bancaires',
+                'ordering': ['-cree_le'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneReleve',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_operation', models.DateField(verbose_name="Date d'opération")),
+                ('date_valeur', models.DateField(blank=True, null=True, verbose_name='Date de valeur')),
+                ('libelle', models.CharField(max_length=255, verbose_name='Libellé')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Référence')),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('empreinte', models.CharField(max_length=64)),
+                ('statut', models.CharField(choices=[('a_rapprocher', 'À rapprocher'), ('rapprochee', 'Rapprochée'), ('ignoree', 'Ignorée')], default='a_rapprocher', max_length=20)),
+                ('methode', models.CharField(blank=True, choices=[('exact', 'Montant, date et référence'), ('tolerance', 'Montant dans la fenêtre de dates'), ('groupe', 'Regroupement de mouvements'), ('manuel', 'Manuel')], max_length=20)),
+                ('compte', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lignes_releve', to='tresorerie.comptebancaire')),
+            ],
+            options={
+                'verbose_name': 'Ligne de relevé',
+                'verbose_name_plural': 'Lignes de relevé',
+                'ordering': ['date_operation'],
+            },
+        ),
+        migrations.AddField(
+            model_name='mouvementtresorerie',
+            name='ligne_releve',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements', to='tresorerie.lignereleve', verbose_name='Ligne de relevé'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementtresorerie',
+            index=models.Index(fields=['compte', 'montant', 'date_mouvement'], name='mouvement_rapprochement_idx'),
+        ),
+        migrations.AddField(
+            model_name='relevebancaire',
+            name='compte',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='releves', to='tresorerie.comptebancaire'),
+        ),
+        migrations.AddField(
+            model_name='relevebancaire',
+            name='cree_par',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='releves_importes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='lignereleve',
+            name='releve',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='tresorerie.relevebancaire'),
+        ),
+        migrations.AddIndex(
+            model_name='lignereleve',
+            index=models.Index(fields=['compte', 'statut', 'date_operation'], name='ligne_releve_statut_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lignereleve',
+            constraint=models.UniqueConstraint(fields=('compte', 'empreinte'), name='ligne_releve_unique'),
+        ),
+    ]
@@ -74,7 +74,8 @@ class CompteBancaire(models.Model):
 
     def recalculer_solde(self):
         """Recalcule le solde actuel basé sur les mouvements"""
-        mouvements = self.mouvements.filter(statut='valide')
+        # Un mouvement rapproché reste un mouvement validé
+        mouvements = self.mouvements.filter(statut__in=['valide', 'rapproche'])
         entrees = mouvements.filter(type_mouvement='entree').aggregate(
             total=models.Sum('montant'))['total'] or Decimal('0')
         sorties = mouvements.filter(type_mouvement='sortie').aggregate(
@@ -158,6 +159,16 @@ class MouvementTresorerie(models.Model):
     statut = models.CharField(max_length=20, choices=STATUTS, default='en_attente')
     notes = models.TextField(blank=True, null=True)
 
+    # Ligne du relevé bancaire rapprochée (plusieurs mouvements pour une remise)
+    ligne_releve = models.ForeignKey(
+        'LigneReleve',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='mouvements',
+        verbose_name='Ligne de relevé'
+    )
+
     cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='mouvements_crees')
     valide_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='mouvements_valides')
     date_validation = models.DateTimeField(blank=True, null=True)
@@ -169,6 +180,9 @@ class MouvementTresorerie(models.Model):
         verbose_name = 'Mouvement de trésorerie'
         verbose_name_plural = 'Mouvements de trésorerie'
         ordering = ['-date_mouvement', '-cree_le']
+        indexes = [
+            models.Index(fields=['compte', 'montant', 'date_mouvement'], name='mouvement_rapprochement_idx'),
+        ]
 
     def __str__(self):
         signe = '+' if self.type_mouvement == 'entree' else '-'
@@ -227,6 +241,79 @@ class RapprochementBancaire(models.Model):
         return self.ecart
 
 
+class ReleveBancaire(models.Model):
+    """Relevé bancaire importé (fichier CSV, OFX ou CAMT.053)"""
+    FORMATS = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+        ('camt', 'CAMT.053'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    compte = models.ForeignKey(CompteBancaire, on_delete=models.PROTECT, related_name='releves')
+    nom_fichier = models.CharField(max_length=255, verbose_name='Fichier')
+    format = models.CharField(max_length=10, choices=FORMATS)
+    nb_lignes = models.PositiveIntegerField(default=0, verbose_name='Lignes importées')
+    nb_doublons = models.PositiveIntegerField(default=0, verbose_name='Doublons ignorés')
+
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='releves_importes')
+    cree_le = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Relevé bancaire'
+        verbose_name_plural = 'Relevés bancaires'
+        ordering = ['-cree_le']
+
+    def __str__(self):
+        return f"Relevé {self.compte.nom} - {self.nom_fichier}"
+
+
+class LigneReleve(models.Model):
+    """Opération d'un relevé bancaire, à rapprocher des mouvements"""
+    STATUTS = [
+        ('a_rapprocher', 'À rapprocher'),
+        ('rapprochee', 'Rapprochée'),
+        ('ignoree', 'Ignorée'),
+    ]
+
+    METHODES = [
+        ('exact', 'Montant, date et référence'),
+        ('tolerance', 'Montant dans la fenêtre de dates'),
+        ('groupe', 'Regroupement de mouvements'),
+        ('manuel', 'Manuel'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    releve = models.ForeignKey(ReleveBancaire, on_delete=models.CASCADE, related_name='lignes')
+    compte = models.ForeignKey(CompteBancaire, on_delete=models.PROTECT, related_name='lignes_releve')
+    date_operation = models.DateField(verbose_name='Date d\'opération')
+    date_valeur = models.DateField(blank=True, null=True, verbose_name='Date de valeur')
+    libelle = models.CharField(max_length=255, verbose_name='Libellé')
+    reference = models.CharField(max_length=100, blank=True, verbose_name='Référence')
+    # Positif au crédit du compte (entrée), négatif au débit (sortie)
+    montant = models.DecimalField(max_digits=15, decimal_places=2)
+
+    # Identifiant stable de l'opération : une réimportation ne crée pas de doublon
+    empreinte = models.CharField(max_length=64)
+
+    statut = models.CharField(max_length=20, choices=STATUTS, default='a_rapprocher')
+    methode = models.CharField(max_length=20, choices=METHODES, blank=True)
+
+    class Meta:
+        verbose_name = 'Ligne de relevé'
+        verbose_name_plural = 'Lignes de relevé'
+        ordering = ['date_operation']
+        constraints = [
+            models.UniqueConstraint(fields=['compte', 'empreinte'], name='ligne_releve_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['compte', 'statut', 'date_operation'], name='ligne_releve_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date_operation} {self.montant} - {self.libelle}"
+
+
 class PrevisionTresorerie(models.Model):
     """Prévision de trésorerie"""
     TYPES = [
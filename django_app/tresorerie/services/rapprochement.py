@@ -0,0 +1,304 @@
+"""
+Rapprochement automatique des lignes de relevé avec les mouvements de trésorerie.
+
+Deux requêtes par compte : les lignes de relevé à rapprocher, puis les
+mouvements validés non rapprochés de la période élargie de la tolérance
+(index compte, montant, date). Les mouvements sont ensuite indexés en
+mémoire par montant signé et les lignes rapprochées en trois passes :
+
+1. exacte : même montant, même date (d'opération ou de valeur) et même
+   référence (référence, n° de chèque ou n° de pièce du mouvement) ;
+2. tolérance : même montant, date la plus proche dans la fenêtre ;
+3. groupe : une ligne contre plusieurs mouvements de même sens dont la
+   somme est exactement son montant (remise de chèques, virement groupé).
+
+Les lignes restantes sont proposées à la revue avec les mouvements de
+même montant d'une fenêtre plus large. proposer() ne fait aucune
+écriture ; appliquer() enregistre les correspondances par lots.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+
+from .releves import _normaliser
+
+TAILLE_LOT = 500
+
+# Écart maximal de dates pour les passes tolérance et groupe
+TOLERANCE_JOURS = 5
+
+# Fenêtre des suggestions proposées à la revue (jamais appliquées d'office)
+FENETRE_REVUE_JOURS = 31
+SUGGESTIONS_MAX = 3
+
+# Bornes de la recherche de groupes (coût en 2^CANDIDATS_MAX au pire)
+CANDIDATS_MAX = 12
+MOUVEMENTS_MAX_GROUPE = 6
+
+
+@dataclass(frozen=True)
+class Correspondance:
+    """Ligne de relevé et mouvements dont la somme signée égale son montant."""
+    ligne_id: object
+    mouvement_ids: tuple
+    montant: object
+    methode: str  # 'exact', 'tolerance', 'groupe' ou 'manuel'
+
+    def as_dict(self):
+        return {
+            'ligne_id': str(self.ligne_id),
+            'mouvements': [str(i) for i in self.mouvement_ids],
+            'montant': str(self.montant),
+            'methode': self.methode,
+        }
+
+
+@dataclass
+class Propositions:
+    """Correspondances trouvées et lignes laissées à la revue."""
+    correspondances: list
+    # ligne_id -> mouvements de même montant hors tolérance (suggestions)
+    a_revoir: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        return {
+            'correspondances': [c.as_dict() for c in self.correspondances],
+            'a_revoir': [
+                {'ligne_id': str(ligne_id), 'suggestions': [str(i) for i in ids]}
+                for ligne_id, ids in self.a_revoir.items()
+            ],
+        }
+
+
+@dataclass
+class _Ligne:
+    id: object
+    date: object
+    date_valeur: object
+    montant: object
+    texte: str
+
+
+@dataclass
+class _Mouvement:
+    id: object
+    date: object
+    date_valeur: object
+    montant: object  # positif pour une entrée, négatif pour une sortie
+    references: frozenset
+
+
+def lignes_a_rapprocher(compte, date_debut=None, date_fin=None):
+    """Lignes de relevé non rapprochées du compte (une requête)."""
+    from tresorerie.models import LigneReleve
+
+    lignes = LigneReleve.objects.filter(compte=compte, statut='a_rapprocher')
+    if date_debut:
+        lignes = lignes.filter(date_operation__gte=date_debut)
+    if date_fin:
+        lignes = lignes.filter(date_operation__lte=date_fin)
+    return [
+        _Ligne(id_, date_, date_valeur, montant, _normaliser(f"{reference} {libelle}"))
+        for id_, date_, date_valeur, montant, reference, libelle in lignes.order_by(
+            'date_operation', 'id'
+        ).values_list('id', 'date_operation', 'date_valeur', 'montant', 'reference', 'libelle')
+    ]
+
+
+def mouvements_candidats(compte, date_debut, date_fin):
+    """Mouvements validés non rapprochés du compte entre deux dates (une requête)."""
+    from tresorerie.models import MouvementTresorerie
+
+    mouvements = MouvementTresorerie.objects.filter(
+        compte=compte,
+        statut='valide',
+        ligne_releve__isnull=True,
+        date_mouvement__range=(date_debut, date_fin),
+    ).order_by('date_mouvement', 'id').values_list(
+        'id', 'date_mouvement', 'date_valeur', 'type_mouvement', 'montant',
+        'reference', 'numero_cheque', 'numero_piece',
+    )
+    return [
+        _Mouvement(
+            id_, date_, date_valeur,
+            montant if type_mouvement == 'entree' else -montant,
+            frozenset(filter(None, (_normaliser(r) for r in references))),
+        )
+        for id_, date_, date_valeur, type_mouvement, montant, *references in mouvements
+    ]
+
+
+def _meme_date(ligne, mouvement):
+    dates_ligne = {ligne.date, ligne.date_valeur}
+    return mouvement.date in dates_ligne or (
+        mouvement.date_valeur is not None and mouvement.date_valeur in dates_ligne
+    )
+
+
+def _meme_reference(ligne, mouvement):
+    texte = f" {ligne.texte} "
+    return any(f" {reference} " in texte for reference in mouvement.references)
+
+
+def _ecart(ligne, mouvement):
+    return abs((mouvement.date - ligne.date).days)
+
+
+def _sous_ensemble(cible, candidats, mouvements_max):
+    """Sous-ensemble de candidats (centimes, id) de somme exactement `cible`."""
+    atteintes = {0: ()}
+    for montant, id_ in candidats:
+        for somme, ids in list(atteintes.items()):
+            total = somme + montant
+            if total > cible or total in atteintes or len(ids) >= mouvements_max:
+                continue
+            atteintes[total] = ids + (id_,)
+            if total == cible:
+                return atteintes[total]
+    return None
+
+
+def apparier(lignes, mouvements, tolerance_jours=TOLERANCE_JOURS,
+             candidats_max=CANDIDATS_MAX, mouvements_max=MOUVEMENTS_MAX_GROUPE):
+    """Rapproche les lignes et les mouvements en mémoire (trois passes)."""
+    par_montant = defaultdict(list)
+    for mouvement in mouvements:
+        par_montant[mouvement.montant].append(mouvement)
+    pris = set()
+    correspondances = []
+
+    def retenir(ligne, choisis, methode):
+        pris.update(m.id for m in choisis)
+        correspondances.append(Correspondance(
+            ligne.id, tuple(m.id for m in choisis), ligne.montant, methode
+        ))
+
+    # Passe 1 : montant, date et référence identiques
+    restantes = []
+    for ligne in lignes:
+        mouvement = next((
+            m for m in par_montant.get(ligne.montant, ())
+            if m.id not in pris and _meme_date(ligne, m) and _meme_reference(ligne, m)
+        ), None)
+        if mouvement:
+            retenir(ligne, [mouvement], 'exact')
+        else:
+            restantes.append(ligne)
+
+    # Passe 2 : même montant, date la plus proche dans la tolérance
+    lignes, restantes = restantes, []
+    for ligne in lignes:
+        mouvement = min((
+            m for m in par_montant.get(ligne.montant, ())
+            if m.id not in pris and _ecart(ligne, m) <= tolerance_jours
+        ), key=lambda m: (_ecart(ligne, m), not _meme_reference(ligne, m)), default=None)
+        if mouvement:
+            retenir(ligne, [mouvement], 'tolerance')
+        else:
+            restantes.append(ligne)
+
+    # Passe 3 : plusieurs mouvements de même sens pour une ligne
+    lignes, restantes = restantes, []
+    for ligne in lignes:
+        cible = abs(ligne.montant)
+        candidats = sorted((
+            m for m in mouvements
+            if m.id not in pris and (m.montant > 0) == (ligne.montant > 0)
+            and abs(m.montant) < cible and _ecart(ligne, m) <= tolerance_jours
+        ), key=lambda m: (_ecart(ligne, m), m.date, str(m.id)))[:candidats_max]
+        ids = _sous_ensemble(
+            int(cible * 100),
+            [(int(abs(m.montant) * 100), m.id) for m in candidats],
+            mouvements_max,
+        )
+        if ids:
+            retenir(ligne, [m for m in candidats if m.id in ids], 'groupe')
+        else:
+            restantes.append(ligne)
+
+    return correspondances, restantes
+
+
+def proposer(compte, date_debut=None, date_fin=None, tolerance_jours=TOLERANCE_JOURS,
+             candidats_max=CANDIDATS_MAX, mouvements_max=MOUVEMENTS_MAX_GROUPE):
+    """Propositions de rapprochement des lignes de relevé du compte (aucune écriture)."""
+    lignes = lignes_a_rapprocher(compte, date_debut, date_fin)
+    if not lignes:
+        return Propositions([])
+
+    fenetre = timedelta(days=max(tolerance_jours, FENETRE_REVUE_JOURS))
+    mouvements = mouvements_candidats(compte, lignes[0].date - fenetre, lignes[-1].date + fenetre)
+    correspondances, restantes = apparier(
+        lignes, mouvements, tolerance_jours, candidats_max, mouvements_max
+    )
+
+    pris = {i for c in correspondances for i in c.mouvement_ids}
+    par_montant = defaultdict(list)
+    for mouvement in mouvements:
+        if mouvement.id not in pris:
+            par_montant[mouvement.montant].append(mouvement)
+    a_revoir = {}
+    for ligne in restantes:
+        suggestions = sorted((
+            m for m in par_montant.get(ligne.montant, ())
+            if _ecart(ligne, m) <= FENETRE_REVUE_JOURS
+        ), key=lambda m: _ecart(ligne, m))[:SUGGESTIONS_MAX]
+        a_revoir[ligne.id] = [m.id for m in suggestions]
+    return Propositions(correspondances, a_revoir)
+
+
+def appliquer(correspondances, rapprochement=None, taille_lot=TAILLE_LOT):
+    """
+    Enregistre les correspondances par lots ; retourne le nombre de lignes rapprochées.
+
+    Les mouvements passent au statut « rapproché » et sont liés à leur
+    ligne de relevé (et au rapprochement s'il est fourni). Une
+    correspondance dont la ligne ou un mouvement a été rapproché
+    entre-temps est ignorée.
+    """
+    from tresorerie.models import LigneReleve, MouvementTresorerie, RapprochementBancaire
+
+    Through = RapprochementBancaire.mouvements_rapproches.through
+    rapprochees = 0
+    for debut in range(0, len(correspondances), taille_lot):
+        lot = correspondances[debut:debut + taille_lot]
+        with transaction.atomic():
+            libres = set(LigneReleve.objects.filter(
+                id__in=[c.ligne_id for c in lot], statut='a_rapprocher'
+            ).values_list('id', flat=True))
+            disponibles = set(MouvementTresorerie.objects.filter(
+                id__in=[i for c in lot for i in c.mouvement_ids],
+                statut='valide',
+                ligne_releve__isnull=True,
+            ).values_list('id', flat=True))
+            lot = [
+                c for c in lot
+                if c.ligne_id in libres and disponibles.issuperset(c.mouvement_ids)
+            ]
+            if not lot:
+                continue
+
+            MouvementTresorerie.objects.bulk_update([
+                MouvementTresorerie(id=mouvement_id, ligne_releve_id=c.ligne_id, statut='rapproche')
+                for c in lot
+                for mouvement_id in c.mouvement_ids
+            ], ['ligne_releve', 'statut'], batch_size=taille_lot)
+
+            par_methode = defaultdict(list)
+            for c in lot:
+                par_methode[c.methode].append(c.ligne_id)
+            for methode, ligne_ids in par_methode.items():
+                LigneReleve.objects.filter(id__in=ligne_ids).update(
+                    statut='rapprochee', methode=methode
+                )
+
+            if rapprochement is not None:
+                Through.objects.bulk_create([
+                    Through(rapprochementbancaire_id=rapprochement.id, mouvementtresorerie_id=mouvement_id)
+                    for c in lot
+                    for mouvement_id in c.mouvement_ids
+                ], batch_size=taille_lot, ignore_conflicts=True)
+            rapprochees += len(lot)
+    return rapprochees
@@ -0,0 +1,346 @@
+"""
+Import des relevés bancaires (CSV, OFX, CAMT.053).
+
+Les lecteurs sont des générateurs : le fichier est lu au fil de l'eau
+(ligne à ligne pour le CSV, par blocs <STMTTRN> pour l'OFX, par
+iterparse sur les éléments <Ntry> pour le CAMT), sans jamais charger le
+relevé entier en mémoire. importer() insère les opérations par lots.
+
+Chaque opération reçoit une empreinte stable (identifiant de la banque
+s'il existe, sinon date, montant, référence, libellé et rang parmi les
+opérations identiques du fichier) : réimporter un relevé, ou deux relevés
+qui se chevauchent, ne crée pas de doublon.
+"""
+import csv
+import hashlib
+import io
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+TAILLE_LOT = 500
+
+FORMATS_DATE = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%Y%m%d']
+
+# Colonnes CSV reconnues (en-têtes sans accents, en minuscules)
+COLONNES_CSV = {
+    'date_operation': ['date operation', 'date comptable', 'date', 'booking date'],
+    'date_valeur': ['date valeur', 'date de valeur', 'value date'],
+    'libelle': ['libelle', 'intitule', 'description', 'operation', 'label'],
+    'reference': ['reference', 'ref', 'n piece', 'numero'],
+    'montant': ['montant', 'amount'],
+    'debit': ['debit'],
+    'credit': ['credit'],
+}
+
+
+class ErreurReleve(ValueError):
+    """Fichier de relevé illisible ou format non reconnu."""
+
+
+@dataclass
+class Operation:
+    """Opération lue dans un relevé (montant positif au crédit du compte)."""
+    date_operation: date
+    libelle: str
+    montant: Decimal
+    reference: str = ''
+    date_valeur: date = None
+    identifiant: str = ''
+
+
+def lire_montant(texte):
+    """'1 234,56' / '1,234.56' / '-1234.5' / '(12,00)' -> Decimal"""
+    texte = (texte or '').strip().replace('\xa0', '').replace(' ', '')
+    negatif = texte.startswith('(') and texte.endswith(')') or texte.endswith('-')
+    texte = texte.strip('()').rstrip('-')
+    if ',' in texte and '.' in texte:
+        separateur = ',' if texte.rfind(',') > texte.rfind('.') else '.'
+        milliers = '.' if separateur == ',' else ','
+        texte = texte.replace(milliers, '').replace(separateur, '.')
+    else:
+        texte = texte.replace(',', '.')
+    try:
+        montant = Decimal(texte) if texte else Decimal('0')
+    except InvalidOperation:
+        raise ErreurReleve(f"Montant illisible : {texte!r}")
+    return -montant if negatif else montant
+
+
+def lire_date(texte):
+    texte = (texte or '').strip()
+    if not texte:
+        return None
+    for fmt in FORMATS_DATE:
+        try:
+            return datetime.strptime(texte[:10] if fmt != '%Y%m%d' else texte[:8], fmt).date()
+        except ValueError:
+            continue
+    raise ErreurReleve(f"Date illisible : {texte!r}")
+
+
+def _normaliser(texte):
+    texte = unicodedata.normalize('NFKD', texte or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', texte.lower()).strip()
+
+
+def _ouvrir_texte(fichier):
+    """Flux texte sur un fichier binaire : UTF-8 si possible, sinon Windows-1252."""
+    debut = fichier.read(65536)
+    fichier.seek(0)
+    try:
+        debut.decode('utf-8')
+        encodage = 'utf-8-sig'
+    except UnicodeDecodeError as erreur:
+        # Coupure d'un caractère multi-octets en fin d'échantillon
+        encodage = 'utf-8-sig' if erreur.start >= len(debut) - 3 else 'cp1252'
+    return io.TextIOWrapper(fichier, encoding=encodage, errors='replace', newline='')
+
+
+def detecter_format(nom_fichier, fichier):
+    """'csv', 'ofx' ou 'camt' d'après l'extension, puis le début du fichier."""
+    extension = (nom_fichier or '').rsplit('.', 1)[-1].lower()
+    if extension in ('ofx', 'qfx'):
+        return 'ofx'
+    debut = fichier.read(2048)
+    fichier.seek(0)
+    if b'OFXHEADER' in debut or b'<OFX>' in debut:
+        return 'ofx'
+    if b'camt.05' in debut or b'<BkToCstmrStmt' in debut:
+        return 'camt'
+    if extension == 'xml':
+        raise ErreurReleve("Fichier XML non reconnu (CAMT.053 attendu)")
+    return 'csv'
+
+
+# CSV
+
+class PointVirgule(csv.excel):
+    """Dialecte par défaut des exports bancaires français."""
+    delimiter = ';'
+
+
+def lire_csv(fichier):
+    """Opérations d'un relevé CSV (séparateur ; , ou tabulation, en-tête requis)."""
+    texte = _ouvrir_texte(fichier)
+    echantillon = texte.read(8192)
+    texte.seek(0)
+    try:
+        dialecte = csv.Sniffer().sniff(echantillon, delimiters=';,\t')
+    except csv.Error:
+        dialecte = PointVirgule
+
+    lecteur = csv.reader(texte, dialecte)
+    colonnes = None
+    for numero, ligne in enumerate(lecteur, 1):
+        if not any(cellule.strip() for cellule in ligne):
+            continue
+        if colonnes is None:
+            colonnes = _colonnes_csv(ligne)
+            continue
+
+        def valeur(champ):
+            index = colonnes.get(champ)
+            return ligne[index].strip() if index is not None and index < len(ligne) else ''
+
+        try:
+            if 'montant' in colonnes:
+                montant = lire_montant(valeur('montant'))
+            else:
+                montant = lire_montant(valeur('credit')) - lire_montant(valeur('debit'))
+            operation = Operation(
+                date_operation=lire_date(valeur('date_operation')),
+                date_valeur=lire_date(valeur('date_valeur')),
+                libelle=valeur('libelle')[:255],
+                reference=valeur('reference')[:100],
+                montant=montant,
+            )
+        except ErreurReleve as erreur:
+            raise ErreurReleve(f"Ligne {numero} : {erreur}")
+        if operation.date_operation and operation.montant:
+            yield operation
+
+
+def _colonnes_csv(entete):
+    """Index des colonnes reconnues dans la ligne d'en-tête."""
+    noms = [_normaliser(nom) for nom in entete]
+    colonnes = {}
+    for champ, libelles in COLONNES_CSV.items():
+        for libelle in libelles:
+            index = next(
+                (i for i, nom in enumerate(noms) if (nom == libelle or nom.startswith(libelle + ' '))
+                 and i not in colonnes.values()),
+                None
+            )
+            if index is not None:
+                colonnes[champ] = index
+                break
+    if 'date_operation' not in colonnes or not ({'montant'} & colonnes.keys() or {'debit', 'credit'} <= colonnes.keys()):
+        raise ErreurReleve("En-tête CSV non reconnu : colonnes date et montant (ou débit/crédit) requises")
+    return colonnes
+
+
+# OFX
+
+def _balise(bloc, nom):
+    correspondance = re.search(rf'<{nom}>([^<\r\n]*)', bloc, re.IGNORECASE)
+    return correspondance.group(1).strip() if correspondance else ''
+
+
+def lire_ofx(fichier, taille_bloc=65536):
+    """Opérations d'un relevé OFX (SGML 1.x ou XML 2.x), bloc <STMTTRN> par bloc."""
+    texte = _ouvrir_texte(fichier)
+    tampon = ''
+    while True:
+        morceau = texte.read(taille_bloc)
+        tampon += morceau
+        majuscules = tampon.upper()
+        position = 0
+        while True:
+            fin = majuscules.find('</STMTTRN>', position)
+            if fin == -1:
+                break
+            debut = majuscules.rfind('<STMTTRN>', position, fin)
+            if debut != -1:
+                bloc = tampon[debut:fin]
+                yield Operation(
+                    date_operation=lire_date(_balise(bloc, 'DTPOSTED')[:8]),
+                    date_valeur=lire_date(_balise(bloc, 'DTAVAIL')[:8]),
+                    libelle=' '.join(filter(None, [_balise(bloc, 'NAME'), _balise(bloc, 'MEMO')]))[:255],
+                    reference=(_balise(bloc, 'CHECKNUM') or _balise(bloc, 'REFNUM'))[:100],
+                    montant=lire_montant(_balise(bloc, 'TRNAMT')),
+                    identifiant=_balise(bloc, 'FITID'),
+                )
+            position = fin + len('</STMTTRN>')
+        if not morceau:
+            break
+        # Seul un bloc incomplet (ou une balise coupée) est conservé pour la suite
+        reste = tampon[position:]
+        ouverture = reste.upper().rfind('<STMTTRN>')
+        tampon = reste[ouverture:] if ouverture != -1 else reste[-20:]
+
+
+# CAMT.053
+
+def _local(balise):
+    return balise.rsplit('}', 1)[-1]
+
+
+def _enfant(element, *chemin):
+    for nom in chemin:
+        if element is None:
+            return None
+        element = next((e for e in element if _local(e.tag) == nom), None)
+    return element
+
+
+def _texte(element, *chemin):
+    element = _enfant(element, *chemin)
+    return (element.text or '').strip() if element is not None else ''
+
+
+def lire_camt(fichier):
+    """Opérations d'un relevé ISO 20022 camt.053, élément <Ntry> par élément."""
+    try:
+        for _evenement, element in ET.iterparse(fichier, events=('end',)):
+            if _local(element.tag) != 'Ntry':
+                continue
+            montant = lire_montant(_texte(element, 'Amt'))
+            if _texte(element, 'CdtDbtInd') == 'DBIT':
+                montant = -montant
+            transaction_detail = _enfant(element, 'NtryDtls', 'TxDtls')
+            reference = (
+                _texte(transaction_detail, 'Refs', 'EndToEndId') or _texte(element, 'NtryRef')
+            )
+            if reference == 'NOTPROVIDED':
+                reference = ''
+            libelle = (
+                _texte(transaction_detail, 'RmtInf', 'Ustrd') or _texte(element, 'AddtlNtryInf')
+            )
+            yield Operation(
+                date_operation=lire_date(_texte(element, 'BookgDt', 'Dt') or _texte(element, 'BookgDt', 'DtTm')),
+                date_valeur=lire_date(_texte(element, 'ValDt', 'Dt') or _texte(element, 'ValDt', 'DtTm')),
+                libelle=libelle[:255],
+                reference=reference[:100],
+                montant=montant,
+                identifiant=_texte(element, 'AcctSvcrRef'),
+            )
+            element.clear()
+    except ET.ParseError as erreur:
+        raise ErreurReleve(f"XML CAMT invalide : {erreur}")
+
+
+LECTEURS = {'csv': lire_csv, 'ofx': lire_ofx, 'camt': lire_camt}
+
+
+def empreintes(operations):
+    """Associe à chaque opération son empreinte de dédoublonnage."""
+    occurrences = Counter()
+    for operation in operations:
+        if operation.identifiant:
+            cle = f"id|{operation.identifiant}"
+        else:
+            cle = (
+                f"{operation.date_operation.isoformat()}|{operation.montant:.2f}|"
+                f"{_normaliser(operation.reference)}|{_normaliser(operation.libelle)}"
+            )
+            occurrences[cle] += 1
+            cle = f"{cle}|{occurrences[cle]}"
+        yield operation, hashlib.sha256(cle.encode()).hexdigest()
+
+
+def importer(compte, fichier, nom_fichier, utilisateur=None, format_releve=None, taille_lot=TAILLE_LOT):
+    """
+    Importe un relevé pour le compte et retourne le ReleveBancaire créé.
+
+    Les opérations déjà importées (même empreinte) sont comptées en
+    doublons et ignorées. Lève ErreurReleve si le fichier est illisible :
+    rien n'est alors enregistré.
+    """
+    from tresorerie.models import LigneReleve, ReleveBancaire
+
+    format_releve = format_releve or detecter_format(nom_fichier, fichier)
+    lecteur = LECTEURS[format_releve]
+
+    with transaction.atomic():
+        releve = ReleveBancaire.objects.create(
+            compte=compte, nom_fichier=nom_fichier[:255], format=format_releve, cree_par=utilisateur
+        )
+        lu = 0
+        lot = []
+
+        def enregistrer(lot):
+            existantes = set(LigneReleve.objects.filter(
+                compte=compte, empreinte__in=[ligne.empreinte for ligne in lot]
+            ).values_list('empreinte', flat=True))
+            nouvelles = [ligne for ligne in lot if ligne.empreinte not in existantes]
+            LigneReleve.objects.bulk_create(nouvelles, ignore_conflicts=True)
+            return len(nouvelles)
+
+        for operation, empreinte in empreintes(lecteur(fichier)):
+            lu += 1
+            lot.append(LigneReleve(
+                releve=releve,
+                compte=compte,
+                date_operation=operation.date_operation,
+                date_valeur=operation.date_valeur,
+                libelle=operation.libelle,
+                reference=operation.reference,
+                montant=operation.montant,
+                empreinte=empreinte,
+            ))
+            if len(lot) >= taille_lot:
+                releve.nb_lignes += enregistrer(lot)
+                lot = []
+        if lot:
+            releve.nb_lignes += enregistrer(lot)
+
+        releve.nb_doublons = lu - releve.nb_lignes
+        releve.save(update_fields=['nb_lignes', 'nb_doublons'])
+    return releve
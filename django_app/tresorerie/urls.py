@@ -40,6 +40,12 @@ urlpatterns = [
     # API - Rapprochements
     path('api/rapprochements/creer/', views.api_creer_rapprochement, name='api_creer_rapprochement'),
     path('api/rapprochements/<uuid:rapprochement_id>/valider/', views.api_valider_rapprochement, name='api_valider_rapprochement'),
+    path('api/rapprochements/automatique/', views.api_rapprochement_automatique, name='api_rapprochement_automatique'),
+
+    # API - Relevés bancaires
+    path('api/releves/importer/', views.api_importer_releve, name='api_importer_releve'),
+    path('api/releves/lignes/', views.api_lignes_releve, name='api_lignes_releve'),
+    path('api/releves/lignes/<uuid:ligne_id>/rapprocher/', views.api_rapprocher_ligne, name='api_rapprocher_ligne'),
 
     # API - Alertes
     path('api/alertes/<uuid:alerte_id>/lue/', views.api_marquer_alerte_lue, name='api_marquer_alerte_lue'),
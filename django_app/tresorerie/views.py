@@ -6,6 +6,7 @@ from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.db import models
 from django.db.models import Sum, Q, Count, F
 from django.utils import timezone
@@ -15,41 +16,15 @@ import json
 
 from .models import (
     CompteBancaire, MouvementTresorerie, RapprochementBancaire,
-    PrevisionTresorerie, AlerteTresorerie
+    PrevisionTresorerie, AlerteTresorerie, LigneReleve
 )
+from .services import rapprochement as rapprochement_auto, releves
 
 
 def get_default_context(request):
     """Contexte par défaut pour tous les templates"""
-    current_user = {
-        'id': 1,
-        'nom': 'BIAOU Martial Arnaud',
-        'role': 'admin',
-        'email': 'mab@etude-biaou.bj',
-        'initials': 'MA'
-    }
-
-    modules = [
-        {'id': 'dashboard', 'label': 'Tableau de bord', 'icon': 'home', 'category': 'main', 'url': 'gestion:dashboard'},
-        {'id': 'dossiers', 'label': 'Dossiers', 'icon': 'folder-open', 'category': 'main', 'url': 'gestion:dossiers', 'badge': 14},
-        {'id': 'facturation', 'label': 'Facturation & MECeF', 'icon': 'file-text', 'category': 'main', 'url': 'gestion:facturation'},
-        {'id': 'calcul', 'label': 'Calcul Recouvrement', 'icon': 'calculator', 'category': 'main', 'url': 'gestion:calcul'},
-        {'id': 'creanciers', 'label': 'Recouvrement Créances', 'icon': 'landmark', 'category': 'main', 'url': 'gestion:creanciers'},
-        {'id': 'tresorerie', 'label': 'Trésorerie', 'icon': 'piggy-bank', 'category': 'finance', 'url': 'tresorerie:dashboard'},
-        {'id': 'comptabilite', 'label': 'Comptabilité', 'icon': 'book-open', 'category': 'finance', 'url': 'comptabilite:dashboard'},
-        {'id': 'rh', 'label': 'Ressources Humaines', 'icon': 'users', 'category': 'gestion', 'url': 'rh:dashboard'},
-        {'id': 'drive', 'label': 'Drive', 'icon': 'hard-drive', 'category': 'gestion', 'url': 'documents:drive'},
-        {'id': 'gerance', 'label': 'Gérance Immobilière', 'icon': 'building-2', 'category': 'gestion', 'url': 'gerance:dashboard'},
-        {'id': 'agenda', 'label': 'Agenda', 'icon': 'calendar', 'category': 'gestion', 'url': 'agenda:home'},
-        {'id': 'parametres', 'label': 'Paramètres', 'icon': 'settings', 'category': 'admin', 'url': 'parametres:index'},
-        {'id': 'securite', 'label': 'Sécurité & Accès', 'icon': 'shield', 'category': 'admin', 'url': 'gestion:securite'},
-    ]
-
-    return {
-        'current_user': current_user,
-        'modules': modules,
-        'active_module': 'tresorerie',
-    }
+    # Navigation (modules, utilisateur, collaborateurs) : processeur de contexte
+    return {'active_module': 'tresorerie'}
 
 
 @login_required
@@ -529,6 +504,11 @@ def api_creer_rapprochement(request):
             solde_comptable=compte.solde_actuel,
             cree_par=request.user if request.user.is_authenticated else None,
         )
+        mouvements_ids = data.get('mouvements_ids') or []
+        if mouvements_ids:
+            rapprochement.mouvements_rapproches.set(
+                compte.mouvements.filter(id__in=mouvements_ids, statut='valide')
+            )
         rapprochement.calculer_ecart()
 
         return JsonResponse({
@@ -751,18 +731,24 @@ def api_mouvements_non_rapproches(request):
         date_debut = request.GET.get('date_debut')
         date_fin = request.GET.get('date_fin')
 
+        page = int(request.GET.get('page', 1))
+        per_page = min(int(request.GET.get('per_page', 100)), 500)
+
         mouvements = MouvementTresorerie.objects.filter(
             compte_id=compte_id,
             statut='valide'
-        ).exclude(statut='rapproche')
+        )
 
         if date_debut:
             mouvements = mouvements.filter(date_mouvement__gte=date_debut)
         if date_fin:
             mouvements = mouvements.filter(date_mouvement__lte=date_fin)
 
+        paginator = Paginator(mouvements.order_by('date_mouvement', 'id'), per_page)
+        page_obj = paginator.get_page(page)
+
         data = []
-        for mvt in mouvements[:50]:
+        for mvt in page_obj:
             data.append({
                 'id': str(mvt.id),
                 'date_mouvement': mvt.date_mouvement.strftime('%d/%m/%Y'),
@@ -773,12 +759,170 @@ def api_mouvements_non_rapproches(request):
 
         return JsonResponse({
             'success': True,
-            'mouvements': data
+            'mouvements': data,
+            'pagination': {
+                'page': page_obj.number,
+                'per_page': per_page,
+                'total': paginator.count,
+                'pages': paginator.num_pages
+            }
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_POST
+def api_importer_releve(request):
+    """Importer un relevé bancaire (CSV, OFX ou CAMT.053)"""
+    try:
+        compte = get_object_or_404(CompteBancaire, id=request.POST.get('compte_id'))
+
+        if 'fichier' not in request.FILES:
+            return JsonResponse({
+                'success': False,
+                'error': 'Aucun fichier fourni'
+            }, status=400)
+
+        fichier = request.FILES['fichier']
+        releve = releves.importer(
+            compte,
+            fichier,
+            fichier.name,
+            utilisateur=request.user,
+            format_releve=request.POST.get('format') or None,
+        )
+
+        return JsonResponse({
+            'success': True,
+            'releve_id': str(releve.id),
+            'format': releve.format,
+            'nb_lignes': releve.nb_lignes,
+            'nb_doublons': releve.nb_doublons,
+            'message': f'{releve.nb_lignes} ligne(s) importée(s), {releve.nb_doublons} doublon(s) ignoré(s)'
+        })
+    except releves.ErreurReleve as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_GET
+def api_lignes_releve(request):
+    """Lignes de relevé d'un compte (par défaut : à rapprocher)"""
+    try:
+        page = int(request.GET.get('page', 1))
+        per_page = min(int(request.GET.get('per_page', 100)), 500)
+
+        lignes = LigneReleve.objects.filter(
+            compte_id=request.GET.get('compte'),
+            statut=request.GET.get('statut', 'a_rapprocher')
+        )
+        if request.GET.get('date_debut'):
+            lignes = lignes.filter(date_operation__gte=request.GET['date_debut'])
+        if request.GET.get('date_fin'):
+            lignes = lignes.filter(date_operation__lte=request.GET['date_fin'])
+
+        paginator = Paginator(lignes.order_by('date_operation', 'id'), per_page)
+        page_obj = paginator.get_page(page)
+
+        data = [{
+            'id': str(ligne.id),
+            'date_operation': ligne.date_operation.strftime('%d/%m/%Y'),
+            'libelle': ligne.libelle,
+            'reference': ligne.reference,
+            'montant': str(ligne.montant),
+            'statut': ligne.statut,
+            'methode': ligne.methode,
+        } for ligne in page_obj]
+
+        return JsonResponse({
+            'success': True,
+            'lignes': data,
+            'pagination': {
+                'page': page_obj.number,
+                'per_page': per_page,
+                'total': paginator.count,
+                'pages': paginator.num_pages
+            }
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_POST
+def api_rapprochement_automatique(request):
+    """Rapprocher les lignes de relevé d'un compte avec ses mouvements"""
+    try:
+        data = json.loads(request.body)
+        compte = get_object_or_404(CompteBancaire, id=data.get('compte_id'))
+
+        propositions = rapprochement_auto.proposer(
+            compte,
+            date_debut=data.get('date_debut') or None,
+            date_fin=data.get('date_fin') or None,
+            tolerance_jours=int(data.get('tolerance_jours', rapprochement_auto.TOLERANCE_JOURS)),
+        )
+
+        rapprochees = 0
+        if data.get('appliquer'):
+            rapprochement = None
+            if data.get('rapprochement_id'):
+                rapprochement = get_object_or_404(
+                    RapprochementBancaire, id=data['rapprochement_id'], compte=compte
+                )
+            rapprochees = rapprochement_auto.appliquer(propositions.correspondances, rapprochement)
+
+        return JsonResponse({
+            'success': True,
+            'nb_propositions': len(propositions.correspondances),
+            'nb_a_revoir': len(propositions.a_revoir),
+            'nb_rapprochees': rapprochees,
+            **propositions.as_dict(),
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+@login_required
+@require_POST
+def api_rapprocher_ligne(request, ligne_id):
+    """Rapprocher manuellement une ligne de relevé, ou l'ignorer"""
+    try:
+        data = json.loads(request.body)
+        ligne = get_object_or_404(LigneReleve, id=ligne_id, statut='a_rapprocher')
+
+        if data.get('ignorer'):
+            ligne.statut = 'ignoree'
+            ligne.save(update_fields=['statut'])
+            return JsonResponse({'success': True, 'message': 'Ligne ignorée'})
+
+        mouvements = list(ligne.compte.mouvements.filter(
+            id__in=data.get('mouvements_ids') or [],
+            statut='valide',
+            ligne_releve__isnull=True,
+        ))
+        total = sum(
+            (m.montant if m.type_mouvement == 'entree' else -m.montant for m in mouvements),
+            Decimal('0')
+        )
+        if not mouvements or total != ligne.montant:
+            return JsonResponse({
+                'success': False,
+                'error': f'Le total des mouvements ({total}) ne correspond pas à la ligne ({ligne.montant})'
+            }, status=400)
+
+        rapprochement_auto.appliquer([rapprochement_auto.Correspondance(
+            ligne.id, tuple(m.id for m in mouvements), ligne.montant, 'manuel'
+        )])
+
+        return JsonResponse({'success': True, 'message': 'Ligne rapprochée'})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 @require_POST
 def api_valider_rapprochement(request, rapprochement_id):
     """Valider un rapprochement bancaire"""